@@ -9,7 +9,7 @@ from alembic import context
 
 from app.config import settings
 from app.database import Base
-from app.models import user, family, child, media, analysis, report
+from app.models import user, family, child, media, analysis, report, face, llm
 
 config = context.config
 
@@ -0,0 +1,55 @@
+"""人脸特征表 face_embeddings，analysis_type_enum 新增 face
+
+基线表由应用启动时的 create_all 创建，本系列迁移面向已有数据库：create_all 不会修改已存在的
+枚举类型，也可能已经建好了新表（升级后先启动过应用），因此建表前先检查是否已存在。
+
+已有数据库：alembic upgrade head
+全新数据库（应用启动时已建好全部表）：alembic stamp head
+
+Revision ID: 0001_face_embeddings
+Revises:
+Create Date: 2026-10-19
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0001_face_embeddings"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade() -> None:
+    # ADD VALUE 不能与使用新值的语句处于同一事务，放在 autocommit 块中执行
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE analysis_type_enum ADD VALUE IF NOT EXISTS 'face'")
+
+    if not _has_table("face_embeddings"):
+        op.create_table(
+            "face_embeddings",
+            sa.Column("id", sa.String(36), primary_key=True),
+            sa.Column("child_id", sa.String(36), sa.ForeignKey("children.id"), nullable=False),
+            sa.Column("family_id", sa.String(36), sa.ForeignKey("families.id"), nullable=False),
+            sa.Column("embedding", sa.LargeBinary(), nullable=False),
+            sa.Column("dim", sa.Integer(), nullable=False),
+            sa.Column("source", sa.String(50), nullable=False),
+            sa.Column(
+                "source_media_id",
+                sa.String(36),
+                sa.ForeignKey("media_files.id", ondelete="SET NULL"),
+                nullable=True,
+            ),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+        )
+        op.create_index("ix_face_embeddings_child_id", "face_embeddings", ["child_id"])
+        op.create_index("ix_face_embeddings_family_id", "face_embeddings", ["family_id"])
+
+
+def downgrade() -> None:
+    # PostgreSQL 不支持删除枚举值，downgrade 只删除新表
+    if _has_table("face_embeddings"):
+        op.drop_table("face_embeddings")
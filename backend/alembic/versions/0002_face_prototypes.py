@@ -0,0 +1,42 @@
+"""人脸原型表 face_prototypes
+
+Revision ID: 0002_face_prototypes
+Revises: 0001_face_embeddings
+Create Date: 2026-10-19
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0002_face_prototypes"
+down_revision = "0001_face_embeddings"
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade() -> None:
+    # 升级后先启动过应用时 create_all 已经建好了表
+    if _has_table("face_prototypes"):
+        return
+    op.create_table(
+        "face_prototypes",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("child_id", sa.String(36), sa.ForeignKey("children.id"), nullable=False),
+        sa.Column("family_id", sa.String(36), sa.ForeignKey("families.id"), nullable=False),
+        sa.Column("embedding", sa.LargeBinary(), nullable=False),
+        sa.Column("dim", sa.Integer(), nullable=False),
+        sa.Column("weight", sa.Float(), nullable=False),
+        sa.Column("match_count", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_face_prototypes_child_id", "face_prototypes", ["child_id"])
+    op.create_index("ix_face_prototypes_family_id", "face_prototypes", ["family_id"])
+
+
+def downgrade() -> None:
+    if _has_table("face_prototypes"):
+        op.drop_table("face_prototypes")
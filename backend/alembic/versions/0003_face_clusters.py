@@ -0,0 +1,60 @@
+"""未识别人脸聚类表 face_clusters / unknown_faces
+
+Revision ID: 0003_face_clusters
+Revises: 0002_face_prototypes
+Create Date: 2026-10-19
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0003_face_clusters"
+down_revision = "0002_face_prototypes"
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade() -> None:
+    # 升级后先启动过应用时 create_all 已经建好了表
+    if not _has_table("face_clusters"):
+        op.create_table(
+            "face_clusters",
+            sa.Column("id", sa.String(36), primary_key=True),
+            sa.Column("family_id", sa.String(36), sa.ForeignKey("families.id"), nullable=False),
+            sa.Column("centroid", sa.LargeBinary(), nullable=False),
+            sa.Column("dim", sa.Integer(), nullable=False),
+            sa.Column("size", sa.Integer(), nullable=False),
+            sa.Column("status", sa.String(20), nullable=False),
+            sa.Column("child_id", sa.String(36), sa.ForeignKey("children.id"), nullable=True),
+            sa.Column("preview_path", sa.String(500), nullable=True),
+            sa.Column("preview_score", sa.Float(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+        )
+        op.create_index("ix_face_clusters_family_id", "face_clusters", ["family_id"])
+
+    if not _has_table("unknown_faces"):
+        op.create_table(
+            "unknown_faces",
+            sa.Column("id", sa.String(36), primary_key=True),
+            sa.Column("family_id", sa.String(36), sa.ForeignKey("families.id"), nullable=False),
+            sa.Column("cluster_id", sa.String(36), sa.ForeignKey("face_clusters.id"), nullable=False),
+            sa.Column(
+                "media_id", sa.String(36), sa.ForeignKey("media_files.id", ondelete="CASCADE"), nullable=False
+            ),
+            sa.Column("embedding", sa.LargeBinary(), nullable=False),
+            sa.Column("dim", sa.Integer(), nullable=False),
+            sa.Column("det_score", sa.Float(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+        )
+        op.create_index("ix_unknown_faces_family_id", "unknown_faces", ["family_id"])
+        op.create_index("ix_unknown_faces_cluster_id", "unknown_faces", ["cluster_id"])
+
+
+def downgrade() -> None:
+    for table in ("unknown_faces", "face_clusters"):
+        if _has_table(table):
+            op.drop_table(table)
@@ -0,0 +1,43 @@
+"""大模型批处理任务表 llm_batch_jobs
+
+Revision ID: 0004_llm_batch_jobs
+Revises: 0003_face_clusters
+Create Date: 2026-10-19
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = "0004_llm_batch_jobs"
+down_revision = "0003_face_clusters"
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade() -> None:
+    # 升级后先启动过应用时 create_all 已经建好了表
+    if _has_table("llm_batch_jobs"):
+        return
+    op.create_table(
+        "llm_batch_jobs",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("kind", sa.String(50), nullable=False),
+        sa.Column("provider", sa.String(50), nullable=False),
+        sa.Column("batch_ref", sa.String(255), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("request_count", sa.Integer(), nullable=False),
+        sa.Column("context", postgresql.JSONB(), nullable=False),
+        sa.Column("error_message", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("completed_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_llm_batch_jobs_status", "llm_batch_jobs", ["status"])
+
+
+def downgrade() -> None:
+    if _has_table("llm_batch_jobs"):
+        op.drop_table("llm_batch_jobs")
@@ -0,0 +1,51 @@
+"""大模型用量台账表 llm_usage_records
+
+Revision ID: 0005_llm_usage_records
+Revises: 0004_llm_batch_jobs
+Create Date: 2026-10-19
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0005_llm_usage_records"
+down_revision = "0004_llm_batch_jobs"
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade() -> None:
+    # 升级后先启动过应用时 create_all 已经建好了表
+    if _has_table("llm_usage_records"):
+        return
+    op.create_table(
+        "llm_usage_records",
+        sa.Column("id", sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("user_id", sa.String(36), nullable=True),
+        sa.Column("family_id", sa.String(36), nullable=True),
+        sa.Column("media_id", sa.String(36), nullable=True),
+        sa.Column("analyzer", sa.String(50), nullable=True),
+        sa.Column("provider", sa.String(50), nullable=False),
+        sa.Column("model", sa.String(100), nullable=False),
+        sa.Column("kind", sa.String(20), nullable=False),
+        sa.Column("outcome", sa.String(20), nullable=False),
+        sa.Column("status_code", sa.Integer(), nullable=True),
+        sa.Column("latency_ms", sa.Integer(), nullable=False),
+        sa.Column("input_tokens", sa.Integer(), nullable=False),
+        sa.Column("output_tokens", sa.Integer(), nullable=False),
+        sa.Column("cached_tokens", sa.Integer(), nullable=False),
+        sa.Column("cache_creation_tokens", sa.Integer(), nullable=False),
+        sa.Column("image_count", sa.Integer(), nullable=False),
+        sa.Column("cost_usd", sa.Float(), nullable=False),
+    )
+    op.create_index("ix_llm_usage_records_created_at", "llm_usage_records", ["created_at"])
+    op.create_index("ix_llm_usage_family_created", "llm_usage_records", ["family_id", "created_at"])
+
+
+def downgrade() -> None:
+    if _has_table("llm_usage_records"):
+        op.drop_table("llm_usage_records")
@@ -1,101 +1,563 @@
 import os
+import threading
+from dataclasses import dataclass, replace
+from functools import partial
 import numpy as np
 from typing import Optional
 
+from app.ai.local.face_index import FaceIndex, face_index_store
+from app.ai.local.face_tracker import link_face_tracks
+from app.ai.local.model_registry import model_registry
+from app.config import settings
+
+# 批量推理时单次送入 ONNX Runtime 的图片 / 人脸数量
+DETECTION_BATCH_SIZE = 8
+RECOGNITION_BATCH_SIZE = 32
+# 未识别人脸参与聚类的最低检测分数与最小边长（像素），过小或模糊的人脸特征不可靠
+UNMATCHED_MIN_DET_SCORE = 0.6
+UNMATCHED_MIN_FACE_SIZE = 40
+
+# 流水线只需要检测 + 特征提取，默认不加载 genderage / landmark_2d_106 / landmark_3d_68
+PIPELINE_MODULES = ("detection", "recognition")
+
+
+@dataclass(frozen=True)
+class FaceProfile:
+    """
+    人脸模型速度档位。
+
+    所有内置档位的识别模型都来自 buffalo_l（w600k_r50），因此已注册的人脸特征在切换档位后仍然可用；
+    档位之间只在检测模型包、检测输入尺寸和是否加载属性模型上有所区别。
+    """
+
+    name: str
+    det_pack: str
+    det_size: tuple[int, int]
+    rec_pack: str = "buffalo_l"
+    modules: Optional[tuple[str, ...]] = PIPELINE_MODULES
+    det_thresh: float = 0.5
+
+
+FACE_PROFILES: dict[str, FaceProfile] = {
+    # 原始行为：加载 buffalo_l 全部子模型（含年龄/性别与关键点）
+    "full": FaceProfile("full", det_pack="buffalo_l", det_size=(640, 640), modules=None),
+    "accurate": FaceProfile("accurate", det_pack="buffalo_l", det_size=(640, 640)),
+    "balanced": FaceProfile("balanced", det_pack="buffalo_l", det_size=(480, 480)),
+    # buffalo_s 的 det_500m 检测器 + buffalo_l 识别模型，适合纯 CPU 机器
+    "fast": FaceProfile("fast", det_pack="buffalo_s", det_size=(320, 320)),
+}
+
+
+def get_face_profile(name: Optional[str] = None) -> FaceProfile:
+    """按名称获取档位，FACE_DET_SIZE 非 0 时覆盖检测尺寸"""
+    profile_name = name or settings.FACE_PROFILE
+    if profile_name not in FACE_PROFILES:
+        raise ValueError(f"未知的人脸模型档位: {profile_name}，可选: {', '.join(FACE_PROFILES)}")
+    profile = FACE_PROFILES[profile_name]
+    if name is None and settings.FACE_DET_SIZE > 0:
+        profile = replace(profile, det_size=(settings.FACE_DET_SIZE, settings.FACE_DET_SIZE))
+    return profile
+
+
+def _load_recognition_model(pack: str, providers: list[str]):
+    """从指定模型包中加载识别模型（检测与识别来自不同模型包时使用）"""
+    import glob
+    from insightface.model_zoo import model_zoo
+    from insightface.utils import ensure_available
+
+    model_dir = ensure_available("models", pack)
+    for onnx_file in sorted(glob.glob(os.path.join(model_dir, "*.onnx"))):
+        model = model_zoo.get_model(onnx_file, providers=providers)
+        if model is not None and model.taskname == "recognition":
+            return model
+    raise RuntimeError(f"模型包 {pack} 中未找到识别模型")
+
+
+def _load_face_model(profile: FaceProfile):
+    """按档位加载 InsightFace 模型（由模型注册表调用，避免启动时占用 GPU）"""
+    from insightface.app import FaceAnalysis
+
+    providers = ["CUDAExecutionProvider", "CPUExecutionProvider"]
+    modules = list(profile.modules) if profile.modules is not None else None
+    if modules is not None and profile.rec_pack != profile.det_pack:
+        modules = [m for m in modules if m != "recognition"]
+
+    app = FaceAnalysis(name=profile.det_pack, allowed_modules=modules, providers=providers)
+    if "recognition" not in app.models:
+        app.models["recognition"] = _load_recognition_model(profile.rec_pack, providers)
+    app.prepare(ctx_id=0, det_size=profile.det_size, det_thresh=profile.det_thresh)
+    return app
+
+
+def _face_model_size_mb(app) -> float:
+    """按 ONNX 模型文件大小估算内存占用"""
+    total_bytes = sum(
+        os.path.getsize(model.model_file)
+        for model in app.models.values()
+        if getattr(model, "model_file", None) and os.path.exists(model.model_file)
+    )
+    return total_bytes / 1024 / 1024
+
 
 class FaceEngine:
     """基于 InsightFace 的人脸检测与识别引擎"""
 
-    def __init__(self):
-        self._app = None
-        self._registered_faces: dict[str, np.ndarray] = {}
-
-    def _ensure_model(self):
-        """延迟加载模型，避免启动时占用 GPU"""
-        if self._app is None:
-            from insightface.app import FaceAnalysis
-            self._app = FaceAnalysis(
-                name="buffalo_l",
-                providers=["CUDAExecutionProvider", "CPUExecutionProvider"],
-            )
-            self._app.prepare(ctx_id=0, det_size=(640, 640))
+    def __init__(self, profile: Optional[FaceProfile] = None):
+        self.profile = profile or get_face_profile()
+        self.model_name = (
+            f"insightface:{self.profile.name}:{self.profile.det_size[0]}x{self.profile.det_size[1]}"
+        )
+        self._buffers: dict[str, np.ndarray] = {}
+        self._buffer_lock = threading.Lock()
+        model_registry.register(
+            self.model_name,
+            partial(_load_face_model, self.profile),
+            size_fn=_face_model_size_mb,
+        )
 
-    def register_face(self, child_id: str, image_path: str) -> bool:
+    def extract_face_embedding(self, image_path: str) -> Optional[np.ndarray]:
         """
-        注册孩子的人脸特征向量。
+        提取照片中最大人脸的特征向量，用于注册孩子人脸。
+        特征向量的持久化由 face_registry_service 负责。
 
         Args:
-            child_id: 孩子 ID
             image_path: 包含孩子人脸的照片路径
 
         Returns:
-            是否注册成功
+            float32 特征向量，未检测到人脸时返回 None
         """
-        self._ensure_model()
         import cv2
         image = cv2.imread(image_path)
         if image is None:
-            return False
+            return None
 
-        faces = self._app.get(image)
-        if not faces:
-            return False
+        with model_registry.use(self.model_name) as app:
+            faces = app.get(image)
+        return self.largest_face_embedding(
+            [{"bbox": face.bbox.tolist(), "embedding": face.embedding} for face in faces]
+        )
 
-        largest_face = max(faces, key=lambda f: (f.bbox[2] - f.bbox[0]) * (f.bbox[3] - f.bbox[1]))
-        self._registered_faces[child_id] = largest_face.embedding
-        return True
+    @staticmethod
+    def largest_face_embedding(faces: list[dict]) -> Optional[np.ndarray]:
+        """取面积最大的人脸的特征向量，没有人脸时返回 None"""
+        if not faces:
+            return None
+        largest_face = max(faces, key=lambda f: (f["bbox"][2] - f["bbox"][0]) * (f["bbox"][3] - f["bbox"][1]))
+        return np.asarray(largest_face["embedding"], dtype=np.float32)
 
     def detect_faces(self, image_path: str) -> list[dict]:
         """
         检测图片中的所有人脸。
 
         Returns:
-            人脸信息列表，包含 bbox, age, gender
+            人脸信息列表，包含 bbox, age, gender（档位未加载属性模型时 age/gender 为 None）
         """
-        self._ensure_model()
         import cv2
         image = cv2.imread(image_path)
         if image is None:
             return []
 
-        faces = self._app.get(image)
+        with model_registry.use(self.model_name) as app:
+            faces = app.get(image)
         return [
             {
                 "bbox": face.bbox.tolist(),
-                "age": int(face.age) if hasattr(face, "age") else None,
-                "gender": "male" if getattr(face, "gender", 0) == 1 else "female",
+                "age": int(face.age) if face.age is not None else None,
+                "gender": None if face.gender is None else ("male" if face.gender == 1 else "female"),
                 "embedding": face.embedding,
             }
             for face in faces
         ]
 
-    def identify_child(self, image_path: str, threshold: float = 0.4) -> list[str]:
+    def detect_faces_batch(self, image_paths: list[str]) -> list[list[dict]]:
+        """
+        批量检测并提取多张图片（如同一媒体的全部关键帧）中的人脸特征。
+
+        检测与识别分别以批次方式调用 ONNX Runtime，输入张量复用同一块缓冲区；
+        只运行检测和识别两个子模型，不计算年龄/性别。
+
+        Returns:
+            与 image_paths 一一对应的人脸列表，每项包含 bbox, det_score, embedding
+        """
+        import cv2
+        from insightface.utils.face_align import norm_crop
+
+        images = [cv2.imread(path) for path in image_paths]
+        results: list[list[dict]] = [[] for _ in image_paths]
+        valid_indices = [i for i, image in enumerate(images) if image is not None]
+        if not valid_indices:
+            return results
+
+        with model_registry.use(self.model_name) as app, self._buffer_lock:
+            rec_model = app.models["recognition"]
+            detections = self._detect_batch(app.det_model, [images[i] for i in valid_indices])
+
+            crops = []
+            for frame_idx, (bboxes, kpss) in zip(valid_indices, detections):
+                if kpss is None:
+                    continue
+                for face_idx in range(bboxes.shape[0]):
+                    crops.append(norm_crop(images[frame_idx], kpss[face_idx], image_size=rec_model.input_size[0]))
+                    results[frame_idx].append({
+                        "bbox": bboxes[face_idx, :4].tolist(),
+                        "det_score": float(bboxes[face_idx, 4]),
+                    })
+
+            embeddings = self._embed_batch(rec_model, crops)
+
+        flat_faces = [face for frame_faces in results for face in frame_faces]
+        for face, embedding in zip(flat_faces, embeddings):
+            face["embedding"] = embedding
+        return results
+
+    def _get_buffer(self, name: str, shape: tuple) -> np.ndarray:
+        """按需扩容并复用 float32 输入缓冲区"""
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape[0] < shape[0] or buffer.shape[1:] != shape[1:]:
+            buffer = np.empty(shape, dtype=np.float32)
+            self._buffers[name] = buffer
+        return buffer[: shape[0]]
+
+    def _detect_batch(self, det_model, images: list[np.ndarray]) -> list[tuple]:
+        """
+        批量人脸检测。输入/输出带动态 batch 维度的 SCRFD 模型一次推理多张图片，
+        其他检测模型（如 buffalo_l 自带的 det_10g）在同一次模型持有内逐张调用 detect()。
+        """
+        import cv2
+
+        input_batch_dim = (getattr(det_model, "input_shape", None) or [1])[0]
+        supports_batch = (
+            getattr(det_model, "batched", False)
+            and hasattr(det_model, "_feat_stride_fpn")
+            and not isinstance(input_batch_dim, int)
+        )
+        if not supports_batch:
+            return [det_model.detect(image, max_num=0, metric="default") for image in images]
+
+        input_width, input_height = det_model.input_size
+        pad_value = -det_model.input_mean / det_model.input_std
+        detections = []
+        for start in range(0, len(images), DETECTION_BATCH_SIZE):
+            chunk = images[start:start + DETECTION_BATCH_SIZE]
+            blob = self._get_buffer("detection", (len(chunk), 3, input_height, input_width))
+            blob.fill(pad_value)
+
+            # 与 SCRFD.detect 相同的等比缩放 + 左上角对齐填充
+            scales = []
+            for i, image in enumerate(chunk):
+                im_ratio = image.shape[0] / image.shape[1]
+                if im_ratio > input_height / input_width:
+                    new_height = input_height
+                    new_width = max(int(new_height / im_ratio), 1)
+                else:
+                    new_width = input_width
+                    new_height = max(int(new_width * im_ratio), 1)
+                scales.append(new_height / image.shape[0])
+                resized = cv2.resize(image, (new_width, new_height))
+                blob[i, :, :new_height, :new_width] = (
+                    (resized[:, :, ::-1].astype(np.float32) - det_model.input_mean) / det_model.input_std
+                ).transpose(2, 0, 1)
+
+            net_outs = det_model.session.run(det_model.output_names, {det_model.input_name: blob})
+            for i, det_scale in enumerate(scales):
+                detections.append(
+                    self._decode_detections(det_model, net_outs, i, input_height, input_width, det_scale)
+                )
+        return detections
+
+    @staticmethod
+    def _decode_detections(
+        det_model, net_outs: list, batch_idx: int, input_height: int, input_width: int, det_scale: float
+    ) -> tuple:
+        """解码批量输出中第 batch_idx 张图的检测结果（逻辑同 SCRFD.forward + detect）"""
+        from insightface.model_zoo.scrfd import distance2bbox, distance2kps
+
+        fmc = det_model.fmc
+        scores_list, bboxes_list, kpss_list = [], [], []
+        for idx, stride in enumerate(det_model._feat_stride_fpn):
+            scores = net_outs[idx][batch_idx]
+            bbox_preds = net_outs[idx + fmc][batch_idx] * stride
+
+            height, width = input_height // stride, input_width // stride
+            key = (height, width, stride)
+            anchor_centers = det_model.center_cache.get(key)
+            if anchor_centers is None:
+                anchor_centers = np.stack(np.mgrid[:height, :width][::-1], axis=-1).astype(np.float32)
+                anchor_centers = (anchor_centers * stride).reshape((-1, 2))
+                if det_model._num_anchors > 1:
+                    anchor_centers = np.stack(
+                        [anchor_centers] * det_model._num_anchors, axis=1
+                    ).reshape((-1, 2))
+                if len(det_model.center_cache) < 100:
+                    det_model.center_cache[key] = anchor_centers
+
+            pos_inds = np.where(scores >= det_model.det_thresh)[0]
+            scores_list.append(scores[pos_inds])
+            bboxes_list.append(distance2bbox(anchor_centers, bbox_preds)[pos_inds])
+            if det_model.use_kps:
+                kps_preds = net_outs[idx + fmc * 2][batch_idx] * stride
+                kpss = distance2kps(anchor_centers, kps_preds)
+                kpss_list.append(kpss.reshape((kpss.shape[0], -1, 2))[pos_inds])
+
+        scores = np.vstack(scores_list)
+        order = scores.ravel().argsort()[::-1]
+        bboxes = np.vstack(bboxes_list) / det_scale
+        pre_det = np.hstack((bboxes, scores)).astype(np.float32, copy=False)[order, :]
+        keep = det_model.nms(pre_det)
+        det = pre_det[keep, :]
+        kpss = None
+        if det_model.use_kps:
+            kpss = (np.vstack(kpss_list) / det_scale)[order][keep]
+        return det, kpss
+
+    def _embed_batch(self, rec_model, crops: list[np.ndarray]) -> np.ndarray:
+        """批量提取对齐人脸的特征向量（预处理同 ArcFaceONNX.get_feat）"""
+        if not crops:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        input_width, input_height = rec_model.input_size
+        outputs = []
+        for start in range(0, len(crops), RECOGNITION_BATCH_SIZE):
+            chunk = crops[start:start + RECOGNITION_BATCH_SIZE]
+            blob = self._get_buffer("recognition", (len(chunk), 3, input_height, input_width))
+            for i, crop in enumerate(chunk):
+                blob[i] = (
+                    (crop[:, :, ::-1].astype(np.float32) - rec_model.input_mean) / rec_model.input_std
+                ).transpose(2, 0, 1)
+            outputs.append(
+                rec_model.session.run(rec_model.output_names, {rec_model.input_name: blob})[0]
+            )
+        return np.vstack(outputs).astype(np.float32, copy=False)
+
+    def identify_child(
+        self,
+        image_path: str,
+        family_id: str,
+        threshold: float = 0.4,
+        top_k: int = 1,
+    ) -> list[dict]:
         """
-        识别图片中出现的已注册孩子。
+        识别图片中出现的已注册孩子（仅与媒体所属家庭的孩子比对）。
 
         Args:
             image_path: 图片路径
-            threshold: 相似度阈值（余弦距离）
+            family_id: 媒体所属家庭，使用该家庭的人脸索引进行匹配
+            threshold: 相似度阈值（余弦相似度）
+            top_k: 每张人脸最多返回的候选孩子数
 
         Returns:
-            匹配到的 child_id 列表
+            每张匹配成功的人脸一项，包含 bbox, child_id, score, candidates
         """
-        if not self._registered_faces:
+        index = face_index_store.load(family_id)
+        if index is None or not index.child_ids:
             return []
 
         detected = self.detect_faces(image_path)
-        matched_children = []
+        return self.match_faces(detected, index, threshold=threshold, top_k=top_k)
 
-        for face_info in detected:
-            face_embedding = face_info["embedding"]
-            for child_id, registered_embedding in self._registered_faces.items():
-                similarity = np.dot(face_embedding, registered_embedding) / (
-                    np.linalg.norm(face_embedding) * np.linalg.norm(registered_embedding)
-                )
-                if similarity >= threshold:
-                    matched_children.append(child_id)
+    def identify_children_batch(
+        self,
+        image_paths: list[str],
+        family_id: str,
+        threshold: float = 0.4,
+        top_k: int = 1,
+    ) -> list[list[dict]]:
+        """
+        批量识别多张图片中出现的已注册孩子，所有帧的人脸一次性与家庭索引比对。
+
+        Returns:
+            与 image_paths 一一对应的匹配列表，每项格式同 identify_child
+        """
+        index = face_index_store.load(family_id)
+        if index is None or not index.child_ids:
+            return [[] for _ in image_paths]
+        return self.identify_detected(self.detect_faces_batch(image_paths), family_id, threshold, top_k)
+
+    def identify_detected(
+        self,
+        frames: list[list[dict]],
+        family_id: str,
+        threshold: float = 0.4,
+        top_k: int = 1,
+    ) -> list[list[dict]]:
+        """identify_children_batch 的比对部分，frames 为 detect_faces_batch 的结果"""
+        index = face_index_store.load(family_id)
+        if index is None or not index.child_ids:
+            return [[] for _ in frames]
+
+        flat_faces = [face for frame_faces in frames for face in frame_faces]
+        scored = self.score_faces(flat_faces, index, threshold=threshold, top_k=top_k)
+
+        results = []
+        offset = 0
+        for frame_faces in frames:
+            frame_scored = scored[offset:offset + len(frame_faces)]
+            results.append([match for match in frame_scored if match is not None])
+            offset += len(frame_faces)
+        return results
+
+    def track_keyframes(
+        self,
+        image_paths: list[str],
+        family_id: str,
+        threshold: float = 0.4,
+        top_k: int = 1,
+        refine_threshold: float = 0.0,
+        refine_margin: float = 0.1,
+        collect_unmatched: bool = False,
+    ) -> dict:
+        """
+        批量识别关键帧中的人脸，并把不同关键帧中的同一张人脸关联成轨迹。
+
+        与 identify_children_batch 不同，未匹配的人脸也会保留（child_id 为 None），
+        便于按轨迹把低分帧归到同一个孩子；特征向量默认不返回。
+        refine_threshold 大于 0 时，每个孩子分数最高且明显领先第二候选的一张人脸
+        会连同特征向量放入 refine_samples，用于在线更新人脸原型。
+        collect_unmatched 为 True 时，每条未识别轨迹中质量最好的一张人脸放入
+        unmatched_samples，用于未识别人脸聚类。
+
+        Returns:
+            {"frames": 与 image_paths 一一对应的人脸列表（bbox, det_score, child_id,
+             score, candidates, track_id）, "tracks": link_face_tracks 的结果,
+             "refine_samples": [{child_id, score, embedding}],
+             "unmatched_samples": [{track_id, keyframe_index, bbox, det_score, embedding}]}
+        """
+        return self.track_detected(
+            self.detect_faces_batch(image_paths), family_id, threshold=threshold, top_k=top_k,
+            refine_threshold=refine_threshold, refine_margin=refine_margin,
+            collect_unmatched=collect_unmatched,
+        )
+
+    def track_detected(
+        self,
+        frames: list[list[dict]],
+        family_id: str,
+        threshold: float = 0.4,
+        top_k: int = 1,
+        refine_threshold: float = 0.0,
+        refine_margin: float = 0.1,
+        collect_unmatched: bool = False,
+    ) -> dict:
+        """track_keyframes 的比对与轨迹关联部分，frames 为 detect_faces_batch 的结果（会被原地修改）"""
+        flat_faces = [face for frame_faces in frames for face in frame_faces]
+
+        index = face_index_store.load(family_id)
+        if index is not None and index.child_ids:
+            scored = self.score_faces(flat_faces, index, threshold=threshold, top_k=top_k)
+        else:
+            scored = [None] * len(flat_faces)
+
+        for face, match in zip(flat_faces, scored):
+            face["bbox"] = [round(float(v), 1) for v in face["bbox"]]
+            face["child_id"] = match["child_id"] if match else None
+            face["score"] = match["score"] if match else None
+            face["candidates"] = match["candidates"] if match else []
+
+        tracks = link_face_tracks(frames)
+
+        refine_samples: dict[str, dict] = {}
+        if refine_threshold > 0:
+            for face in flat_faces:
+                candidates = face["candidates"]
+                if not candidates or candidates[0]["score"] < refine_threshold:
+                    continue
+                if len(candidates) > 1 and candidates[0]["score"] - candidates[1]["score"] < refine_margin:
+                    continue
+                best = refine_samples.get(face["child_id"])
+                if best is None or face["score"] > best["score"]:
+                    refine_samples[face["child_id"]] = {
+                        "child_id": face["child_id"],
+                        "score": face["score"],
+                        "embedding": np.asarray(face["embedding"], dtype=np.float32),
+                    }
+
+        unmatched_samples: dict[int, dict] = {}
+        if collect_unmatched:
+            unmatched_tracks = {track["track_id"] for track in tracks if track["child_id"] is None}
+            for frame_idx, frame_faces in enumerate(frames):
+                for face in frame_faces:
+                    x1, y1, x2, y2 = face["bbox"]
+                    if (
+                        face["track_id"] not in unmatched_tracks
+                        or face["det_score"] < UNMATCHED_MIN_DET_SCORE
+                        or min(x2 - x1, y2 - y1) < UNMATCHED_MIN_FACE_SIZE
+                    ):
+                        continue
+                    best = unmatched_samples.get(face["track_id"])
+                    if best is None or face["det_score"] > best["det_score"]:
+                        unmatched_samples[face["track_id"]] = {
+                            "track_id": face["track_id"],
+                            "keyframe_index": frame_idx,
+                            "bbox": face["bbox"],
+                            "det_score": face["det_score"],
+                            "embedding": np.asarray(face["embedding"], dtype=np.float32),
+                        }
+
+        for face in flat_faces:
+            face.pop("embedding", None)
+        return {
+            "frames": frames,
+            "tracks": tracks,
+            "refine_samples": list(refine_samples.values()),
+            "unmatched_samples": list(unmatched_samples.values()),
+        }
+
+    @classmethod
+    def match_faces(
+        cls,
+        detected: list[dict],
+        index: FaceIndex,
+        threshold: float = 0.4,
+        top_k: int = 1,
+    ) -> list[dict]:
+        """将检测到的人脸与家庭索引批量比对，只返回匹配成功的人脸"""
+        scored = cls.score_faces(detected, index, threshold=threshold, top_k=top_k)
+        return [match for match in scored if match is not None]
+
+    @staticmethod
+    def score_faces(
+        detected: list[dict],
+        index: FaceIndex,
+        threshold: float = 0.4,
+        top_k: int = 1,
+    ) -> list[Optional[dict]]:
+        """
+        将检测到的人脸与家庭索引批量比对，结果与 detected 一一对应，未匹配为 None。
+
+        索引矩阵已预先归一化，所有人脸与所有已注册特征的相似度通过一次矩阵乘法得到，
+        同一孩子的多条特征取最大值，再对每张人脸做 top-k 选择。
+        """
+        if not detected or not index.child_order:
+            return [None] * len(detected)
+
+        queries = np.stack([np.asarray(f["embedding"], dtype=np.float32) for f in detected])
+        queries /= np.clip(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12, None)
+
+        similarities = queries @ np.asarray(index.embeddings).T
+        child_scores = np.maximum.reduceat(similarities, index.segment_starts, axis=1)
+
+        k = max(1, min(top_k, child_scores.shape[1]))
+        top_columns = np.argpartition(-child_scores, k - 1, axis=1)[:, :k]
 
-        return list(set(matched_children))
+        scored: list[Optional[dict]] = []
+        for face_idx, face_info in enumerate(detected):
+            columns = top_columns[face_idx]
+            columns = columns[np.argsort(-child_scores[face_idx, columns])]
+            candidates = [
+                {"child_id": index.child_order[col], "score": round(float(child_scores[face_idx, col]), 4)}
+                for col in columns
+                if child_scores[face_idx, col] >= threshold
+            ]
+            if not candidates:
+                scored.append(None)
+                continue
+            scored.append({
+                "bbox": [round(float(v), 1) for v in face_info["bbox"]],
+                "child_id": candidates[0]["child_id"],
+                "score": candidates[0]["score"],
+                "candidates": candidates,
+            })
+        return scored
 
 
 face_engine = FaceEngine()
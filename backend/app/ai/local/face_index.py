@@ -0,0 +1,154 @@
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FaceIndex:
+    """
+    单个家庭的人脸匹配矩阵：embeddings 第 i 行对应 child_ids[i]。
+
+    embeddings 已按行 L2 归一化，且同一孩子的多条特征连续存放，
+    child_order[j] 对应的特征行从 segment_starts[j] 开始。
+    """
+
+    family_id: str
+    fingerprint: str
+    child_ids: list[str]
+    embeddings: np.ndarray
+    child_order: list[str] = field(default_factory=list)
+    segment_starts: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.intp))
+
+    def __post_init__(self):
+        if not self.child_order and self.child_ids:
+            starts = [
+                i for i, child_id in enumerate(self.child_ids)
+                if i == 0 or child_id != self.child_ids[i - 1]
+            ]
+            self.child_order = [self.child_ids[i] for i in starts]
+            self.segment_starts = np.asarray(starts, dtype=np.intp)
+
+
+class FaceIndexStore:
+    """
+    基于磁盘文件的家庭人脸索引，供同一台机器上的所有 worker 进程共享。
+
+    每个家庭对应一个 float32 .npy 矩阵文件和一个 JSON 元数据文件。读取时使用
+    mmap 打开矩阵，多个进程共享同一份页缓存；元数据文件通过 os.replace 原子替换，
+    读取方根据其 mtime 判断是否需要重新映射，因此一个家庭的人脸变化只会使该家庭的索引失效。
+    """
+
+    def __init__(self, root_dir: Optional[str] = None):
+        self.root_dir = root_dir or os.path.join(settings.DATA_DIR, "models", "face_index")
+        self._cache: dict[str, tuple[int, FaceIndex]] = {}
+        self._lock = threading.Lock()
+
+    def _meta_path(self, family_id: str) -> str:
+        return os.path.join(self.root_dir, f"{family_id}.json")
+
+    def read_fingerprint(self, family_id: str) -> Optional[str]:
+        """读取磁盘上索引的指纹，不存在时返回 None"""
+        try:
+            with open(self._meta_path(family_id), encoding="utf-8") as f:
+                return json.load(f).get("fingerprint")
+        except (OSError, ValueError):
+            return None
+
+    def write(
+        self,
+        family_id: str,
+        fingerprint: str,
+        child_ids: list[str],
+        embeddings: np.ndarray,
+    ) -> None:
+        """原子写入一个家庭的索引，旧矩阵文件在元数据切换后删除"""
+        os.makedirs(self.root_dir, exist_ok=True)
+        previous_matrix = self._read_meta(family_id).get("matrix_file")
+
+        matrix_file = f"{family_id}.{fingerprint[:16]}.npy"
+        matrix_path = os.path.join(self.root_dir, matrix_file)
+        tmp_matrix_path = f"{matrix_path}.{os.getpid()}.tmp"
+        with open(tmp_matrix_path, "wb") as f:
+            np.save(f, np.ascontiguousarray(embeddings, dtype=np.float32))
+        os.replace(tmp_matrix_path, matrix_path)
+
+        meta_path = self._meta_path(family_id)
+        tmp_meta_path = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp_meta_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"fingerprint": fingerprint, "child_ids": child_ids, "matrix_file": matrix_file},
+                f,
+            )
+        os.replace(tmp_meta_path, meta_path)
+
+        # 已映射旧文件的进程在 POSIX 上仍可继续读取，直到重新加载
+        if previous_matrix and previous_matrix != matrix_file:
+            try:
+                os.unlink(os.path.join(self.root_dir, previous_matrix))
+            except OSError:
+                pass
+        logger.info(
+            "🗂️ [人脸索引] 家庭 %s 索引已更新: %d 条特征, 指纹=%s",
+            family_id, len(child_ids), fingerprint[:8],
+        )
+
+    def load(self, family_id: str) -> Optional[FaceIndex]:
+        """加载（或复用已映射的）家庭索引，不存在时返回 None"""
+        meta_path = self._meta_path(family_id)
+        try:
+            mtime_ns = os.stat(meta_path).st_mtime_ns
+        except OSError:
+            return None
+
+        with self._lock:
+            cached = self._cache.get(family_id)
+            if cached is not None and cached[0] == mtime_ns:
+                return cached[1]
+
+            meta = self._read_meta(family_id)
+            if not meta.get("matrix_file"):
+                return None
+            matrix_path = os.path.join(self.root_dir, meta["matrix_file"])
+            try:
+                embeddings = np.load(matrix_path, mmap_mode="r")
+            except OSError:
+                return None
+            index = FaceIndex(
+                family_id=family_id,
+                fingerprint=meta["fingerprint"],
+                child_ids=list(meta.get("child_ids", [])),
+                embeddings=embeddings,
+            )
+            self._cache[family_id] = (mtime_ns, index)
+            return index
+
+    def remove(self, family_id: str) -> None:
+        """删除家庭索引"""
+        meta = self._read_meta(family_id)
+        for name in (meta.get("matrix_file"), f"{family_id}.json"):
+            if name:
+                try:
+                    os.unlink(os.path.join(self.root_dir, name))
+                except OSError:
+                    pass
+        with self._lock:
+            self._cache.pop(family_id, None)
+
+    def _read_meta(self, family_id: str) -> dict:
+        try:
+            with open(self._meta_path(family_id), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+
+face_index_store = FaceIndexStore()
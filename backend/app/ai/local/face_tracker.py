@@ -0,0 +1,174 @@
+import os
+from collections import Counter
+from typing import Optional
+
+import numpy as np
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    return matrix / np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+
+
+def link_face_tracks(
+    frames: list[list[dict]],
+    similarity_threshold: float = 0.5,
+) -> list[dict]:
+    """
+    将相邻关键帧中的同一张人脸关联成轨迹。
+
+    关键帧来自不同镜头，位置信息不可靠，因此按特征向量关联：每帧的人脸与已有轨迹的
+    平均特征比对，按相似度从高到低贪心分配（同一帧内一条轨迹最多分配一张脸），
+    低于阈值的人脸开启新轨迹。会在 frames 的每张人脸上写入 track_id。
+
+    Args:
+        frames: 每个关键帧的人脸列表，需包含 embedding、bbox，可选 child_id、score
+        similarity_threshold: 关联到已有轨迹的最低余弦相似度
+
+    Returns:
+        轨迹列表，每项包含 track_id, child_id（多数投票）, frames
+    """
+    track_sums: list[np.ndarray] = []
+    track_members: list[list[tuple[int, dict]]] = []
+
+    for frame_idx, faces in enumerate(frames):
+        if not faces:
+            continue
+        embeddings = _normalize_rows(
+            np.stack([np.asarray(face["embedding"], dtype=np.float32) for face in faces])
+        )
+
+        assigned: dict[int, int] = {}
+        if track_sums:
+            prototypes = _normalize_rows(np.stack(track_sums))
+            similarities = embeddings @ prototypes.T
+            used_tracks: set[int] = set()
+            for flat_idx in np.argsort(-similarities, axis=None):
+                face_idx, track_idx = np.unravel_index(flat_idx, similarities.shape)
+                if similarities[face_idx, track_idx] < similarity_threshold:
+                    break
+                if face_idx in assigned or track_idx in used_tracks:
+                    continue
+                assigned[int(face_idx)] = int(track_idx)
+                used_tracks.add(int(track_idx))
+
+        for face_idx, face in enumerate(faces):
+            track_idx = assigned.get(face_idx)
+            if track_idx is None:
+                track_idx = len(track_sums)
+                track_sums.append(np.zeros_like(embeddings[face_idx]))
+                track_members.append([])
+            track_sums[track_idx] += embeddings[face_idx]
+            track_members[track_idx].append((frame_idx, face))
+            face["track_id"] = track_idx
+
+    tracks = []
+    for track_idx, members in enumerate(track_members):
+        votes = Counter(face["child_id"] for _, face in members if face.get("child_id"))
+        tracks.append({
+            "track_id": track_idx,
+            "child_id": votes.most_common(1)[0][0] if votes else None,
+            "frames": [
+                {
+                    "keyframe_index": frame_idx,
+                    "bbox": face["bbox"],
+                    "score": face.get("score"),
+                }
+                for frame_idx, face in members
+            ],
+        })
+    return tracks
+
+
+def select_child_faces(
+    tracks: list[dict],
+    child_id: Optional[str],
+    max_faces: int = 4,
+) -> list[tuple[int, list[float]]]:
+    """
+    选出目标孩子最适合做情绪分析的若干张人脸（关键帧下标 + bbox）。
+
+    优先使用投票归属于该孩子的轨迹，按匹配分数从高到低选取，且尽量分散到不同关键帧；
+    child_id 为空时使用出现帧数最多的已识别轨迹。
+    """
+    child_tracks = [t for t in tracks if t.get("child_id")]
+    if child_id:
+        child_tracks = [t for t in child_tracks if t["child_id"] == child_id]
+    elif child_tracks:
+        child_tracks = [max(child_tracks, key=lambda t: len(t["frames"]))]
+    if not child_tracks:
+        return []
+
+    candidates = [
+        (frame["score"] or 0.0, frame["keyframe_index"], frame["bbox"])
+        for track in child_tracks
+        for frame in track["frames"]
+    ]
+    candidates.sort(key=lambda c: c[0], reverse=True)
+
+    selected: list[tuple[int, list[float]]] = []
+    used_frames: set[int] = set()
+    for _, keyframe_index, bbox in candidates:
+        if keyframe_index in used_frames:
+            continue
+        selected.append((keyframe_index, bbox))
+        used_frames.add(keyframe_index)
+        if len(selected) >= max_faces:
+            break
+    return sorted(selected)
+
+
+def crop_face(
+    image_path: str,
+    bbox: list[float],
+    output_path: str,
+    max_side: int = 336,
+    margin: float = 0.35,
+    quality: int = 85,
+) -> bool:
+    """
+    从图片中裁剪一张人脸（带边距以保留头部姿态与表情上下文），缩放后保存为 JPEG。
+
+    Returns:
+        是否成功写出裁剪图
+    """
+    import cv2
+
+    image = cv2.imread(image_path)
+    if image is None:
+        return False
+    height, width = image.shape[:2]
+    x1, y1, x2, y2 = bbox
+    pad_x = (x2 - x1) * margin
+    pad_y = (y2 - y1) * margin
+    left, top = max(int(x1 - pad_x), 0), max(int(y1 - pad_y), 0)
+    right, bottom = min(int(x2 + pad_x), width), min(int(y2 + pad_y), height)
+    if right <= left or bottom <= top:
+        return False
+
+    crop = image[top:bottom, left:right]
+    scale = max_side / max(crop.shape[:2])
+    if scale < 1.0:
+        crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    return bool(cv2.imwrite(output_path, crop, [cv2.IMWRITE_JPEG_QUALITY, quality]))
+
+
+def crop_faces(
+    keyframe_paths: list[str],
+    selections: list[tuple[int, list[float]]],
+    output_dir: str,
+    max_side: int = 336,
+) -> list[str]:
+    """
+    按 select_child_faces 的结果批量裁剪人脸。
+
+    Returns:
+        成功写出的裁剪图片路径列表
+    """
+    crop_paths = []
+    for keyframe_index, bbox in selections:
+        crop_path = os.path.join(output_dir, f"face_{keyframe_index:04d}.jpg")
+        if crop_face(keyframe_paths[keyframe_index], bbox, crop_path, max_side=max_side):
+            crop_paths.append(crop_path)
+    return crop_paths
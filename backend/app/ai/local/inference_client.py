@@ -0,0 +1,204 @@
+import logging
+import pickle
+import socket
+import threading
+import time
+from typing import Any, Optional
+
+from app.ai.local.inference_server import FRAME_HEADER, default_socket_path
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 推理服务可用性检测结果的缓存时长，避免每次获取引擎都发送一次 stats 请求
+AVAILABILITY_CHECK_INTERVAL_SEC = 30.0
+
+
+class InferenceServerError(RuntimeError):
+    """推理服务返回的执行错误"""
+
+
+class InferenceClient:
+    """推理服务的同步客户端，每个线程持有一条独立的 Unix Socket 连接"""
+
+    def __init__(self, socket_path: Optional[str] = None, timeout: float = 600.0):
+        self.socket_path = socket_path or default_socket_path()
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def call(self, method: str, *args, **kwargs) -> Any:
+        """调用远端方法，连接断开时重连一次"""
+        payload = pickle.dumps(
+            {"method": method, "args": args, "kwargs": kwargs},
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+        frame = FRAME_HEADER.pack(len(payload)) + payload
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.sendall(frame)
+                response = self._read_frame(conn)
+                break
+            except (ConnectionError, OSError):
+                self._close()
+                if attempt == 1:
+                    raise
+        if not response.get("ok"):
+            raise InferenceServerError(response.get("error", "推理服务未知错误"))
+        return response.get("result")
+
+    def is_available(self) -> bool:
+        """检测推理服务是否可连接"""
+        try:
+            self.call("stats")
+            return True
+        except (ConnectionError, OSError, InferenceServerError):
+            return False
+
+    def _connection(self) -> socket.socket:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            conn.settimeout(self.timeout)
+            conn.connect(self.socket_path)
+            self._local.conn = conn
+        return conn
+
+    def _close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            try:
+                conn.close()
+            finally:
+                self._local.conn = None
+
+    @staticmethod
+    def _read_exactly(conn: socket.socket, size: int) -> bytes:
+        chunks = []
+        remaining = size
+        while remaining:
+            chunk = conn.recv(min(remaining, 1 << 20))
+            if not chunk:
+                raise ConnectionError("推理服务连接已关闭")
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return b"".join(chunks)
+
+    def _read_frame(self, conn: socket.socket) -> dict:
+        (length,) = FRAME_HEADER.unpack(self._read_exactly(conn, FRAME_HEADER.size))
+        return pickle.loads(self._read_exactly(conn, length))
+
+
+class RemoteFaceEngine:
+    """与 FaceEngine 方法签名一致的推理服务代理"""
+
+    def __init__(self, client: InferenceClient):
+        self._client = client
+
+    def extract_face_embedding(self, image_path: str):
+        return self._client.call("extract_face_embedding", image_path)
+
+    def detect_faces(self, image_path: str) -> list[dict]:
+        return self._client.call("detect_faces", image_path)
+
+    def detect_faces_batch(self, image_paths: list[str]) -> list[list[dict]]:
+        return self._client.call("detect_faces_batch", image_paths)
+
+    def identify_child(
+        self,
+        image_path: str,
+        family_id: str,
+        threshold: float = 0.4,
+        top_k: int = 1,
+    ) -> list[dict]:
+        return self._client.call(
+            "identify_child", image_path, family_id, threshold=threshold, top_k=top_k
+        )
+
+    def identify_children_batch(
+        self,
+        image_paths: list[str],
+        family_id: str,
+        threshold: float = 0.4,
+        top_k: int = 1,
+    ) -> list[list[dict]]:
+        return self._client.call(
+            "identify_children_batch", image_paths, family_id, threshold=threshold, top_k=top_k
+        )
+
+    def track_keyframes(
+        self,
+        image_paths: list[str],
+        family_id: str,
+        threshold: float = 0.4,
+        top_k: int = 1,
+        refine_threshold: float = 0.0,
+        refine_margin: float = 0.1,
+        collect_unmatched: bool = False,
+    ) -> dict:
+        return self._client.call(
+            "track_keyframes", image_paths, family_id, threshold=threshold, top_k=top_k,
+            refine_threshold=refine_threshold, refine_margin=refine_margin,
+            collect_unmatched=collect_unmatched,
+        )
+
+
+class RemoteWhisperEngine:
+    """与 WhisperEngine 方法签名一致的推理服务代理"""
+
+    def __init__(self, client: InferenceClient):
+        self._client = client
+
+    def transcribe(self, audio_path: str, language: str = "zh") -> dict:
+        return self._client.call("transcribe", audio_path, language=language)
+
+    def analyze_speech(self, transcription: dict) -> dict:
+        # 纯文本统计，无需模型，直接在本地计算
+        from app.ai.local.whisper_engine import whisper_engine
+        return whisper_engine.analyze_speech(transcription)
+
+
+_client: Optional[InferenceClient] = None
+_client_lock = threading.Lock()
+# (是否可用, 检测时间)
+_availability: tuple[bool, float] = (False, float("-inf"))
+
+
+def _get_client() -> Optional[InferenceClient]:
+    """
+    启用推理服务且可连接时返回客户端，否则返回 None（可用性检测结果缓存一段时间）。
+
+    可用性检测是阻塞的 Socket 调用，在事件循环中应通过 asyncio.to_thread 调用
+    get_face_engine / get_whisper_engine。
+    """
+    global _client, _availability
+    if not settings.INFERENCE_SERVER_ENABLED:
+        return None
+    with _client_lock:
+        if _client is None:
+            _client = InferenceClient()
+        available, checked_at = _availability
+        if time.monotonic() - checked_at >= AVAILABILITY_CHECK_INTERVAL_SEC:
+            available = _client.is_available()
+            _availability = (available, time.monotonic())
+            if not available:
+                logger.warning("⚠️ [推理客户端] 推理服务不可用(%s)，回退到进程内模型", _client.socket_path)
+    return _client if available else None
+
+
+def get_face_engine():
+    """获取人脸引擎：启用推理服务时返回代理，否则返回进程内引擎"""
+    client = _get_client()
+    if client is not None:
+        return RemoteFaceEngine(client)
+    from app.ai.local.face_engine import face_engine
+    return face_engine
+
+
+def get_whisper_engine():
+    """获取语音转写引擎：启用推理服务时返回代理，否则返回进程内引擎"""
+    client = _get_client()
+    if client is not None:
+        return RemoteWhisperEngine(client)
+    from app.ai.local.whisper_engine import whisper_engine
+    return whisper_engine
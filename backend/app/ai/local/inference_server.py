@@ -0,0 +1,271 @@
+"""
+本机推理服务：在单个进程内持有 InsightFace / Whisper 模型，通过 Unix Socket 为所有
+Celery worker 提供推理，并在很短的时间窗口内把多个 worker 的并发请求合并成批次执行。
+
+人脸请求按批次合并为一次 ONNX 推理；Whisper 转写只在共享模型上串行执行（同一模型、
+同一线程，避免每个 worker 各加载一份），不做跨请求的批量解码。
+
+启动方式：
+    python -m app.ai.local.inference_server
+
+worker 侧设置 INFERENCE_SERVER_ENABLED=true 后，通过 inference_client 中的
+get_face_engine() / get_whisper_engine() 透明地使用本服务。
+"""
+import asyncio
+import logging
+import os
+import pickle
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+from app.ai.local.face_engine import face_engine
+from app.ai.local.whisper_engine import whisper_engine
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 帧格式：4 字节大端长度 + pickle 负载
+FRAME_HEADER = struct.Struct("!I")
+
+# 方法名 -> 所属批处理组；同一组共享一个模型和一个执行线程
+METHOD_GROUPS = {
+    "extract_face_embedding": "face",
+    "detect_faces": "face",
+    "detect_faces_batch": "face",
+    "identify_child": "face",
+    "identify_children_batch": "face",
+    "track_keyframes": "face",
+    "transcribe": "whisper",
+}
+
+# 可以跨请求合并检测的人脸方法：同一批次内这些请求的图片拼接后只调用一次 detect_faces_batch
+# （检测与识别按批次送入 ONNX Runtime），再按偏移把检测结果切回各请求完成比对。
+# detect_faces 需要年龄/性别属性，仍走逐张的完整模型。
+DETECTION_METHODS = {
+    "extract_face_embedding",
+    "identify_child",
+    "detect_faces_batch",
+    "identify_children_batch",
+    "track_keyframes",
+}
+SINGLE_IMAGE_METHODS = {"extract_face_embedding", "identify_child"}
+
+
+def default_socket_path() -> str:
+    """未配置时，Socket 文件放在 DATA_DIR/temp 下"""
+    return settings.INFERENCE_SOCKET_PATH or os.path.join(settings.DATA_DIR, "temp", "inference.sock")
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Any:
+    header = await reader.readexactly(FRAME_HEADER.size)
+    (length,) = FRAME_HEADER.unpack(header)
+    return pickle.loads(await reader.readexactly(length))
+
+
+def encode_frame(payload: Any) -> bytes:
+    body = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+    return FRAME_HEADER.pack(len(body)) + body
+
+
+class InferenceServer:
+    """按模型分组的动态批处理推理服务"""
+
+    def __init__(
+        self,
+        socket_path: Optional[str] = None,
+        batch_window_ms: Optional[float] = None,
+        max_batch_size: Optional[int] = None,
+    ):
+        self.socket_path = socket_path or default_socket_path()
+        self.batch_window = (
+            batch_window_ms if batch_window_ms is not None else settings.INFERENCE_BATCH_WINDOW_MS
+        ) / 1000
+        self.max_batch_size = max_batch_size or settings.INFERENCE_MAX_BATCH_SIZE
+        self.engines = {"face": face_engine, "whisper": whisper_engine}
+        self._queues: dict[str, asyncio.Queue] = {}
+        self._executors = {
+            group: ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"inference-{group}")
+            for group in self.engines
+        }
+        self.stats = {
+            group: {"requests": 0, "batches": 0, "max_batch": 0, "busy_seconds": 0.0, "merged_images": 0}
+            for group in self.engines
+        }
+
+    async def serve_forever(self) -> None:
+        """启动服务并持续运行"""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        os.makedirs(os.path.dirname(self.socket_path) or ".", exist_ok=True)
+
+        for group in self.engines:
+            self._queues[group] = asyncio.Queue()
+            asyncio.create_task(self._batch_loop(group))
+
+        # 仅允许同一用户的 worker 访问，负载使用 pickle，不能暴露给其他用户。
+        # 创建时即以 0600 权限生成 Socket 文件，避免 bind 之后、chmod 之前的窗口期被其他用户连接
+        old_umask = os.umask(0o077)
+        try:
+            server = await asyncio.start_unix_server(self._handle_connection, path=self.socket_path)
+        finally:
+            os.umask(old_umask)
+        os.chmod(self.socket_path, 0o600)
+        logger.info(
+            "🚀 [推理服务] 已启动: socket=%s, 批处理窗口=%.0fms, 最大批次=%d",
+            self.socket_path, self.batch_window * 1000, self.max_batch_size,
+        )
+        async with server:
+            await server.serve_forever()
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    request = await read_frame(reader)
+                except asyncio.IncompleteReadError:
+                    break
+
+                method = request.get("method")
+                if method == "stats":
+                    response = {"ok": True, "result": self.stats}
+                elif method not in METHOD_GROUPS:
+                    response = {"ok": False, "error": f"不支持的方法: {method}"}
+                else:
+                    future = loop.create_future()
+                    await self._queues[METHOD_GROUPS[method]].put((request, future))
+                    response = await future
+
+                writer.write(encode_frame(response))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def _batch_loop(self, group: str) -> None:
+        """收集窗口期内的请求，合并为一个批次交给模型线程执行"""
+        loop = asyncio.get_running_loop()
+        queue = self._queues[group]
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            requests = [request for request, _ in batch]
+            start_time = time.monotonic()
+            responses = await loop.run_in_executor(
+                self._executors[group], self._run_batch, group, requests
+            )
+            self._record_batch(group, len(batch), time.monotonic() - start_time)
+
+            for (_, future), response in zip(batch, responses):
+                if not future.done():
+                    future.set_result(response)
+
+    def _run_batch(self, group: str, requests: list[dict]) -> list[dict]:
+        """
+        在模型线程中执行同一批次的请求，模型只加载一次并保持热状态。
+        人脸检测类请求合并为一次批量推理，其余请求（包括 Whisper 转写）依次执行。
+        """
+        engine = self.engines[group]
+        responses: list[Optional[dict]] = [None] * len(requests)
+        merged = [
+            i for i, request in enumerate(requests)
+            if group == "face" and request["method"] in DETECTION_METHODS
+        ]
+        if merged:
+            self._run_merged_detection(engine, requests, merged, responses)
+
+        for i, request in enumerate(requests):
+            if responses[i] is None:
+                responses[i] = self._run_single(engine, request)
+        return responses
+
+    def _run_merged_detection(
+        self, engine, requests: list[dict], indices: list[int], responses: list[Optional[dict]]
+    ) -> None:
+        """拼接各请求的图片做一次 detect_faces_batch，按偏移切分后逐个完成请求"""
+        try:
+            split = [self._split_request(requests[i]) for i in indices]
+            all_paths = [path for paths, _, _ in split for path in paths]
+            all_frames = engine.detect_faces_batch(all_paths)
+        except Exception as error:
+            # 合并检测失败时逐个执行，单个请求的错误不影响同批次的其他请求
+            logger.warning("⚠️ [推理服务] 合并检测失败，改为逐个执行: %s", error)
+            return
+        self.stats["face"]["merged_images"] += len(all_paths)
+
+        offset = 0
+        for i, (paths, args, kwargs) in zip(indices, split):
+            frames = all_frames[offset:offset + len(paths)]
+            offset += len(paths)
+            method = requests[i]["method"]
+            try:
+                if method == "detect_faces_batch":
+                    result = frames
+                elif method == "extract_face_embedding":
+                    result = engine.largest_face_embedding(frames[0])
+                elif method == "identify_child":
+                    result = engine.identify_detected(frames, *args, **kwargs)[0]
+                elif method == "identify_children_batch":
+                    result = engine.identify_detected(frames, *args, **kwargs)
+                else:
+                    result = engine.track_detected(frames, *args, **kwargs)
+                responses[i] = {"ok": True, "result": result}
+            except Exception as error:
+                logger.error("❌ [推理服务] %s 执行失败: %s", method, error)
+                responses[i] = {"ok": False, "error": f"{type(error).__name__}: {error}"}
+
+    @staticmethod
+    def _split_request(request: dict) -> tuple[list[str], tuple, dict]:
+        """拆出请求的图片路径列表与其余参数"""
+        args = tuple(request.get("args", ()))
+        kwargs = dict(request.get("kwargs", {}))
+        if args:
+            target, args = args[0], args[1:]
+        else:
+            target = kwargs.pop("image_path", None) or kwargs.pop("image_paths")
+        paths = [target] if request["method"] in SINGLE_IMAGE_METHODS else list(target)
+        return paths, args, kwargs
+
+    @staticmethod
+    def _run_single(engine, request: dict) -> dict:
+        try:
+            method = getattr(engine, request["method"])
+            result = method(*request.get("args", ()), **request.get("kwargs", {}))
+            return {"ok": True, "result": result}
+        except Exception as error:
+            logger.error("❌ [推理服务] %s 执行失败: %s", request.get("method"), error)
+            return {"ok": False, "error": f"{type(error).__name__}: {error}"}
+
+    def _record_batch(self, group: str, size: int, elapsed: float) -> None:
+        stats = self.stats[group]
+        stats["requests"] += size
+        stats["batches"] += 1
+        stats["max_batch"] = max(stats["max_batch"], size)
+        stats["busy_seconds"] = round(stats["busy_seconds"] + elapsed, 3)
+        if size > 1:
+            logger.info("📦 [推理服务] %s 合并批次: %d 个请求, 耗时=%.2fs", group, size, elapsed)
+
+
+def main() -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    asyncio.run(InferenceServer().serve_forever())
+
+
+if __name__ == "__main__":
+    main()
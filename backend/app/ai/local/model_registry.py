@@ -0,0 +1,284 @@
+import gc
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _ModelEntry:
+    """注册表中单个模型的状态"""
+
+    name: str
+    loader: Callable[[], Any]
+    size_fn: Optional[Callable[[Any], float]] = None
+    model: Any = None
+    memory_mb: float = 0.0
+    load_seconds: float = 0.0
+    last_used: float = 0.0
+    in_use: int = 0
+    pinned: bool = False
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+def _current_rss_mb() -> float:
+    """读取当前进程常驻内存（MB），用于估算模型加载前后的内存增量"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, IndexError):
+        import resource
+        # macOS 上 ru_maxrss 单位为字节，Linux 上为 KB；这里只作为兜底估算
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss / 1024 / 1024 if max_rss > 1 << 32 else max_rss / 1024
+
+
+class ModelRegistry:
+    """
+    本地模型注册表，统一管理 Whisper / InsightFace 等模型的生命周期。
+
+    - 每个模型独立加锁，并发首次访问只会触发一次加载（single-flight）
+    - 记录每个模型的近似内存占用，超出内存预算时按 LRU 卸载空闲模型
+    - 后台线程定期卸载超过空闲时长未使用的模型
+    - 测试可通过 override() 注入轻量级假模型，不触发真实加载
+    """
+
+    def __init__(
+        self,
+        memory_budget_mb: Optional[float] = None,
+        idle_timeout_sec: Optional[float] = None,
+    ):
+        self.memory_budget_mb = (
+            memory_budget_mb if memory_budget_mb is not None else settings.MODEL_MEMORY_BUDGET_MB
+        )
+        self.idle_timeout_sec = (
+            idle_timeout_sec if idle_timeout_sec is not None else settings.MODEL_IDLE_TIMEOUT_SEC
+        )
+        self._entries: dict[str, _ModelEntry] = {}
+        self._registry_lock = threading.RLock()
+        self._reaper: Optional[threading.Thread] = None
+        self._reaper_stop = threading.Event()
+
+    def register(
+        self,
+        name: str,
+        loader: Callable[[], Any],
+        size_fn: Optional[Callable[[Any], float]] = None,
+    ) -> None:
+        """
+        注册模型加载器（不立即加载）。
+
+        Args:
+            name: 模型唯一名称
+            loader: 无参加载函数，返回模型对象
+            size_fn: 可选，根据模型对象计算内存占用（MB）；为空时使用加载前后 RSS 差值
+        """
+        with self._registry_lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                self._entries[name] = _ModelEntry(name=name, loader=loader, size_fn=size_fn)
+            else:
+                entry.loader = loader
+                entry.size_fn = size_fn
+
+    def get(self, name: str) -> Any:
+        """获取已加载的模型，未加载时加锁加载。返回后不保证模型不会被卸载，推理请使用 use()。"""
+        entry = self._get_entry(name)
+        model = self._load_if_needed(entry)
+        entry.last_used = time.monotonic()
+        return model
+
+    @contextmanager
+    def use(self, name: str) -> Iterator[Any]:
+        """推理期间持有模型引用，避免被空闲回收或预算淘汰卸载"""
+        entry = self._get_entry(name)
+        with entry.lock:
+            entry.in_use += 1
+        try:
+            model = self._load_if_needed(entry)
+            entry.last_used = time.monotonic()
+            yield model
+        finally:
+            with entry.lock:
+                entry.in_use -= 1
+                entry.last_used = time.monotonic()
+
+    def unload(self, name: str) -> bool:
+        """卸载指定模型，正在使用或被 override 固定的模型不会卸载"""
+        entry = self._entries.get(name)
+        if entry is None:
+            return False
+        with entry.lock:
+            if entry.model is None or entry.in_use > 0 or entry.pinned:
+                return False
+            entry.model = None
+            freed_mb = entry.memory_mb
+            entry.memory_mb = 0.0
+        self._release_memory()
+        logger.info("🧹 [模型注册表] 已卸载模型 %s，释放约 %.0fMB", name, freed_mb)
+        return True
+
+    def evict_idle(self, now: Optional[float] = None) -> list[str]:
+        """卸载超过空闲时长未使用的模型，返回被卸载的模型名称"""
+        if self.idle_timeout_sec <= 0:
+            return []
+        now = now if now is not None else time.monotonic()
+        evicted = []
+        for entry in list(self._entries.values()):
+            if entry.model is not None and now - entry.last_used >= self.idle_timeout_sec:
+                if self.unload(entry.name):
+                    evicted.append(entry.name)
+        return evicted
+
+    def memory_report(self) -> list[dict]:
+        """返回各模型的加载状态与近似内存占用"""
+        now = time.monotonic()
+        return [
+            {
+                "name": entry.name,
+                "loaded": entry.model is not None,
+                "memory_mb": round(entry.memory_mb, 1),
+                "load_seconds": round(entry.load_seconds, 2),
+                "idle_seconds": round(now - entry.last_used, 1) if entry.last_used else None,
+                "in_use": entry.in_use,
+            }
+            for entry in self._entries.values()
+        ]
+
+    def total_memory_mb(self) -> float:
+        """当前已加载模型的总内存占用（MB）"""
+        return sum(e.memory_mb for e in self._entries.values() if e.model is not None)
+
+    @contextmanager
+    def override(self, name: str, model: Any, memory_mb: float = 0.0) -> Iterator[Any]:
+        """
+        测试用：临时注入假模型，退出时恢复原状态。
+
+        Args:
+            name: 模型名称
+            model: 替代的模型对象
+            memory_mb: 假模型上报的内存占用
+        """
+        entry = self._get_entry(name, create=True)
+        with entry.lock:
+            previous = (entry.model, entry.memory_mb, entry.pinned)
+            entry.model = model
+            entry.memory_mb = memory_mb
+            entry.pinned = True
+            entry.last_used = time.monotonic()
+        try:
+            yield model
+        finally:
+            with entry.lock:
+                entry.model, entry.memory_mb, entry.pinned = previous
+
+    def start_reaper(self, interval_sec: float = 60.0) -> None:
+        """启动后台空闲回收线程（幂等）"""
+        if self.idle_timeout_sec <= 0:
+            return
+        with self._registry_lock:
+            if self._reaper is not None and self._reaper.is_alive():
+                return
+            self._reaper_stop.clear()
+            self._reaper = threading.Thread(
+                target=self._reap_loop,
+                args=(interval_sec,),
+                name="model-registry-reaper",
+                daemon=True,
+            )
+            self._reaper.start()
+
+    def stop_reaper(self) -> None:
+        """停止后台空闲回收线程"""
+        self._reaper_stop.set()
+
+    def _reap_loop(self, interval_sec: float) -> None:
+        while not self._reaper_stop.wait(interval_sec):
+            try:
+                self.evict_idle()
+            except Exception as error:
+                logger.warning("⚠️ [模型注册表] 空闲回收失败: %s", error)
+
+    def _get_entry(self, name: str, create: bool = False) -> _ModelEntry:
+        with self._registry_lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                if not create:
+                    raise KeyError(f"模型未注册: {name}")
+                entry = _ModelEntry(name=name, loader=self._missing_loader(name))
+                self._entries[name] = entry
+            return entry
+
+    @staticmethod
+    def _missing_loader(name: str) -> Callable[[], Any]:
+        def _loader():
+            raise KeyError(f"模型未注册: {name}")
+        return _loader
+
+    def _load_if_needed(self, entry: _ModelEntry) -> Any:
+        model = entry.model
+        if model is not None:
+            return model
+        with entry.lock:
+            if entry.model is not None:
+                return entry.model
+            logger.info("📦 [模型注册表] 开始加载模型 %s...", entry.name)
+            rss_before = _current_rss_mb()
+            start_time = time.monotonic()
+            model = entry.loader()
+            entry.load_seconds = time.monotonic() - start_time
+            if entry.size_fn is not None:
+                try:
+                    entry.memory_mb = float(entry.size_fn(model))
+                except Exception:
+                    entry.memory_mb = max(_current_rss_mb() - rss_before, 0.0)
+            else:
+                entry.memory_mb = max(_current_rss_mb() - rss_before, 0.0)
+            entry.model = model
+            entry.last_used = time.monotonic()
+            logger.info(
+                "📦 [模型注册表] 模型 %s 加载完成，耗时=%.1fs，内存约 %.0fMB",
+                entry.name, entry.load_seconds, entry.memory_mb,
+            )
+        self._enforce_budget(keep=entry.name)
+        self.start_reaper()
+        return model
+
+    def _enforce_budget(self, keep: str) -> None:
+        """超出内存预算时按最久未使用顺序卸载其他空闲模型"""
+        if self.memory_budget_mb <= 0:
+            return
+        candidates = sorted(
+            (e for e in self._entries.values() if e.model is not None and e.name != keep),
+            key=lambda e: e.last_used,
+        )
+        for entry in candidates:
+            if self.total_memory_mb() <= self.memory_budget_mb:
+                break
+            self.unload(entry.name)
+        if self.total_memory_mb() > self.memory_budget_mb:
+            logger.warning(
+                "⚠️ [模型注册表] 模型总内存 %.0fMB 超出预算 %.0fMB（剩余模型均在使用中）",
+                self.total_memory_mb(), self.memory_budget_mb,
+            )
+
+    @staticmethod
+    def _release_memory() -> None:
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+
+
+model_registry = ModelRegistry()
@@ -1,21 +1,29 @@
 import os
 from typing import Optional
 
+from app.ai.local.model_registry import model_registry
 from app.config import settings
 
 
+def _whisper_model_size_mb(model) -> float:
+    """按模型参数与缓冲区字节数估算内存占用"""
+    total_bytes = sum(p.numel() * p.element_size() for p in model.parameters())
+    total_bytes += sum(b.numel() * b.element_size() for b in model.buffers())
+    return total_bytes / 1024 / 1024
+
+
 class WhisperEngine:
     """基于 OpenAI Whisper 的语音转文字引擎"""
 
     def __init__(self, model_size: Optional[str] = None):
         self.model_size = model_size or settings.WHISPER_MODEL_SIZE
-        self._model = None
+        self.model_name = f"whisper:{self.model_size}"
+        model_registry.register(self.model_name, self._load_model, size_fn=_whisper_model_size_mb)
 
-    def _ensure_model(self):
-        """延迟加载模型"""
-        if self._model is None:
-            import whisper
-            self._model = whisper.load_model(self.model_size)
+    def _load_model(self):
+        """延迟加载模型（由模型注册表调用）"""
+        import whisper
+        return whisper.load_model(self.model_size)
 
     def transcribe(self, audio_path: str, language: str = "zh") -> dict:
         """
@@ -28,12 +36,12 @@ class WhisperEngine:
         Returns:
             包含 text, segments, language 的字典
         """
-        self._ensure_model()
-        result = self._model.transcribe(
-            audio_path,
-            language=language,
-            verbose=False,
-        )
+        with model_registry.use(self.model_name) as model:
+            result = model.transcribe(
+                audio_path,
+                language=language,
+                verbose=False,
+            )
         return {
             "text": result["text"],
             "language": result.get("language", language),
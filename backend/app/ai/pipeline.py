@@ -4,16 +4,21 @@ import os
 import shutil
 import tempfile
 from datetime import datetime
+from typing import Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.ai.local.face_tracker import crop_face, crop_faces, select_child_faces
 from app.ai.local.scene_detector import scene_detector
-from app.ai.local.face_engine import face_engine
-from app.ai.local.whisper_engine import whisper_engine
+from app.ai.local.inference_client import get_face_engine, get_whisper_engine
 from app.ai.remote.behavior_analyzer import analyze_behavior
+from app.ai.remote.combined_analyzer import analyze_behavior_and_emotion
 from app.ai.remote.emotion_analyzer import analyze_emotion
-from app.models.analysis import AnalysisResult, AnalysisTask
+from app.ai.remote.usage_ledger import llm_usage_context
+from app.config import settings
+from app.models.analysis import AnalysisTask
 from app.models.media import MediaFile
+from app.services.analysis_service import AnalysisResultWriter
 from app.services.media_service import minio_service
 
 logger = logging.getLogger(__name__)
@@ -28,7 +33,7 @@ async def run_preprocess_pipeline(db: AsyncSession, media_id: str) -> dict:
         media_id: 媒体文件 ID
 
     Returns:
-        预处理结果，包含 keyframes, audio_path, transcription
+        预处理结果，包含 keyframe_paths, keyframe_timestamps, transcription, face_tracks, work_dir
     """
     from sqlalchemy import select
     result = await db.execute(select(MediaFile).where(MediaFile.id == media_id))
@@ -39,9 +44,16 @@ async def run_preprocess_pipeline(db: AsyncSession, media_id: str) -> dict:
     media_file.analysis_status = "processing"
     await db.flush()
 
+    # 推理服务可用性检测是阻塞的 Socket 调用，放到线程中执行
+    face_engine = await asyncio.to_thread(get_face_engine)
+    whisper_engine = await asyncio.to_thread(get_whisper_engine)
+
     work_dir = tempfile.mkdtemp(prefix=f"lifeprint_{media_id}_")
     local_video_path = os.path.join(work_dir, "source_video")
 
+    # 认知与人脸结果在内存中累积，预处理结束时一次写入
+    result_writer = AnalysisResultWriter(db)
+
     try:
         logger.info("📥 [预处理] 从 MinIO 下载文件: %s", media_file.storage_path)
         file_bytes = minio_service.get_file_bytes(media_file.storage_path)
@@ -71,7 +83,7 @@ async def run_preprocess_pipeline(db: AsyncSession, media_id: str) -> dict:
             associated_child_ids = [row[0] for row in child_ids_result.all()]
             primary_child_id = associated_child_ids[0] if associated_child_ids else ""
 
-            cognition_result = AnalysisResult(
+            result_writer.add(
                 media_id=media_id,
                 child_id=primary_child_id,
                 analysis_type="cognition",
@@ -83,9 +95,7 @@ async def run_preprocess_pipeline(db: AsyncSession, media_id: str) -> dict:
                     "unique_word_count": speech_analysis["unique_word_count"],
                 },
                 confidence_score=0.85,
-                analyzed_at=datetime.utcnow(),
             )
-            db.add(cognition_result)
         else:
             from app.models.media import MediaChild
             child_ids_result = await db.execute(
@@ -94,28 +104,62 @@ async def run_preprocess_pipeline(db: AsyncSession, media_id: str) -> dict:
             associated_child_ids = [row[0] for row in child_ids_result.all()]
             primary_child_id = associated_child_ids[0] if associated_child_ids else ""
 
+        from app.services.face_registry_service import sync_family_index
+        await sync_family_index(db, media_file.family_id)
+
         keyframe_paths = [kf["image_path"] for kf in keyframes]
-        for keyframe_path in keyframe_paths:
-            matched_children = face_engine.identify_child(keyframe_path)
-            if matched_children:
-                face_result = AnalysisResult(
+        logger.info("👤 [预处理] 批量人脸识别与轨迹关联，关键帧数=%d", len(keyframe_paths))
+        face_tracking = face_engine.track_keyframes(
+            keyframe_paths,
+            media_file.family_id,
+            top_k=2,
+            refine_threshold=settings.FACE_REFINE_THRESHOLD,
+            refine_margin=settings.FACE_REFINE_MARGIN,
+            collect_unmatched=True,
+        )
+        for keyframe, frame_faces in zip(keyframes, face_tracking["frames"]):
+            face_matches = [face for face in frame_faces if face["child_id"]]
+            if face_matches:
+                best_match = max(face_matches, key=lambda m: m["score"])
+                matched_children = list(dict.fromkeys(m["child_id"] for m in face_matches))
+                result_writer.add(
                     media_id=media_id,
-                    child_id=matched_children[0],
+                    child_id=best_match["child_id"],
                     analysis_type="face",
                     result_data={
-                        "keyframe": os.path.basename(keyframe_path),
+                        "keyframe": os.path.basename(keyframe["image_path"]),
+                        "timestamp_sec": keyframe.get("timestamp_sec"),
                         "matched_children": matched_children,
+                        "faces": face_matches,
                     },
-                    confidence_score=0.9,
-                    analyzed_at=datetime.utcnow(),
+                    confidence_score=best_match["score"],
                 )
-                db.add(face_result)
+        logger.info(
+            "👤 [预处理] 人脸轨迹=%d，已识别孩子的轨迹=%d",
+            len(face_tracking["tracks"]),
+            sum(1 for track in face_tracking["tracks"] if track["child_id"]),
+        )
+        from app.services.face_registry_service import refine_child_prototypes
+        await refine_child_prototypes(db, media_file.family_id, face_tracking.get("refine_samples", []))
+
+        unmatched_samples = face_tracking.get("unmatched_samples", [])
+        if unmatched_samples:
+            from app.services.face_cluster_service import add_unknown_faces
+            preview_paths = []
+            for sample_idx, sample in enumerate(unmatched_samples):
+                preview_path = os.path.join(work_dir, "unknown_faces", f"face_{sample_idx:02d}.jpg")
+                ok = crop_face(keyframe_paths[sample["keyframe_index"]], sample["bbox"], preview_path)
+                preview_paths.append(preview_path if ok else None)
+            await add_unknown_faces(db, media_file.family_id, media_id, unmatched_samples, preview_paths)
 
         await db.flush()
+        await result_writer.flush()
 
         return {
             "keyframe_paths": keyframe_paths,
+            "keyframe_timestamps": [kf.get("timestamp_sec") for kf in keyframes],
             "transcription": transcription,
+            "face_tracks": face_tracking["tracks"],
             "work_dir": work_dir,
         }
 
@@ -138,52 +182,49 @@ async def run_analysis_pipeline(
         preprocess_result: 预处理结果
     """
     keyframe_paths = preprocess_result.get("keyframe_paths", [])
+    keyframe_timestamps = preprocess_result.get("keyframe_timestamps")
     transcription = preprocess_result.get("transcription", {})
+    face_tracks = preprocess_result.get("face_tracks", [])
     work_dir = preprocess_result.get("work_dir", "")
 
     try:
-        logger.info("🧠 [深度分析] 开始并行执行行为识别 + 情感分析，关键帧数=%d", len(keyframe_paths))
-        behavior_result, emotion_result = await asyncio.gather(
-            analyze_behavior(keyframe_paths),
-            analyze_emotion(keyframe_paths, transcription.get("text", "")),
-        )
-        logger.info("🧠 [深度分析] 行为识别结果: %s", str(behavior_result)[:300])
-        logger.info("🧠 [深度分析] 情感分析结果: %s", str(emotion_result)[:300])
-
-        from app.models.media import MediaChild
-        child_ids_result = await db.execute(
-            select(MediaChild.child_id).where(MediaChild.media_id == media_id)
-        )
-        associated_child_ids = [row[0] for row in child_ids_result.all()]
-        primary_child_id = associated_child_ids[0] if associated_child_ids else ""
+        from sqlalchemy import select
+        primary_child_id = await _primary_child_id(db, media_id)
 
-        behavior_analysis = AnalysisResult(
-            media_id=media_id,
-            child_id=primary_child_id,
-            analysis_type="behavior",
-            result_data=behavior_result,
-            confidence_score=0.8,
-            analyzed_at=datetime.utcnow(),
-        )
-        db.add(behavior_analysis)
+        face_crop_paths = _build_face_crops(keyframe_paths, face_tracks, work_dir, primary_child_id)
 
-        emotion_analysis = AnalysisResult(
+        owner = (await db.execute(
+            select(MediaFile.family_id, MediaFile.uploader_id).where(MediaFile.id == media_id)
+        )).first()
+        # 本次分析的所有大模型调用记入上传者及其家庭的用量台账
+        with llm_usage_context(
+            user_id=owner.uploader_id if owner else None,
+            family_id=owner.family_id if owner else None,
             media_id=media_id,
-            child_id=primary_child_id,
-            analysis_type="emotion",
-            result_data=emotion_result,
-            confidence_score=0.75,
-            analyzed_at=datetime.utcnow(),
-        )
-        db.add(emotion_analysis)
-
-        from sqlalchemy import select
-        result = await db.execute(select(MediaFile).where(MediaFile.id == media_id))
-        media_file = result.scalar_one_or_none()
-        if media_file:
-            media_file.analysis_status = "completed"
+        ):
+            if settings.LLM_COMBINED_ANALYSIS:
+                logger.info("🧠 [深度分析] 开始联合执行行为识别 + 情感分析，关键帧数=%d", len(keyframe_paths))
+                behavior_result, emotion_result = await analyze_behavior_and_emotion(
+                    keyframe_paths,
+                    transcription.get("text", ""),
+                    face_crop_paths=face_crop_paths,
+                    keyframe_timestamps=keyframe_timestamps,
+                )
+            else:
+                logger.info("🧠 [深度分析] 开始并行执行行为识别 + 情感分析，关键帧数=%d", len(keyframe_paths))
+                behavior_result, emotion_result = await asyncio.gather(
+                    analyze_behavior(keyframe_paths, keyframe_timestamps=keyframe_timestamps),
+                    analyze_emotion(
+                        face_crop_paths or keyframe_paths,
+                        transcription.get("text", ""),
+                        face_crops=bool(face_crop_paths),
+                        keyframe_timestamps=keyframe_timestamps,
+                    ),
+                )
+        logger.info("🧠 [深度分析] 行为识别结果: %s", str(behavior_result)[:300])
+        logger.info("🧠 [深度分析] 情感分析结果: %s", str(emotion_result)[:300])
 
-        await db.flush()
+        await _store_analysis_results(db, media_id, primary_child_id, behavior_result, emotion_result)
         logger.info("✅ [深度分析] AI 分析全部完成: media_id=%s", media_id)
 
     except Exception as error:
@@ -199,3 +240,201 @@ async def run_analysis_pipeline(
     finally:
         if work_dir and os.path.exists(work_dir):
             shutil.rmtree(work_dir, ignore_errors=True)
+
+
+async def run_photo_event_pipeline(
+    db: AsyncSession, preprocess_results: dict[str, dict]
+) -> list[tuple[str, dict]]:
+    """
+    照片事件分析：同一事件的照片（已完成预处理）通过一次视觉请求分析，结果按照片写入各自的
+    AnalysisResult。事件请求失败或某张照片缺少有效结果时，这些照片交回调用方逐张分析。
+
+    Args:
+        db: 数据库会话
+        preprocess_results: {媒体 ID: 预处理结果}
+
+    Returns:
+        需要逐张回退分析的 (媒体 ID, 预处理结果)。工作目录由调用方在事务提交后清理
+        （回退分析的照片保留工作目录）
+    """
+    from sqlalchemy import func, select
+    from app.ai.remote.photo_event_analyzer import analyze_photo_event
+    from app.ai.remote.rate_limiter import LLMRequestError
+
+    rows = (await db.execute(
+        select(MediaFile.id, MediaFile.family_id, MediaFile.uploader_id, MediaFile.captured_at)
+        .where(MediaFile.id.in_(list(preprocess_results)))
+        .order_by(func.coalesce(MediaFile.captured_at, MediaFile.uploaded_at))
+    )).all()
+    media_ids = [row.id for row in rows]
+    image_paths = []
+    for media_id in media_ids:
+        result = preprocess_results[media_id]
+        keyframe_paths = result.get("keyframe_paths") or [os.path.join(result.get("work_dir", ""), "source_video")]
+        image_paths.append(keyframe_paths[0])
+
+    fallback: list[tuple[str, dict]] = []
+    result_writer = AnalysisResultWriter(db)
+    logger.info("📸 [照片事件] 开始联合分析，照片数=%d", len(media_ids))
+    with llm_usage_context(
+        user_id=rows[0].uploader_id if rows else None,
+        family_id=rows[0].family_id if rows else None,
+    ):
+        try:
+            results = await analyze_photo_event(image_paths, [row.captured_at for row in rows])
+        except LLMRequestError as error:
+            logger.warning("⚠️ [照片事件] 请求失败，%d 张照片改为逐张分析: %s", len(media_ids), error)
+            results = [None] * len(media_ids)
+
+    for media_id, parsed in zip(media_ids, results):
+        if parsed is None:
+            fallback.append((media_id, preprocess_results[media_id]))
+            continue
+        now = datetime.utcnow()
+        db.add(AnalysisTask(
+            media_id=media_id, task_type="analyze", status="completed", started_at=now, completed_at=now,
+        ))
+        await _store_analysis_results(
+            db, media_id, await _primary_child_id(db, media_id), *parsed, result_writer=result_writer
+        )
+    await result_writer.flush()
+    logger.info(
+        "✅ [照片事件] 分析完成: 照片数=%d, 逐张回退=%d", len(media_ids), len(fallback),
+    )
+    return fallback
+
+
+async def _primary_child_id(db: AsyncSession, media_id: str) -> str:
+    from sqlalchemy import select
+    from app.models.media import MediaChild
+
+    child_ids_result = await db.execute(
+        select(MediaChild.child_id).where(MediaChild.media_id == media_id)
+    )
+    associated_child_ids = [row[0] for row in child_ids_result.all()]
+    return associated_child_ids[0] if associated_child_ids else ""
+
+
+def _build_face_crops(
+    keyframe_paths: list[str], face_tracks: list[dict], work_dir: str, child_id: str
+) -> list[str]:
+    """按人脸轨迹裁剪目标孩子的面部特写，供情感分析使用"""
+    if not (settings.EMOTION_FACE_CROPS and face_tracks and work_dir):
+        return []
+    selections = select_child_faces(face_tracks, child_id or None)
+    face_crop_paths = crop_faces(
+        keyframe_paths,
+        selections,
+        os.path.join(work_dir, "face_crops"),
+        max_side=settings.EMOTION_FACE_CROP_SIZE,
+    )
+    if face_crop_paths:
+        logger.info("👤 [深度分析] 情感分析使用 %d 张人脸裁剪图", len(face_crop_paths))
+    return face_crop_paths
+
+
+async def _store_analysis_results(
+    db: AsyncSession,
+    media_id: str,
+    child_id: str,
+    behavior_result: dict,
+    emotion_result: dict,
+    result_writer: Optional[AnalysisResultWriter] = None,
+) -> None:
+    """
+    写入行为与情感分析结果，并将媒体标记为分析完成。
+    传入 result_writer 时结果只累积到其中，由调用方在处理完一批媒体后统一 flush。
+    """
+    from sqlalchemy import update
+
+    # model_version 记录产出结果的模型档位（fast / full，见 model_cascade），不写入 result_data
+    behavior_result = dict(behavior_result)
+    emotion_result = dict(emotion_result)
+    writer = result_writer or AnalysisResultWriter(db)
+    writer.add(
+        media_id=media_id,
+        child_id=child_id,
+        analysis_type="behavior",
+        confidence_score=0.0 if behavior_result.get("fallback") else 0.8,
+        model_version=behavior_result.pop("model_version", "v1.0"),
+        result_data=behavior_result,
+    )
+    writer.add(
+        media_id=media_id,
+        child_id=child_id,
+        analysis_type="emotion",
+        confidence_score=0.0 if emotion_result.get("fallback") else 0.75,
+        model_version=emotion_result.pop("model_version", "v1.0"),
+        result_data=emotion_result,
+    )
+
+    # 直接更新状态列，不加载 MediaFile（及其 selectin 关系）
+    await db.execute(update(MediaFile).where(MediaFile.id == media_id).values(analysis_status="completed"))
+    if result_writer is None:
+        await writer.flush()
+
+
+async def build_reanalysis_batch_item(
+    db: AsyncSession, media_id: str, preprocess_result: dict
+) -> tuple[dict, dict]:
+    """
+    重新分析回填的批量模式：把预处理结果构造成一个联合分析请求体（图片内联），
+    随后即可清理工作目录。无论 LLM_COMBINED_ANALYSIS 如何配置，批量模式总是使用联合请求。
+
+    Returns:
+        ({用途: 请求体}, 结果回写所需的上下文)
+    """
+    from app.ai.remote.combined_analyzer import COMBINED_SYSTEM_PROMPT, build_combined_prompt
+    from app.ai.remote.llm_client import get_llm_client
+
+    keyframe_paths = preprocess_result.get("keyframe_paths", [])
+    work_dir = preprocess_result.get("work_dir", "")
+    try:
+        primary_child_id = await _primary_child_id(db, media_id)
+        face_crop_paths = _build_face_crops(
+            keyframe_paths, preprocess_result.get("face_tracks", []), work_dir, primary_child_id
+        )
+        prompt, image_paths = build_combined_prompt(
+            keyframe_paths,
+            preprocess_result.get("transcription", {}).get("text", ""),
+            face_crop_paths=face_crop_paths,
+            keyframe_timestamps=preprocess_result.get("keyframe_timestamps"),
+        )
+        body = await get_llm_client().build_vision_body(prompt, image_paths, COMBINED_SYSTEM_PROMPT)
+        return {"combined": body}, {"child_id": primary_child_id}
+    finally:
+        if work_dir and os.path.exists(work_dir):
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+async def apply_reanalysis_batch_results(db: AsyncSession, context: dict, results: Optional[dict]) -> None:
+    """
+    把重新分析批次的结果写回 AnalysisResult。
+    回复无法解析时写入带 fallback 标记的默认结果；请求失败（或整批失败）时将媒体标记为失败，
+    可通过重新分析接口单独重试。
+    """
+    from sqlalchemy import update
+    from app.ai.remote.behavior_analyzer import FALLBACK_RESULT as BEHAVIOR_FALLBACK
+    from app.ai.remote.combined_analyzer import _parse_combined
+    from app.ai.remote.emotion_analyzer import FALLBACK_RESULT as EMOTION_FALLBACK
+
+    failed_media_ids = []
+    result_writer = AnalysisResultWriter(db)
+    for media_id, item in context.items():
+        text = (results or {}).get(media_id, {}).get("combined")
+        if text is None:
+            failed_media_ids.append(media_id)
+            continue
+        parsed = _parse_combined(text)
+        if parsed is None:
+            logger.warning("⚠️ [批量分析] 返回结构不完整，使用默认结果: media_id=%s", media_id)
+            parsed = ({**BEHAVIOR_FALLBACK, "fallback": True}, {**EMOTION_FALLBACK, "fallback": True})
+        await _store_analysis_results(db, media_id, item["child_id"], *parsed, result_writer=result_writer)
+    await result_writer.flush()
+
+    if failed_media_ids:
+        logger.warning("⚠️ [批量分析] %d 个媒体的批量分析失败，已标记为失败", len(failed_media_ids))
+        await db.execute(
+            update(MediaFile).where(MediaFile.id.in_(failed_media_ids)).values(analysis_status="failed")
+        )
+        await db.flush()
@@ -1,9 +1,16 @@
 import json
-from typing import Optional
+import logging
+from typing import Callable, Optional
 
+from app.ai.remote.frame_grid import prepare_frames
 from app.ai.remote.llm_client import get_llm_client
+from app.ai.remote.model_cascade import cascade_tiers, run_cascade
+from app.ai.remote.usage_ledger import llm_usage_context
 
-BEHAVIOR_PROMPT = """分析这组连续帧中孩子的行为。请以 JSON 格式返回，包含以下字段：
+logger = logging.getLogger(__name__)
+
+# 静态指令作为系统提示词，构成每次请求相同的前缀，便于提供商侧的提示词缓存
+BEHAVIOR_SYSTEM_PROMPT = """你是儿童行为分析助手，负责分析视频关键帧中孩子的行为。请以 JSON 格式返回，包含以下字段：
 {
   "activities": [
     {
@@ -18,6 +25,10 @@ BEHAVIOR_PROMPT = """分析这组连续帧中孩子的行为。请以 JSON 格
 }
 只返回 JSON，不要其他文字。"""
 
+BEHAVIOR_PROMPT = "分析这组连续帧中孩子的行为。"
+
+BEHAVIOR_TYPES = {"sport", "learning", "art", "music", "social", "independent", "rest"}
+
 FALLBACK_RESULT = {
     "activities": [{"type": "unknown", "description": "分析失败", "confidence": 0.0, "duration_pct": 1.0}],
     "environment": "unknown",
@@ -31,6 +42,7 @@ async def analyze_behavior(
     llm_api_key: Optional[str] = None,
     llm_base_url: Optional[str] = None,
     llm_vision_model: Optional[str] = None,
+    keyframe_timestamps: Optional[list[float]] = None,
 ) -> dict:
     """
     使用大模型多模态视觉能力分析关键帧中孩子的行为。
@@ -42,25 +54,64 @@ async def analyze_behavior(
         llm_api_key: 用户级 API Key 覆盖
         llm_base_url: 用户级 Base URL 覆盖
         llm_vision_model: 用户级视觉模型覆盖
+        keyframe_timestamps: 关键帧的视频时间（秒），拼图模式下用于标注
+
+    Raises:
+        LLMRequestError: 请求在限流重试后仍然失败
 
     Returns:
-        行为分析结果，包含 activities 列表
+        行为分析结果，包含 activities 列表；model_version 为产出结果的模型档位（见 model_cascade）
     """
-    client = get_llm_client(
-        llm_provider=llm_provider,
-        llm_api_key=llm_api_key,
-        llm_base_url=llm_base_url,
-        llm_vision_model=llm_vision_model,
-    )
+    image_paths, grid_note = prepare_frames("behavior", keyframe_paths, keyframe_timestamps)
+    tiers = cascade_tiers(llm_provider, llm_vision_model)
 
-    try:
-        raw_content = await client.vision(
-            prompt=BEHAVIOR_PROMPT,
-            image_paths=keyframe_paths[:8],
+    async def request(model: str, validate: Callable[[str], bool]) -> str:
+        client = get_llm_client(
+            llm_provider=llm_provider,
+            llm_api_key=llm_api_key,
+            llm_base_url=llm_base_url,
+            llm_vision_model=model,
+        )
+        return await client.vision(
+            prompt=BEHAVIOR_PROMPT + grid_note,
+            system_prompt=BEHAVIOR_SYSTEM_PROMPT,
+            image_paths=image_paths,
+            validate=validate,
         )
-        content = raw_content.strip()
-        if content.startswith("```"):
-            content = content.split("\n", 1)[1].rsplit("```", 1)[0]
-        return json.loads(content)
-    except Exception:
-        return FALLBACK_RESULT
+
+    with llm_usage_context(analyzer="behavior"):
+        result, raw_content, version = await run_cascade(
+            "behavior", tiers, request, parse_json_content, behavior_confidence
+        )
+    if result is None:
+        logger.warning("⚠️ [行为识别] 模型返回内容无法解析为 JSON，使用默认结果: %s", raw_content[:200])
+        return {**FALLBACK_RESULT, "fallback": True}
+    return {**result, "model_version": version}
+
+
+def parse_json_content(raw_content: str) -> Optional[dict]:
+    """解析模型回复中的 JSON 对象（允许 Markdown 代码块包裹），无法解析时返回 None"""
+    content = raw_content.strip()
+    if content.startswith("```"):
+        content = content.split("\n", 1)[1].rsplit("```", 1)[0]
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def behavior_confidence(result: dict) -> Optional[float]:
+    """校验行为识别结果并返回各行为置信度的均值，结构不合格时返回 None"""
+    activities = result.get("activities")
+    if not isinstance(activities, list) or not activities:
+        return None
+    scores = []
+    for activity in activities:
+        if not isinstance(activity, dict) or activity.get("type") not in BEHAVIOR_TYPES:
+            return None
+        try:
+            scores.append(float(activity.get("confidence", 0.0)))
+        except (TypeError, ValueError):
+            return None
+    return sum(scores) / len(scores)
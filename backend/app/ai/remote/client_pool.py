@@ -0,0 +1,130 @@
+import asyncio
+import hashlib
+import importlib.util
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _PoolEntry:
+    client: Any
+    loop: asyncio.AbstractEventLoop
+    last_used: float
+
+
+def _http2_available() -> bool:
+    return settings.LLM_HTTP2 and importlib.util.find_spec("h2") is not None
+
+
+class LLMClientPool:
+    """
+    进程级的大模型 SDK 客户端池，按 (provider, api_key, base_url) 复用客户端。
+
+    每个客户端持有一个 httpx 连接池（keep-alive，安装了 h2 时启用 HTTP/2），
+    同一配置的请求复用已建立的 TLS 连接。httpx 异步客户端绑定创建时的事件循环，
+    因此池的键同时包含事件循环；事件循环关闭后对应条目自动失效。
+    池大小有上限，超出时按 LRU 淘汰，空闲超时的客户端在下次访问池时关闭。
+    """
+
+    def __init__(self, max_clients: Optional[int] = None, idle_timeout: Optional[float] = None):
+        self.max_clients = max_clients or settings.LLM_POOL_MAX_CLIENTS
+        self.idle_timeout = idle_timeout if idle_timeout is not None else settings.LLM_POOL_IDLE_TIMEOUT_SEC
+        self._entries: "OrderedDict[tuple, _PoolEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, provider: str, api_key: str, base_url: str):
+        """获取（或创建）当前事件循环上的 SDK 客户端，必须在事件循环内调用"""
+        loop = asyncio.get_running_loop()
+        key_hash = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+        pool_key = (provider, key_hash, base_url, id(loop))
+        now = time.monotonic()
+
+        with self._lock:
+            self._evict_stale(now)
+            entry = self._entries.get(pool_key)
+            if entry is not None and entry.loop is loop:
+                entry.last_used = now
+                self._entries.move_to_end(pool_key)
+                self.stats["hits"] += 1
+                return entry.client
+
+            client = self._create_client(provider, api_key, base_url)
+            self._entries[pool_key] = _PoolEntry(client=client, loop=loop, last_used=now)
+            self.stats["misses"] += 1
+            while len(self._entries) > self.max_clients:
+                _, evicted = self._entries.popitem(last=False)
+                self._close(evicted)
+            logger.info(
+                "🔌 [LLM 连接池] 新建客户端: provider=%s, base_url=%s, http2=%s, 池大小=%d",
+                provider, base_url, _http2_available(), len(self._entries),
+            )
+            return client
+
+    def report(self) -> dict:
+        """返回池统计信息"""
+        with self._lock:
+            return {**self.stats, "size": len(self._entries)}
+
+    async def aclose(self) -> None:
+        """关闭当前事件循环上的全部客户端"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            closing = [key for key, entry in self._entries.items() if entry.loop is loop]
+            entries = [self._entries.pop(key) for key in closing]
+        for entry in entries:
+            await entry.client.close()
+
+    def _evict_stale(self, now: float) -> None:
+        stale = [
+            key for key, entry in self._entries.items()
+            if entry.loop.is_closed()
+            or (self.idle_timeout and now - entry.last_used > self.idle_timeout)
+        ]
+        for key in stale:
+            self._close(self._entries.pop(key))
+
+    def _close(self, entry: _PoolEntry) -> None:
+        self.stats["evictions"] += 1
+        # 事件循环已关闭时连接随对象回收；否则在其所属循环上异步关闭
+        if entry.loop.is_closed():
+            return
+        try:
+            entry.loop.call_soon_threadsafe(lambda: entry.loop.create_task(entry.client.close()))
+        except RuntimeError:
+            pass
+
+    @staticmethod
+    def _create_client(provider: str, api_key: str, base_url: str):
+        import httpx
+
+        http_client = httpx.AsyncClient(
+            http2=_http2_available(),
+            timeout=httpx.Timeout(120.0, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+                keepalive_expiry=60.0,
+            ),
+            follow_redirects=True,
+        )
+        if provider == "anthropic":
+            import anthropic
+            return anthropic.AsyncAnthropic(
+                api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0
+            )
+
+        from openai import AsyncOpenAI
+        # 重试由 LLMRateLimiter 统一负责，SDK 内置重试关闭以免重复重试
+        return AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+
+
+llm_client_pool = LLMClientPool()
@@ -0,0 +1,180 @@
+import asyncio
+import json
+import logging
+from typing import Callable, Optional
+
+from app.ai.remote.behavior_analyzer import analyze_behavior, behavior_confidence
+from app.ai.remote.emotion_analyzer import analyze_emotion, emotion_confidence
+from app.ai.remote.frame_grid import prepare_frames
+from app.ai.remote.llm_client import get_llm_client
+from app.ai.remote.model_cascade import cascade_tiers, run_cascade
+from app.ai.remote.usage_ledger import llm_usage_context
+
+logger = logging.getLogger(__name__)
+
+# 静态指令作为系统提示词，构成每次请求相同的前缀，便于提供商侧的提示词缓存
+COMBINED_SYSTEM_PROMPT = """你是儿童成长分析助手，负责根据视频关键帧（及可能提供的面部特写、语音内容）同时分析孩子的行为与情绪状态。
+
+请以 JSON 格式返回，包含 behavior 和 emotion 两部分：
+{
+  "behavior": {
+    "activities": [
+      {
+        "type": "行为类型（sport/learning/art/music/social/independent/rest）",
+        "description": "具体行为描述",
+        "confidence": 0.0-1.0,
+        "duration_pct": 0.0-1.0
+      }
+    ],
+    "environment": "场景描述（室内/室外/学校等）",
+    "interaction_mode": "互动模式（独处/与同伴/与成人）"
+  },
+  "emotion": {
+    "dominant": "主要情绪（happy/sad/angry/calm/excited/anxious/focused）",
+    "scores": {
+      "happy": 0.0-1.0,
+      "sad": 0.0-1.0,
+      "angry": 0.0-1.0,
+      "calm": 0.0-1.0,
+      "excited": 0.0-1.0,
+      "anxious": 0.0-1.0,
+      "focused": 0.0-1.0
+    },
+    "expression_description": "表情描述",
+    "emotional_stability": 0.0-1.0,
+    "confidence": 0.0-1.0（对情绪判断的整体把握程度，面部不清晰或证据不足时给低分）
+  }
+}
+只返回 JSON，不要其他文字。"""
+
+COMBINED_PROMPT = "分析这组视频关键帧中孩子的行为与情绪状态。{image_note}{text_context}"
+
+
+def _parse_combined(raw_content: str) -> Optional[tuple[dict, dict]]:
+    """解析联合结果，结构不完整时返回 None"""
+    content = raw_content.strip()
+    if content.startswith("```"):
+        content = content.split("\n", 1)[1].rsplit("```", 1)[0]
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return None
+
+    behavior = data.get("behavior") if isinstance(data, dict) else None
+    emotion = data.get("emotion") if isinstance(data, dict) else None
+    if not isinstance(behavior, dict) or not isinstance(behavior.get("activities"), list):
+        return None
+    if not isinstance(emotion, dict) or not emotion.get("dominant") or not isinstance(emotion.get("scores"), dict):
+        return None
+    return behavior, emotion
+
+
+def _combined_confidence(parsed: tuple[dict, dict]) -> Optional[float]:
+    """两部分中较低的置信度，任一部分结构不合格时返回 None"""
+    behavior_score = behavior_confidence(parsed[0])
+    emotion_score = emotion_confidence(parsed[1])
+    if behavior_score is None or emotion_score is None:
+        return None
+    return min(behavior_score, emotion_score)
+
+
+def build_combined_prompt(
+    keyframe_paths: list[str],
+    transcription_text: str = "",
+    face_crop_paths: Optional[list[str]] = None,
+    keyframe_timestamps: Optional[list[float]] = None,
+) -> tuple[str, list[str]]:
+    """
+    构造联合分析的提示词与图片列表（帧预算内的关键帧或其拼图 + 最多 4 张人脸裁剪图），
+    批量提交时同样使用
+    """
+    frame_paths, grid_note = prepare_frames("combined", keyframe_paths, keyframe_timestamps)
+    crop_paths = (face_crop_paths or [])[:4]
+
+    image_note = grid_note
+    if crop_paths:
+        image_note = (
+            f"\n前 {len(frame_paths)} 张为视频关键帧{'拼图' if grid_note else ''}，用于行为分析；"
+            f"后 {len(crop_paths)} 张为同一个孩子在不同时刻的面部特写，请主要依据它们分析情绪。{grid_note}"
+        )
+    text_context = ""
+    if transcription_text:
+        text_context = f"\n孩子的语音内容：「{transcription_text[:500]}」"
+
+    return COMBINED_PROMPT.format(image_note=image_note, text_context=text_context), frame_paths + crop_paths
+
+
+async def analyze_behavior_and_emotion(
+    keyframe_paths: list[str],
+    transcription_text: str = "",
+    face_crop_paths: Optional[list[str]] = None,
+    llm_provider: Optional[str] = None,
+    llm_api_key: Optional[str] = None,
+    llm_base_url: Optional[str] = None,
+    llm_vision_model: Optional[str] = None,
+    keyframe_timestamps: Optional[list[float]] = None,
+) -> tuple[dict, dict]:
+    """
+    一次视觉请求同时完成行为识别与情感分析，关键帧只上传一次。
+    返回结果无法解析或结构不完整时，回退为分别调用 analyze_behavior / analyze_emotion；
+    请求失败时抛出 LLMRequestError。
+
+    Args:
+        keyframe_paths: 关键帧图片路径列表
+        transcription_text: 语音转写文本（辅助情绪分析）
+        face_crop_paths: 目标孩子的人脸裁剪图，附加在关键帧之后用于情绪分析
+        llm_provider: 用户级 LLM 提供商覆盖
+        llm_api_key: 用户级 API Key 覆盖
+        llm_base_url: 用户级 Base URL 覆盖
+        llm_vision_model: 用户级视觉模型覆盖
+        keyframe_timestamps: 关键帧的视频时间（秒），拼图模式下用于标注
+
+    Returns:
+        (行为分析结果, 情感分析结果)
+    """
+    prompt, image_paths = build_combined_prompt(
+        keyframe_paths, transcription_text, face_crop_paths, keyframe_timestamps
+    )
+    crop_paths = (face_crop_paths or [])[:4]
+
+    tiers = cascade_tiers(llm_provider, llm_vision_model)
+
+    async def request(model: str, validate: Callable[[str], bool]) -> str:
+        client = get_llm_client(
+            llm_provider=llm_provider,
+            llm_api_key=llm_api_key,
+            llm_base_url=llm_base_url,
+            llm_vision_model=model,
+        )
+        return await client.vision(
+            prompt=prompt,
+            image_paths=image_paths,
+            system_prompt=COMBINED_SYSTEM_PROMPT,
+            validate=validate,
+        )
+
+    # 请求本身失败（LLMRequestError）直接抛出：限流器已完成重试，再拆成两次请求只会加重拥塞
+    with llm_usage_context(analyzer="combined"):
+        parsed, _, version = await run_cascade("combined", tiers, request, _parse_combined, _combined_confidence)
+    if parsed is not None:
+        behavior_result, emotion_result = parsed
+        return {**behavior_result, "model_version": version}, {**emotion_result, "model_version": version}
+    logger.warning("⚠️ [联合分析] 返回结构不完整，回退为分别调用")
+
+    user_overrides = {
+        "llm_provider": llm_provider,
+        "llm_api_key": llm_api_key,
+        "llm_base_url": llm_base_url,
+        "llm_vision_model": llm_vision_model,
+    }
+    behavior_result, emotion_result = await asyncio.gather(
+        analyze_behavior(keyframe_paths, keyframe_timestamps=keyframe_timestamps, **user_overrides),
+        analyze_emotion(
+            crop_paths or keyframe_paths,
+            transcription_text,
+            face_crops=bool(crop_paths),
+            keyframe_timestamps=keyframe_timestamps,
+            **user_overrides,
+        ),
+    )
+    return behavior_result, emotion_result
@@ -1,7 +1,36 @@
-import json
-from typing import Optional
+import logging
+from typing import Callable, Optional
 
+from app.ai.remote.behavior_analyzer import parse_json_content
+from app.ai.remote.frame_grid import prepare_frames
 from app.ai.remote.llm_client import get_llm_client
+from app.ai.remote.model_cascade import cascade_tiers, run_cascade
+from app.ai.remote.usage_ledger import llm_usage_context
+
+logger = logging.getLogger(__name__)
+
+# 静态指令作为系统提示词，构成每次请求相同的前缀，便于提供商侧的提示词缓存
+EMOTION_SYSTEM_PROMPT = """你是儿童情绪分析助手，负责根据图片（及可能提供的语音内容）分析孩子的情绪状态。
+
+请以 JSON 格式返回：
+{
+  "dominant": "主要情绪（happy/sad/angry/calm/excited/anxious/focused）",
+  "scores": {
+    "happy": 0.0-1.0,
+    "sad": 0.0-1.0,
+    "angry": 0.0-1.0,
+    "calm": 0.0-1.0,
+    "excited": 0.0-1.0,
+    "anxious": 0.0-1.0,
+    "focused": 0.0-1.0
+  },
+  "expression_description": "表情描述",
+  "emotional_stability": 0.0-1.0,
+  "confidence": 0.0-1.0（对以上判断的整体把握程度，面部不清晰或证据不足时给低分）
+}
+只返回 JSON，不要其他文字。"""
+
+EMOTION_TYPES = {"happy", "sad", "angry", "calm", "excited", "anxious", "focused"}
 
 FALLBACK_RESULT = {
     "dominant": "calm",
@@ -14,64 +43,76 @@ FALLBACK_RESULT = {
 async def analyze_emotion(
     keyframe_paths: list[str],
     transcription_text: str = "",
+    face_crops: bool = False,
     llm_provider: Optional[str] = None,
     llm_api_key: Optional[str] = None,
     llm_base_url: Optional[str] = None,
     llm_vision_model: Optional[str] = None,
+    keyframe_timestamps: Optional[list[float]] = None,
 ) -> dict:
     """
     使用大模型多模态视觉能力分析孩子的情绪状态。
     支持 OpenAI 和 Anthropic 两种 API 格式。
 
     Args:
-        keyframe_paths: 包含孩子面部的关键帧路径
+        keyframe_paths: 包含孩子面部的关键帧路径，或目标孩子的人脸裁剪图路径
         transcription_text: 语音转写文本（辅助分析）
+        face_crops: keyframe_paths 是否为同一个孩子的人脸裁剪图
         llm_provider: 用户级 LLM 提供商覆盖
         llm_api_key: 用户级 API Key 覆盖
         llm_base_url: 用户级 Base URL 覆盖
         llm_vision_model: 用户级视觉模型覆盖
+        keyframe_timestamps: 关键帧的视频时间（秒），拼图模式下用于标注（人脸裁剪图不适用）
+
+    Raises:
+        LLMRequestError: 请求在限流重试后仍然失败
 
     Returns:
-        情感分析结果
+        情感分析结果；model_version 为产出结果的模型档位（见 model_cascade）
     """
     text_context = ""
     if transcription_text:
         text_context = f"\n孩子的语音内容：「{transcription_text[:500]}」"
 
-    prompt = f"""分析图片中孩子的情绪状态。{text_context}
-
-请以 JSON 格式返回：
-{{
-  "dominant": "主要情绪（happy/sad/angry/calm/excited/anxious/focused）",
-  "scores": {{
-    "happy": 0.0-1.0,
-    "sad": 0.0-1.0,
-    "angry": 0.0-1.0,
-    "calm": 0.0-1.0,
-    "excited": 0.0-1.0,
-    "anxious": 0.0-1.0,
-    "focused": 0.0-1.0
-  }},
-  "expression_description": "表情描述",
-  "emotional_stability": 0.0-1.0
-}}
-只返回 JSON，不要其他文字。"""
-
-    client = get_llm_client(
-        llm_provider=llm_provider,
-        llm_api_key=llm_api_key,
-        llm_base_url=llm_base_url,
-        llm_vision_model=llm_vision_model,
+    subject = "以下图片是同一个孩子在视频不同时刻的面部特写，请综合分析其情绪状态" if face_crops else "分析图片中孩子的情绪状态"
+    image_paths, grid_note = prepare_frames(
+        "emotion", keyframe_paths, None if face_crops else keyframe_timestamps
     )
+    prompt = f"{subject}。{grid_note}{text_context}"
 
-    try:
-        raw_content = await client.vision(
+    tiers = cascade_tiers(llm_provider, llm_vision_model)
+
+    async def request(model: str, validate: Callable[[str], bool]) -> str:
+        client = get_llm_client(
+            llm_provider=llm_provider,
+            llm_api_key=llm_api_key,
+            llm_base_url=llm_base_url,
+            llm_vision_model=model,
+        )
+        return await client.vision(
             prompt=prompt,
-            image_paths=keyframe_paths[:4],
+            image_paths=image_paths,
+            system_prompt=EMOTION_SYSTEM_PROMPT,
+            validate=validate,
         )
-        content = raw_content.strip()
-        if content.startswith("```"):
-            content = content.split("\n", 1)[1].rsplit("```", 1)[0]
-        return json.loads(content)
-    except Exception:
-        return FALLBACK_RESULT
+
+    with llm_usage_context(analyzer="emotion"):
+        result, raw_content, version = await run_cascade(
+            "emotion", tiers, request, parse_json_content, emotion_confidence
+        )
+    if result is None:
+        logger.warning("⚠️ [情感分析] 模型返回内容无法解析为 JSON，使用默认结果: %s", raw_content[:200])
+        return {**FALLBACK_RESULT, "fallback": True}
+    return {**result, "model_version": version}
+
+
+def emotion_confidence(result: dict) -> Optional[float]:
+    """校验情感分析结果并返回模型自评的置信度（缺失时取主要情绪的得分），结构不合格时返回 None"""
+    scores = result.get("scores")
+    dominant = result.get("dominant")
+    if dominant not in EMOTION_TYPES or not isinstance(scores, dict):
+        return None
+    try:
+        return float(result.get("confidence", scores.get(dominant, 0.0)))
+    except (TypeError, ValueError):
+        return None
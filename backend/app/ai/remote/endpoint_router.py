@@ -0,0 +1,277 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Awaitable, Callable, Optional, TypeVar
+
+from app.ai.remote.rate_limiter import LLMRequestError
+from app.config import settings
+
+if TYPE_CHECKING:
+    from app.ai.remote.llm_client import LLMClient
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 请求内容错误（参数无效、请求体过大），不触发故障转移
+REQUEST_ERROR_STATUS = {400, 413, 422}
+
+# 每个端点、每种请求保留的最近延迟样本数（用于计算对冲延迟）
+LATENCY_WINDOW = 200
+
+_endpoints_cache: tuple[str, list[dict]] = ("", [])
+
+
+def fallback_endpoints() -> list[dict]:
+    """解析 LLM_FALLBACK_ENDPOINTS，格式错误的配置记录日志后忽略"""
+    global _endpoints_cache
+    raw = settings.LLM_FALLBACK_ENDPOINTS.strip()
+    if raw == _endpoints_cache[0]:
+        return _endpoints_cache[1]
+
+    endpoints: list[dict] = []
+    if raw:
+        try:
+            parsed = json.loads(raw)
+            if not isinstance(parsed, list):
+                raise ValueError("应为 JSON 数组")
+            for item in parsed:
+                if not isinstance(item, dict) or not item.get("base_url"):
+                    raise ValueError(f"端点缺少 base_url: {item}")
+                endpoints.append(item)
+        except ValueError as error:
+            logger.error("❌ [LLM 端点] LLM_FALLBACK_ENDPOINTS 配置无效，已忽略: %s", error)
+            endpoints = []
+    _endpoints_cache = (raw, endpoints)
+    return endpoints
+
+
+def _quantile(samples: deque, percentile: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * percentile), len(ordered) - 1)] if ordered else 0.0
+
+
+def endpoint_key(client: "LLMClient") -> str:
+    return f"{client.provider}|{client.base_url}"
+
+
+class EndpointHealth:
+    """
+    单个端点的熔断状态：closed 正常放行；连续失败达到阈值后 open，
+    LLM_CIRCUIT_RESET_SEC 后进入 half_open 放行一个探测请求，成功则恢复，失败则重新熔断。
+    """
+
+    def __init__(self):
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.counts = {"succeeded": 0, "failed": 0, "hedged": 0, "hedge_won": 0}
+        self.latencies: dict[str, deque] = {}
+
+    def available(self) -> bool:
+        """是否可以放行请求（只读，不改变熔断状态）"""
+        if self.state == "closed":
+            return True
+        return not self.probing and time.monotonic() - self.opened_at >= settings.LLM_CIRCUIT_RESET_SEC
+
+    def claim_probe(self) -> bool:
+        """实际向熔断中的端点发出请求时调用：进入 half_open 并占用探测名额，返回是否占用成功"""
+        if self.state == "closed" or not self.available():
+            return False
+        self.state = "half_open"
+        self.probing = True
+        return True
+
+    def percentile(self, kind: str, percentile: float) -> Optional[float]:
+        samples = self.latencies.get(kind)
+        if not samples or len(samples) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return _quantile(samples, percentile)
+
+
+class EndpointRouter:
+    """
+    按配置顺序在多个端点之间路由大模型请求。
+
+    - 故障转移：当前端点在限流器重试后仍失败时切换到下一个端点；熔断中的端点跳过，
+      全部熔断时仍按原顺序尝试。
+    - 对冲请求（LLM_HEDGE_ENABLED）：主端点超过其历史 p95 延迟仍未返回时，向下一个可用端点
+      再发一次，取先成功者并取消另一方。只有约 5% 的慢请求会触发，且总量受 LLM_HEDGE_MAX_RATIO 限制，
+      稳态费用基本不变。
+    """
+
+    def __init__(self):
+        self._health: dict[str, EndpointHealth] = {}
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._hedges = 0
+
+    async def call(
+        self,
+        kind: str,
+        clients: list["LLMClient"],
+        invoke: Callable[["LLMClient", Optional[int]], Awaitable[T]],
+        hedge: bool = True,
+    ) -> T:
+        """
+        Args:
+            kind: 请求类型（chat / vision / stream），延迟分开统计
+            clients: 按优先级排列的端点客户端
+            invoke: 以 (端点客户端, 限流器重试次数) 发起一次请求
+            hedge: 是否允许对冲（流式请求不对冲，避免建立两条流）
+        """
+        candidates = self._candidates(clients)
+        with self._lock:
+            self._requests += 1
+
+        pending: dict[asyncio.Task, tuple["LLMClient", float, bool, bool]] = {}
+        last_error: Optional[LLMRequestError] = None
+        next_index = 0
+
+        def launch(is_hedge: bool) -> None:
+            nonlocal next_index
+            client = candidates[next_index]
+            next_index += 1
+            retries = settings.LLM_FAILOVER_RETRIES if next_index < len(candidates) else None
+            # 只有真正发出的请求才占用熔断端点的探测名额
+            with self._lock:
+                probe = self._get_health(endpoint_key(client)).claim_probe()
+            task = asyncio.ensure_future(invoke(client, retries))
+            pending[task] = (client, time.monotonic(), is_hedge, probe)
+
+        try:
+            while True:
+                if not pending:
+                    if next_index >= len(candidates):
+                        raise last_error or LLMRequestError("没有可用的大模型端点")
+                    if next_index > 0:
+                        logger.warning(
+                            "🔀 [LLM 端点] 切换到备用端点: %s", endpoint_key(candidates[next_index])
+                        )
+                    launch(is_hedge=False)
+
+                timeout = None
+                if hedge and len(pending) == 1 and next_index < len(candidates):
+                    timeout = self._hedge_delay(kind, pending)
+
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    primary = next(iter(pending.values()))[0]
+                    logger.info(
+                        "🪝 [LLM 端点] %s 超过 p95 延迟未返回，对冲到 %s",
+                        endpoint_key(primary), endpoint_key(candidates[next_index]),
+                    )
+                    with self._lock:
+                        self._hedges += 1
+                        self._get_health(endpoint_key(candidates[next_index])).counts["hedged"] += 1
+                    launch(is_hedge=True)
+                    continue
+
+                for task in done:
+                    client, started, is_hedge, probe = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except LLMRequestError as error:
+                        if error.status_code in REQUEST_ERROR_STATUS:
+                            # 请求本身有问题，换端点也不会成功，也不计入端点健康
+                            if probe:
+                                self._release_probe(client)
+                            raise
+                        self._record_failure(client, error)
+                        last_error = error
+                        continue
+                    except BaseException:
+                        if probe:
+                            self._release_probe(client)
+                        raise
+                    self._record_success(client, kind, time.monotonic() - started, is_hedge)
+                    return result
+        finally:
+            for task, (client, _, _, probe) in pending.items():
+                task.cancel()
+                if probe:
+                    self._release_probe(client)
+
+    def report(self) -> dict:
+        """进程内各端点的熔断状态、成功失败次数、延迟分位数与对冲次数"""
+        with self._lock:
+            endpoints = {}
+            for key, health in self._health.items():
+                endpoints[key] = {
+                    "state": health.state,
+                    "consecutive_failures": health.consecutive_failures,
+                    **health.counts,
+                    "p50": {kind: round(_quantile(samples, 0.5), 3) for kind, samples in health.latencies.items()},
+                    "p95": {kind: round(_quantile(samples, 0.95), 3) for kind, samples in health.latencies.items()},
+                }
+            return {"requests": self._requests, "hedges": self._hedges, "endpoints": endpoints}
+
+    def _get_health(self, key: str) -> EndpointHealth:
+        health = self._health.get(key)
+        if health is None:
+            health = self._health[key] = EndpointHealth()
+        return health
+
+    def _candidates(self, clients: list["LLMClient"]) -> list["LLMClient"]:
+        with self._lock:
+            available = [client for client in clients if self._get_health(endpoint_key(client)).available()]
+        return available or clients
+
+    def _hedge_delay(self, kind: str, pending: dict) -> Optional[float]:
+        """主端点的 p95 延迟减去已等待时长；未开启、样本不足或超出对冲配额时返回 None（不对冲）"""
+        if not settings.LLM_HEDGE_ENABLED:
+            return None
+        client, started, _, _ = next(iter(pending.values()))
+        with self._lock:
+            if self._hedges >= settings.LLM_HEDGE_MAX_RATIO * self._requests:
+                return None
+            delay = self._get_health(endpoint_key(client)).percentile(kind, settings.LLM_HEDGE_PERCENTILE)
+        if delay is None:
+            return None
+        return max(delay - (time.monotonic() - started), 0.0)
+
+    def _release_probe(self, client: "LLMClient") -> None:
+        """探测请求被取消或因非端点原因失败时，允许下一次请求重新探测"""
+        with self._lock:
+            health = self._get_health(endpoint_key(client))
+            if health.state == "half_open":
+                health.probing = False
+
+    def _record_success(self, client: "LLMClient", kind: str, elapsed: float, is_hedge: bool) -> None:
+        key = endpoint_key(client)
+        with self._lock:
+            health = self._get_health(key)
+            if health.state != "closed":
+                logger.info("✅ [LLM 端点] %s 已恢复", key)
+            health.state = "closed"
+            health.consecutive_failures = 0
+            health.probing = False
+            health.counts["succeeded"] += 1
+            if is_hedge:
+                health.counts["hedge_won"] += 1
+            health.latencies.setdefault(kind, deque(maxlen=LATENCY_WINDOW)).append(elapsed)
+
+    def _record_failure(self, client: "LLMClient", error: LLMRequestError) -> None:
+        key = endpoint_key(client)
+        with self._lock:
+            health = self._get_health(key)
+            health.consecutive_failures += 1
+            health.counts["failed"] += 1
+            if health.state == "half_open" or (
+                health.state == "closed"
+                and health.consecutive_failures >= settings.LLM_CIRCUIT_FAILURE_THRESHOLD
+            ):
+                health.state = "open"
+                health.opened_at = time.monotonic()
+                health.probing = False
+                logger.warning(
+                    "🚧 [LLM 端点] %s 连续失败 %d 次，熔断 %ds: %s",
+                    key, health.consecutive_failures, settings.LLM_CIRCUIT_RESET_SEC, error,
+                )
+
+
+endpoint_router = EndpointRouter()
@@ -0,0 +1,170 @@
+import hashlib
+import logging
+import os
+from typing import Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 各分析器每次请求覆盖的关键帧数（帧预算）对应的配置项
+FRAME_BUDGET_SETTINGS = {
+    "behavior": "LLM_BEHAVIOR_FRAME_BUDGET",
+    "emotion": "LLM_EMOTION_FRAME_BUDGET",
+    "combined": "LLM_COMBINED_FRAME_BUDGET",
+}
+
+GRID_JPEG_QUALITY = 90
+LABEL_FONT_SCALE = 0.6
+LABEL_PADDING = 4
+
+
+def frame_budget(analyzer: str) -> int:
+    return max(getattr(settings, FRAME_BUDGET_SETTINGS[analyzer]), 1)
+
+
+def sample_frames(image_paths: list[str], budget: int) -> tuple[list[int], list[str]]:
+    """
+    在整段视频上均匀抽取至多 budget 帧（保留首尾），而不是只取开头几帧。
+
+    Returns:
+        (抽中帧在原列表中的下标, 对应的图片路径)
+    """
+    count = len(image_paths)
+    if count <= budget:
+        indices = list(range(count))
+    elif budget == 1:
+        indices = [count // 2]
+    else:
+        indices = sorted({round(i * (count - 1) / (budget - 1)) for i in range(budget)})
+    return indices, [image_paths[i] for i in indices]
+
+
+def frame_label(index: int, timestamp: Optional[float]) -> str:
+    """单元格标注：帧序号（从 1 开始）与视频时间，OpenCV 只能绘制 ASCII 字符"""
+    if timestamp is None:
+        return f"#{index + 1}"
+    minutes, seconds = divmod(float(timestamp), 60)
+    return f"#{index + 1} {int(minutes):02d}:{seconds:04.1f}"
+
+
+def compose_grid(
+    image_paths: list[str],
+    labels: list[str],
+    output_path: str,
+    columns: int,
+    rows: int,
+    cell_width: int,
+) -> bool:
+    """
+    按从左到右、从上到下的顺序把图片拼成 rows × columns 的网格（不足时缩减行数），
+    每张图等比缩放后居中放入单元格，左上角绘制标注。单元格高度取首张图的宽高比。
+
+    Returns:
+        是否成功写出拼图
+    """
+    import cv2
+    import numpy as np
+
+    images = [cv2.imread(path) for path in image_paths]
+    if any(image is None for image in images):
+        return False
+
+    first_height, first_width = images[0].shape[:2]
+    cell_height = max(int(cell_width * first_height / first_width), 1)
+    used_rows = min(rows, -(-len(images) // columns))
+    used_columns = min(columns, len(images))
+    canvas = np.zeros((cell_height * used_rows, cell_width * used_columns, 3), dtype=np.uint8)
+
+    for position, (image, label) in enumerate(zip(images, labels)):
+        row, column = divmod(position, columns)
+        height, width = image.shape[:2]
+        scale = min(cell_width / width, cell_height / height)
+        new_width, new_height = max(int(width * scale), 1), max(int(height * scale), 1)
+        resized = cv2.resize(
+            image, (new_width, new_height),
+            interpolation=cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR,
+        )
+        top = row * cell_height + (cell_height - new_height) // 2
+        left = column * cell_width + (cell_width - new_width) // 2
+        canvas[top:top + new_height, left:left + new_width] = resized
+
+        (text_width, text_height), baseline = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, LABEL_FONT_SCALE, 1)
+        x, y = column * cell_width, row * cell_height
+        cv2.rectangle(
+            canvas, (x, y),
+            (x + text_width + LABEL_PADDING * 2, y + text_height + baseline + LABEL_PADDING * 2),
+            (0, 0, 0), thickness=-1,
+        )
+        cv2.putText(
+            canvas, label, (x + LABEL_PADDING, y + LABEL_PADDING + text_height),
+            cv2.FONT_HERSHEY_SIMPLEX, LABEL_FONT_SCALE, (255, 255, 255), 1, cv2.LINE_AA,
+        )
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    return bool(cv2.imwrite(output_path, canvas, [cv2.IMWRITE_JPEG_QUALITY, GRID_JPEG_QUALITY]))
+
+
+def prepare_frames(
+    analyzer: str,
+    image_paths: list[str],
+    timestamps: Optional[list[Optional[float]]] = None,
+) -> tuple[list[str], str]:
+    """
+    按分析器的帧预算准备视觉请求的图片。
+
+    未开启拼图（LLM_FRAME_GRID_ENABLED）时保持逐张发送，取前 budget 张；开启后在整段视频上
+    均匀抽取 budget 帧，每 LLM_FRAME_GRID_COLUMNS × LLM_FRAME_GRID_ROWS 帧拼成一张带序号与时间标注
+    的网格图。拼图写在第一张图片所在目录的 grids 子目录下（随工作目录一起清理），文件名由输入与布局
+    决定，相同关键帧重复分析时内容不变，回复缓存与图片编码缓存仍然有效。
+
+    Args:
+        analyzer: 分析器名称（behavior / emotion / combined），决定帧预算
+        image_paths: 按时间顺序排列的关键帧或人脸特写
+        timestamps: 与 image_paths 一一对应的视频时间（秒），缺失时只标注序号
+
+    Returns:
+        (发送的图片路径, 追加到提示词中的拼图说明；逐张发送时为空字符串)
+    """
+    budget = frame_budget(analyzer)
+    if not settings.LLM_FRAME_GRID_ENABLED or len(image_paths) <= 1:
+        return image_paths[:budget], ""
+
+    columns = max(settings.LLM_FRAME_GRID_COLUMNS, 1)
+    rows = max(settings.LLM_FRAME_GRID_ROWS, 1)
+    cells = columns * rows
+    indices, selected = sample_frames(image_paths, budget)
+    labels = [
+        frame_label(index, timestamps[index] if timestamps and index < len(timestamps) else None)
+        for index in indices
+    ]
+    output_dir = os.path.join(os.path.dirname(selected[0]), "grids")
+
+    images: list[str] = []
+    grid_count = 0
+    for start in range(0, len(selected), cells):
+        chunk, chunk_labels = selected[start:start + cells], labels[start:start + cells]
+        layout = f"{columns}x{rows}x{settings.LLM_FRAME_GRID_CELL_WIDTH}"
+        digest = hashlib.sha1("\n".join([layout, *chunk, *chunk_labels]).encode("utf-8")).hexdigest()[:16]
+        grid_path = os.path.join(output_dir, f"grid_{digest}.jpg")
+        if os.path.exists(grid_path) or compose_grid(
+            chunk, chunk_labels, grid_path, columns, rows, settings.LLM_FRAME_GRID_CELL_WIDTH
+        ):
+            images.append(grid_path)
+            grid_count += 1
+        else:
+            logger.warning("⚠️ [关键帧拼图] %s: 拼图失败，%d 帧改为逐张发送", analyzer, len(chunk))
+            images.extend(chunk)
+
+    if not grid_count:
+        return images, ""
+    logger.info(
+        "🧩 [关键帧拼图] %s: %d/%d 帧拼成 %d 张图片（%d 张拼图）",
+        analyzer, len(selected), len(image_paths), len(images), grid_count,
+    )
+    label_note = "帧序号与视频时间（分:秒）" if timestamps else "帧序号"
+    note = (
+        f"\n图片为按时间顺序排列的拼图（每张最多 {rows} 行 × {columns} 列，从左到右、从上到下），"
+        f"共 {len(selected)} 帧，每格左上角标注{label_note}。"
+    )
+    return images, note
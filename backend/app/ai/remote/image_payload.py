@@ -0,0 +1,158 @@
+import base64
+import hashlib
+import logging
+import math
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 各提供商视觉输入的有效尺寸（超过部分会被服务端缩小，只会浪费上传带宽与编码时间）
+# OpenAI：先缩放到 2048 以内，再把短边缩放到 768；
+# Anthropic：长边不超过 1568，且总像素约不超过 1.15MP（1568x1568 仍会被服务端缩小）
+PROVIDER_IMAGE_LIMITS = {
+    "openai": {"max_long_side": 2048, "max_short_side": 768, "max_pixels": None},
+    "anthropic": {"max_long_side": 1568, "max_short_side": 1568, "max_pixels": 1_150_000},
+}
+
+IMAGE_MEDIA_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp"}
+
+
+@dataclass(frozen=True)
+class EncodedImage:
+    """已按提供商尺寸压缩并 base64 编码的图片"""
+
+    media_type: str
+    data: str
+    content_hash: str
+    width: int
+    height: int
+
+    @property
+    def data_url(self) -> str:
+        return f"data:{self.media_type};base64,{self.data}"
+
+
+class ImagePayloadOptimizer:
+    """
+    视觉请求的图片负载优化：按提供商缩放到有效尺寸，以设定的格式和质量重新编码，
+    并按图片内容哈希缓存编码结果。行为识别与情感分析通常发送相同的关键帧，
+    共享同一个实例即可只编码一次。缓存按编码后字节数限制总大小，超出时按 LRU 淘汰。
+    """
+
+    def __init__(
+        self,
+        image_format: Optional[str] = None,
+        quality: Optional[int] = None,
+        cache_mb: Optional[int] = None,
+    ):
+        self.image_format = (image_format or settings.LLM_IMAGE_FORMAT).lower()
+        if self.image_format not in IMAGE_MEDIA_TYPES:
+            raise ValueError(f"不支持的图片格式: {self.image_format}")
+        self.quality = quality or settings.LLM_IMAGE_QUALITY
+        self.cache_bytes = (cache_mb if cache_mb is not None else settings.LLM_IMAGE_CACHE_MB) * 1024 * 1024
+        self._cache: "OrderedDict[tuple, EncodedImage]" = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "bytes_in": 0, "bytes_out": 0}
+
+    def encode(self, image_path: str, provider: str) -> EncodedImage:
+        """读取并编码单张图片，相同内容、相同提供商的图片直接返回缓存"""
+        with open(image_path, "rb") as f:
+            raw = f.read()
+        content_hash = hashlib.sha256(raw).hexdigest()
+        cache_key = (content_hash, provider, self.image_format, self.quality)
+
+        with self._lock:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                self._cache.move_to_end(cache_key)
+                self.stats["hits"] += 1
+                return cached
+
+        encoded = self._encode_bytes(raw, content_hash, provider)
+
+        with self._lock:
+            self.stats["misses"] += 1
+            self.stats["bytes_in"] += len(raw)
+            self.stats["bytes_out"] += len(encoded.data) * 3 // 4
+            if cache_key not in self._cache:
+                self._cache[cache_key] = encoded
+                self._cached_bytes += len(encoded.data)
+                while self._cached_bytes > self.cache_bytes and self._cache:
+                    _, evicted = self._cache.popitem(last=False)
+                    self._cached_bytes -= len(evicted.data)
+        return encoded
+
+    def encode_many(self, image_paths: list[str], provider: str) -> list[EncodedImage]:
+        return [self.encode(path, provider) for path in image_paths]
+
+    @staticmethod
+    def content_hashes(image_paths: list[str]) -> list[str]:
+        """计算图片文件内容的 SHA-256，用作回复缓存键的一部分"""
+        hashes = []
+        for path in image_paths:
+            with open(path, "rb") as f:
+                hashes.append(hashlib.sha256(f.read()).hexdigest())
+        return hashes
+
+    @property
+    def variant(self) -> str:
+        """影响模型所见图片的编码设置"""
+        return f"{self.image_format}:{self.quality}:{settings.LLM_IMAGE_MAX_SIDE}"
+
+    def _encode_bytes(self, raw: bytes, content_hash: str, provider: str) -> EncodedImage:
+        import cv2
+        import numpy as np
+
+        image = cv2.imdecode(np.frombuffer(raw, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            # 无法解码时按原样发送，由服务端判断格式
+            return EncodedImage(
+                media_type="image/jpeg",
+                data=base64.b64encode(raw).decode("utf-8"),
+                content_hash=content_hash,
+                width=0,
+                height=0,
+            )
+
+        height, width = image.shape[:2]
+        limits = PROVIDER_IMAGE_LIMITS.get(provider, PROVIDER_IMAGE_LIMITS["openai"])
+        max_long = settings.LLM_IMAGE_MAX_SIDE or limits["max_long_side"]
+        scale = min(
+            1.0,
+            max_long / max(height, width),
+            limits["max_short_side"] / min(height, width),
+        )
+        if limits["max_pixels"]:
+            scale = min(scale, math.sqrt(limits["max_pixels"] / (height * width)))
+        if scale < 1.0:
+            # 向下取整，保证缩放后仍在像素上限以内
+            width, height = max(int(width * scale), 1), max(int(height * scale), 1)
+            image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+
+        if self.image_format == "webp":
+            ok, buffer = cv2.imencode(".webp", image, [cv2.IMWRITE_WEBP_QUALITY, self.quality])
+        else:
+            ok, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        payload = buffer.tobytes() if ok else raw
+        media_type = IMAGE_MEDIA_TYPES[self.image_format] if ok else "image/jpeg"
+
+        # 原图本就是未缩放的小 JPEG 时，重新编码可能反而更大
+        if scale >= 1.0 and raw[:3] == b"\xff\xd8\xff" and len(raw) <= len(payload):
+            payload, media_type = raw, "image/jpeg"
+
+        return EncodedImage(
+            media_type=media_type,
+            data=base64.b64encode(payload).decode("utf-8"),
+            content_hash=content_hash,
+            width=width,
+            height=height,
+        )
+
+
+image_payload_optimizer = ImagePayloadOptimizer()
@@ -0,0 +1,266 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import uuid
+from typing import TYPE_CHECKING, Optional
+
+from app.ai.remote.client_pool import llm_client_pool
+from app.ai.remote.rate_limiter import LLMRequestError, llm_rate_limiter
+from app.ai.remote.usage_ledger import llm_usage_ledger
+from app.config import settings
+
+if TYPE_CHECKING:
+    from app.ai.remote.llm_client import LLMClient
+
+logger = logging.getLogger(__name__)
+
+# custom_id 由业务对象 ID 与请求用途组成；Anthropic 只允许字母、数字、- 和 _
+CUSTOM_ID_SEPARATOR = "__"
+
+ANTHROPIC_BATCH_BETA = "message-batches-2024-09-24"
+
+
+class LLMBatchFailedError(LLMRequestError):
+    """批次整体失败、被取消或不存在（不会再产生结果）"""
+
+
+def make_custom_id(item_key: str, purpose: str) -> str:
+    return f"{item_key}{CUSTOM_ID_SEPARATOR}{purpose}"
+
+
+def split_custom_id(custom_id: str) -> tuple[str, str]:
+    item_key, _, purpose = custom_id.rpartition(CUSTOM_ID_SEPARATOR)
+    return item_key, purpose
+
+
+def _response_text(provider: str, body: dict) -> Optional[str]:
+    """从批处理结果中的原始响应 JSON 提取回复文本"""
+    if provider == "anthropic":
+        content = body.get("content") or []
+        return content[0].get("text", "") if content else ""
+    choices = body.get("choices") or []
+    return (choices[0].get("message") or {}).get("content") or "" if choices else None
+
+
+def _openai_batch_usage(body: dict) -> dict:
+    """批处理结果中的 usage 是原始 JSON，字段与 extract_usage 的统一格式对应"""
+    usage = body.get("usage") or {}
+    return {
+        "input_tokens": usage.get("prompt_tokens") or 0,
+        "output_tokens": usage.get("completion_tokens") or 0,
+        "cached_tokens": (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0,
+        "cache_creation_tokens": 0,
+    }
+
+
+class OpenAIBatchBackend:
+    """OpenAI Batch API：上传 JSONL 输入文件，24 小时内完成，结果从输出文件读取"""
+
+    def __init__(self, client: "LLMClient"):
+        self.client = client
+        self.poll_interval = settings.LLM_BATCH_POLL_INTERVAL_SEC
+
+    def _sdk(self):
+        return llm_client_pool.get("openai", self.client.api_key, self.client.base_url)
+
+    async def submit(self, bodies: dict[str, dict]) -> str:
+        payload = "\n".join(
+            json.dumps(
+                {"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body},
+                ensure_ascii=False,
+            )
+            for custom_id, body in bodies.items()
+        ).encode("utf-8")
+
+        async def request():
+            input_file = await self._sdk().files.create(file=("batch.jsonl", payload), purpose="batch")
+            return await self._sdk().batches.create(
+                input_file_id=input_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h",
+            )
+
+        batch = await llm_rate_limiter.call("openai", self.client.api_key, request)
+        return batch.id
+
+    async def poll(self, batch_id: str) -> Optional[dict[str, Optional[str]]]:
+        batch = await llm_rate_limiter.call(
+            "openai", self.client.api_key, lambda: self._sdk().batches.retrieve(batch_id)
+        )
+        if batch.status in ("failed", "cancelled", "cancelling"):
+            raise LLMBatchFailedError(f"批次 {batch_id} 状态为 {batch.status}")
+        # expired 的批次仍会返回已完成部分的输出
+        if batch.status not in ("completed", "expired"):
+            return None
+
+        results: dict[str, Optional[str]] = {}
+        if batch.output_file_id:
+            content = await llm_rate_limiter.call(
+                "openai", self.client.api_key, lambda: self._sdk().files.content(batch.output_file_id)
+            )
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                response = item.get("response") or {}
+                body = response.get("body") or {}
+                succeeded = response.get("status_code") == 200
+                results[item["custom_id"]] = _response_text("openai", body) if succeeded else None
+                llm_usage_ledger.record(
+                    "openai", body.get("model") or "", "batch", "ok" if succeeded else "error",
+                    usage=_openai_batch_usage(body), status_code=response.get("status_code"), batch=True,
+                )
+        return results
+
+
+class AnthropicBatchBackend:
+    """Anthropic Message Batches API：请求直接随创建接口提交，结果以 JSONL 流返回"""
+
+    def __init__(self, client: "LLMClient"):
+        self.client = client
+        self.poll_interval = settings.LLM_BATCH_POLL_INTERVAL_SEC
+
+    def _sdk(self):
+        return llm_client_pool.get("anthropic", self.client.api_key, self.client.base_url)
+
+    @staticmethod
+    def _betas() -> list[str]:
+        from app.ai.remote.llm_client import ANTHROPIC_PROMPT_CACHE_BETA
+
+        betas = [ANTHROPIC_BATCH_BETA]
+        if settings.LLM_PROMPT_CACHE:
+            betas.append(ANTHROPIC_PROMPT_CACHE_BETA)
+        return betas
+
+    async def submit(self, bodies: dict[str, dict]) -> str:
+        requests = [{"custom_id": custom_id, "params": body} for custom_id, body in bodies.items()]
+        batch = await llm_rate_limiter.call(
+            "anthropic",
+            self.client.api_key,
+            lambda: self._sdk().beta.messages.batches.create(requests=requests, betas=self._betas()),
+        )
+        return batch.id
+
+    async def poll(self, batch_id: str) -> Optional[dict[str, Optional[str]]]:
+        batch = await llm_rate_limiter.call(
+            "anthropic",
+            self.client.api_key,
+            lambda: self._sdk().beta.messages.batches.retrieve(batch_id, betas=self._betas()),
+        )
+        if batch.processing_status != "ended":
+            return None
+
+        from app.ai.remote.llm_client import extract_usage
+
+        async def fetch_results() -> dict[str, Optional[str]]:
+            results: dict[str, Optional[str]] = {}
+            decoder = await self._sdk().beta.messages.batches.results(batch_id, betas=self._betas())
+            async for entry in decoder:
+                if entry.result.type == "succeeded":
+                    message = entry.result.message
+                    results[entry.custom_id] = message.content[0].text if message.content else ""
+                    llm_usage_ledger.record(
+                        "anthropic", message.model, "batch", "ok", usage=extract_usage("anthropic", message), batch=True
+                    )
+                else:
+                    results[entry.custom_id] = None
+                    llm_usage_ledger.record("anthropic", "", "batch", "error", batch=True)
+            return results
+
+        return await llm_rate_limiter.call("anthropic", self.client.api_key, fetch_results)
+
+
+class LocalBatchBackend:
+    """
+    本地批处理替身：请求写入 DATA_DIR/temp/llm_batches 下的 JSONL 文件，每次轮询通过普通接口
+    （共享限流器）执行一部分未完成的请求，全部完成后返回结果。用于测试，也可用于不支持
+    Batch API 的 OpenAI 兼容服务。
+    """
+
+    def __init__(self, client: "LLMClient"):
+        self.client = client
+        # 每次轮询只执行一部分请求，尽快再次轮询
+        self.poll_interval = 1
+
+    @staticmethod
+    def _batch_dir(batch_id: str) -> str:
+        return os.path.join(settings.DATA_DIR, "temp", "llm_batches", batch_id)
+
+    async def submit(self, bodies: dict[str, dict]) -> str:
+        batch_id = uuid.uuid4().hex
+        batch_dir = self._batch_dir(batch_id)
+        os.makedirs(batch_dir, exist_ok=True)
+        with open(os.path.join(batch_dir, "requests.jsonl"), "w", encoding="utf-8") as f:
+            for custom_id, body in bodies.items():
+                f.write(json.dumps({"custom_id": custom_id, "body": body}, ensure_ascii=False) + "\n")
+        return batch_id
+
+    async def poll(self, batch_id: str) -> Optional[dict[str, Optional[str]]]:
+        batch_dir = self._batch_dir(batch_id)
+        requests_path = os.path.join(batch_dir, "requests.jsonl")
+        results_path = os.path.join(batch_dir, "results.jsonl")
+        if not os.path.exists(requests_path):
+            raise LLMBatchFailedError(f"本地批次不存在: {batch_id}")
+
+        results: dict[str, Optional[str]] = {}
+        if os.path.exists(results_path):
+            with open(results_path, encoding="utf-8") as f:
+                for line in f:
+                    item = json.loads(line)
+                    results[item["custom_id"]] = item["text"]
+
+        pending = []
+        with open(requests_path, encoding="utf-8") as f:
+            for line in f:
+                item = json.loads(line)
+                if item["custom_id"] not in results:
+                    pending.append(item)
+                    if len(pending) >= settings.LLM_BATCH_LOCAL_CHUNK:
+                        break
+
+        if pending:
+            texts = await asyncio.gather(
+                *(
+                    llm_rate_limiter.call(
+                        self.client.provider,
+                        self.client.api_key,
+                        lambda body=item["body"]: self.client.execute_body(body),
+                    )
+                    for item in pending
+                ),
+                return_exceptions=True,
+            )
+            with open(results_path, "a", encoding="utf-8") as f:
+                for item, text in zip(pending, texts):
+                    if isinstance(text, BaseException):
+                        logger.warning("⚠️ [LLM 批量] 本地批次 %s 请求 %s 失败: %s", batch_id, item["custom_id"], text)
+                        text = None
+                    results[item["custom_id"]] = text
+                    f.write(json.dumps({"custom_id": item["custom_id"], "text": text}, ensure_ascii=False) + "\n")
+            if len(pending) >= settings.LLM_BATCH_LOCAL_CHUNK:
+                return None
+
+        shutil.rmtree(batch_dir, ignore_errors=True)
+        return results
+
+
+BATCH_BACKENDS = {"provider", "local"}
+
+
+def get_batch_backend(client: "LLMClient", backend: str):
+    """按配置选择批处理后端：provider 使用当前提供商的 Batch API，local 使用本地替身"""
+    if backend not in BATCH_BACKENDS:
+        raise ValueError(f"不支持的批处理后端: {backend}")
+    if backend == "local":
+        return LocalBatchBackend(client)
+    if client.provider == "anthropic":
+        return AnthropicBatchBackend(client)
+    return OpenAIBatchBackend(client)
+
+
+def batch_poll_interval(client: "LLMClient", batch_ref: str) -> int:
+    """批次的建议轮询间隔（秒）"""
+    backend_name, _ = batch_ref.split(":", 1)
+    return get_batch_backend(client, backend_name).poll_interval
@@ -1,13 +1,85 @@
-import base64
+import asyncio
 import json
 import logging
+import threading
 import time
-from typing import Optional
-
+from typing import AsyncIterator, Awaitable, Callable, Optional, TypeVar
+
+from app.ai.remote.client_pool import llm_client_pool
+from app.ai.remote.endpoint_router import endpoint_router, fallback_endpoints
+from app.ai.remote.image_payload import EncodedImage, image_payload_optimizer
+from app.ai.remote.rate_limiter import LLMRequestError, llm_rate_limiter
+from app.ai.remote.response_cache import llm_response_cache
+from app.ai.remote.usage_ledger import llm_usage_ledger
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+# Anthropic 提示词缓存在 SDK 当前版本仍需 beta 请求头
+ANTHROPIC_PROMPT_CACHE_BETA = "prompt-caching-2024-07-31"
+
+_usage_lock = threading.Lock()
+_usage_stats: dict[str, dict] = {}
+
+
+def extract_usage(provider: str, response) -> dict:
+    """
+    从 SDK 响应中提取 token 用量，统一为 input_tokens（含缓存命中部分）、output_tokens、
+    cached_tokens（命中提示词缓存的输入 token）、cache_creation_tokens（写入缓存的输入 token）。
+    """
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return {"input_tokens": 0, "output_tokens": 0, "cached_tokens": 0, "cache_creation_tokens": 0}
+    if provider == "anthropic":
+        cached = getattr(usage, "cache_read_input_tokens", None) or 0
+        created = getattr(usage, "cache_creation_input_tokens", None) or 0
+        return {
+            "input_tokens": (usage.input_tokens or 0) + cached + created,
+            "output_tokens": usage.output_tokens or 0,
+            "cached_tokens": cached,
+            "cache_creation_tokens": created,
+        }
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "input_tokens": usage.prompt_tokens or 0,
+        "output_tokens": usage.completion_tokens or 0,
+        "cached_tokens": (getattr(details, "cached_tokens", None) or 0) if details else 0,
+        "cache_creation_tokens": 0,
+    }
+
+
+def _record_usage(provider: str, model: str, usage: dict) -> None:
+    with _usage_lock:
+        stats = _usage_stats.setdefault(
+            f"{provider}:{model}",
+            {"calls": 0, "input_tokens": 0, "output_tokens": 0, "cached_tokens": 0, "cache_creation_tokens": 0},
+        )
+        stats["calls"] += 1
+        for name, value in usage.items():
+            stats[name] += value
+
+
+def usage_report() -> dict:
+    """进程内按 provider:model 汇总的 token 用量与提示词缓存命中情况"""
+    with _usage_lock:
+        return {
+            key: {
+                **stats,
+                "cached_ratio": round(stats["cached_tokens"] / stats["input_tokens"], 4) if stats["input_tokens"] else 0.0,
+            }
+            for key, stats in _usage_stats.items()
+        }
+
+
+def _anthropic_system(system_prompt: str) -> list[dict]:
+    """系统提示词是各分析器固定不变的指令前缀，标记为可缓存"""
+    block: dict = {"type": "text", "text": system_prompt}
+    if settings.LLM_PROMPT_CACHE:
+        block["cache_control"] = {"type": "ephemeral"}
+    return [block]
+
 
 class LLMClient:
     """
@@ -15,6 +87,9 @@ class LLMClient:
 
     OpenAI 格式兼容：OpenAI、DashScope、DeepSeek、Groq、Together 等所有 OpenAI 兼容 API。
     Anthropic 格式兼容：Anthropic Claude 系列。
+
+    使用系统配置时，LLM_FALLBACK_ENDPOINTS 中的备用端点按顺序参与故障转移与对冲请求；
+    用户自带提供商、API Key 或 Base URL 时只使用用户的端点。
     """
 
     def __init__(
@@ -24,12 +99,45 @@ class LLMClient:
         base_url: Optional[str] = None,
         model: Optional[str] = None,
         vision_model: Optional[str] = None,
+        use_fallbacks: bool = True,
     ):
         self.provider = provider or settings.LLM_PROVIDER
         self.api_key = api_key or settings.LLM_API_KEY
         self.base_url = base_url or settings.LLM_BASE_URL
         self.model = model or settings.LLM_MODEL
         self.vision_model = vision_model or settings.LLM_VISION_MODEL
+        self.use_fallbacks = use_fallbacks and provider is None and api_key is None and base_url is None
+
+    def endpoints(self) -> list["LLMClient"]:
+        """主端点与按顺序排列的备用端点；备用端点未指定模型时沿用当前客户端的模型"""
+        if not self.use_fallbacks:
+            return [self]
+        return [self] + [
+            LLMClient(
+                provider=endpoint.get("provider") or self.provider,
+                api_key=endpoint.get("api_key") or self.api_key,
+                base_url=endpoint["base_url"],
+                model=endpoint.get("model") or self.model,
+                vision_model=endpoint.get("vision_model") or self.vision_model,
+                use_fallbacks=False,
+            )
+            for endpoint in fallback_endpoints()
+        ]
+
+    async def _route(
+        self,
+        kind: str,
+        invoke: Callable[["LLMClient", Optional[int]], Awaitable[T]],
+        hedge: bool = True,
+    ) -> T:
+        """只有一个端点时直接请求，否则交给端点路由器做故障转移与对冲；完成后按需写入用量台账"""
+        endpoints = self.endpoints()
+        if len(endpoints) == 1:
+            result = await invoke(self, None)
+        else:
+            result = await endpoint_router.call(kind, endpoints, invoke, hedge=hedge)
+        await llm_usage_ledger.maybe_flush()
+        return result
 
     @classmethod
     def from_user_settings(
@@ -49,150 +157,468 @@ class LLMClient:
             vision_model=llm_vision_model or None,
         )
 
-    async def chat(self, prompt: str, system_prompt: str = "") -> str:
-        """纯文本对话，返回模型回复文本。"""
-        if self.provider == "anthropic":
-            return await self._anthropic_chat(prompt, system_prompt)
-        return await self._openai_chat(prompt, system_prompt)
+    async def chat(
+        self,
+        prompt: str,
+        system_prompt: str = "",
+        cache: bool = True,
+        validate: Optional[Callable[[str], bool]] = None,
+    ) -> str:
+        """
+        纯文本对话，返回模型回复文本。
+
+        相同请求优先返回回复缓存（cache=False 时跳过）；未命中的请求经过共享限流器
+        （令牌桶 + 自适应并发 + 退避重试），最终失败时抛出 LLMRequestError。
+        validate 为调用方对回复的校验（如能否解析为预期的 JSON）：只有通过校验的回复才写入缓存，
+        命中的缓存未通过校验时删除并重新请求；不传时任何非空回复都会缓存。
+        """
+        cache_key = None
+        if cache and settings.LLM_CACHE_ENABLED:
+            cache_key = llm_response_cache.make_key(self.provider, self.model, system_prompt, prompt)
+            cached = await self._cached(cache_key, validate)
+            if cached is not None:
+                logger.info("♻️ [LLM 缓存] 命中: provider=%s, model=%s", self.provider, self.model)
+                llm_usage_ledger.record(self.provider, self.model, "chat", "cache_hit")
+                return cached
+
+        client, result = await self._route(
+            "chat", lambda client, max_retries: client._request_chat(prompt, system_prompt, max_retries)
+        )
+
+        if cache_key and self._cacheable(result, validate):
+            # 按实际回复的端点与模型写入缓存，备用端点的回复不会冒充主模型的结果
+            if (client.provider, client.model) != (self.provider, self.model):
+                cache_key = llm_response_cache.make_key(client.provider, client.model, system_prompt, prompt)
+            await llm_response_cache.set(cache_key, result)
+        return result
+
+    async def vision(
+        self,
+        prompt: str,
+        image_paths: list[str],
+        system_prompt: str = "",
+        cache: bool = True,
+        validate: Optional[Callable[[str], bool]] = None,
+    ) -> str:
+        """
+        多模态视觉分析，传入图片路径列表，返回模型回复文本。
+
+        缓存键包含图片内容哈希，同一组关键帧的重复分析直接复用回复；validate 含义同 chat。
+        失败时抛出 LLMRequestError。
+        """
+        cache_key = None
+        image_hashes: list[str] = []
+        if cache and settings.LLM_CACHE_ENABLED:
+            image_hashes = await asyncio.to_thread(image_payload_optimizer.content_hashes, image_paths)
+            cache_key = llm_response_cache.make_key(
+                self.provider, self.vision_model, system_prompt, prompt,
+                image_hashes=image_hashes, variant=image_payload_optimizer.variant,
+            )
+            cached = await self._cached(cache_key, validate)
+            if cached is not None:
+                logger.info(
+                    "♻️ [LLM 缓存] 命中: provider=%s, model=%s, 图片数=%d",
+                    self.provider, self.vision_model, len(image_paths),
+                )
+                llm_usage_ledger.record(
+                    self.provider, self.vision_model, "vision", "cache_hit", image_count=len(image_paths)
+                )
+                return cached
+
+        client, result = await self._route(
+            "vision",
+            lambda client, max_retries: client._request_vision(prompt, image_paths, system_prompt, max_retries),
+        )
+
+        if cache_key and self._cacheable(result, validate):
+            if (client.provider, client.vision_model) != (self.provider, self.vision_model):
+                cache_key = llm_response_cache.make_key(
+                    client.provider, client.vision_model, system_prompt, prompt,
+                    image_hashes=image_hashes, variant=image_payload_optimizer.variant,
+                )
+            await llm_response_cache.set(cache_key, result)
+        return result
+
+    async def chat_stream(
+        self,
+        prompt: str,
+        system_prompt: str = "",
+        cache: bool = True,
+        validate: Optional[Callable[[str], bool]] = None,
+    ) -> AsyncIterator[str]:
+        """
+        流式纯文本对话，按到达顺序逐段产出回复文本。
+
+        建立流（收到响应头）之前经过共享限流器，失败可重试；开始产出后中途断开直接抛出
+        LLMRequestError，不再重试以免重复输出。完整回复（通过 validate 校验时）写入回复缓存，
+        命中缓存时一次产出全文。
+        """
+        cache_key = None
+        if cache and settings.LLM_CACHE_ENABLED:
+            cache_key = llm_response_cache.make_key(self.provider, self.model, system_prompt, prompt)
+            cached = await self._cached(cache_key, validate)
+            if cached is not None:
+                logger.info("♻️ [LLM 缓存] 命中: provider=%s, model=%s", self.provider, self.model)
+                llm_usage_ledger.record(self.provider, self.model, "stream", "cache_hit")
+                yield cached
+                return
+
+        start_time = time.time()
+        # 只在建立流之前故障转移；不对冲，避免同时建立两条流
+        client, stream = await self._route(
+            "stream",
+            lambda client, max_retries: client._request_open_stream(prompt, system_prompt, max_retries),
+            hedge=False,
+        )
+        iterate = client._anthropic_stream_text if client.provider == "anthropic" else client._openai_stream_text
 
-    async def vision(self, prompt: str, image_paths: list[str], system_prompt: str = "") -> str:
-        """多模态视觉分析，传入图片路径列表，返回模型回复文本。"""
+        usage = {"input_tokens": 0, "output_tokens": 0, "cached_tokens": 0, "cache_creation_tokens": 0}
+        parts: list[str] = []
+        first_chunk_at = None
+        try:
+            async for text in iterate(stream, usage):
+                if first_chunk_at is None:
+                    first_chunk_at = time.time()
+                parts.append(text)
+                yield text
+        except Exception as error:
+            # 中途断开前已产生的 token 同样计费
+            llm_usage_ledger.record(
+                client.provider, client.model, "stream", "error", time.time() - start_time, usage,
+                status_code=getattr(error, "status_code", None),
+            )
+            if isinstance(error, LLMRequestError):
+                raise
+            raise LLMRequestError(
+                f"大模型流式回复中断（{type(error).__name__}）: {error}",
+                status_code=getattr(error, "status_code", None),
+            ) from error
+        finally:
+            await stream.close()
+
+        result = "".join(parts)
+        client._record_call("stream", client.model, usage, time.time() - start_time)
+        logger.info(
+            "✅ [LLM 流式回复] 首字耗时=%.1fs, 总耗时=%.1fs, 回复长度=%d字符, 输入token=%d(缓存命中%d), 输出token=%d",
+            (first_chunk_at or time.time()) - start_time, time.time() - start_time, len(result),
+            usage["input_tokens"], usage["cached_tokens"], usage["output_tokens"],
+        )
+        if cache_key and self._cacheable(result, validate):
+            if (client.provider, client.model) != (self.provider, self.model):
+                cache_key = llm_response_cache.make_key(client.provider, client.model, system_prompt, prompt)
+            await llm_response_cache.set(cache_key, result)
+        await llm_usage_ledger.maybe_flush()
+
+    @staticmethod
+    async def _cached(key: str, validate: Optional[Callable[[str], bool]]) -> Optional[str]:
+        """读取回复缓存；未通过校验的缓存（例如校验规则收紧前写入的）删除后视为未命中"""
+        cached = await llm_response_cache.get(key)
+        if cached is not None and validate is not None and not validate(cached):
+            logger.warning("♻️ [LLM 缓存] 命中的回复未通过校验，已删除")
+            await llm_response_cache.delete(key)
+            return None
+        return cached
+
+    @staticmethod
+    def _cacheable(result: str, validate: Optional[Callable[[str], bool]]) -> bool:
+        if not result:
+            return False
+        if validate is not None and not validate(result):
+            logger.info("♻️ [LLM 缓存] 回复未通过校验，不写入缓存")
+            return False
+        return True
+
+    async def _request_chat(
+        self, prompt: str, system_prompt: str, max_retries: Optional[int] = None
+    ) -> tuple["LLMClient", str]:
+        if self.provider == "anthropic":
+            request = lambda: self._anthropic_chat(prompt, system_prompt)
+        else:
+            request = lambda: self._openai_chat(prompt, system_prompt)
+        return self, await self._call_endpoint("chat", self.model, 0, request, max_retries)
+
+    async def _request_vision(
+        self, prompt: str, image_paths: list[str], system_prompt: str, max_retries: Optional[int] = None
+    ) -> tuple["LLMClient", str]:
         if self.provider == "anthropic":
-            return await self._anthropic_vision(prompt, image_paths, system_prompt)
-        return await self._openai_vision(prompt, image_paths, system_prompt)
+            request = lambda: self._anthropic_vision(prompt, image_paths, system_prompt)
+        else:
+            request = lambda: self._openai_vision(prompt, image_paths, system_prompt)
+        return self, await self._call_endpoint("vision", self.vision_model, len(image_paths), request, max_retries)
+
+    async def _request_open_stream(
+        self, prompt: str, system_prompt: str, max_retries: Optional[int] = None
+    ) -> tuple["LLMClient", object]:
+        if self.provider == "anthropic":
+            request = lambda: self._anthropic_open_stream(prompt, system_prompt)
+        else:
+            request = lambda: self._openai_open_stream(prompt, system_prompt)
+        return self, await self._call_endpoint("stream", self.model, 0, request, max_retries)
 
-    async def _openai_chat(self, prompt: str, system_prompt: str = "") -> str:
-        """OpenAI 格式的纯文本对话。"""
-        from openai import AsyncOpenAI
+    async def _call_endpoint(
+        self,
+        kind: str,
+        model: str,
+        image_count: int,
+        request: Callable[[], Awaitable[T]],
+        max_retries: Optional[int],
+    ) -> T:
+        """经共享限流器请求当前端点；最终失败或被取消（对冲中落后的一方）的调用同样记入用量台账"""
+        start_time = time.time()
+        try:
+            return await llm_rate_limiter.call(self.provider, self.api_key, request, max_retries=max_retries)
+        except LLMRequestError as error:
+            llm_usage_ledger.record(
+                self.provider, model, kind, "error", time.time() - start_time,
+                image_count=image_count, status_code=error.status_code,
+            )
+            raise
+        except asyncio.CancelledError:
+            llm_usage_ledger.record(
+                self.provider, model, kind, "cancelled", time.time() - start_time, image_count=image_count
+            )
+            raise
+
+    def _record_call(self, kind: str, model: str, usage: dict, elapsed: float, image_count: int = 0) -> None:
+        _record_usage(self.provider, model, usage)
+        llm_usage_ledger.record(self.provider, model, kind, "ok", elapsed, usage, image_count)
+
+    def build_request_body(
+        self,
+        prompt: str,
+        system_prompt: str = "",
+        images: Optional[list[EncodedImage]] = None,
+    ) -> dict:
+        """
+        构造提供商格式的请求体（不含传输选项），同步调用、流式调用与批量提交共用。
+        带图片时使用视觉模型。
+        """
+        model = self.vision_model if images else self.model
+        if self.provider == "anthropic":
+            content: object = prompt
+            if images:
+                content = [
+                    {
+                        "type": "image",
+                        "source": {"type": "base64", "media_type": image.media_type, "data": image.data},
+                    }
+                    for image in images
+                ] + [{"type": "text", "text": prompt}]
+            body: dict = {
+                "model": model,
+                "max_tokens": 4096,
+                "messages": [{"role": "user", "content": content}],
+            }
+            if system_prompt:
+                body["system"] = _anthropic_system(system_prompt)
+            return body
 
-        client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
         messages = []
         if system_prompt:
             messages.append({"role": "system", "content": system_prompt})
-        messages.append({"role": "user", "content": prompt})
+        if images:
+            messages.append({
+                "role": "user",
+                "content": [{"type": "image_url", "image_url": {"url": image.data_url}} for image in images]
+                + [{"type": "text", "text": prompt}],
+            })
+        else:
+            messages.append({"role": "user", "content": prompt})
+        return {"model": model, "messages": messages}
+
+    async def build_vision_body(self, prompt: str, image_paths: list[str], system_prompt: str = "") -> dict:
+        """读取并编码图片后构造视觉请求体（用于批量提交，图片在提交前即已内联）"""
+        images = await asyncio.to_thread(image_payload_optimizer.encode_many, image_paths, self.provider)
+        return self.build_request_body(prompt, system_prompt, images)
+
+    async def execute_body(self, body: dict) -> str:
+        """直接发送已构造好的请求体，返回回复文本（批量任务的本地执行使用）"""
+        client = llm_client_pool.get(self.provider, self.api_key, self.base_url)
+        if self.provider == "anthropic":
+            response = await client.messages.create(**body, **self._anthropic_options(body))
+            result = response.content[0].text if response.content else ""
+        else:
+            response = await client.chat.completions.create(**body, timeout=120.0)
+            result = response.choices[0].message.content or ""
+        usage = extract_usage(self.provider, response)
+        _record_usage(self.provider, body["model"], usage)
+        image_count = sum(
+            1
+            for message in body["messages"] if isinstance(message.get("content"), list)
+            for part in message["content"] if part.get("type") in ("image", "image_url")
+        )
+        llm_usage_ledger.record(self.provider, body["model"], "batch", "ok", usage=usage, image_count=image_count)
+        return result
+
+    @staticmethod
+    def _anthropic_options(body: dict) -> dict:
+        if body.get("system") and settings.LLM_PROMPT_CACHE:
+            return {"extra_headers": {"anthropic-beta": ANTHROPIC_PROMPT_CACHE_BETA}}
+        return {}
+
+    async def _openai_open_stream(self, prompt: str, system_prompt: str = ""):
+        """OpenAI 格式的流式对话，返回收到响应头后的流对象。"""
+        client = llm_client_pool.get("openai", self.api_key, self.base_url)
+        body = self.build_request_body(prompt, system_prompt)
+
+        logger.info("🤖 [LLM 流式请求] provider=openai, model=%s, base_url=%s", self.model, self.base_url)
+        return await client.chat.completions.create(
+            **body,
+            stream=True,
+            stream_options={"include_usage": True},
+            timeout=120.0,
+        )
+
+    @staticmethod
+    async def _openai_stream_text(stream, usage: dict) -> AsyncIterator[str]:
+        async for chunk in stream:
+            # include_usage 时最后一个分片只携带用量、没有 choices
+            if getattr(chunk, "usage", None):
+                usage.update(extract_usage("openai", chunk))
+            if chunk.choices:
+                text = chunk.choices[0].delta.content
+                if text:
+                    yield text
+
+    async def _anthropic_open_stream(self, prompt: str, system_prompt: str = ""):
+        """Anthropic 格式的流式对话，返回收到响应头后的事件流。"""
+        client = llm_client_pool.get("anthropic", self.api_key, self.base_url)
+        body = self.build_request_body(prompt, system_prompt)
+
+        logger.info("🤖 [LLM 流式请求] provider=anthropic, model=%s, base_url=%s", self.model, self.base_url)
+        return await client.messages.create(**body, stream=True, **self._anthropic_options(body))
+
+    @staticmethod
+    async def _anthropic_stream_text(stream, usage: dict) -> AsyncIterator[str]:
+        async for event in stream:
+            # 输入用量在 message_start 中给出，输出 token 数在 message_delta 中累计
+            if event.type == "message_start":
+                usage.update(extract_usage("anthropic", event.message))
+            elif event.type == "content_block_delta" and event.delta.type == "text_delta":
+                yield event.delta.text
+            elif event.type == "message_delta":
+                usage["output_tokens"] = event.usage.output_tokens
+
+    async def _openai_chat(self, prompt: str, system_prompt: str = "") -> str:
+        """OpenAI 格式的纯文本对话。"""
+        client = llm_client_pool.get("openai", self.api_key, self.base_url)
+        body = self.build_request_body(prompt, system_prompt)
 
         logger.info("🤖 [LLM 请求] provider=openai, model=%s, base_url=%s", self.model, self.base_url)
         logger.info("📝 [LLM Prompt] (前500字): %s", prompt[:500])
         start_time = time.time()
 
-        response = await client.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            timeout=120.0,
-        )
+        response = await client.chat.completions.create(**body, timeout=120.0)
         result = response.choices[0].message.content or ""
         elapsed = time.time() - start_time
+        usage = extract_usage("openai", response)
+        self._record_call("chat", self.model, usage, elapsed)
 
-        logger.info("✅ [LLM 回复] 耗时=%.1fs, 回复长度=%d字符", elapsed, len(result))
+        logger.info(
+            "✅ [LLM 回复] 耗时=%.1fs, 回复长度=%d字符, 输入token=%d(缓存命中%d), 输出token=%d",
+            elapsed, len(result), usage["input_tokens"], usage["cached_tokens"], usage["output_tokens"],
+        )
         logger.info("📄 [LLM 回复内容] (前500字): %s", result[:500])
         return result
 
     async def _openai_vision(self, prompt: str, image_paths: list[str], system_prompt: str = "") -> str:
         """OpenAI 格式的多模态视觉分析。"""
-        from openai import AsyncOpenAI
-
-        client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
-
-        content: list[dict] = []
-        for path in image_paths:
-            with open(path, "rb") as f:
-                encoded = base64.b64encode(f.read()).decode("utf-8")
-            content.append({
-                "type": "image_url",
-                "image_url": {"url": f"data:image/jpeg;base64,{encoded}"},
-            })
-        content.append({"type": "text", "text": prompt})
-
-        messages = []
-        if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
-        messages.append({"role": "user", "content": content})
+        client = llm_client_pool.get("openai", self.api_key, self.base_url)
+        images = await asyncio.to_thread(image_payload_optimizer.encode_many, image_paths, "openai")
+        body = self.build_request_body(prompt, system_prompt, images)
 
         logger.info("🖼️ [LLM Vision 请求] provider=openai, model=%s, 图片数=%d", self.vision_model, len(image_paths))
         logger.info("📝 [Vision Prompt] (前500字): %s", prompt[:500])
         start_time = time.time()
 
-        response = await client.chat.completions.create(
-            model=self.vision_model,
-            messages=messages,
-            timeout=120.0,
-        )
+        response = await client.chat.completions.create(**body, timeout=120.0)
         result = response.choices[0].message.content or ""
         elapsed = time.time() - start_time
+        usage = extract_usage("openai", response)
+        self._record_call("vision", self.vision_model, usage, elapsed, len(image_paths))
 
-        logger.info("✅ [LLM Vision 回复] 耗时=%.1fs, 回复长度=%d字符", elapsed, len(result))
+        logger.info(
+            "✅ [LLM Vision 回复] 耗时=%.1fs, 回复长度=%d字符, 输入token=%d(缓存命中%d), 输出token=%d",
+            elapsed, len(result), usage["input_tokens"], usage["cached_tokens"], usage["output_tokens"],
+        )
         logger.info("📄 [Vision 回复内容] (前500字): %s", result[:500])
         return result
 
     async def _anthropic_chat(self, prompt: str, system_prompt: str = "") -> str:
         """Anthropic 格式的纯文本对话。"""
-        import anthropic
-
-        client = anthropic.AsyncAnthropic(api_key=self.api_key, base_url=self.base_url)
-        kwargs: dict = {
-            "model": self.model,
-            "max_tokens": 4096,
-            "messages": [{"role": "user", "content": prompt}],
-        }
-        if system_prompt:
-            kwargs["system"] = system_prompt
+        client = llm_client_pool.get("anthropic", self.api_key, self.base_url)
+        body = self.build_request_body(prompt, system_prompt)
 
         logger.info("🤖 [LLM 请求] provider=anthropic, model=%s, base_url=%s", self.model, self.base_url)
         logger.info("📝 [LLM Prompt] (前500字): %s", prompt[:500])
         start_time = time.time()
 
-        response = await client.messages.create(**kwargs)
+        response = await client.messages.create(**body, **self._anthropic_options(body))
         result = response.content[0].text if response.content else ""
         elapsed = time.time() - start_time
+        usage = extract_usage("anthropic", response)
+        self._record_call("chat", self.model, usage, elapsed)
 
-        logger.info("✅ [LLM 回复] 耗时=%.1fs, 回复长度=%d字符", elapsed, len(result))
+        logger.info(
+            "✅ [LLM 回复] 耗时=%.1fs, 回复长度=%d字符, 输入token=%d(缓存命中%d), 输出token=%d",
+            elapsed, len(result), usage["input_tokens"], usage["cached_tokens"], usage["output_tokens"],
+        )
         logger.info("📄 [LLM 回复内容] (前500字): %s", result[:500])
         return result
 
     async def _anthropic_vision(self, prompt: str, image_paths: list[str], system_prompt: str = "") -> str:
         """Anthropic 格式的多模态视觉分析。"""
-        import anthropic
-
-        client = anthropic.AsyncAnthropic(api_key=self.api_key, base_url=self.base_url)
-
-        content: list[dict] = []
-        for path in image_paths:
-            with open(path, "rb") as f:
-                encoded = base64.b64encode(f.read()).decode("utf-8")
-            content.append({
-                "type": "image",
-                "source": {
-                    "type": "base64",
-                    "media_type": "image/jpeg",
-                    "data": encoded,
-                },
-            })
-        content.append({"type": "text", "text": prompt})
-
-        kwargs: dict = {
-            "model": self.vision_model,
-            "max_tokens": 4096,
-            "messages": [{"role": "user", "content": content}],
-        }
-        if system_prompt:
-            kwargs["system"] = system_prompt
+        client = llm_client_pool.get("anthropic", self.api_key, self.base_url)
+        images = await asyncio.to_thread(image_payload_optimizer.encode_many, image_paths, "anthropic")
+        body = self.build_request_body(prompt, system_prompt, images)
 
         logger.info("🖼️ [LLM Vision 请求] provider=anthropic, model=%s, 图片数=%d", self.vision_model, len(image_paths))
         logger.info("📝 [Vision Prompt] (前500字): %s", prompt[:500])
         start_time = time.time()
 
-        response = await client.messages.create(**kwargs)
+        response = await client.messages.create(**body, **self._anthropic_options(body))
         result = response.content[0].text if response.content else ""
         elapsed = time.time() - start_time
+        usage = extract_usage("anthropic", response)
+        self._record_call("vision", self.vision_model, usage, elapsed, len(image_paths))
 
-        logger.info("✅ [LLM Vision 回复] 耗时=%.1fs, 回复长度=%d字符", elapsed, len(result))
+        logger.info(
+            "✅ [LLM Vision 回复] 耗时=%.1fs, 回复长度=%d字符, 输入token=%d(缓存命中%d), 输出token=%d",
+            elapsed, len(result), usage["input_tokens"], usage["cached_tokens"], usage["output_tokens"],
+        )
         logger.info("📄 [Vision 回复内容] (前500字): %s", result[:500])
         return result
 
+    async def submit_batch(self, bodies: dict[str, dict], backend: Optional[str] = None) -> str:
+        """
+        批量模式：把一组 custom_id -> 请求体 提交为离线批处理任务，返回批次引用（"后端:批次ID"）。
+        适合可以接受数小时延迟的大批量请求（月度报告、重新分析回填），费用约为同步调用的一半。
+        backend 为 provider（提供商 Batch API）或 local（本地逐条执行，用于测试和不支持批处理的兼容 API）。
+        """
+        from app.ai.remote.llm_batch import get_batch_backend
+
+        backend_name = backend or settings.LLM_BATCH_BACKEND
+        batch_id = await get_batch_backend(self, backend_name).submit(bodies)
+        logger.info(
+            "📦 [LLM 批量] 已提交批次: backend=%s, provider=%s, 请求数=%d, batch_id=%s",
+            backend_name, self.provider, len(bodies), batch_id,
+        )
+        return f"{backend_name}:{batch_id}"
+
+    async def poll_batch(self, batch_ref: str) -> Optional[dict[str, Optional[str]]]:
+        """
+        查询批次状态：未完成时返回 None；完成后返回 custom_id -> 回复文本（单条失败为 None）。
+        批次整体失败或被取消时抛出 LLMBatchFailedError；已过期的批次返回已完成的部分。
+        """
+        from app.ai.remote.llm_batch import get_batch_backend
+
+        backend_name, batch_id = batch_ref.split(":", 1)
+        return await get_batch_backend(self, backend_name).poll(batch_id)
+
     async def test_connection(self) -> dict:
         """测试 API 连通性，返回 {"success": bool, "message": str}。"""
         try:
-            result = await self.chat("请回复：连接成功")
+            result = await self.chat("请回复：连接成功", cache=False)
             if result:
                 return {"success": True, "message": f"连接成功，模型回复：{result[:50]}"}
             return {"success": False, "message": "模型返回空内容"}
@@ -0,0 +1,107 @@
+import logging
+import threading
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from app.ai.remote.rate_limiter import LLMRequestError
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+MODEL_TIER_FAST = "fast"
+MODEL_TIER_FULL = "full"
+
+_stats_lock = threading.Lock()
+_cascade_stats: dict[str, dict[str, int]] = {}
+
+
+def cascade_tiers(
+    llm_provider: Optional[str] = None, llm_vision_model: Optional[str] = None
+) -> list[tuple[str, str]]:
+    """
+    返回依次尝试的 (档位, 视觉模型)。
+    未开启级联、未配置小模型，或用户覆盖了提供商 / 视觉模型时只使用一档。
+    """
+    full_model = llm_vision_model or settings.LLM_VISION_MODEL
+    fast_model = settings.LLM_FAST_VISION_MODEL
+    if (
+        not settings.LLM_CASCADE_ENABLED
+        or not fast_model
+        or fast_model == full_model
+        or llm_provider
+        or llm_vision_model
+    ):
+        return [(MODEL_TIER_FULL, full_model)]
+    return [(MODEL_TIER_FAST, fast_model), (MODEL_TIER_FULL, full_model)]
+
+
+def model_version(tier: str, model: str) -> str:
+    """写入 AnalysisResult.model_version 的档位标识"""
+    return f"{tier}:{model}"
+
+
+async def run_cascade(
+    label: str,
+    tiers: list[tuple[str, str]],
+    request: Callable[[str, Callable[[str], bool]], Awaitable[str]],
+    parse: Callable[[str], Optional[T]],
+    confidence: Callable[[T], Optional[float]],
+) -> tuple[Optional[T], str, str]:
+    """
+    先用小模型分析，回复无法解析、结构校验失败（confidence 返回 None）或置信度低于
+    LLM_CASCADE_CONFIDENCE 时升级到下一档。最后一档只要能解析就采用。
+
+    Args:
+        label: 分析器名称（日志与统计）
+        tiers: cascade_tiers() 的返回值
+        request: 以模型名与回复校验函数发起一次视觉请求，返回原始回复；校验函数应传给
+            LLMClient.vision(validate=...)，只有能解析且结构合格的回复才写入回复缓存
+        parse: 解析原始回复，无法解析时返回 None
+        confidence: 校验解析结果并返回置信度，结构不合格时返回 None
+
+    Returns:
+        (解析结果（最后一档仍无法解析时为 None）, 最后一次的原始回复, model_version)
+    """
+    def valid(raw: str) -> bool:
+        parsed = parse(raw)
+        return parsed is not None and confidence(parsed) is not None
+
+    raw_content = ""
+    for index, (tier, model) in enumerate(tiers):
+        is_last = index == len(tiers) - 1
+        try:
+            raw_content = await request(model, valid)
+        except LLMRequestError as error:
+            if is_last:
+                raise
+            logger.warning("⬆️ [模型级联] %s: %s 请求失败（%s），升级到下一档", label, model, error)
+            _record(label, f"{tier}_error")
+            continue
+
+        parsed = parse(raw_content)
+        score = confidence(parsed) if parsed is not None else None
+        if parsed is not None and (is_last or (score is not None and score >= settings.LLM_CASCADE_CONFIDENCE)):
+            _record(label, tier)
+            return parsed, raw_content, model_version(tier, model)
+
+        if not is_last:
+            _record(label, f"{tier}_escalated")
+            logger.info(
+                "⬆️ [模型级联] %s: %s %s，升级到下一档",
+                label, model, "结构无效" if score is None else f"置信度 {score:.2f} 低于阈值",
+            )
+    tier, model = tiers[-1]
+    return None, raw_content, model_version(tier, model)
+
+
+def cascade_report() -> dict:
+    """进程内各分析器按档位统计的采用次数与升级次数"""
+    with _stats_lock:
+        return {label: dict(counts) for label, counts in _cascade_stats.items()}
+
+
+def _record(label: str, outcome: str) -> None:
+    with _stats_lock:
+        counts = _cascade_stats.setdefault(label, {})
+        counts[outcome] = counts.get(outcome, 0) + 1
@@ -0,0 +1,144 @@
+import logging
+from datetime import datetime
+from typing import Callable, Optional
+
+from app.ai.remote.behavior_analyzer import behavior_confidence, parse_json_content
+from app.ai.remote.emotion_analyzer import emotion_confidence
+from app.ai.remote.llm_client import get_llm_client
+from app.ai.remote.model_cascade import cascade_tiers, run_cascade
+from app.ai.remote.usage_ledger import llm_usage_context
+
+logger = logging.getLogger(__name__)
+
+# 静态指令作为系统提示词，构成每次请求相同的前缀，便于提供商侧的提示词缓存
+PHOTO_EVENT_SYSTEM_PROMPT = """你是儿童成长分析助手，负责分析同一次活动中连续拍摄的一组照片，对每张照片分别给出孩子的行为与情绪状态。
+
+请以 JSON 格式返回，photos 中每张照片一项：
+{
+  "photos": [
+    {
+      "index": 照片序号（从 1 开始，与提示中的序号一致）,
+      "behavior": {
+        "activities": [
+          {
+            "type": "行为类型（sport/learning/art/music/social/independent/rest）",
+            "description": "具体行为描述",
+            "confidence": 0.0-1.0,
+            "duration_pct": 0.0-1.0
+          }
+        ],
+        "environment": "场景描述（室内/室外/学校等）",
+        "interaction_mode": "互动模式（独处/与同伴/与成人）"
+      },
+      "emotion": {
+        "dominant": "主要情绪（happy/sad/angry/calm/excited/anxious/focused）",
+        "scores": {
+          "happy": 0.0-1.0,
+          "sad": 0.0-1.0,
+          "angry": 0.0-1.0,
+          "calm": 0.0-1.0,
+          "excited": 0.0-1.0,
+          "anxious": 0.0-1.0,
+          "focused": 0.0-1.0
+        },
+        "expression_description": "表情描述",
+        "emotional_stability": 0.0-1.0,
+        "confidence": 0.0-1.0（对情绪判断的整体把握程度，面部不清晰或证据不足时给低分）
+      }
+    }
+  ]
+}
+可以结合同组其他照片理解场景与活动的前后经过，但每张照片的结论以该照片本身为准。
+每张照片都必须返回一项。只返回 JSON，不要其他文字。"""
+
+
+def build_photo_event_prompt(captured_times: list[Optional[datetime]]) -> str:
+    lines = [f"以下 {len(captured_times)} 张照片拍摄于同一次活动，按拍摄时间排序："]
+    for index, captured_at in enumerate(captured_times, start=1):
+        lines.append(f"第 {index} 张：{captured_at.strftime('%Y-%m-%d %H:%M:%S') if captured_at else '拍摄时间未知'}")
+    return "\n".join(lines)
+
+
+def _parse_photo_event(raw_content: str) -> Optional[dict[int, tuple[dict, dict]]]:
+    """
+    解析事件结果为 {照片序号: (行为结果, 情感结果)}，只保留结构合格的照片；
+    整体无法解析时返回 None
+    """
+    data = parse_json_content(raw_content)
+    photos = data.get("photos") if data else None
+    if not isinstance(photos, list):
+        return None
+
+    parsed: dict[int, tuple[dict, dict]] = {}
+    for item in photos:
+        if not isinstance(item, dict):
+            continue
+        behavior, emotion = item.get("behavior"), item.get("emotion")
+        if not isinstance(behavior, dict) or not isinstance(emotion, dict):
+            continue
+        if behavior_confidence(behavior) is None or emotion_confidence(emotion) is None:
+            continue
+        try:
+            parsed[int(item.get("index"))] = (behavior, emotion)
+        except (TypeError, ValueError):
+            continue
+    return parsed
+
+
+async def analyze_photo_event(
+    image_paths: list[str],
+    captured_times: list[Optional[datetime]],
+) -> list[Optional[tuple[dict, dict]]]:
+    """
+    一次视觉请求分析同一事件的全部照片，结果按照片拆分。
+
+    某张照片缺失或结构不合格、或置信度低于级联阈值时整组升级到下一档模型；
+    最后一档仍缺失的照片返回 None，由调用方逐张回退分析。请求失败时抛出 LLMRequestError。
+
+    Args:
+        image_paths: 按拍摄时间排序的照片路径
+        captured_times: 与 image_paths 一一对应的拍摄时间
+
+    Returns:
+        与 image_paths 一一对应的 (行为分析结果, 情感分析结果)，结果带 model_version
+    """
+    prompt = build_photo_event_prompt(captured_times)
+    tiers = cascade_tiers()
+    expected = set(range(1, len(image_paths) + 1))
+
+    def confidence(parsed: dict[int, tuple[dict, dict]]) -> Optional[float]:
+        if not expected <= set(parsed):
+            return None
+        return min(
+            min(behavior_confidence(behavior), emotion_confidence(emotion))
+            for index, (behavior, emotion) in parsed.items()
+            if index in expected
+        )
+
+    async def request(model: str, validate: Callable[[str], bool]) -> str:
+        client = get_llm_client(llm_vision_model=model)
+        return await client.vision(
+            prompt=prompt,
+            image_paths=image_paths,
+            system_prompt=PHOTO_EVENT_SYSTEM_PROMPT,
+            validate=validate,
+        )
+
+    with llm_usage_context(analyzer="photo_event"):
+        parsed, raw_content, version = await run_cascade(
+            "photo_event", tiers, request, _parse_photo_event, confidence
+        )
+    if parsed is None:
+        logger.warning("⚠️ [照片事件] 返回内容无法解析: %s", raw_content[:200])
+        parsed = {}
+
+    results: list[Optional[tuple[dict, dict]]] = []
+    for index in range(1, len(image_paths) + 1):
+        item = parsed.get(index)
+        results.append(
+            ({**item[0], "model_version": version}, {**item[1], "model_version": version}) if item else None
+        )
+    missing = sum(1 for item in results if item is None)
+    if missing:
+        logger.warning("⚠️ [照片事件] %d/%d 张照片缺少有效结果", missing, len(image_paths))
+    return results
@@ -0,0 +1,373 @@
+import asyncio
+import hashlib
+import logging
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 进程内累积的限流计数写入 Redis 的最短间隔，避免每次请求都多一次 Redis 往返
+METRICS_PUBLISH_INTERVAL_SEC = 5.0
+
+# 令牌桶：KEYS[1] 桶状态，KEYS[2] 全局暂停标记（429 的 Retry-After）
+# ARGV: 每毫秒补充令牌数, 桶容量, 状态过期时间(ms)；返回需要等待的毫秒数，0 表示已取得令牌
+TOKEN_BUCKET_SCRIPT = """
+local pause = redis.call('PTTL', KEYS[2])
+if pause > 0 then return pause end
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1]) or capacity
+local ts = tonumber(data[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - ts, 0) * rate)
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+else
+  wait = math.ceil((1 - tokens) / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], ARGV[3])
+return wait
+"""
+
+
+class LLMRequestError(RuntimeError):
+    """大模型请求在重试后仍然失败（或遇到不可重试的错误）"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        try:
+            return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+
+def classify_error(error: Exception) -> tuple[str, Optional[float]]:
+    """
+    将 SDK 异常归类为 throttled（429 / 529 过载）、retryable（超时、连接错误、5xx）
+    或 fatal（其他 4xx 等），并解析 Retry-After。
+    """
+    status_code = getattr(error, "status_code", None)
+    if status_code in (429, 529):
+        return "throttled", _retry_after_seconds(error)
+    if isinstance(status_code, int):
+        return ("retryable" if status_code >= 500 or status_code == 408 else "fatal"), _retry_after_seconds(error)
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return "retryable", None
+    if type(error).__name__ in ("APIConnectionError", "APITimeoutError"):
+        return "retryable", None
+    return "fatal", None
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD 自适应并发：每个成功请求使上限增加 1/limit（约每轮 +1），
+    被限流时上限减半（冷却期内只减一次，避免同一波 429 把上限压到最低）。
+
+    没有空闲槽位时按先来后到排队，release() 把腾出的槽位直接交给队首等待者并唤醒它，
+    等待期间不轮询。等待者可能来自不同线程的事件循环，通过 call_soon_threadsafe 唤醒。
+    """
+
+    def __init__(self, initial: int, maximum: int, minimum: int = 1, decrease_cooldown: float = 1.0):
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self.decrease_cooldown = decrease_cooldown
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self._waiters: deque[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+
+    async def acquire(self) -> float:
+        """等待空闲并发槽位，返回等待秒数"""
+        start = time.monotonic()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if not self._waiters and self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return 0.0
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove(waiter)
+                    granted = False
+                except ValueError:
+                    # 已被 release() 移出队列，槽位已经记在本等待者名下
+                    granted = True
+            if granted:
+                self.release("cancelled")
+            raise
+        return time.monotonic() - start
+
+    def release(self, outcome: str) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if outcome == "ok":
+                self.limit = min(float(self.maximum), self.limit + 1.0 / self.limit)
+            elif outcome == "throttled":
+                now = time.monotonic()
+                if now - self._last_decrease >= self.decrease_cooldown:
+                    self.limit = max(float(self.minimum), self.limit / 2)
+                    self._last_decrease = now
+            woken = []
+            while self._waiters and self.in_flight < int(self.limit):
+                self.in_flight += 1
+                woken.append(self._waiters.popleft())
+        for loop, future in woken:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                # 等待者所在的事件循环已关闭，把槽位还回去
+                self.release("cancelled")
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class LLMRateLimiter:
+    """
+    大模型请求限流器，按 provider + API Key 区分配额。
+
+    - 令牌桶存放在 Redis 中，所有 worker 进程共享同一配额（LLM_RATE_LIMIT_RPM 为 0 时关闭）；
+      收到 429 时按 Retry-After 写入全局暂停标记，所有进程一起退避。
+    - 每个进程内使用 AIMD 自适应并发控制在途请求数。
+    - 可重试错误按带抖动的指数退避重试，优先遵循 Retry-After；重试耗尽后抛出 LLMRequestError。
+    - Redis 不可用时令牌桶放行（只保留进程内并发控制），不阻塞业务。
+    """
+
+    def __init__(self):
+        self._concurrency: dict[str, AdaptiveConcurrency] = {}
+        self._metrics: dict[str, dict] = {}
+        # 尚未写入 Redis 的计数，按 METRICS_PUBLISH_INTERVAL_SEC 合并写入
+        self._unpublished: dict[str, dict[str, int]] = {}
+        self._last_publish = time.monotonic()
+        self._lock = threading.Lock()
+        self._redis_warned = False
+
+    async def call(
+        self,
+        provider: str,
+        api_key: str,
+        request: Callable[[], Awaitable[T]],
+        max_retries: Optional[int] = None,
+    ) -> T:
+        """
+        在限流、并发控制与重试保护下执行一次请求。
+        max_retries 默认为 LLM_MAX_RETRIES；有备用端点时由调用方调低，尽快切换端点。
+        """
+        limit_key = f"{provider}:{hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]}"
+        concurrency = self._get_concurrency(limit_key)
+        if max_retries is None:
+            max_retries = settings.LLM_MAX_RETRIES
+
+        call_stats = {"requests": 0, "succeeded": 0, "throttled": 0, "retried": 0, "failed": 0}
+        try:
+            for attempt in range(max_retries + 1):
+                waited = await self._acquire_token(limit_key)
+                waited += await concurrency.acquire()
+                self._record(limit_key, call_stats, requests=1, wait_seconds=waited)
+                try:
+                    result = await request()
+                except asyncio.CancelledError:
+                    # 对冲请求中落后的一方会被取消，需归还并发槽位
+                    concurrency.release("cancelled")
+                    raise
+                except Exception as error:
+                    kind, retry_after = classify_error(error)
+                    if retry_after is not None:
+                        # 异常的 Retry-After（如数小时之后的 HTTP 日期）不能让 worker 长时间停顿
+                        retry_after = min(retry_after, settings.LLM_RETRY_MAX_DELAY_SEC)
+                    concurrency.release("throttled" if kind == "throttled" else "error")
+                    if kind == "throttled":
+                        self._record(limit_key, call_stats, throttled=1)
+                        await self._pause(limit_key, retry_after)
+
+                    if kind == "fatal" or attempt >= max_retries:
+                        self._record(limit_key, call_stats, failed=1)
+                        raise LLMRequestError(
+                            f"大模型请求失败（{type(error).__name__}）: {error}",
+                            status_code=getattr(error, "status_code", None),
+                        ) from error
+
+                    backoff = min(
+                        settings.LLM_RETRY_MAX_DELAY_SEC,
+                        settings.LLM_RETRY_BASE_DELAY_SEC * 2 ** attempt,
+                    )
+                    delay = random.uniform(0, backoff)
+                    if retry_after is not None:
+                        delay = retry_after + random.uniform(0, settings.LLM_RETRY_BASE_DELAY_SEC)
+                    self._record(limit_key, call_stats, retried=1)
+                    logger.warning(
+                        "⏳ [LLM 限流] %s 第 %d 次重试，原因=%s(%s)，等待 %.1fs，并发上限=%.1f",
+                        provider, attempt + 1, kind, type(error).__name__, delay, concurrency.limit,
+                    )
+                    await asyncio.sleep(delay)
+                else:
+                    concurrency.release("ok")
+                    self._record(limit_key, call_stats, succeeded=1)
+                    return result
+            raise LLMRequestError("大模型请求失败：重试次数已耗尽")
+        finally:
+            self._accumulate(limit_key, call_stats)
+            await self.maybe_publish()
+
+    def report(self) -> dict:
+        """进程内各配额的请求统计与当前并发上限"""
+        with self._lock:
+            return {
+                key: {
+                    **metrics,
+                    "concurrency_limit": round(self._concurrency[key].limit, 2),
+                    "in_flight": self._concurrency[key].in_flight,
+                }
+                for key, metrics in self._metrics.items()
+            }
+
+    def _get_concurrency(self, limit_key: str) -> AdaptiveConcurrency:
+        with self._lock:
+            concurrency = self._concurrency.get(limit_key)
+            if concurrency is None:
+                concurrency = AdaptiveConcurrency(
+                    initial=settings.LLM_CONCURRENCY_INITIAL,
+                    maximum=settings.LLM_CONCURRENCY_MAX,
+                )
+                self._concurrency[limit_key] = concurrency
+                self._metrics[limit_key] = {
+                    "requests": 0, "succeeded": 0, "throttled": 0,
+                    "retried": 0, "failed": 0, "wait_seconds": 0.0,
+                }
+            return concurrency
+
+    def _record(self, limit_key: str, call_stats: dict, wait_seconds: float = 0.0, **counters: int) -> None:
+        with self._lock:
+            metrics = self._metrics[limit_key]
+            for name, value in counters.items():
+                metrics[name] += value
+                call_stats[name] += value
+            if wait_seconds:
+                metrics["wait_seconds"] = round(metrics["wait_seconds"] + wait_seconds, 3)
+
+    def _accumulate(self, limit_key: str, call_stats: dict) -> None:
+        with self._lock:
+            pending = self._unpublished.setdefault(limit_key, {})
+            for name, value in call_stats.items():
+                if value:
+                    pending[name] = pending.get(name, 0) + value
+
+    async def maybe_publish(self) -> None:
+        """距上次写入超过 METRICS_PUBLISH_INTERVAL_SEC 时把累积的计数写入 Redis"""
+        with self._lock:
+            due = self._unpublished and time.monotonic() - self._last_publish >= METRICS_PUBLISH_INTERVAL_SEC
+        if due:
+            await self.publish_metrics()
+
+    async def publish_metrics(self) -> None:
+        """把累积的计数一次性累加到 Redis，汇总所有 worker 进程的限流指标；失败时保留到下次"""
+        from app.utils.redis_client import get_redis
+
+        with self._lock:
+            pending, self._unpublished = self._unpublished, {}
+            self._last_publish = time.monotonic()
+        if not pending:
+            return
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            for limit_key, counters in pending.items():
+                for name, value in counters.items():
+                    pipe.hincrby(f"llm:metrics:{limit_key}", name, value)
+            await pipe.execute()
+        except Exception:
+            for limit_key, counters in pending.items():
+                self._accumulate(limit_key, counters)
+
+    async def _acquire_token(self, limit_key: str) -> float:
+        """从共享令牌桶取一个令牌，返回等待秒数"""
+        if settings.LLM_RATE_LIMIT_RPM <= 0:
+            return 0.0
+        from app.utils.redis_client import get_redis
+
+        rate_per_ms = settings.LLM_RATE_LIMIT_RPM / 60000
+        capacity = max(settings.LLM_RATE_LIMIT_BURST, 1)
+        state_ttl_ms = int(capacity / rate_per_ms) + 60000
+        keys = [f"llm:bucket:{limit_key}", f"llm:pause:{limit_key}"]
+
+        start = time.monotonic()
+        while True:
+            try:
+                wait_ms = await get_redis().eval(
+                    TOKEN_BUCKET_SCRIPT, 2, *keys, rate_per_ms, capacity, state_ttl_ms
+                )
+            except Exception as error:
+                if not self._redis_warned:
+                    logger.warning("⚠️ [LLM 限流] Redis 不可用，跳过共享令牌桶: %s", error)
+                    self._redis_warned = True
+                return time.monotonic() - start
+            if not wait_ms:
+                return time.monotonic() - start
+            # 加少量抖动，避免多个 worker 同时醒来再次争抢
+            await asyncio.sleep(int(wait_ms) / 1000 * random.uniform(1.0, 1.2))
+
+    async def _pause(self, limit_key: str, retry_after: Optional[float]) -> None:
+        """收到 429 时通知所有进程在 Retry-After 内暂停发送"""
+        if not retry_after or settings.LLM_RATE_LIMIT_RPM <= 0:
+            return
+        from app.utils.redis_client import get_redis
+
+        try:
+            await get_redis().set(f"llm:pause:{limit_key}", 1, px=max(int(retry_after * 1000), 1))
+        except Exception:
+            pass
+
+
+async def load_shared_metrics() -> dict:
+    """读取所有 worker 汇总到 Redis 的限流指标，键为 provider:API Key 哈希"""
+    from app.utils.redis_client import get_redis
+
+    redis = get_redis()
+    metrics = {}
+    async for key in redis.scan_iter(match="llm:metrics:*"):
+        name = key.decode("utf-8") if isinstance(key, bytes) else key
+        values = await redis.hgetall(key)
+        metrics[name.removeprefix("llm:metrics:")] = {
+            (k.decode("utf-8") if isinstance(k, bytes) else k): int(v) for k, v in values.items()
+        }
+    return metrics
+
+
+llm_rate_limiter = LLMRateLimiter()
@@ -1,45 +1,45 @@
 import json
 import logging
 import time
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 from app.ai.remote.llm_client import get_llm_client
+from app.ai.remote.usage_ledger import llm_usage_context, set_llm_usage_context
 
 logger = logging.getLogger(__name__)
 
+# 静态指令作为系统提示词，构成每次请求相同的前缀，便于提供商侧的提示词缓存
+NARRATIVE_SYSTEM_PROMPT = """你是一位资深的儿童发展心理学专家，负责根据孩子的月度数据撰写成长叙事报告。
 
-async def generate_growth_narrative(
+请按以下结构撰写报告（Markdown 格式，800-1200 字）：
+
+### 本月成长亮点
+（用温暖的语言描述孩子本月最突出的 2-3 个进步）
+
+### 兴趣探索
+（分析孩子的兴趣偏好变化，给出引导建议）
+
+### 天赋发现
+（如有火花卡片，重点描述；如无，鼓励继续观察）
+
+### 情感世界
+（分析情绪特征，给出亲子互动建议）
+
+### 下月期待
+（基于当前数据，给出 2-3 个具体的成长期待和建议）
+
+语气要求：温暖、专业、鼓励性，用"您的孩子"或直接用孩子名字。"""
+
+
+def _build_narrative_prompt(
     child_name: str,
     age_months: int,
     radar_data: dict,
     spark_cards: list[dict],
     behavior_summary: list[dict],
     emotion_summary: dict,
-    llm_provider: Optional[str] = None,
-    llm_api_key: Optional[str] = None,
-    llm_base_url: Optional[str] = None,
-    llm_model: Optional[str] = None,
 ) -> str:
-    """
-    使用大模型生成月度成长叙事报告。
-    支持 OpenAI 和 Anthropic 两种 API 格式。
-
-    Args:
-        child_name: 孩子名字
-        age_months: 孩子月龄
-        radar_data: 雷达图数据
-        spark_cards: 天赋火花卡片
-        behavior_summary: 行为汇总
-        emotion_summary: 情绪汇总
-        llm_provider: 用户级 LLM 提供商覆盖
-        llm_api_key: 用户级 API Key 覆盖
-        llm_base_url: 用户级 Base URL 覆盖
-        llm_model: 用户级文本模型覆盖
-
-    Returns:
-        Markdown 格式的成长叙事文本
-    """
-    prompt = f"""你是一位资深的儿童发展心理学专家，请为以下孩子撰写一份月度成长叙事报告。
+    return f"""请为以下孩子撰写本月的成长叙事报告。
 
 ## 孩子信息
 - 名字：{child_name}
@@ -70,26 +70,66 @@ async def generate_growth_narrative(
 {json.dumps(behavior_summary[:5], ensure_ascii=False, indent=2) if behavior_summary else "暂无行为数据"}
 
 ## 情绪状态
-{json.dumps(emotion_summary, ensure_ascii=False, indent=2) if emotion_summary else "暂无情绪数据"}
+{json.dumps(emotion_summary, ensure_ascii=False, indent=2) if emotion_summary else "暂无情绪数据"}"""
 
-请按以下结构撰写报告（Markdown 格式，800-1200 字）：
 
-### 本月成长亮点
-（用温暖的语言描述孩子本月最突出的 2-3 个进步）
+def _fallback_narrative(child_name: str) -> str:
+    """大模型不可用时的默认叙事文案"""
+    return f"""### 本月成长亮点
+
+{child_name}这个月继续保持着积极的成长态势，每一天都在用自己的方式探索这个世界。
 
 ### 兴趣探索
-（分析孩子的兴趣偏好变化，给出引导建议）
+
+孩子在多个领域都展现出了好奇心，建议继续提供丰富多样的体验机会。
 
 ### 天赋发现
-（如有火花卡片，重点描述；如无，鼓励继续观察）
+
+我们正在持续观察{child_name}的天赋特质，每个孩子都有独特的闪光点。
 
 ### 情感世界
-（分析情绪特征，给出亲子互动建议）
+
+{child_name}的情绪表达越来越丰富，建议家长多给予积极的情感回应。
 
 ### 下月期待
-（基于当前数据，给出 2-3 个具体的成长期待和建议）
 
-语气要求：温暖、专业、鼓励性，用"您的孩子"或直接用孩子名字。"""
+继续保持对{child_name}的关注和陪伴，让成长的每一步都被温柔记录。"""
+
+
+async def generate_growth_narrative(
+    child_name: str,
+    age_months: int,
+    radar_data: dict,
+    spark_cards: list[dict],
+    behavior_summary: list[dict],
+    emotion_summary: dict,
+    llm_provider: Optional[str] = None,
+    llm_api_key: Optional[str] = None,
+    llm_base_url: Optional[str] = None,
+    llm_model: Optional[str] = None,
+) -> str:
+    """
+    使用大模型生成月度成长叙事报告。
+    支持 OpenAI 和 Anthropic 两种 API 格式。
+
+    Args:
+        child_name: 孩子名字
+        age_months: 孩子月龄
+        radar_data: 雷达图数据
+        spark_cards: 天赋火花卡片
+        behavior_summary: 行为汇总
+        emotion_summary: 情绪汇总
+        llm_provider: 用户级 LLM 提供商覆盖
+        llm_api_key: 用户级 API Key 覆盖
+        llm_base_url: 用户级 Base URL 覆盖
+        llm_model: 用户级文本模型覆盖
+
+    Returns:
+        Markdown 格式的成长叙事文本
+    """
+    prompt = _build_narrative_prompt(
+        child_name, age_months, radar_data, spark_cards, behavior_summary, emotion_summary
+    )
 
     client = get_llm_client(
         llm_provider=llm_provider,
@@ -101,28 +141,58 @@ async def generate_growth_narrative(
     try:
         logger.info("📊 [成长叙事] 开始为 %s（%d月龄）生成成长叙事报告...", child_name, age_months)
         start_time = time.time()
-        result = await client.chat(prompt=prompt)
+        with llm_usage_context(analyzer="report_narrative"):
+            result = await client.chat(prompt=prompt, system_prompt=NARRATIVE_SYSTEM_PROMPT)
         elapsed = time.time() - start_time
         logger.info("📊 [成长叙事] 生成完成，耗时=%.1fs，内容长度=%d字符", elapsed, len(result))
         return result
     except Exception as error:
         logger.error("❌ [成长叙事] 生成失败: %s，使用默认文案", error, exc_info=True)
-        return f"""### 本月成长亮点
-
-{child_name}这个月继续保持着积极的成长态势，每一天都在用自己的方式探索这个世界。
+        return _fallback_narrative(child_name)
 
-### 兴趣探索
 
-孩子在多个领域都展现出了好奇心，建议继续提供丰富多样的体验机会。
-
-### 天赋发现
-
-我们正在持续观察{child_name}的天赋特质，每个孩子都有独特的闪光点。
-
-### 情感世界
-
-{child_name}的情绪表达越来越丰富，建议家长多给予积极的情感回应。
+async def stream_growth_narrative(
+    child_name: str,
+    age_months: int,
+    radar_data: dict,
+    spark_cards: list[dict],
+    behavior_summary: list[dict],
+    emotion_summary: dict,
+    llm_provider: Optional[str] = None,
+    llm_api_key: Optional[str] = None,
+    llm_base_url: Optional[str] = None,
+    llm_model: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """
+    流式生成月度成长叙事报告，按到达顺序逐段产出 Markdown 文本。
 
-### 下月期待
+    尚未产出任何内容就失败时产出默认文案（与 generate_growth_narrative 一致）；
+    产出中途失败时抛出 LLMRequestError，由调用方决定是否保存已生成的部分。
+    """
+    prompt = _build_narrative_prompt(
+        child_name, age_months, radar_data, spark_cards, behavior_summary, emotion_summary
+    )
+    client = get_llm_client(
+        llm_provider=llm_provider,
+        llm_api_key=llm_api_key,
+        llm_base_url=llm_base_url,
+        llm_model=llm_model,
+    )
 
-继续保持对{child_name}的关注和陪伴，让成长的每一步都被温柔记录。"""
+    set_llm_usage_context(analyzer="report_narrative")
+    logger.info("📊 [成长叙事] 开始为 %s（%d月龄）流式生成成长叙事报告...", child_name, age_months)
+    start_time = time.time()
+    produced = 0
+    try:
+        async for text in client.chat_stream(prompt=prompt, system_prompt=NARRATIVE_SYSTEM_PROMPT):
+            if not produced:
+                logger.info("📊 [成长叙事] 首段内容到达，耗时=%.1fs", time.time() - start_time)
+            produced += len(text)
+            yield text
+    except Exception as error:
+        if produced:
+            raise
+        logger.error("❌ [成长叙事] 流式生成失败: %s，使用默认文案", error, exc_info=True)
+        yield _fallback_narrative(child_name)
+        return
+    logger.info("📊 [成长叙事] 流式生成完成，耗时=%.1fs，内容长度=%d字符", time.time() - start_time, produced)
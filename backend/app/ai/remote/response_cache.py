@@ -0,0 +1,193 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 缓存键格式版本，变更键的组成方式时递增使旧缓存失效
+CACHE_KEY_VERSION = 1
+
+INDEX_KEY = "llm:cache:index"  # 有序集合：缓存键 -> 最近访问时间
+SIZES_KEY = "llm:cache:sizes"  # 哈希：缓存键 -> 字节数
+TOTAL_KEY = "llm:cache:bytes"  # 缓存总字节数
+STATS_KEY = "llm:cache:stats"  # 哈希：hits / misses / stores / evictions
+
+# 每次写入时最多清理的过期索引条目数，限制脚本单次执行时间
+EXPIRED_PRUNE_LIMIT = 200
+
+# 写入一条缓存并按最近访问时间淘汰，直到总字节数回到上限以内，返回淘汰条数。
+# 已因 TTL 过期的条目不再占用空间：最近访问时间早于一个 TTL 之前的条目必然已过期（写入时间不晚于
+# 访问时间），写入时先批量清理（每次最多 EXPIRED_PRUNE_LIMIT 条）；淘汰时遇到已不存在的条目只清理记账，
+# 不计入淘汰数，避免过期条目的字节数累积导致过早淘汰仍有效的缓存。
+# KEYS: 条目键, INDEX_KEY, SIZES_KEY, TOTAL_KEY；ARGV: 值, TTL 秒, 当前时间, 字节上限, 清理条数上限
+STORE_SCRIPT = """
+local function forget(key)
+  local size = tonumber(redis.call('HGET', KEYS[3], key) or '0')
+  redis.call('ZREM', KEYS[2], key)
+  redis.call('HDEL', KEYS[3], key)
+  return redis.call('DECRBY', KEYS[4], size)
+end
+
+local expired = redis.call(
+  'ZRANGEBYSCORE', KEYS[2], '-inf', '(' .. (tonumber(ARGV[3]) - tonumber(ARGV[2])), 'LIMIT', 0, tonumber(ARGV[5])
+)
+for _, key in ipairs(expired) do
+  if key ~= KEYS[1] then
+    redis.call('DEL', key)
+    forget(key)
+  end
+end
+
+local old = tonumber(redis.call('HGET', KEYS[3], KEYS[1]) or '0')
+local size = string.len(ARGV[1])
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+redis.call('ZADD', KEYS[2], ARGV[3], KEYS[1])
+redis.call('HSET', KEYS[3], KEYS[1], size)
+local total = redis.call('INCRBY', KEYS[4], size - old)
+local evicted = 0
+while total > tonumber(ARGV[4]) do
+  local oldest = redis.call('ZRANGE', KEYS[2], 0, 0)
+  if #oldest == 0 or oldest[1] == KEYS[1] then break end
+  if redis.call('DEL', oldest[1]) == 1 then
+    evicted = evicted + 1
+  end
+  total = forget(oldest[1])
+end
+if total < 0 then
+  redis.call('SET', KEYS[4], 0)
+end
+return evicted
+"""
+
+# 删除一条缓存并扣除其字节记账（回复未通过调用方校验时使用）
+# KEYS: 条目键, INDEX_KEY, SIZES_KEY, TOTAL_KEY
+DELETE_SCRIPT = """
+local size = tonumber(redis.call('HGET', KEYS[3], KEYS[1]) or '0')
+redis.call('DEL', KEYS[1])
+redis.call('ZREM', KEYS[2], KEYS[1])
+redis.call('HDEL', KEYS[3], KEYS[1])
+if redis.call('DECRBY', KEYS[4], size) < 0 then
+  redis.call('SET', KEYS[4], 0)
+end
+return size
+"""
+
+
+class LLMResponseCache:
+    """
+    大模型回复缓存，存放在 Redis（REDIS_URL）中。
+
+    键为 provider、模型、系统提示词、提示词与图片内容哈希的 SHA-256，相同的分析请求
+    （重新分析、任务重试、重复上传的媒体、相同雷达数据的报告）直接复用上一次的回复。
+    每条缓存带 TTL，总大小超过 LLM_CACHE_MAX_MB 时按最近访问时间淘汰；
+    Redis 不可用时视为未命中，不影响请求本身。
+    只缓存通过调用方校验的回复（见 LLMClient.chat 的 validate 参数），命中的回复校验失败时删除。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidated": 0, "errors": 0}
+
+    @staticmethod
+    def make_key(
+        provider: str,
+        model: str,
+        system_prompt: str,
+        prompt: str,
+        image_hashes: Optional[list[str]] = None,
+        variant: str = "",
+    ) -> str:
+        """生成缓存键；variant 用于区分会影响输出的其他参数（如图片编码设置）"""
+        material = json.dumps(
+            [CACHE_KEY_VERSION, provider, model, system_prompt, prompt, image_hashes or [], variant],
+            ensure_ascii=False,
+        )
+        return "llm:cache:" + hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        from app.utils.redis_client import get_redis
+
+        try:
+            redis = get_redis()
+            value = await redis.get(key)
+            pipe = redis.pipeline(transaction=False)
+            if value is not None:
+                pipe.zadd(INDEX_KEY, {key: time.time()})
+            pipe.hincrby(STATS_KEY, "hits" if value is not None else "misses", 1)
+            await pipe.execute()
+        except Exception as error:
+            self._count("errors")
+            logger.debug("LLM 缓存读取失败: %s", error)
+            return None
+
+        if value is None:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    async def set(self, key: str, value: str) -> None:
+        from app.utils.redis_client import get_redis
+
+        try:
+            redis = get_redis()
+            evicted = await redis.eval(
+                STORE_SCRIPT, 4, key, INDEX_KEY, SIZES_KEY, TOTAL_KEY,
+                value, settings.LLM_CACHE_TTL_SEC, time.time(), settings.LLM_CACHE_MAX_MB * 1024 * 1024,
+                EXPIRED_PRUNE_LIMIT,
+            )
+            pipe = redis.pipeline(transaction=False)
+            pipe.hincrby(STATS_KEY, "stores", 1)
+            if evicted:
+                pipe.hincrby(STATS_KEY, "evictions", int(evicted))
+            await pipe.execute()
+        except Exception as error:
+            self._count("errors")
+            logger.debug("LLM 缓存写入失败: %s", error)
+            return
+        self._count("stores")
+        if evicted:
+            self._count("evictions", int(evicted))
+
+    async def delete(self, key: str) -> None:
+        """删除一条缓存（命中的回复未通过校验时调用），同时扣除字节记账"""
+        from app.utils.redis_client import get_redis
+
+        try:
+            redis = get_redis()
+            await redis.eval(DELETE_SCRIPT, 4, key, INDEX_KEY, SIZES_KEY, TOTAL_KEY)
+            await redis.hincrby(STATS_KEY, "invalidated", 1)
+        except Exception as error:
+            self._count("errors")
+            logger.debug("LLM 缓存删除失败: %s", error)
+            return
+        self._count("invalidated")
+
+    def report(self) -> dict:
+        """进程内的命中统计"""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {**self.stats, "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0}
+
+    async def load_shared_stats(self) -> dict:
+        """所有进程汇总到 Redis 的命中统计与当前缓存大小"""
+        from app.utils.redis_client import get_redis
+
+        redis = get_redis()
+        values = await redis.hgetall(STATS_KEY)
+        stats = {(k.decode("utf-8") if isinstance(k, bytes) else k): int(v) for k, v in values.items()}
+        stats["bytes"] = int(await redis.get(TOTAL_KEY) or 0)
+        stats["entries"] = int(await redis.zcard(INDEX_KEY))
+        return stats
+
+    def _count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.stats[name] += value
+
+
+llm_response_cache = LLMResponseCache()
@@ -0,0 +1,203 @@
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Iterator, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 内置单价（美元 / 百万 token），按模型名前缀匹配，最长前缀优先；LLM_PRICES 可覆盖或补充
+DEFAULT_PRICES: dict[str, dict[str, float]] = {
+    "gpt-4o-mini": {"input": 0.15, "cached_input": 0.075, "output": 0.6},
+    "gpt-4o": {"input": 2.5, "cached_input": 1.25, "output": 10.0},
+    "claude-3-5-haiku": {"input": 0.8, "cached_input": 0.08, "cache_write": 1.0, "output": 4.0},
+    "claude-3-5-sonnet": {"input": 3.0, "cached_input": 0.3, "cache_write": 3.75, "output": 15.0},
+    "claude-3-haiku": {"input": 0.25, "cached_input": 0.03, "cache_write": 0.3, "output": 1.25},
+}
+
+# 提供商 Batch API 按同步价格的一半计费
+BATCH_DISCOUNT = 0.5
+
+# 缓冲上限（写库持续失败时丢弃最早的记录，避免占用内存）
+MAX_BUFFERED_ROWS = 10000
+
+CONTEXT_FIELDS = ("user_id", "family_id", "media_id", "analyzer")
+
+_usage_context: ContextVar[dict] = ContextVar("llm_usage_context", default={})
+
+_prices_cache: tuple[str, dict] = ("", DEFAULT_PRICES)
+
+
+@contextmanager
+def llm_usage_context(**fields: Optional[str]) -> Iterator[None]:
+    """
+    在代码块内为大模型调用标注归属（user_id / family_id / media_id / analyzer），
+    与外层上下文合并，值为 None 的字段沿用外层。asyncio 任务创建时继承当前上下文。
+    """
+    token = _usage_context.set(_merge_context(fields))
+    try:
+        yield
+    finally:
+        _usage_context.reset(token)
+
+
+def set_llm_usage_context(**fields: Optional[str]) -> None:
+    """
+    不限范围地设置用量上下文，供异步生成器使用（生成器跨 yield 无法使用 with 块）。
+    值保留到当前任务结束，应只在请求或任务独占的上下文中调用。
+    """
+    _usage_context.set(_merge_context(fields))
+
+
+def _merge_context(fields: dict) -> dict:
+    merged = dict(_usage_context.get())
+    for name, value in fields.items():
+        if name not in CONTEXT_FIELDS:
+            raise ValueError(f"未知的用量上下文字段: {name}")
+        if value is not None:
+            merged[name] = value
+    return merged
+
+
+def _prices() -> dict[str, dict[str, float]]:
+    global _prices_cache
+    raw = settings.LLM_PRICES.strip()
+    if raw == _prices_cache[0]:
+        return _prices_cache[1]
+    prices = dict(DEFAULT_PRICES)
+    if raw:
+        try:
+            overrides = json.loads(raw)
+            if not isinstance(overrides, dict):
+                raise ValueError("应为 JSON 对象")
+            prices.update(overrides)
+        except ValueError as error:
+            logger.error("❌ [LLM 用量] LLM_PRICES 配置无效，使用内置价格: %s", error)
+    _prices_cache = (raw, prices)
+    return prices
+
+
+def estimate_cost(model: str, usage: dict, batch: bool = False) -> float:
+    """按模型单价估算一次调用的费用（美元），未知模型返回 0"""
+    prices = _prices()
+    prefix = next((name for name in sorted(prices, key=len, reverse=True) if model.startswith(name)), None)
+    if prefix is None:
+        return 0.0
+    price = prices[prefix]
+    input_price = price.get("input", 0.0)
+    cached = usage.get("cached_tokens", 0)
+    created = usage.get("cache_creation_tokens", 0)
+    uncached = max(usage.get("input_tokens", 0) - cached - created, 0)
+    cost = (
+        uncached * input_price
+        + cached * price.get("cached_input", input_price)
+        + created * price.get("cache_write", input_price)
+        + usage.get("output_tokens", 0) * price.get("output", 0.0)
+    ) / 1_000_000
+    return cost * BATCH_DISCOUNT if batch else cost
+
+
+class LLMUsageLedger:
+    """
+    大模型调用用量台账：每次调用追加一条记录到进程内缓冲，达到 LLM_USAGE_FLUSH_SIZE 条或
+    距上次写入超过 LLM_USAGE_FLUSH_SEC 时批量写入 llm_usage_records。
+    Celery 任务结束与 API 进程退出时调用 flush() 写入剩余记录；写库失败时保留在缓冲中下次重试。
+    """
+
+    def __init__(self):
+        self._buffer: list[dict] = []
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._flushing = False
+        self._written = 0
+        self._dropped = 0
+
+    def record(
+        self,
+        provider: str,
+        model: str,
+        kind: str,
+        outcome: str,
+        latency_seconds: float = 0.0,
+        usage: Optional[dict] = None,
+        image_count: int = 0,
+        status_code: Optional[int] = None,
+        batch: bool = False,
+    ) -> None:
+        if not settings.LLM_USAGE_LEDGER:
+            return
+        usage = usage or {}
+        context = _usage_context.get()
+        row = {
+            "created_at": datetime.utcnow(),
+            **{name: context.get(name) for name in CONTEXT_FIELDS},
+            "provider": provider,
+            "model": model,
+            "kind": kind,
+            "outcome": outcome,
+            "status_code": status_code,
+            "latency_ms": int(latency_seconds * 1000),
+            "input_tokens": usage.get("input_tokens", 0),
+            "output_tokens": usage.get("output_tokens", 0),
+            "cached_tokens": usage.get("cached_tokens", 0),
+            "cache_creation_tokens": usage.get("cache_creation_tokens", 0),
+            "image_count": image_count,
+            "cost_usd": estimate_cost(model, usage, batch=batch),
+        }
+        with self._lock:
+            self._buffer.append(row)
+            overflow = len(self._buffer) - MAX_BUFFERED_ROWS
+            if overflow > 0:
+                del self._buffer[:overflow]
+                self._dropped += overflow
+
+    async def maybe_flush(self) -> None:
+        """缓冲条数或时长达到阈值时写入数据库"""
+        with self._lock:
+            due = self._buffer and not self._flushing and (
+                len(self._buffer) >= settings.LLM_USAGE_FLUSH_SIZE
+                or time.monotonic() - self._last_flush >= settings.LLM_USAGE_FLUSH_SEC
+            )
+        if due:
+            await self.flush()
+
+    async def flush(self) -> None:
+        """把缓冲中的记录批量写入数据库（单条多行 INSERT）"""
+        from sqlalchemy import insert
+        from app.database import async_session_factory
+        from app.models.llm import LLMUsageRecord
+
+        with self._lock:
+            if not self._buffer or self._flushing:
+                return
+            rows, self._buffer = self._buffer, []
+            self._flushing = True
+            self._last_flush = time.monotonic()
+
+        try:
+            async with async_session_factory() as session:
+                async with session.begin():
+                    await session.execute(insert(LLMUsageRecord), rows)
+        except Exception as error:
+            logger.warning("⚠️ [LLM 用量] 写入用量台账失败，%d 条记录稍后重试: %s", len(rows), error)
+            with self._lock:
+                self._buffer = (rows + self._buffer)[-MAX_BUFFERED_ROWS:]
+        else:
+            with self._lock:
+                self._written += len(rows)
+        finally:
+            with self._lock:
+                self._flushing = False
+
+    def report(self) -> dict:
+        """进程内台账的已写入、待写入与丢弃条数"""
+        with self._lock:
+            return {"written": self._written, "buffered": len(self._buffer), "dropped": self._dropped}
+
+
+llm_usage_ledger = LLMUsageLedger()
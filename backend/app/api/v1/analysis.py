@@ -1,6 +1,7 @@
 import logging
+from datetime import datetime, timedelta
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
@@ -9,7 +10,7 @@ from app.models.user import User
 from app.models.media import MediaFile
 from app.models.analysis import AnalysisResult, AnalysisTask
 from app.models.family import FamilyMember
-from app.schemas.analysis import AnalysisResultResponse, AnalysisTaskResponse
+from app.schemas.analysis import AnalysisResultResponse, AnalysisTaskResponse, LLMUsageAggregateResponse
 from app.utils.deps import get_current_user
 
 logger = logging.getLogger(__name__)
@@ -17,6 +18,51 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+@router.get("/llm-metrics")
+async def get_llm_metrics(current_user: User = Depends(get_current_user)):
+    """大模型调用指标：限流与回复缓存在所有 worker 的汇总计数，以及当前 API 进程内的统计"""
+    from app.ai.remote.endpoint_router import endpoint_router
+    from app.ai.remote.llm_client import usage_report
+    from app.ai.remote.model_cascade import cascade_report
+    from app.ai.remote.rate_limiter import llm_rate_limiter, load_shared_metrics
+    from app.ai.remote.response_cache import llm_response_cache
+    from app.ai.remote.usage_ledger import llm_usage_ledger
+
+    try:
+        shared = await load_shared_metrics()
+        cache_stats = await llm_response_cache.load_shared_stats()
+    except Exception as error:
+        logger.warning("读取共享 LLM 指标失败: %s", error)
+        shared, cache_stats = {}, {}
+    return {
+        "shared": shared,
+        "process": llm_rate_limiter.report(),
+        "cache": {"shared": cache_stats, "process": llm_response_cache.report()},
+        "usage": usage_report(),
+        "cascade": cascade_report(),
+        "endpoints": endpoint_router.report(),
+        "ledger": llm_usage_ledger.report(),
+    }
+
+
+@router.get("/llm-usage", response_model=list[LLMUsageAggregateResponse])
+async def get_llm_usage(
+    group_by: str = Query("analyzer", pattern="^(user|family|model|analyzer|day)$"),
+    days: int = Query(30, ge=1, le=366),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """当前用户所在家庭最近 days 天的大模型用量，按 user / family / model / analyzer / day 汇总"""
+    from app.services.llm_usage_service import usage_aggregates
+
+    family_ids = list((await db.execute(
+        select(FamilyMember.family_id).where(FamilyMember.user_id == current_user.id)
+    )).scalars().all())
+    if not family_ids:
+        return []
+    return await usage_aggregates(db, family_ids, group_by, datetime.utcnow() - timedelta(days=days))
+
+
 @router.get("/{media_id}/results", response_model=list[AnalysisResultResponse])
 async def get_analysis_results(
     media_id: str,
@@ -109,7 +155,8 @@ async def reanalyze(
     celery_available = False
     try:
         from app.tasks.preprocess import preprocess_video
-        preprocess_video.delay(media_id)
+        # 用户手动触发的重新分析不受家庭 LLM 预算限制
+        preprocess_video.delay(media_id, urgent=True)
         celery_available = True
         logger.info("📤 [分析API] 已提交 Celery 预处理任务")
     except Exception as celery_error:
@@ -1,4 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import os
+import tempfile
+
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
@@ -6,7 +10,12 @@ from app.database import get_db
 from app.models.user import User
 from app.models.child import Child
 from app.models.family import FamilyMember
-from app.schemas.child import ChildCreateRequest, ChildUpdateRequest, ChildResponse
+from app.schemas.child import (
+    ChildCreateRequest,
+    ChildUpdateRequest,
+    ChildResponse,
+    ChildFaceResponse,
+)
 from app.utils.deps import get_current_user
 
 router = APIRouter()
@@ -124,3 +133,78 @@ async def update_child(
     await db.refresh(child)
 
     return ChildResponse.model_validate(child)
+
+
+async def _verify_child_access(child_id: str, user: User, db: AsyncSession) -> Child:
+    """验证用户对孩子的访问权限"""
+    result = await db.execute(select(Child).where(Child.id == child_id))
+    child = result.scalar_one_or_none()
+    if not child:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="孩子不存在")
+
+    member_check = await db.execute(
+        select(FamilyMember).where(
+            FamilyMember.family_id == child.family_id,
+            FamilyMember.user_id == user.id,
+        )
+    )
+    if not member_check.scalar_one_or_none():
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="无权访问")
+    return child
+
+
+@router.get("/{child_id}/faces", response_model=ChildFaceResponse)
+async def get_child_faces(
+    child_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """查询孩子已注册的人脸数量"""
+    from app.services.face_registry_service import count_child_faces
+
+    await _verify_child_access(child_id, current_user, db)
+    return ChildFaceResponse(child_id=child_id, face_count=await count_child_faces(db, child_id))
+
+
+@router.post("/{child_id}/faces", response_model=ChildFaceResponse, status_code=status.HTTP_201_CREATED)
+async def register_child_face(
+    child_id: str,
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """上传孩子照片注册人脸，用于在媒体中自动识别孩子"""
+    from app.ai.local.inference_client import get_face_engine
+    from app.services.face_registry_service import add_child_face, count_child_faces
+
+    child = await _verify_child_access(child_id, current_user, db)
+
+    suffix = os.path.splitext(file.filename or "")[1] or ".jpg"
+    with tempfile.NamedTemporaryFile(suffix=suffix, prefix="lifeprint_face_", delete=False) as tmp:
+        tmp.write(await file.read())
+        image_path = tmp.name
+
+    try:
+        face_engine = await run_in_threadpool(get_face_engine)
+        embedding = await run_in_threadpool(face_engine.extract_face_embedding, image_path)
+    finally:
+        os.unlink(image_path)
+
+    if embedding is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="照片中未检测到人脸")
+
+    await add_child_face(db, child, embedding)
+    return ChildFaceResponse(child_id=child_id, face_count=await count_child_faces(db, child_id))
+
+
+@router.delete("/{child_id}/faces", status_code=status.HTTP_204_NO_CONTENT)
+async def clear_child_faces(
+    child_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """清除孩子已注册的全部人脸"""
+    from app.services.face_registry_service import clear_child_faces as clear_faces
+
+    child = await _verify_child_access(child_id, current_user, db)
+    await clear_faces(db, child)
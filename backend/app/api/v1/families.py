@@ -10,7 +10,11 @@ from app.schemas.family import (
     FamilyResponse,
     FamilyDetailResponse,
     FamilyMemberResponse,
+    FaceSuggestionResponse,
+    FaceSuggestionAcceptRequest,
+    FamilyLLMBudgetResponse,
 )
+from app.schemas.child import ChildFaceResponse
 from app.utils.deps import get_current_user
 
 router = APIRouter()
@@ -143,3 +147,109 @@ async def invite_member(
     db.add(member)
 
     return {"message": f"已邀请 {username} 加入家庭"}
+
+
+@router.get("/{family_id}/llm-budget", response_model=FamilyLLMBudgetResponse)
+async def get_family_llm_budget(
+    family_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """家庭本月的大模型费用与预算状态"""
+    from app.services.llm_usage_service import family_budget_status
+
+    await _verify_family_member(family_id, current_user, db)
+    return await family_budget_status(db, family_id)
+
+
+async def _verify_family_member(family_id: str, user: User, db: AsyncSession) -> None:
+    """验证用户是家庭成员"""
+    member_check = await db.execute(
+        select(FamilyMember).where(
+            FamilyMember.family_id == family_id,
+            FamilyMember.user_id == user.id,
+        )
+    )
+    if not member_check.scalar_one_or_none():
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="无权访问该家庭")
+
+
+async def _get_open_cluster(family_id: str, cluster_id: str, db: AsyncSession):
+    from app.models.face import FaceCluster
+
+    result = await db.execute(
+        select(FaceCluster).where(
+            FaceCluster.id == cluster_id,
+            FaceCluster.family_id == family_id,
+        )
+    )
+    cluster = result.scalar_one_or_none()
+    if not cluster or cluster.status != "open":
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="人脸建议不存在或已处理")
+    return cluster
+
+
+@router.get("/{family_id}/face-suggestions", response_model=list[FaceSuggestionResponse])
+async def list_face_suggestions(
+    family_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """获取"这是你的孩子吗？"建议：媒体中反复出现但尚未识别的人脸聚类"""
+    from app.services.face_cluster_service import list_face_suggestions as list_suggestions, preview_url
+
+    await _verify_family_member(family_id, current_user, db)
+    clusters = await list_suggestions(db, family_id)
+    return [
+        FaceSuggestionResponse(
+            id=cluster.id,
+            family_id=cluster.family_id,
+            size=cluster.size,
+            preview_url=preview_url(cluster),
+            created_at=cluster.created_at,
+            updated_at=cluster.updated_at,
+        )
+        for cluster in clusters
+    ]
+
+
+@router.post("/{family_id}/face-suggestions/{cluster_id}/accept", response_model=ChildFaceResponse)
+async def accept_face_suggestion(
+    family_id: str,
+    cluster_id: str,
+    body: FaceSuggestionAcceptRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """确认人脸建议属于某个孩子，聚类中的人脸一次性注册到该孩子"""
+    from app.models.child import Child
+    from app.services.face_cluster_service import accept_face_suggestion as accept_suggestion
+    from app.services.face_registry_service import count_child_faces
+
+    await _verify_family_member(family_id, current_user, db)
+    cluster = await _get_open_cluster(family_id, cluster_id, db)
+
+    child_result = await db.execute(
+        select(Child).where(Child.id == body.child_id, Child.family_id == family_id)
+    )
+    child = child_result.scalar_one_or_none()
+    if not child:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="孩子不存在")
+
+    await accept_suggestion(db, cluster, child)
+    return ChildFaceResponse(child_id=child.id, face_count=await count_child_faces(db, child.id))
+
+
+@router.post("/{family_id}/face-suggestions/{cluster_id}/dismiss", status_code=status.HTTP_204_NO_CONTENT)
+async def dismiss_face_suggestion(
+    family_id: str,
+    cluster_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """忽略人脸建议，相似人脸之后不再提示"""
+    from app.services.face_cluster_service import dismiss_face_suggestion as dismiss_suggestion
+
+    await _verify_family_member(family_id, current_user, db)
+    cluster = await _get_open_cluster(family_id, cluster_id, db)
+    await dismiss_suggestion(db, cluster)
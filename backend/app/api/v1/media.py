@@ -8,6 +8,7 @@ from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File,
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
+from app.config import settings
 from app.database import get_db
 from app.models.user import User
 from app.models.media import MediaFile, MediaChild
@@ -99,8 +100,17 @@ async def complete_upload(
     await db.flush()
 
     try:
-        from app.tasks.preprocess import preprocess_video
-        preprocess_video.delay(media_file.id)
+        if file_type == "image" and settings.LLM_PHOTO_EVENTS_ENABLED:
+            # 照片先排队，等待同一批上传的其他照片后按事件合并分析
+            from app.services.photo_event_service import PHOTO_EVENT_DISPATCH_MARGIN_SEC
+            from app.tasks.preprocess import dispatch_photo_events
+            dispatch_photo_events.apply_async(
+                args=[current_user.id],
+                countdown=settings.LLM_PHOTO_EVENT_WAIT_SEC + PHOTO_EVENT_DISPATCH_MARGIN_SEC,
+            )
+        else:
+            from app.tasks.preprocess import preprocess_video
+            preprocess_video.delay(media_file.id)
     except Exception:
         pass
 
@@ -204,5 +214,8 @@ async def delete_media(
     if not member_check.scalar_one_or_none():
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="无权操作")
 
+    from app.services.face_cluster_service import remove_media_faces
+    await remove_media_faces(db, media_id)
+
     minio_service.delete_file(media_file.storage_path)
     await db.delete(media_file)
@@ -1,6 +1,8 @@
+import json
 import logging
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
@@ -34,6 +36,11 @@ async def _verify_child_access(child_id: str, user: User, db: AsyncSession) -> C
     return child
 
 
+def _sse(event: str, data) -> str:
+    """编码一条 Server-Sent Events 消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
 def _format_report(report: MonthlyReport) -> dict:
     """将报告格式化为前端期望的结构，radar_data 从嵌套 dict 转为 array"""
     from app.services.report_service import _flatten_radar_data
@@ -167,3 +174,43 @@ async def generate_report(
             )
 
     return {"message": "报告生成完成" if not celery_available else "已触发月度报告生成"}
+
+
+@router.post("/children/{child_id}/reports/generate/stream")
+async def generate_report_stream(
+    child_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    流式生成月度报告（Server-Sent Events）。
+
+    事件依次为 start（雷达图与火花卡片）、narrative（成长叙事增量文本，可多次）、
+    summary（月度总结）、report（已保存的完整报告）；出错时发送 error。
+    本月报告已存在时只发送 report。
+    """
+    await _verify_child_access(child_id, current_user, db)
+
+    logger.info("🎯 [API] 收到流式报告生成请求: child_id=%s, user=%s", child_id, current_user.id)
+
+    from app.services.report_service import stream_report
+
+    async def event_source():
+        try:
+            async for event, payload in stream_report(child_id):
+                if event == "report":
+                    payload = _format_report(payload)
+                elif event == "narrative":
+                    payload = {"delta": payload}
+                elif event == "summary":
+                    payload = {"text": payload}
+                yield _sse(event, payload)
+        except Exception as error:
+            logger.error("❌ [API] 流式报告生成失败: %s", error, exc_info=True)
+            yield _sse("error", {"message": f"报告生成失败: {str(error)}"})
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
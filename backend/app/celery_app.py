@@ -7,6 +7,13 @@ celery_app = Celery(
     "life_print",
     broker=settings.CELERY_BROKER_URL,
     backend=settings.CELERY_RESULT_BACKEND,
+    # autodiscover_tasks 只查找 app.tasks.tasks 模块，任务模块需显式列出
+    include=[
+        "app.tasks.preprocess",
+        "app.tasks.analyze",
+        "app.tasks.report",
+        "app.tasks.batch",
+    ],
 )
 
 celery_app.conf.update(
@@ -27,4 +34,8 @@ celery_app.conf.beat_schedule = {
         "task": "app.tasks.report.generate_all_monthly_reports",
         "schedule": crontab(day_of_month="1", hour="2", minute="0"),
     },
+    "resume-budget-deferred-analysis": {
+        "task": "app.tasks.preprocess.resume_budget_deferred_analysis",
+        "schedule": crontab(minute="15"),
+    },
 }
@@ -30,6 +30,99 @@ class Settings(BaseSettings):
     LLM_MODEL: str = "gpt-4o"  # 文本模型
     LLM_VISION_MODEL: str = "gpt-4o"  # 视觉模型
 
+    # LLM 客户端连接池（按 provider + api_key + base_url 复用 SDK 客户端与 HTTP 连接）
+    LLM_POOL_MAX_CLIENTS: int = 32
+    LLM_POOL_IDLE_TIMEOUT_SEC: int = 300  # 客户端空闲超过该时长后关闭
+    LLM_MAX_CONNECTIONS: int = 20  # 每个客户端的最大连接数
+    LLM_HTTP2: bool = True  # 安装 h2 时启用 HTTP/2
+
+    # LLM 限流（令牌桶存于 REDIS_URL，所有 worker 共享；RPM 为 0 表示不限速）
+    LLM_RATE_LIMIT_RPM: int = 0  # 每个 provider + API Key 每分钟请求数
+    LLM_RATE_LIMIT_BURST: int = 10
+    LLM_CONCURRENCY_INITIAL: int = 4  # 每个进程的初始并发上限（AIMD 自适应调整）
+    LLM_CONCURRENCY_MAX: int = 16
+    LLM_MAX_RETRIES: int = 4
+    LLM_RETRY_BASE_DELAY_SEC: float = 1.0
+    LLM_RETRY_MAX_DELAY_SEC: float = 60.0
+
+    # LLM 回复缓存（存于 REDIS_URL，按 provider/模型/提示词/图片内容哈希复用回复）
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_TTL_SEC: int = 604800  # 7 天
+    LLM_CACHE_MAX_MB: int = 256  # 超出后按最近访问时间淘汰
+
+    # 提供商侧提示词缓存（Anthropic 标记系统提示词前缀；OpenAI 自动缓存，仅记录命中 token）
+    LLM_PROMPT_CACHE: bool = True
+
+    # 视觉请求图片压缩（按提供商有效尺寸缩放后重新编码，并按内容哈希缓存）
+    LLM_IMAGE_FORMAT: str = "jpeg"  # jpeg 或 webp
+    LLM_IMAGE_QUALITY: int = 80
+    LLM_IMAGE_MAX_SIDE: int = 0  # 非 0 时覆盖提供商默认的最长边
+    LLM_IMAGE_CACHE_MB: int = 64
+
+    # 各分析器每次视觉请求覆盖的关键帧数（帧预算）
+    LLM_BEHAVIOR_FRAME_BUDGET: int = 8
+    LLM_EMOTION_FRAME_BUDGET: int = 4
+    LLM_COMBINED_FRAME_BUDGET: int = 8
+    # 关键帧拼图：在整段视频上均匀抽取帧预算内的关键帧，按时间顺序拼成带序号与时间标注的网格图再发送，
+    # 减少每张图片的固定 token 开销与单次请求的图片数（开启后可适当调高帧预算以覆盖更多画面）
+    LLM_FRAME_GRID_ENABLED: bool = False
+    LLM_FRAME_GRID_COLUMNS: int = 3
+    LLM_FRAME_GRID_ROWS: int = 2
+    LLM_FRAME_GRID_CELL_WIDTH: int = 512  # 单元格宽度像素，高度按关键帧宽高比
+
+    # 照片事件：同一上传者拍摄时间相近的照片归为一个事件，一次视觉请求分析整组照片，结果按照片拆分写入
+    LLM_PHOTO_EVENTS_ENABLED: bool = False
+    LLM_PHOTO_EVENT_GAP_SEC: int = 1800  # 相邻照片拍摄时间间隔不超过该值时归为同一事件
+    LLM_PHOTO_EVENT_MAX_IMAGES: int = 10  # 每个事件（每次请求）的最多照片数，达到后立即分派
+    LLM_PHOTO_EVENT_WAIT_SEC: int = 60  # 未满的事件在最近一次上传后等待该时长再分派
+
+    # 行为识别与情感分析合并为一次视觉请求（可选，解析失败时自动回退为两次请求）
+    LLM_COMBINED_ANALYSIS: bool = False
+
+    # 视觉分析模型级联：先用小模型，结构无效或置信度低于阈值时再用 LLM_VISION_MODEL
+    LLM_CASCADE_ENABLED: bool = False
+    LLM_FAST_VISION_MODEL: str = "gpt-4o-mini"
+    LLM_CASCADE_CONFIDENCE: float = 0.6
+
+    # 备用端点（JSON 数组，按顺序故障转移），例如
+    # [{"provider": "openai", "base_url": "https://...", "api_key": "...", "model": "...", "vision_model": "..."}]
+    # 未指定 model / vision_model 时沿用主配置；仅在未使用用户级提供商配置时生效
+    LLM_FALLBACK_ENDPOINTS: str = ""
+    LLM_FAILOVER_RETRIES: int = 1  # 有备用端点时每个端点的重试次数（之后切换到下一个端点）
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = 5  # 连续失败次数达到阈值后熔断该端点
+    LLM_CIRCUIT_RESET_SEC: int = 30  # 熔断后经过该时长放行一个探测请求
+    # 对冲请求：主端点超过其 p95 延迟仍未返回时向下一个端点再发一次，取先返回者
+    LLM_HEDGE_ENABLED: bool = False
+    LLM_HEDGE_PERCENTILE: float = 0.95
+    LLM_HEDGE_MIN_SAMPLES: int = 20  # 延迟样本不足时不对冲
+    LLM_HEDGE_MAX_RATIO: float = 0.1  # 对冲请求数占总请求数的上限
+
+    # LLM 用量台账：每次调用的 token、耗时、图片数与估算费用写入 llm_usage_records
+    LLM_USAGE_LEDGER: bool = True
+    LLM_USAGE_FLUSH_SIZE: int = 50  # 缓冲达到该条数或 LLM_USAGE_FLUSH_SEC 后批量写入
+    LLM_USAGE_FLUSH_SEC: int = 30
+    # 模型单价（JSON，美元 / 百万 token，按模型名前缀匹配），覆盖内置价格，例如
+    # {"gpt-4o": {"input": 2.5, "cached_input": 1.25, "output": 10}}
+    LLM_PRICES: str = ""
+
+    # 家庭月度 LLM 预算（美元，0 表示不限）；超过 LLM_BUDGET_THROTTLE_RATIO 后延后非紧急分析，
+    # 用尽后推迟到预算恢复（下月或调高预算）
+    LLM_FAMILY_MONTHLY_BUDGET_USD: float = 0.0
+    LLM_FAMILY_BUDGETS: str = ""  # JSON，按家庭 ID 覆盖月度预算，例如 {"<family_id>": 20}
+    LLM_BUDGET_THROTTLE_RATIO: float = 0.8
+    LLM_BUDGET_THROTTLE_DELAY_SEC: int = 600
+
+    # LLM 离线批处理（月度报告、重新分析回填；结果延迟数小时，费用约为同步调用的一半）
+    LLM_BATCH_REPORTS: bool = False  # 每月定时报告通过批处理生成
+    LLM_BATCH_BACKEND: str = "provider"  # provider（提供商 Batch API）或 local（本地逐条执行的替身）
+    LLM_BATCH_POLL_INTERVAL_SEC: int = 300
+    LLM_BATCH_MAX_WAIT_HOURS: int = 30  # 超时仍未完成的批次回退为逐条同步处理
+    LLM_BATCH_POLL_MAX_ERRORS: int = 10  # 轮询或结果回写连续出错达到该次数后将批次标记为失败
+    LLM_BATCH_MAX_REQUESTS: int = 10000  # 单个批次的最大请求数，超出时拆分为多个批次
+    LLM_BATCH_MAX_MB: int = 150  # 单个批次的最大请求体大小（含内联图片）
+    LLM_BATCH_LOCAL_CHUNK: int = 50  # 本地替身每次轮询执行的请求数
+    LLM_BATCH_BACKFILL_CHUNK: int = 50  # 重新分析回填时每个预处理任务负责的媒体数
+
     # 向后兼容旧配置
     DASHSCOPE_API_KEY: str = ""
     OPENAI_API_KEY: Optional[str] = None
@@ -37,12 +130,49 @@ class Settings(BaseSettings):
     # Whisper（本地模型，不需要 API Key）
     WHISPER_MODEL_SIZE: str = "small"
 
+    # 本地模型生命周期管理（0 表示不限制 / 不回收）
+    MODEL_MEMORY_BUDGET_MB: int = 0  # 本地模型总内存预算，超出时按 LRU 卸载空闲模型
+    MODEL_IDLE_TIMEOUT_SEC: int = 1800  # 模型空闲超过该时长自动卸载
+
+    # 人脸模型档位：full / accurate / balanced / fast（见 app/ai/local/face_engine.py）
+    FACE_PROFILE: str = "accurate"
+    FACE_DET_SIZE: int = 0  # 非 0 时覆盖档位的检测输入尺寸（正方形边长）
+
+    # 人脸原型在线更新（高置信度识别结果持续修正每个孩子的匹配特征）
+    FACE_REFINE_THRESHOLD: float = 0.6  # 参与更新的最低匹配分数，0 表示关闭
+    FACE_REFINE_MARGIN: float = 0.1  # 与第二候选孩子的最小分差
+    FACE_PROTOTYPES_PER_CHILD: int = 8
+    FACE_PROTOTYPE_MERGE_THRESHOLD: float = 0.7  # 与已有原型相似度达到该值时合并，否则新建
+    FACE_PROTOTYPE_HALF_LIFE_DAYS: float = 90.0  # 原型权重半衰期，让原型跟随孩子长相变化
+
+    # 未识别人脸聚类（"这是你的孩子吗？"建议）
+    FACE_CLUSTER_THRESHOLD: float = 0.5  # 并入已有聚类的最低相似度
+    FACE_CLUSTER_MAX_MEMBERS: int = 50  # 每个聚类最多保存的人脸特征数
+    FACE_SUGGESTION_MIN_SIZE: int = 5  # 聚类达到该人脸数后才作为建议展示
+
+    # 情感分析使用目标孩子的人脸裁剪图代替整帧（无人脸时回退整帧）
+    EMOTION_FACE_CROPS: bool = True
+    EMOTION_FACE_CROP_SIZE: int = 336  # 裁剪图最长边像素
+
+    # 本机推理服务（可选，所有 worker 共享一份模型并跨任务合并批次）
+    INFERENCE_SERVER_ENABLED: bool = False
+    INFERENCE_SOCKET_PATH: str = ""  # 为空时使用 DATA_DIR/temp/inference.sock
+    INFERENCE_BATCH_WINDOW_MS: float = 10.0  # 请求合并等待窗口
+    INFERENCE_MAX_BATCH_SIZE: int = 16
+
+    # 分析结果批量写入：每个媒体的结果行以一条多行 INSERT 写入，行数达到该值时改用 COPY（0 表示不使用 COPY）
+    ANALYSIS_RESULT_COPY_MIN_ROWS: int = 500
+
     # 数据目录（所有产生的数据文件存放位置）
     DATA_DIR: str = "./data"
 
     # Celery
     CELERY_BROKER_URL: str = "redis://localhost:6379/1"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/2"
+    # 每个 worker 进程的数据库连接池（进程内的持久事件循环上创建，跨任务复用连接）
+    CELERY_DB_POOL_SIZE: int = 2
+    CELERY_DB_MAX_OVERFLOW: int = 8
+    CELERY_DB_POOL_RECYCLE_SEC: int = 1800
 
     model_config = {
         "env_file": ".env",
@@ -1,15 +1,22 @@
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
 from sqlalchemy.orm import DeclarativeBase
 from typing import AsyncGenerator
 
 from app.config import settings
 
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=False,
-    future=True,
-    pool_pre_ping=True,
-)
+
+def create_engine(**pool_options) -> AsyncEngine:
+    return create_async_engine(
+        settings.DATABASE_URL,
+        echo=False,
+        future=True,
+        pool_pre_ping=True,
+        **pool_options,
+    )
+
+
+engine = create_engine()
 
 AsyncSessionLocal = async_sessionmaker(
     engine,
@@ -21,6 +28,33 @@ AsyncSessionLocal = async_sessionmaker(
 async_session_factory = AsyncSessionLocal
 
 
+def rebind_engine(new_engine: AsyncEngine) -> None:
+    """
+    让 AsyncSessionLocal / async_session_factory 改用 new_engine。
+    asyncpg 连接绑定建立时的事件循环，Celery worker 进程初始化时在其持久事件循环上
+    新建引擎并调用本函数（见 app/tasks/runtime.py）。
+    """
+    global engine
+    engine = new_engine
+    AsyncSessionLocal.configure(bind=new_engine)
+
+
+# create_all 不会修改已存在的枚举类型：模型中新增的枚举值需要对已有数据库补齐
+# （与 alembic 迁移 0001_face_embeddings 相同，启动时幂等执行）
+ENUM_VALUE_ADDITIONS = {
+    "analysis_type_enum": ("face",),
+}
+
+
+async def ensure_enum_values(target_engine: AsyncEngine) -> None:
+    """为已存在的 PostgreSQL 枚举类型补齐新增的值（ADD VALUE 需在事务外执行）"""
+    async with target_engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for type_name, values in ENUM_VALUE_ADDITIONS.items():
+            for value in values:
+                await conn.execute(text(f"ALTER TYPE {type_name} ADD VALUE IF NOT EXISTS '{value}'"))
+
+
 class Base(DeclarativeBase):
     """所有 ORM 模型的声明基类"""
     pass
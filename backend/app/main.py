@@ -5,7 +5,7 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.database import engine, Base
+from app.database import engine, Base, ensure_enum_values
 
 logging.basicConfig(
     level=logging.INFO,
@@ -18,10 +18,19 @@ logging.basicConfig(
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """应用生命周期：启动时自动创建数据库表"""
+    """
+    应用生命周期：启动时自动创建数据库表并补齐已有枚举类型的新值，
+    退出前写入剩余的 LLM 用量记录与限流指标
+    """
+    from app.ai.remote.rate_limiter import llm_rate_limiter
+    from app.ai.remote.usage_ledger import llm_usage_ledger
+
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    await ensure_enum_values(engine)
     yield
+    await llm_usage_ledger.flush()
+    await llm_rate_limiter.publish_metrics()
 
 
 app = FastAPI(
@@ -4,6 +4,8 @@ from app.models.child import Child
 from app.models.media import MediaFile, MediaChild
 from app.models.analysis import AnalysisResult, AnalysisTask, GrowthMetric
 from app.models.report import MonthlyReport, SkillTree
+from app.models.face import FaceEmbedding, FacePrototype, FaceCluster, UnknownFace
+from app.models.llm import LLMBatchJob, LLMUsageRecord
 
 __all__ = [
     "User",
@@ -17,4 +19,10 @@ __all__ = [
     "GrowthMetric",
     "MonthlyReport",
     "SkillTree",
+    "FaceEmbedding",
+    "FacePrototype",
+    "FaceCluster",
+    "UnknownFace",
+    "LLMBatchJob",
+    "LLMUsageRecord",
 ]
@@ -21,7 +21,7 @@ class AnalysisResult(Base):
         String(36), ForeignKey("children.id"), nullable=False
     )
     analysis_type: Mapped[str] = mapped_column(
-        SAEnum("behavior", "emotion", "cognition", "autonomy", name="analysis_type_enum"),
+        SAEnum("behavior", "emotion", "cognition", "autonomy", "face", name="analysis_type_enum"),
         nullable=False,
     )
     result_data: Mapped[dict] = mapped_column(JSONB, nullable=False)
@@ -0,0 +1,109 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import String, DateTime, Integer, Float, LargeBinary, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class FaceEmbedding(Base):
+    """孩子的人脸特征向量（float32 原始字节），按家庭加载为共享的匹配矩阵"""
+
+    __tablename__ = "face_embeddings"
+
+    id: Mapped[str] = mapped_column(
+        String(36), primary_key=True, default=lambda: str(uuid.uuid4())
+    )
+    child_id: Mapped[str] = mapped_column(
+        String(36), ForeignKey("children.id"), nullable=False, index=True
+    )
+    family_id: Mapped[str] = mapped_column(
+        String(36), ForeignKey("families.id"), nullable=False, index=True
+    )
+    embedding: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    dim: Mapped[int] = mapped_column(Integer, nullable=False)
+    source: Mapped[str] = mapped_column(String(50), nullable=False, default="enrolment")
+    # 来源媒体删除后保留已注册的特征，只清空来源
+    source_media_id: Mapped[str | None] = mapped_column(
+        String(36), ForeignKey("media_files.id", ondelete="SET NULL"), nullable=True
+    )
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class FacePrototype(Base):
+    """
+    孩子的在线人脸原型：由高置信度识别结果持续更新的少量代表性特征。
+
+    weight 为按时间衰减后的累计权重，用于合并与淘汰；每个孩子的原型数量有上限。
+    """
+
+    __tablename__ = "face_prototypes"
+
+    id: Mapped[str] = mapped_column(
+        String(36), primary_key=True, default=lambda: str(uuid.uuid4())
+    )
+    child_id: Mapped[str] = mapped_column(
+        String(36), ForeignKey("children.id"), nullable=False, index=True
+    )
+    family_id: Mapped[str] = mapped_column(
+        String(36), ForeignKey("families.id"), nullable=False, index=True
+    )
+    embedding: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    dim: Mapped[int] = mapped_column(Integer, nullable=False)
+    weight: Mapped[float] = mapped_column(Float, nullable=False, default=1.0)
+    match_count: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class FaceCluster(Base):
+    """
+    家庭媒体中未识别人脸的增量聚类。
+
+    status: open（待确认，达到一定规模后作为"这是你的孩子吗？"建议）、
+    accepted（已注册为 child_id 的人脸）、dismissed（用户确认不是孩子，后续相似人脸直接并入）。
+    """
+
+    __tablename__ = "face_clusters"
+
+    id: Mapped[str] = mapped_column(
+        String(36), primary_key=True, default=lambda: str(uuid.uuid4())
+    )
+    family_id: Mapped[str] = mapped_column(
+        String(36), ForeignKey("families.id"), nullable=False, index=True
+    )
+    centroid: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    dim: Mapped[int] = mapped_column(Integer, nullable=False)
+    size: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="open")
+    child_id: Mapped[str | None] = mapped_column(
+        String(36), ForeignKey("children.id"), nullable=True
+    )
+    preview_path: Mapped[str | None] = mapped_column(String(500), nullable=True)
+    preview_score: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class UnknownFace(Base):
+    """聚类中的一张未识别人脸（每条轨迹只保留检测分数最高的一张）"""
+
+    __tablename__ = "unknown_faces"
+
+    id: Mapped[str] = mapped_column(
+        String(36), primary_key=True, default=lambda: str(uuid.uuid4())
+    )
+    family_id: Mapped[str] = mapped_column(
+        String(36), ForeignKey("families.id"), nullable=False, index=True
+    )
+    cluster_id: Mapped[str] = mapped_column(
+        String(36), ForeignKey("face_clusters.id"), nullable=False, index=True
+    )
+    media_id: Mapped[str] = mapped_column(
+        String(36), ForeignKey("media_files.id", ondelete="CASCADE"), nullable=False
+    )
+    embedding: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    dim: Mapped[int] = mapped_column(Integer, nullable=False)
+    det_score: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
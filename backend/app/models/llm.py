@@ -0,0 +1,65 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, Float, Index, Integer, String, Text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class LLMBatchJob(Base):
+    """
+    已提交的大模型离线批处理任务。
+
+    context 保存结果回写所需的业务数据（按 item_key 索引，如孩子 ID 或媒体 ID），
+    批次完成后由对应 kind 的处理函数把结果写回 MonthlyReport / AnalysisResult。
+    """
+
+    __tablename__ = "llm_batch_jobs"
+
+    id: Mapped[str] = mapped_column(
+        String(36), primary_key=True, default=lambda: str(uuid.uuid4())
+    )
+    kind: Mapped[str] = mapped_column(String(50), nullable=False)  # monthly_report / reanalysis
+    provider: Mapped[str] = mapped_column(String(50), nullable=False)
+    batch_ref: Mapped[str] = mapped_column(String(255), nullable=False)  # "后端:批次ID"
+    status: Mapped[str] = mapped_column(
+        String(20), nullable=False, default="submitted", index=True
+    )  # submitted / applied / failed
+    request_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    context: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
+    error_message: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    completed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+
+class LLMUsageRecord(Base):
+    """
+    每次大模型调用的用量台账（一次调用一行，包括失败、被取消的对冲请求与回复缓存命中）。
+
+    user_id / family_id / media_id / analyzer 来自调用时的用量上下文（见 usage_ledger），
+    用于按用户、家庭、模型、分析器汇总 token、耗时与费用，以及家庭月度预算。
+    """
+
+    __tablename__ = "llm_usage_records"
+    __table_args__ = (Index("ix_llm_usage_family_created", "family_id", "created_at"),)
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    user_id: Mapped[str | None] = mapped_column(String(36), nullable=True)
+    family_id: Mapped[str | None] = mapped_column(String(36), nullable=True)
+    media_id: Mapped[str | None] = mapped_column(String(36), nullable=True)
+    analyzer: Mapped[str | None] = mapped_column(String(50), nullable=True)
+    provider: Mapped[str] = mapped_column(String(50), nullable=False)
+    model: Mapped[str] = mapped_column(String(100), nullable=False)
+    kind: Mapped[str] = mapped_column(String(20), nullable=False)  # chat / vision / stream / batch
+    outcome: Mapped[str] = mapped_column(String(20), nullable=False)  # ok / error / cancelled / cache_hit
+    status_code: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    latency_ms: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    input_tokens: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    output_tokens: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    cached_tokens: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    cache_creation_tokens: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    image_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    cost_usd: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
@@ -44,3 +44,16 @@ class GrowthTimelineRequest(BaseModel):
     metric_type: Optional[str] = None
     start_date: Optional[str] = None
     end_date: Optional[str] = None
+
+
+class LLMUsageAggregateResponse(BaseModel):
+    key: Optional[str]
+    calls: int
+    errors: int
+    cache_hits: int
+    input_tokens: int
+    output_tokens: int
+    cached_tokens: int
+    images: int
+    avg_latency_ms: float
+    cost_usd: float
@@ -27,3 +27,8 @@ class ChildResponse(BaseModel):
     created_at: datetime
 
     model_config = {"from_attributes": True}
+
+
+class ChildFaceResponse(BaseModel):
+    child_id: str
+    face_count: int
@@ -33,3 +33,25 @@ class FamilyDetailResponse(BaseModel):
     members: list[FamilyMemberResponse] = []
 
     model_config = {"from_attributes": True}
+
+
+class FaceSuggestionResponse(BaseModel):
+    id: str
+    family_id: str
+    size: int
+    preview_url: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+
+class FaceSuggestionAcceptRequest(BaseModel):
+    child_id: str
+
+
+class FamilyLLMBudgetResponse(BaseModel):
+    family_id: str
+    month: str
+    budget_usd: float
+    spent_usd: float
+    ratio: float
+    state: str
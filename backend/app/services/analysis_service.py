@@ -1,12 +1,110 @@
-from datetime import date
+import json
+import logging
+import threading
+import time
+import uuid
+from datetime import date, datetime
 from typing import Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
+from sqlalchemy import insert, select, and_
 
+from app.config import settings
 from app.models.analysis import AnalysisResult, GrowthMetric
 from app.models.media import MediaFile, MediaChild
 
+logger = logging.getLogger(__name__)
+
+RESULT_COLUMNS = (
+    "id", "media_id", "child_id", "analysis_type", "result_data",
+    "confidence_score", "analyzed_at", "model_version",
+)
+
+
+class AnalysisResultWriter:
+    """
+    批量写入一个媒体的分析结果：add() 只在内存中累积，flush() 时以一条多行 INSERT 写入，
+    行数达到 ANALYSIS_RESULT_COPY_MIN_ROWS 时（PostgreSQL）改用 COPY。
+    不经过 ORM 工作单元，也不会触发 AnalysisResult 上 selectin 关系的后续查询；
+    写入在会话的当前事务内进行，随事务一起提交或回滚。
+    """
+
+    _stats_lock = threading.Lock()
+    stats = {"rows": 0, "inserts": 0, "copies": 0, "seconds": 0.0}
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.rows: list[dict] = []
+
+    def add(
+        self,
+        media_id: str,
+        child_id: str,
+        analysis_type: str,
+        result_data: dict,
+        confidence_score: Optional[float] = None,
+        model_version: str = "v1.0",
+    ) -> None:
+        self.rows.append({
+            "id": str(uuid.uuid4()),
+            "media_id": media_id,
+            "child_id": child_id,
+            "analysis_type": analysis_type,
+            "result_data": result_data,
+            "confidence_score": confidence_score,
+            "analyzed_at": datetime.utcnow(),
+            "model_version": model_version,
+        })
+
+    async def flush(self) -> int:
+        """写入累积的结果行，返回写入行数"""
+        if not self.rows:
+            return 0
+        rows, self.rows = self.rows, []
+        start = time.perf_counter()
+        use_copy = (
+            settings.ANALYSIS_RESULT_COPY_MIN_ROWS > 0
+            and len(rows) >= settings.ANALYSIS_RESULT_COPY_MIN_ROWS
+            and self.db.sync_session.get_bind().dialect.name == "postgresql"
+        )
+        if use_copy:
+            await self._copy(rows)
+        else:
+            await self.db.execute(insert(AnalysisResult), rows)
+        elapsed = time.perf_counter() - start
+
+        with self._stats_lock:
+            self.stats["rows"] += len(rows)
+            self.stats["copies" if use_copy else "inserts"] += 1
+            self.stats["seconds"] += elapsed
+        logger.debug("🗄️ [分析结果] %s 写入 %d 行，耗时 %.1fms", "COPY" if use_copy else "INSERT", len(rows), elapsed * 1000)
+        return len(rows)
+
+    async def _copy(self, rows: list[dict]) -> None:
+        # 先写出会话中待写入的改动，COPY 与之处于同一连接和事务
+        await self.db.flush()
+        connection = await self.db.connection()
+        raw_connection = await connection.get_raw_connection()
+        records = [
+            tuple(
+                json.dumps(row[column], ensure_ascii=False) if column == "result_data" else row[column]
+                for column in RESULT_COLUMNS
+            )
+            for row in rows
+        ]
+        await raw_connection.driver_connection.copy_records_to_table(
+            AnalysisResult.__tablename__, records=records, columns=list(RESULT_COLUMNS)
+        )
+
+    @classmethod
+    def report(cls) -> dict:
+        """进程内批量写入的行数、语句数与写入速率"""
+        with cls._stats_lock:
+            stats = dict(cls.stats)
+        stats["rows_per_sec"] = round(stats["rows"] / stats["seconds"], 1) if stats["seconds"] else 0.0
+        stats["seconds"] = round(stats["seconds"], 3)
+        return stats
+
 
 async def get_analysis_results(db: AsyncSession, media_id: str) -> list[AnalysisResult]:
     """获取某个媒体的所有分析结果"""
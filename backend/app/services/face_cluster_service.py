@@ -0,0 +1,195 @@
+import logging
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.child import Child
+from app.models.face import FaceCluster, UnknownFace
+from app.services.face_registry_service import add_child_faces
+from app.services.media_service import minio_service
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+async def add_unknown_faces(
+    db: AsyncSession,
+    family_id: str,
+    media_id: str,
+    samples: list[dict],
+    preview_paths: list[Optional[str]],
+) -> int:
+    """
+    将一个媒体中的未识别人脸增量并入家庭的人脸聚类，返回新建的聚类数。
+
+    采用单遍 leader 聚类：与最相似的聚类中心比对，达到 FACE_CLUSTER_THRESHOLD 时并入并
+    更新中心（按人脸数加权平均），否则新建聚类。已忽略的聚类同样参与比对，
+    使相同的人不会被反复建议；每个聚类最多保存 FACE_CLUSTER_MAX_MEMBERS 条特征。
+
+    Args:
+        samples: track_keyframes 返回的 unmatched_samples
+        preview_paths: 与 samples 一一对应的人脸裁剪图路径，用于建议预览
+    """
+    if not samples:
+        return 0
+
+    rows = await db.execute(
+        select(FaceCluster).where(
+            FaceCluster.family_id == family_id,
+            FaceCluster.status.in_(("open", "dismissed")),
+        )
+    )
+    clusters = list(rows.scalars().all())
+    centroids = [np.frombuffer(c.centroid, dtype=np.float32) for c in clusters]
+    now = datetime.utcnow()
+    created = 0
+
+    for sample, preview_path in zip(samples, preview_paths):
+        vector = _normalize(sample["embedding"])
+
+        cluster = None
+        candidates = [i for i, c in enumerate(centroids) if c.shape[0] == vector.shape[0]]
+        if candidates:
+            similarities = np.stack([centroids[i] for i in candidates]) @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] >= settings.FACE_CLUSTER_THRESHOLD:
+                cluster_idx = candidates[best]
+                cluster = clusters[cluster_idx]
+                centroids[cluster_idx] = _normalize(centroids[cluster_idx] * cluster.size + vector)
+                cluster.centroid = centroids[cluster_idx].tobytes()
+                cluster.size += 1
+                cluster.updated_at = now
+
+        if cluster is None:
+            cluster = FaceCluster(
+                family_id=family_id,
+                centroid=vector.tobytes(),
+                dim=int(vector.shape[0]),
+                size=1,
+                status="open",
+                preview_score=0.0,
+                created_at=now,
+                updated_at=now,
+            )
+            db.add(cluster)
+            await db.flush()
+            clusters.append(cluster)
+            centroids.append(vector)
+            created += 1
+
+        if cluster.status != "open":
+            continue
+
+        if cluster.size <= settings.FACE_CLUSTER_MAX_MEMBERS:
+            db.add(UnknownFace(
+                family_id=family_id,
+                cluster_id=cluster.id,
+                media_id=media_id,
+                embedding=vector.tobytes(),
+                dim=int(vector.shape[0]),
+                det_score=sample["det_score"],
+                created_at=now,
+            ))
+
+        if preview_path and sample["det_score"] > cluster.preview_score:
+            object_name = f"faces/{family_id}/{cluster.id}.jpg"
+            minio_service.upload_file_from_path(object_name, preview_path, "image/jpeg")
+            cluster.preview_path = object_name
+            cluster.preview_score = sample["det_score"]
+
+    await db.flush()
+    logger.info(
+        "🧩 [人脸聚类] 家庭 %s 新增未识别人脸 %d 张，新建聚类 %d 个",
+        family_id, len(samples), created,
+    )
+    return created
+
+
+async def remove_media_faces(db: AsyncSession, media_id: str) -> None:
+    """
+    删除媒体前调用：从所属聚类的人脸数中减去该媒体保存的未识别人脸，并删除这些人脸
+    （数据库外键同样会级联删除，但不会更新聚类的 size）
+    """
+    rows = await db.execute(
+        select(UnknownFace.cluster_id, func.count())
+        .where(UnknownFace.media_id == media_id)
+        .group_by(UnknownFace.cluster_id)
+    )
+    removed = dict(rows.all())
+    if not removed:
+        return
+
+    clusters = await db.execute(select(FaceCluster).where(FaceCluster.id.in_(list(removed))))
+    now = datetime.utcnow()
+    for cluster in clusters.scalars().all():
+        cluster.size = max(cluster.size - removed[cluster.id], 0)
+        cluster.updated_at = now
+    await db.execute(delete(UnknownFace).where(UnknownFace.media_id == media_id))
+    await db.flush()
+
+
+async def list_face_suggestions(
+    db: AsyncSession, family_id: str, min_size: Optional[int] = None
+) -> list[FaceCluster]:
+    """列出达到规模阈值、待用户确认的聚类，按人脸数降序"""
+    min_size = min_size if min_size is not None else settings.FACE_SUGGESTION_MIN_SIZE
+    rows = await db.execute(
+        select(FaceCluster)
+        .where(
+            FaceCluster.family_id == family_id,
+            FaceCluster.status == "open",
+            FaceCluster.size >= min_size,
+        )
+        .order_by(FaceCluster.size.desc())
+    )
+    return list(rows.scalars().all())
+
+
+async def accept_face_suggestion(db: AsyncSession, cluster: FaceCluster, child: Child) -> int:
+    """
+    确认聚类是某个孩子：聚类中保存的人脸特征一次性注册为该孩子的人脸，返回注册条数。
+    """
+    rows = await db.execute(
+        select(UnknownFace.embedding, UnknownFace.media_id)
+        .where(UnknownFace.cluster_id == cluster.id)
+        .order_by(UnknownFace.det_score.desc())
+    )
+    faces = [
+        (np.frombuffer(embedding, dtype=np.float32), media_id)
+        for embedding, media_id in rows.all()
+    ]
+
+    cluster.status = "accepted"
+    cluster.child_id = child.id
+    cluster.updated_at = datetime.utcnow()
+    await db.execute(delete(UnknownFace).where(UnknownFace.cluster_id == cluster.id))
+
+    enrolled = await add_child_faces(db, child, faces, source="suggestion")
+    logger.info("🧩 [人脸聚类] 聚类 %s 已注册为孩子 %s: %d 条特征", cluster.id, child.id, enrolled)
+    return enrolled
+
+
+async def dismiss_face_suggestion(db: AsyncSession, cluster: FaceCluster) -> None:
+    """忽略聚类：保留聚类中心用于吸收后续相似人脸，删除已保存的人脸特征与预览"""
+    cluster.status = "dismissed"
+    cluster.updated_at = datetime.utcnow()
+    await db.execute(delete(UnknownFace).where(UnknownFace.cluster_id == cluster.id))
+    if cluster.preview_path:
+        minio_service.delete_file(cluster.preview_path)
+        cluster.preview_path = None
+    await db.flush()
+
+
+def preview_url(cluster: FaceCluster) -> Optional[str]:
+    """聚类预览图的预签名 URL"""
+    if not cluster.preview_path:
+        return None
+    return minio_service.get_presigned_url(cluster.preview_path)
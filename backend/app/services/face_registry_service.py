@@ -0,0 +1,211 @@
+import hashlib
+import logging
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.ai.local.face_index import face_index_store
+from app.config import settings
+from app.models.child import Child
+from app.models.face import FaceEmbedding, FacePrototype
+
+logger = logging.getLogger(__name__)
+
+# 索引文件格式版本，变更归一化/排序方式时递增以触发重建
+INDEX_FORMAT_VERSION = 3
+
+
+def _face_row(
+    child: Child,
+    embedding: np.ndarray,
+    source: str,
+    source_media_id: Optional[str],
+) -> FaceEmbedding:
+    vector = np.asarray(embedding, dtype=np.float32).ravel()
+    return FaceEmbedding(
+        child_id=child.id,
+        family_id=child.family_id,
+        embedding=vector.tobytes(),
+        dim=int(vector.shape[0]),
+        source=source,
+        source_media_id=source_media_id,
+    )
+
+
+async def add_child_face(
+    db: AsyncSession,
+    child: Child,
+    embedding: np.ndarray,
+    source: str = "enrolment",
+    source_media_id: Optional[str] = None,
+) -> FaceEmbedding:
+    """保存孩子的一条人脸特征向量，并刷新所属家庭的人脸索引"""
+    face = _face_row(child, embedding, source, source_media_id)
+    db.add(face)
+    await db.flush()
+    await sync_family_index(db, child.family_id)
+    return face
+
+
+async def add_child_faces(
+    db: AsyncSession,
+    child: Child,
+    faces: list[tuple[np.ndarray, Optional[str]]],
+    source: str = "enrolment",
+) -> int:
+    """批量保存孩子的人脸特征（特征向量, 来源媒体 ID），只刷新一次家庭索引"""
+    for embedding, source_media_id in faces:
+        db.add(_face_row(child, embedding, source, source_media_id))
+    await db.flush()
+    await sync_family_index(db, child.family_id)
+    return len(faces)
+
+
+async def clear_child_faces(db: AsyncSession, child: Child) -> int:
+    """删除孩子的全部人脸特征（连同在线原型），返回删除的注册特征条数"""
+    result = await db.execute(
+        delete(FaceEmbedding).where(FaceEmbedding.child_id == child.id)
+    )
+    await db.execute(delete(FacePrototype).where(FacePrototype.child_id == child.id))
+    await db.flush()
+    await sync_family_index(db, child.family_id)
+    return result.rowcount or 0
+
+
+async def count_child_faces(db: AsyncSession, child_id: str) -> int:
+    """统计孩子已注册的人脸特征条数"""
+    result = await db.execute(
+        select(func.count(FaceEmbedding.id)).where(FaceEmbedding.child_id == child_id)
+    )
+    return int(result.scalar() or 0)
+
+
+def _decayed_weight(prototype: FacePrototype, now: datetime) -> float:
+    age_days = max((now - prototype.updated_at).total_seconds(), 0.0) / 86400
+    return prototype.weight * 0.5 ** (age_days / settings.FACE_PROTOTYPE_HALF_LIFE_DAYS)
+
+
+async def refine_child_prototypes(
+    db: AsyncSession,
+    family_id: str,
+    samples: list[dict],
+    now: Optional[datetime] = None,
+) -> int:
+    """
+    用高置信度识别结果在线更新孩子的人脸原型，返回更新的孩子数。
+
+    每个孩子最多保留 FACE_PROTOTYPES_PER_CHILD 个原型，权重按半衰期随时间衰减：
+    与最近原型足够相似时做加权平均合并；否则在未满时新建，已满时替换衰减后权重最小的原型。
+    这样原型会逐渐跟随孩子的成长变化，而不会无限增长。
+    """
+    if not samples:
+        return 0
+    now = now or datetime.utcnow()
+
+    for sample in samples:
+        vector = np.asarray(sample["embedding"], dtype=np.float32).ravel()
+        vector = vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+        rows = await db.execute(
+            select(FacePrototype).where(FacePrototype.child_id == sample["child_id"])
+        )
+        prototypes = [p for p in rows.scalars().all() if p.dim == vector.shape[0]]
+        weights = [_decayed_weight(p, now) for p in prototypes]
+
+        if prototypes:
+            matrix = np.stack([np.frombuffer(p.embedding, dtype=np.float32) for p in prototypes])
+            similarities = matrix @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] >= settings.FACE_PROTOTYPE_MERGE_THRESHOLD:
+                merged = matrix[best] * weights[best] + vector
+                merged /= max(float(np.linalg.norm(merged)), 1e-12)
+                target = prototypes[best]
+                target.embedding = merged.astype(np.float32).tobytes()
+                target.weight = weights[best] + 1.0
+                target.match_count += 1
+                target.updated_at = now
+                continue
+
+        if len(prototypes) < settings.FACE_PROTOTYPES_PER_CHILD:
+            db.add(FacePrototype(
+                child_id=sample["child_id"],
+                family_id=family_id,
+                embedding=vector.tobytes(),
+                dim=int(vector.shape[0]),
+                weight=1.0,
+                match_count=1,
+                created_at=now,
+                updated_at=now,
+            ))
+        else:
+            target = prototypes[int(np.argmin(weights))]
+            target.embedding = vector.tobytes()
+            target.weight = 1.0
+            target.match_count = 1
+            target.created_at = now
+            target.updated_at = now
+
+    await db.flush()
+    await sync_family_index(db, family_id)
+    logger.info("🧬 [人脸注册] 家庭 %s 在线更新人脸原型: %d 个孩子", family_id, len(samples))
+    return len(samples)
+
+
+async def sync_family_index(db: AsyncSession, family_id: str) -> None:
+    """
+    确保磁盘上的家庭人脸索引与数据库一致。
+
+    索引同时包含注册特征与在线原型。先只查询 ID（原型附带更新时间）计算指纹，
+    与磁盘索引一致时直接返回；只有该家庭的人脸发生变化时才重新加载特征并重建矩阵。
+    """
+    id_rows = await db.execute(
+        select(FaceEmbedding.id).where(FaceEmbedding.family_id == family_id)
+    )
+    prototype_rows = await db.execute(
+        select(FacePrototype.id, FacePrototype.updated_at).where(FacePrototype.family_id == family_id)
+    )
+    embedding_ids = sorted(row[0] for row in id_rows.all())
+    prototype_keys = sorted(f"{row[0]}@{row[1].isoformat()}" for row in prototype_rows.all())
+    fingerprint = hashlib.sha1(
+        f"{INDEX_FORMAT_VERSION}:{','.join(embedding_ids)}:{','.join(prototype_keys)}".encode("utf-8")
+    ).hexdigest()
+
+    if face_index_store.read_fingerprint(family_id) == fingerprint:
+        return
+
+    if not embedding_ids and not prototype_keys:
+        face_index_store.remove(family_id)
+        return
+
+    rows = (await db.execute(
+        select(FaceEmbedding.child_id, FaceEmbedding.id, FaceEmbedding.embedding, FaceEmbedding.dim)
+        .where(FaceEmbedding.family_id == family_id)
+    )).all()
+    rows += (await db.execute(
+        select(FacePrototype.child_id, FacePrototype.id, FacePrototype.embedding, FacePrototype.dim)
+        .where(FacePrototype.family_id == family_id)
+    )).all()
+    # 同一孩子的特征必须连续存放（见 FaceIndex）
+    rows.sort(key=lambda row: (row[0], row[1]))
+
+    child_ids = []
+    vectors = []
+    for child_id, _, embedding_bytes, dim in rows:
+        vector = np.frombuffer(embedding_bytes, dtype=np.float32)
+        if vector.shape[0] != dim:
+            logger.warning("⚠️ [人脸注册] 特征维度不一致，已跳过: child_id=%s", child_id)
+            continue
+        child_ids.append(child_id)
+        vectors.append(vector)
+
+    if not vectors:
+        face_index_store.remove(family_id)
+        return
+
+    # 写入前按行归一化，匹配时只需一次矩阵乘法即可得到余弦相似度
+    matrix = np.vstack(vectors)
+    matrix /= np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+    face_index_store.write(family_id, fingerprint, child_ids, matrix)
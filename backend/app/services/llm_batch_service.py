@@ -0,0 +1,155 @@
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.ai.remote.llm_batch import LLMBatchFailedError, batch_poll_interval, make_custom_id, split_custom_id
+from app.ai.remote.llm_client import LLMClient, get_llm_client
+from app.ai.remote.usage_ledger import llm_usage_context
+from app.config import settings
+from app.models.llm import LLMBatchJob
+
+logger = logging.getLogger(__name__)
+
+# 结果回写函数：(db, context, results)；results 为 item_key -> {用途: 回复文本或 None}，
+# 批次整体失败时为 None，处理函数需回退为逐条同步处理
+BatchResultHandler = Callable[[AsyncSession, dict, Optional[dict]], Awaitable[None]]
+
+
+def _result_handler(kind: str) -> BatchResultHandler:
+    if kind == "monthly_report":
+        from app.services.report_service import apply_report_batch_results
+        return apply_report_batch_results
+    if kind == "reanalysis":
+        from app.ai.pipeline import apply_reanalysis_batch_results
+        return apply_reanalysis_batch_results
+    raise ValueError(f"未知的批处理类型: {kind}")
+
+
+async def submit_batch_jobs(
+    db: AsyncSession,
+    kind: str,
+    items: dict[str, dict[str, dict]],
+    context: dict[str, dict],
+) -> list[LLMBatchJob]:
+    """
+    提交一组请求为离线批处理任务。
+
+    Args:
+        db: 数据库会话
+        kind: 批处理类型，决定结果回写方式（monthly_report / reanalysis）
+        items: item_key -> {用途: 请求体}，同一 item 的请求总在同一个批次中
+        context: item_key -> 结果回写所需的业务数据
+
+    Returns:
+        创建的批处理任务；超过 LLM_BATCH_MAX_REQUESTS / LLM_BATCH_MAX_MB 时拆分为多个。
+        每个批次提交后立即在独立事务中落库并安排 poll_llm_batch 轮询，调用方无需再安排；
+        某个批次提交失败时，其中的请求按整批失败交给结果回写函数回退为逐条处理。
+    """
+    client = get_llm_client()
+    max_bytes = settings.LLM_BATCH_MAX_MB * 1024 * 1024
+    jobs: list[LLMBatchJob] = []
+    bodies: dict[str, dict] = {}
+    chunk_context: dict[str, dict] = {}
+    chunk_bytes = 0
+
+    for item_key, requests in items.items():
+        item_bodies = {make_custom_id(item_key, purpose): body for purpose, body in requests.items()}
+        item_bytes = sum(len(json.dumps(body, ensure_ascii=False)) for body in item_bodies.values())
+        if bodies and (
+            len(bodies) + len(item_bodies) > settings.LLM_BATCH_MAX_REQUESTS
+            or chunk_bytes + item_bytes > max_bytes
+        ):
+            await _submit_chunk(db, client, kind, bodies, chunk_context, jobs)
+            bodies, chunk_context, chunk_bytes = {}, {}, 0
+        bodies.update(item_bodies)
+        chunk_context[item_key] = context.get(item_key, {})
+        chunk_bytes += item_bytes
+
+    if bodies:
+        await _submit_chunk(db, client, kind, bodies, chunk_context, jobs)
+    await db.flush()
+    return jobs
+
+
+async def _submit_chunk(
+    db: AsyncSession,
+    client: LLMClient,
+    kind: str,
+    bodies: dict[str, dict],
+    context: dict[str, dict],
+    jobs: list[LLMBatchJob],
+) -> None:
+    from app.database import async_session_factory
+    from app.tasks.batch import poll_llm_batch
+
+    try:
+        batch_ref = await client.submit_batch(bodies)
+    except Exception as error:
+        logger.error("❌ [LLM 批量] 批次提交失败，%d 个请求回退为逐条处理: %s", len(bodies), error)
+        await _result_handler(kind)(db, context, None)
+        return
+
+    # 提供商已接收（并将计费）的批次立即落库，不随调用方事务回滚，保证总能被轮询和回写
+    job = LLMBatchJob(
+        kind=kind,
+        provider=client.provider,
+        batch_ref=batch_ref,
+        request_count=len(bodies),
+        context=context,
+    )
+    async with async_session_factory() as job_session:
+        async with job_session.begin():
+            job_session.add(job)
+    jobs.append(job)
+    poll_llm_batch.delay(job.id)
+
+
+async def poll_batch_job(db: AsyncSession, job_id: str) -> Optional[int]:
+    """
+    轮询一个批处理任务，完成后回写结果。
+
+    Returns:
+        尚未完成时返回建议的下次轮询间隔（秒）；已完成、已失败或任务不存在时返回 None
+    """
+    job = await db.get(LLMBatchJob, job_id)
+    if not job or job.status != "submitted":
+        return None
+
+    if datetime.utcnow() - job.created_at > timedelta(hours=settings.LLM_BATCH_MAX_WAIT_HOURS):
+        logger.warning("⏰ [LLM 批量] 批次等待超时，回退为逐条处理: job=%s", job.id)
+        await _finish(db, job, None, "批次等待超时")
+        return None
+
+    client = get_llm_client()
+    try:
+        with llm_usage_context(analyzer=job.kind):
+            raw_results = await client.poll_batch(job.batch_ref)
+    except LLMBatchFailedError as error:
+        logger.error("❌ [LLM 批量] 批次失败，回退为逐条处理: job=%s, %s", job.id, error)
+        await _finish(db, job, None, str(error))
+        return None
+    if raw_results is None:
+        return batch_poll_interval(client, job.batch_ref)
+
+    results: dict[str, dict[str, Optional[str]]] = {}
+    for custom_id, text in raw_results.items():
+        item_key, purpose = split_custom_id(custom_id)
+        results.setdefault(item_key, {})[purpose] = text
+    succeeded = sum(1 for text in raw_results.values() if text is not None)
+    logger.info(
+        "📦 [LLM 批量] 批次完成: job=%s, kind=%s, 成功 %d/%d",
+        job.id, job.kind, succeeded, job.request_count,
+    )
+    await _finish(db, job, results)
+    return None
+
+
+async def _finish(db: AsyncSession, job: LLMBatchJob, results: Optional[dict], error: Optional[str] = None) -> None:
+    await _result_handler(job.kind)(db, job.context, results)
+    job.status = "failed" if results is None else "applied"
+    job.error_message = error
+    job.completed_at = datetime.utcnow()
+    await db.flush()
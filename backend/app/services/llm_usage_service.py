@@ -0,0 +1,179 @@
+import json
+import logging
+from datetime import datetime
+
+from sqlalchemy import case, desc, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.analysis import AnalysisTask
+from app.models.llm import LLMUsageRecord
+from app.models.media import MediaFile
+
+logger = logging.getLogger(__name__)
+
+USAGE_GROUPS = {
+    "user": LLMUsageRecord.user_id,
+    "family": LLMUsageRecord.family_id,
+    "model": LLMUsageRecord.model,
+    "analyzer": LLMUsageRecord.analyzer,
+    "day": func.date(LLMUsageRecord.created_at),
+}
+
+# 因预算用尽而推迟的预处理任务保持 queued 状态，以该说明标记，预算恢复后重新排队
+BUDGET_DEFERRED_MESSAGE = "本月 LLM 预算已用尽，分析已推迟"
+
+
+async def usage_aggregates(
+    db: AsyncSession, family_ids: list[str], group_by: str, since: datetime
+) -> list[dict]:
+    """
+    按 user / family / model / analyzer / day 汇总指定家庭的大模型用量，按费用降序。
+
+    Raises:
+        ValueError: group_by 不受支持
+    """
+    if group_by not in USAGE_GROUPS:
+        raise ValueError(f"不支持的汇总维度: {group_by}")
+    key = USAGE_GROUPS[group_by]
+    result = await db.execute(
+        select(
+            key.label("key"),
+            func.count().label("calls"),
+            func.sum(case((LLMUsageRecord.outcome == "error", 1), else_=0)).label("errors"),
+            func.sum(case((LLMUsageRecord.outcome == "cache_hit", 1), else_=0)).label("cache_hits"),
+            func.sum(LLMUsageRecord.input_tokens).label("input_tokens"),
+            func.sum(LLMUsageRecord.output_tokens).label("output_tokens"),
+            func.sum(LLMUsageRecord.cached_tokens).label("cached_tokens"),
+            func.sum(LLMUsageRecord.image_count).label("images"),
+            func.avg(LLMUsageRecord.latency_ms).label("avg_latency_ms"),
+            func.sum(LLMUsageRecord.cost_usd).label("cost_usd"),
+        )
+        .where(LLMUsageRecord.family_id.in_(family_ids), LLMUsageRecord.created_at >= since)
+        .group_by(key)
+        .order_by(desc("cost_usd"))
+    )
+    return [
+        {
+            "key": str(row.key) if row.key is not None else None,
+            "calls": row.calls,
+            "errors": row.errors or 0,
+            "cache_hits": row.cache_hits or 0,
+            "input_tokens": row.input_tokens or 0,
+            "output_tokens": row.output_tokens or 0,
+            "cached_tokens": row.cached_tokens or 0,
+            "images": row.images or 0,
+            "avg_latency_ms": round(float(row.avg_latency_ms or 0), 1),
+            "cost_usd": round(float(row.cost_usd or 0), 4),
+        }
+        for row in result.all()
+    ]
+
+
+def family_monthly_budget(family_id: str) -> float:
+    """家庭的月度预算（美元），LLM_FAMILY_BUDGETS 中的覆盖值优先，0 表示不限"""
+    if settings.LLM_FAMILY_BUDGETS.strip():
+        try:
+            overrides = json.loads(settings.LLM_FAMILY_BUDGETS)
+            if family_id in overrides:
+                return float(overrides[family_id])
+        except (ValueError, TypeError, AttributeError) as error:
+            logger.error("❌ [LLM 预算] LLM_FAMILY_BUDGETS 配置无效，使用默认预算: %s", error)
+    return settings.LLM_FAMILY_MONTHLY_BUDGET_USD
+
+
+async def family_budget_status(db: AsyncSession, family_id: str) -> dict:
+    """
+    家庭本月（UTC 自然月）的 LLM 费用与预算状态。
+
+    Returns:
+        {"family_id", "month", "budget_usd", "spent_usd", "ratio", "state"}；state 为
+        unlimited（未设预算）、ok、throttled（超过 LLM_BUDGET_THROTTLE_RATIO）或 exceeded
+    """
+    month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    spent = await db.scalar(
+        select(func.coalesce(func.sum(LLMUsageRecord.cost_usd), 0.0)).where(
+            LLMUsageRecord.family_id == family_id,
+            LLMUsageRecord.created_at >= month_start,
+        )
+    )
+    spent = float(spent or 0.0)
+    budget = family_monthly_budget(family_id)
+
+    if budget <= 0:
+        state, ratio = "unlimited", 0.0
+    else:
+        ratio = spent / budget
+        if ratio >= 1:
+            state = "exceeded"
+        elif ratio >= settings.LLM_BUDGET_THROTTLE_RATIO:
+            state = "throttled"
+        else:
+            state = "ok"
+    return {
+        "family_id": family_id,
+        "month": month_start.date().isoformat(),
+        "budget_usd": budget,
+        "spent_usd": round(spent, 4),
+        "ratio": round(ratio, 4),
+        "state": state,
+    }
+
+
+async def check_media_budget(db: AsyncSession, media_id: str) -> str:
+    """
+    非紧急分析开始前检查媒体所属家庭的预算。预算用尽时把排队中的预处理任务标记为推迟。
+
+    Returns:
+        预算状态（unlimited / ok / throttled / exceeded）；媒体不存在时返回 ok
+    """
+    family_id = await db.scalar(select(MediaFile.family_id).where(MediaFile.id == media_id))
+    if family_id is None or family_monthly_budget(family_id) <= 0:
+        return "ok"
+
+    status = await family_budget_status(db, family_id)
+    if status["state"] == "exceeded":
+        result = await db.execute(
+            select(AnalysisTask).where(
+                AnalysisTask.media_id == media_id,
+                AnalysisTask.task_type == "preprocess",
+                AnalysisTask.status == "queued",
+            )
+        )
+        for task in result.scalars().all():
+            task.error_message = BUDGET_DEFERRED_MESSAGE
+        await db.flush()
+        logger.warning(
+            "💸 [LLM 预算] 家庭 %s 本月预算已用尽（%.2f/%.2f 美元），推迟分析: media_id=%s",
+            family_id, status["spent_usd"], status["budget_usd"], media_id,
+        )
+    return status["state"]
+
+
+async def release_deferred_analysis(db: AsyncSession) -> list[str]:
+    """
+    找出因预算推迟、且所属家庭预算已恢复（新的月份或调高了预算）的媒体，清除推迟标记。
+
+    Returns:
+        需要重新排队预处理的媒体 ID
+    """
+    result = await db.execute(
+        select(AnalysisTask, MediaFile.family_id)
+        .join(MediaFile, MediaFile.id == AnalysisTask.media_id)
+        .where(
+            AnalysisTask.task_type == "preprocess",
+            AnalysisTask.status == "queued",
+            AnalysisTask.error_message == BUDGET_DEFERRED_MESSAGE,
+        )
+    )
+    family_states: dict[str, str] = {}
+    released: list[str] = []
+    for task, family_id in result.all():
+        if family_id not in family_states:
+            family_states[family_id] = (await family_budget_status(db, family_id))["state"]
+        if family_states[family_id] == "exceeded":
+            continue
+        task.error_message = None
+        released.append(task.media_id)
+    await db.flush()
+    return released
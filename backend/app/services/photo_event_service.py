@@ -0,0 +1,129 @@
+import logging
+import math
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.analysis import AnalysisTask
+from app.models.media import MediaFile
+from app.services.llm_usage_service import BUDGET_DEFERRED_MESSAGE, family_budget_status, family_monthly_budget
+
+logger = logging.getLogger(__name__)
+
+# 分派任务相对等待时长的余量：上传时安排的分派与等待中事件的重新分派都晚于等待期结束这么多秒，
+# 避免 API 与 worker 之间的时钟偏差、ETA 计算早于 uploaded_at 写入等导致提前执行
+PHOTO_EVENT_DISPATCH_MARGIN_SEC = 5
+
+
+def group_photo_events(photos: list[dict], gap_sec: int, max_images: int) -> list[list[dict]]:
+    """
+    把同一上传者的照片按拍摄时间归为事件：同一家庭、相邻照片拍摄时间间隔不超过 gap_sec，
+    且每个事件最多 max_images 张（超出时另起一个事件）。
+
+    Args:
+        photos: 每项包含 media_id, family_id, taken_at（拍摄时间，缺失时为上传时间）
+
+    Returns:
+        事件列表，每个事件内的照片按拍摄时间排序
+    """
+    events: list[list[dict]] = []
+    ordered = sorted(photos, key=lambda photo: (photo["family_id"], photo["taken_at"]))
+    for photo in ordered:
+        current = events[-1] if events else None
+        if (
+            current
+            and current[-1]["family_id"] == photo["family_id"]
+            and (photo["taken_at"] - current[-1]["taken_at"]).total_seconds() <= gap_sec
+            and len(current) < max_images
+        ):
+            current.append(photo)
+        else:
+            events.append([photo])
+    return events
+
+
+async def claim_photo_events(db: AsyncSession, uploader_id: str) -> tuple[list[dict], Optional[int]]:
+    """
+    找出上传者排队中的照片预处理任务并归组为事件，认领（标记为 running）可以分派的事件。
+
+    事件已满 LLM_PHOTO_EVENT_MAX_IMAGES 张，或其中最近一张上传已超过 LLM_PHOTO_EVENT_WAIT_SEC 时分派；
+    否则留在队列中，等待同一批上传的后续照片；调用方按返回的等待秒数重新安排分派，
+    等待中的照片不会因为分派任务提前执行而被遗漏。
+    预算用尽的家庭按预算推迟（与单个媒体的分析相同），接近预算时延后分派。
+    认领时对任务行加锁并跳过已被其他分派任务锁定的行，同一张照片不会被分派两次。
+
+    Returns:
+        ([{"media_ids": 按拍摄时间排序的媒体 ID, "family_id", "countdown": 延后秒数}],
+         仍有事件等待时距最早一个等待期结束的秒数（含余量），否则为 None)
+    """
+    result = await db.execute(
+        select(AnalysisTask, MediaFile.family_id, MediaFile.captured_at, MediaFile.uploaded_at)
+        .join(MediaFile, MediaFile.id == AnalysisTask.media_id)
+        .where(
+            MediaFile.uploader_id == uploader_id,
+            MediaFile.file_type == "image",
+            AnalysisTask.task_type == "preprocess",
+            AnalysisTask.status == "queued",
+            or_(AnalysisTask.error_message.is_(None), AnalysisTask.error_message != BUDGET_DEFERRED_MESSAGE),
+        )
+        .with_for_update(of=AnalysisTask, skip_locked=True)
+    )
+    photos = [
+        {
+            "task": task,
+            "media_id": task.media_id,
+            "family_id": family_id,
+            "taken_at": captured_at or uploaded_at,
+            "uploaded_at": uploaded_at,
+        }
+        for task, family_id, captured_at, uploaded_at in result.all()
+    ]
+    if not photos:
+        return [], None
+
+    now = datetime.utcnow()
+    max_images = max(settings.LLM_PHOTO_EVENT_MAX_IMAGES, 1)
+    family_states: dict[str, str] = {}
+    claimed: list[dict] = []
+    waiting = 0
+    retry_in: Optional[int] = None
+    for event in group_photo_events(photos, settings.LLM_PHOTO_EVENT_GAP_SEC, max_images):
+        last_upload = max(photo["uploaded_at"] for photo in event)
+        remaining = settings.LLM_PHOTO_EVENT_WAIT_SEC - (now - last_upload).total_seconds()
+        if len(event) < max_images and remaining > 0:
+            waiting += len(event)
+            wait_sec = math.ceil(remaining) + PHOTO_EVENT_DISPATCH_MARGIN_SEC
+            retry_in = wait_sec if retry_in is None else min(retry_in, wait_sec)
+            continue
+
+        family_id = event[0]["family_id"]
+        if family_id not in family_states:
+            family_states[family_id] = (
+                (await family_budget_status(db, family_id))["state"]
+                if family_monthly_budget(family_id) > 0 else "unlimited"
+            )
+        if family_states[family_id] == "exceeded":
+            for photo in event:
+                photo["task"].error_message = BUDGET_DEFERRED_MESSAGE
+            logger.warning("💸 [照片事件] 家庭 %s 本月预算已用尽，推迟 %d 张照片的分析", family_id, len(event))
+            continue
+
+        for photo in event:
+            photo["task"].status = "running"
+            photo["task"].started_at = now
+        claimed.append({
+            "media_ids": [photo["media_id"] for photo in event],
+            "family_id": family_id,
+            "countdown": settings.LLM_BUDGET_THROTTLE_DELAY_SEC if family_states[family_id] == "throttled" else 0,
+        })
+    await db.flush()
+
+    if claimed or waiting:
+        logger.info(
+            "📸 [照片事件] 上传者 %s: 分派 %d 个事件（%d 张照片），%d 张照片等待后续上传",
+            uploader_id, len(claimed), sum(len(event["media_ids"]) for event in claimed), waiting,
+        )
+    return claimed, retry_in
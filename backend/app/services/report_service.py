@@ -1,11 +1,12 @@
 import json
 import logging
 from datetime import date, timedelta
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_
 
+from app.ai.remote.usage_ledger import llm_usage_context, set_llm_usage_context
 from app.models.analysis import AnalysisResult, GrowthMetric
 from app.models.media import MediaFile, MediaChild
 from app.models.report import MonthlyReport
@@ -13,6 +14,14 @@ from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+# 月度总结的静态指令，作为系统提示词放在请求前缀（便于提供商侧的提示词缓存）
+MONTHLY_SUMMARY_SYSTEM_PROMPT = (
+    "你是一位专业的儿童发展顾问。请根据家长提供的数据，撰写一份温暖、鼓励性的月度成长总结（200-300字）。"
+    '请用第二人称（"您的孩子"）撰写，语气温暖积极，突出进步和亮点。'
+)
+
+DEFAULT_MONTHLY_SUMMARY = "本月孩子表现良好，各方面都在稳步成长。继续保持对孩子的关注和陪伴，让成长的每一步都被温柔记录。"
+
 
 async def calculate_radar_data(
     db: AsyncSession, child_id: str, report_month: date
@@ -145,16 +154,8 @@ async def detect_spark_cards(db: AsyncSession, child_id: str) -> list[dict]:
     return spark_cards
 
 
-async def generate_monthly_summary(
-    radar_data: dict, spark_cards: list[dict]
-) -> str:
-    """使用统一 LLM client 生成月度成长总结"""
-    import time as _time
-    from app.ai.remote.llm_client import get_llm_client
-
-    logger.info("📝 [月度总结] 开始生成月度成长总结，火花卡片数=%d", len(spark_cards))
-
-    prompt = f"""你是一位专业的儿童发展顾问。请根据以下数据，为家长撰写一份温暖、鼓励性的月度成长总结（200-300字）。
+def _build_summary_prompt(radar_data: dict, spark_cards: list[dict]) -> str:
+    return f"""请根据以下数据撰写本月的成长总结。
 
 兴趣偏好分布：
 - 运动: {radar_data['interest']['sport']:.0%}
@@ -175,21 +176,32 @@ async def generate_monthly_summary(
 - 自信心: {radar_data['psychology']['confidence']:.0%}
 
 发现的天赋火花：{len(spark_cards)} 个
-{chr(10).join(f"- {card['talent_name']}（置信度 {card['confidence']:.0%}）" for card in spark_cards) if spark_cards else "暂无"}
+{chr(10).join(f"- {card['talent_name']}（置信度 {card['confidence']:.0%}）" for card in spark_cards) if spark_cards else "暂无"}"""
+
+
+async def generate_monthly_summary(
+    radar_data: dict, spark_cards: list[dict]
+) -> str:
+    """使用统一 LLM client 生成月度成长总结"""
+    import time as _time
+    from app.ai.remote.llm_client import get_llm_client
+
+    logger.info("📝 [月度总结] 开始生成月度成长总结，火花卡片数=%d", len(spark_cards))
 
-请用第二人称（"您的孩子"）撰写，语气温暖积极，突出进步和亮点。"""
+    prompt = _build_summary_prompt(radar_data, spark_cards)
 
     try:
         client = get_llm_client()
         start_time = _time.time()
-        result = await client.chat(prompt=prompt)
+        with llm_usage_context(analyzer="report_summary"):
+            result = await client.chat(prompt=prompt, system_prompt=MONTHLY_SUMMARY_SYSTEM_PROMPT)
         elapsed = _time.time() - start_time
         logger.info("📝 [月度总结] 生成完成，耗时=%.1fs，内容长度=%d字符", elapsed, len(result))
         return result
     except Exception as error:
         logger.warning("❌ [月度总结] LLM 生成失败: %s，使用默认文案", error, exc_info=True)
 
-    return "本月孩子表现良好，各方面都在稳步成长。继续保持对孩子的关注和陪伴，让成长的每一步都被温柔记录。"
+    return DEFAULT_MONTHLY_SUMMARY
 
 
 def _flatten_radar_data(radar_data: dict) -> list[dict]:
@@ -262,18 +274,19 @@ async def generate_report_sync(child_id: str, db: AsyncSession) -> None:
         + report_month.month - child.birth_date.month
     )
 
-    logger.info("📊 [报告生成] 步骤3: 调用 LLM 生成成长叙事...")
-    narrative = await generate_growth_narrative(
-        child_name=child.name,
-        age_months=age_months,
-        radar_data=radar_data,
-        spark_cards=spark_cards,
-        behavior_summary=[],
-        emotion_summary={},
-    )
+    with llm_usage_context(family_id=child.family_id):
+        logger.info("📊 [报告生成] 步骤3: 调用 LLM 生成成长叙事...")
+        narrative = await generate_growth_narrative(
+            child_name=child.name,
+            age_months=age_months,
+            radar_data=radar_data,
+            spark_cards=spark_cards,
+            behavior_summary=[],
+            emotion_summary={},
+        )
 
-    logger.info("📝 [报告生成] 步骤4: 调用 LLM 生成月度总结...")
-    summary = await generate_monthly_summary(radar_data, spark_cards)
+        logger.info("📝 [报告生成] 步骤4: 调用 LLM 生成月度总结...")
+        summary = await generate_monthly_summary(radar_data, spark_cards)
 
     report = MonthlyReport(
         child_id=child_id,
@@ -288,3 +301,183 @@ async def generate_report_sync(child_id: str, db: AsyncSession) -> None:
 
     overall_elapsed = _time.time() - overall_start
     logger.info("✅ [报告生成] 月度报告生成完成！child_id=%s, 总耗时=%.1fs", child_id, overall_elapsed)
+
+
+async def stream_report(child_id: str) -> AsyncIterator[tuple[str, object]]:
+    """
+    流式生成本月报告，依次产出 (事件名, 数据)：
+    - ("start", {"report_month", "radar_data", "spark_cards"})：统计数据就绪，前端可先渲染雷达图
+    - ("narrative", 文本片段)：成长叙事的增量文本
+    - ("summary", 文本)：月度总结（与叙事并行生成）
+    - ("report", MonthlyReport)：报告已写入数据库
+
+    本月报告已存在时直接产出 ("report", 已有报告)。统计阶段和保存阶段各自使用独立的数据库会话，
+    流式生成期间不占用连接。
+    """
+    import asyncio
+    import time as _time
+    from app.database import async_session_factory
+    from app.models.child import Child
+    from app.ai.remote.report_generator import stream_growth_narrative
+
+    report_month = date.today().replace(day=1)
+    overall_start = _time.time()
+
+    async with async_session_factory() as db:
+        child = (await db.execute(select(Child).where(Child.id == child_id))).scalar_one_or_none()
+        if not child:
+            raise ValueError(f"孩子不存在: {child_id}")
+
+        existing = await _get_monthly_report(db, child_id, report_month)
+        if existing:
+            logger.info("⏭️ [报告生成] 本月报告已存在，直接返回: child_id=%s, month=%s", child_id, report_month)
+            yield "report", existing
+            return
+
+        radar_data = await calculate_radar_data(db, child_id, report_month)
+        spark_cards = await detect_spark_cards(db, child_id)
+        child_name = child.name
+        age_months = _age_in_months(child.birth_date, report_month)
+        # 异步生成器跨 yield 无法使用 with 块；月度总结任务创建时继承该上下文
+        set_llm_usage_context(family_id=child.family_id)
+
+    yield "start", {
+        "report_month": report_month.isoformat(),
+        "radar_data": _flatten_radar_data(radar_data),
+        "spark_cards": spark_cards,
+    }
+
+    logger.info("🌊 [报告生成] 开始流式生成成长叙事: child_id=%s", child_id)
+    summary_task = asyncio.create_task(generate_monthly_summary(radar_data, spark_cards))
+    try:
+        narrative_parts: list[str] = []
+        async for text in stream_growth_narrative(
+            child_name=child_name,
+            age_months=age_months,
+            radar_data=radar_data,
+            spark_cards=spark_cards,
+            behavior_summary=[],
+            emotion_summary={},
+        ):
+            narrative_parts.append(text)
+            yield "narrative", text
+        summary = await summary_task
+    finally:
+        # 客户端断开或叙事生成中途失败时，不再等待月度总结
+        if not summary_task.done():
+            summary_task.cancel()
+    yield "summary", summary
+
+    async with async_session_factory() as db:
+        # 流式生成期间可能已由其他请求或 Celery 任务生成
+        report = await _get_monthly_report(db, child_id, report_month)
+        if report is None:
+            report = MonthlyReport(
+                child_id=child_id,
+                report_month=report_month,
+                summary_text=summary,
+                radar_data=radar_data,
+                spark_cards=spark_cards,
+                narrative="".join(narrative_parts),
+            )
+            db.add(report)
+            await db.commit()
+
+    logger.info(
+        "✅ [报告生成] 流式月度报告生成完成！child_id=%s, 总耗时=%.1fs",
+        child_id, _time.time() - overall_start,
+    )
+    yield "report", report
+
+
+async def _get_monthly_report(db: AsyncSession, child_id: str, report_month: date) -> Optional[MonthlyReport]:
+    result = await db.execute(
+        select(MonthlyReport).where(
+            MonthlyReport.child_id == child_id,
+            MonthlyReport.report_month == report_month,
+        )
+    )
+    return result.scalar_one_or_none()
+
+
+def _age_in_months(birth_date: date, report_month: date) -> int:
+    return (report_month.year - birth_date.year) * 12 + report_month.month - birth_date.month
+
+
+async def submit_monthly_report_batch(db: AsyncSession) -> list:
+    """
+    为本月尚无报告的孩子构造成长叙事与月度总结请求，作为离线批处理提交。
+    雷达图与火花卡片在提交时计算并随任务保存，批次完成后由 apply_report_batch_results 写回。
+
+    Returns:
+        创建的 LLMBatchJob 列表
+    """
+    from app.models.child import Child
+    from app.ai.remote.llm_client import get_llm_client
+    from app.ai.remote.report_generator import NARRATIVE_SYSTEM_PROMPT, _build_narrative_prompt
+    from app.services.llm_batch_service import submit_batch_jobs
+
+    report_month = date.today().replace(day=1)
+    reported = select(MonthlyReport.child_id).where(MonthlyReport.report_month == report_month)
+    children = list((await db.execute(select(Child).where(Child.id.not_in(reported)))).scalars().all())
+    if not children:
+        logger.info("⏭️ [报告批量] 本月所有孩子均已有报告")
+        return []
+
+    client = get_llm_client()
+    items: dict[str, dict] = {}
+    context: dict[str, dict] = {}
+    for child in children:
+        radar_data = await calculate_radar_data(db, child.id, report_month)
+        spark_cards = await detect_spark_cards(db, child.id)
+        narrative_prompt = _build_narrative_prompt(
+            child.name, _age_in_months(child.birth_date, report_month), radar_data, spark_cards, [], {}
+        )
+        items[child.id] = {
+            "narrative": client.build_request_body(narrative_prompt, NARRATIVE_SYSTEM_PROMPT),
+            "summary": client.build_request_body(
+                _build_summary_prompt(radar_data, spark_cards), MONTHLY_SUMMARY_SYSTEM_PROMPT
+            ),
+        }
+        context[child.id] = {
+            "report_month": report_month.isoformat(),
+            "radar_data": radar_data,
+            "spark_cards": spark_cards,
+        }
+
+    jobs = await submit_batch_jobs(db, "monthly_report", items, context)
+    logger.info("📦 [报告批量] 已提交 %d 个孩子的月度报告，批次数=%d", len(items), len(jobs))
+    return jobs
+
+
+async def apply_report_batch_results(db: AsyncSession, context: dict, results: Optional[dict]) -> None:
+    """
+    把月度报告批次的结果写回 MonthlyReport。
+    整批失败或某个孩子的成长叙事缺失时，改为逐个触发同步生成任务；只缺月度总结时使用默认文案。
+    """
+    retry_child_ids = []
+    for child_id, item in context.items():
+        texts = (results or {}).get(child_id, {})
+        narrative = texts.get("narrative")
+        if not narrative:
+            retry_child_ids.append(child_id)
+            continue
+
+        report_month = date.fromisoformat(item["report_month"])
+        if await _get_monthly_report(db, child_id, report_month):
+            continue
+        db.add(MonthlyReport(
+            child_id=child_id,
+            report_month=report_month,
+            summary_text=texts.get("summary") or DEFAULT_MONTHLY_SUMMARY,
+            radar_data=item["radar_data"],
+            spark_cards=item["spark_cards"],
+            narrative=narrative,
+        ))
+    await db.flush()
+
+    if retry_child_ids:
+        logger.warning("⚠️ [报告批量] %d 个孩子的报告未能批量生成，改为逐个生成", len(retry_child_ids))
+        from app.tasks.report import generate_child_monthly_report
+        for child_id in retry_child_ids:
+            generate_child_monthly_report.delay(child_id)
@@ -1,10 +1,14 @@
-import asyncio
 import logging
+import os
+import shutil
 from datetime import datetime
 
+from app.ai.remote.usage_ledger import llm_usage_ledger
 from app.celery_app import celery_app
+from app.config import settings
 from app.database import async_session_factory
 from app.models.analysis import AnalysisTask
+from app.tasks.runtime import run_async
 
 logger = logging.getLogger(__name__)
 
@@ -17,20 +21,17 @@ def analyze_media(self, media_id: str, preprocess_result: dict):
     """
     logger.info("开始 AI 深度分析: %s", media_id)
 
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-
     try:
-        loop.run_until_complete(_run_analysis(media_id, preprocess_result))
+        run_async(_run_analysis(media_id, preprocess_result))
         logger.info("AI 深度分析完成: %s", media_id)
     except Exception as error:
         logger.error("AI 深度分析失败: %s, 错误: %s", media_id, error)
         try:
             self.retry(exc=error)
         except self.MaxRetriesExceededError:
-            loop.run_until_complete(_mark_task_failed(media_id, str(error)))
+            run_async(_mark_task_failed(media_id, str(error)))
     finally:
-        loop.close()
+        run_async(llm_usage_ledger.flush())
 
 
 async def _run_analysis(media_id: str, preprocess_result: dict):
@@ -82,3 +83,161 @@ async def _mark_task_failed(media_id: str, error_message: str):
                 task.status = "failed"
                 task.error_message = error_message
                 task.completed_at = datetime.utcnow()
+
+
+@celery_app.task(bind=True)
+def analyze_photo_event(self, media_ids: list[str]):
+    """
+    Celery 任务：照片事件分析（由 dispatch_photo_events 分派）。
+    逐张完成本地预处理后，用一次视觉请求分析整组照片；请求失败或缺少结果的照片
+    交给 analyze_media 逐张分析（沿用其重试逻辑）。事件分析本身出错（写入失败等）时
+    整组照片都改为逐张分析。
+    """
+    logger.info("开始照片事件分析: 照片数=%d", len(media_ids))
+
+    try:
+        fallback = run_async(_run_photo_event(media_ids))
+        for media_id, preprocess_result in fallback:
+            analyze_media.delay(media_id, preprocess_result)
+        logger.info("照片事件分析完成: 照片数=%d, 逐张回退=%d", len(media_ids), len(fallback))
+    except Exception as error:
+        logger.error("照片事件分析失败: %s, 错误: %s", media_ids, error)
+        run_async(_mark_photos_failed(media_ids, str(error)))
+    finally:
+        run_async(llm_usage_ledger.flush())
+
+
+async def _run_photo_event(media_ids: list[str]) -> list[tuple[str, dict]]:
+    from sqlalchemy import select, update
+    from app.ai.pipeline import run_photo_event_pipeline, run_preprocess_pipeline
+    from app.models.media import MediaFile
+
+    preprocess_results: dict[str, dict] = {}
+    for media_id in media_ids:
+        try:
+            async with async_session_factory() as session:
+                async with session.begin():
+                    preprocess_results[media_id] = await run_preprocess_pipeline(session, media_id)
+                    task_result = await session.execute(
+                        select(AnalysisTask).where(
+                            AnalysisTask.media_id == media_id,
+                            AnalysisTask.task_type == "preprocess",
+                            AnalysisTask.status == "running",
+                        )
+                    )
+                    for task in task_result.scalars().all():
+                        task.status = "completed"
+                        task.completed_at = datetime.utcnow()
+        except Exception as error:
+            logger.error("照片预处理失败: %s, 错误: %s", media_id, error)
+            async with async_session_factory() as session:
+                async with session.begin():
+                    await session.execute(
+                        update(MediaFile).where(MediaFile.id == media_id).values(analysis_status="failed")
+                    )
+                    await session.execute(
+                        update(AnalysisTask)
+                        .where(AnalysisTask.media_id == media_id, AnalysisTask.task_type == "preprocess")
+                        .values(status="failed", error_message=str(error), completed_at=datetime.utcnow())
+                    )
+
+    if not preprocess_results:
+        return []
+    try:
+        async with async_session_factory() as session:
+            async with session.begin():
+                fallback = await run_photo_event_pipeline(session, preprocess_results)
+    except Exception as error:
+        # 事务已回滚，没有照片写入结果：全部交给 analyze_media 逐张分析，保留工作目录
+        logger.error("照片事件分析失败，%d 张照片改为逐张分析: %s", len(preprocess_results), error)
+        return list(preprocess_results.items())
+
+    # 结果提交后再清理工作目录，逐张回退的照片保留给 analyze_media
+    fallback_ids = {media_id for media_id, _ in fallback}
+    for media_id, result in preprocess_results.items():
+        work_dir = result.get("work_dir", "")
+        if media_id not in fallback_ids and work_dir and os.path.exists(work_dir):
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return fallback
+
+
+async def _mark_photos_failed(media_ids: list[str], error_message: str):
+    """照片事件任务异常中止时，把仍未完成分析的照片标记为失败（可通过重新分析接口重试）"""
+    from sqlalchemy import update
+    from app.models.media import MediaFile
+
+    async with async_session_factory() as session:
+        async with session.begin():
+            await session.execute(
+                update(MediaFile)
+                .where(MediaFile.id.in_(media_ids), MediaFile.analysis_status.in_(["pending", "processing"]))
+                .values(analysis_status="failed")
+            )
+            await session.execute(
+                update(AnalysisTask)
+                .where(
+                    AnalysisTask.media_id.in_(media_ids),
+                    AnalysisTask.task_type == "preprocess",
+                    AnalysisTask.status == "running",
+                )
+                .values(status="failed", error_message=error_message, completed_at=datetime.utcnow())
+            )
+
+
+@celery_app.task(bind=True)
+def submit_reanalysis_backfill(self, media_ids: list[str]):
+    """
+    Celery 任务：大批量重新分析（回填）。
+    按 LLM_BATCH_BACKFILL_CHUNK 拆分为多个任务，每个任务完成本地预处理后，
+    把该组媒体的视觉分析作为一个离线批次提交，结果由 poll_llm_batch 写回。
+    """
+    chunk_size = max(settings.LLM_BATCH_BACKFILL_CHUNK, 1)
+    for start in range(0, len(media_ids), chunk_size):
+        prepare_reanalysis_batch.delay(media_ids[start:start + chunk_size])
+    logger.info("重新分析回填已拆分: 媒体数=%d, 每组=%d", len(media_ids), chunk_size)
+
+
+@celery_app.task(bind=True)
+def prepare_reanalysis_batch(self, media_ids: list[str]):
+    """Celery 任务：预处理一组媒体并提交批量视觉分析（批次的轮询由 submit_batch_jobs 安排）"""
+    try:
+        job_ids = run_async(_prepare_reanalysis_batch(media_ids))
+        logger.info("重新分析批次已提交: 媒体数=%d, 批次数=%d", len(media_ids), len(job_ids))
+    except Exception as error:
+        logger.error("重新分析批次提交失败: 错误: %s", error)
+
+
+async def _prepare_reanalysis_batch(media_ids: list[str]) -> list[str]:
+    from sqlalchemy import update
+    from app.ai.pipeline import build_reanalysis_batch_item, run_preprocess_pipeline
+    from app.models.media import MediaFile
+    from app.services.llm_batch_service import submit_batch_jobs
+    from app.services.llm_usage_service import check_media_budget
+
+    items: dict[str, dict] = {}
+    context: dict[str, dict] = {}
+    for media_id in media_ids:
+        try:
+            async with async_session_factory() as session:
+                async with session.begin():
+                    # 回填属于非紧急分析，预算用尽的家庭跳过
+                    if await check_media_budget(session, media_id) == "exceeded":
+                        continue
+                    preprocess_result = await run_preprocess_pipeline(session, media_id)
+                    items[media_id], context[media_id] = await build_reanalysis_batch_item(
+                        session, media_id, preprocess_result
+                    )
+        except Exception as error:
+            logger.error("重新分析预处理失败: %s, 错误: %s", media_id, error)
+            async with async_session_factory() as session:
+                async with session.begin():
+                    await session.execute(
+                        update(MediaFile).where(MediaFile.id == media_id).values(analysis_status="failed")
+                    )
+
+    if not items:
+        return []
+    async with async_session_factory() as session:
+        async with session.begin():
+            jobs = await submit_batch_jobs(session, "reanalysis", items, context)
+            return [job.id for job in jobs]
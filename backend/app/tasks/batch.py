@@ -0,0 +1,58 @@
+import logging
+
+from app.ai.remote.usage_ledger import llm_usage_ledger
+from app.celery_app import celery_app
+from app.config import settings
+from app.database import async_session_factory
+from app.tasks.runtime import run_async
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(bind=True)
+def poll_llm_batch(self, job_id: str, errors: int = 0):
+    """
+    Celery 任务：轮询大模型离线批处理任务，未完成时按建议间隔重新排队，
+    完成后把结果写回对应业务表（月度报告 / 分析结果）。
+    轮询或结果回写连续出错 LLM_BATCH_POLL_MAX_ERRORS 次后不再重试，将任务标记为失败。
+    """
+    try:
+        delay = run_async(_poll_batch(job_id))
+        errors = 0
+    except Exception as error:
+        # 网络错误等临时问题：稍后再试；超过 LLM_BATCH_MAX_WAIT_HOURS 后由轮询逻辑回退
+        errors += 1
+        logger.error(
+            "批处理轮询失败(%d/%d): job=%s, 错误: %s", errors, settings.LLM_BATCH_POLL_MAX_ERRORS, job_id, error
+        )
+        delay = settings.LLM_BATCH_POLL_INTERVAL_SEC
+        if errors >= settings.LLM_BATCH_POLL_MAX_ERRORS:
+            logger.error("❌ [LLM 批量] 连续出错次数达到上限，标记为失败: job=%s", job_id)
+            run_async(_mark_job_failed(job_id, f"轮询或结果回写连续失败 {errors} 次: {error}"))
+            delay = None
+    finally:
+        run_async(llm_usage_ledger.flush())
+
+    if delay is not None:
+        poll_llm_batch.apply_async(args=[job_id], kwargs={"errors": errors}, countdown=delay)
+
+
+async def _poll_batch(job_id: str):
+    from app.services.llm_batch_service import poll_batch_job
+
+    async with async_session_factory() as session:
+        async with session.begin():
+            return await poll_batch_job(session, job_id)
+
+
+async def _mark_job_failed(job_id: str, error_message: str):
+    from datetime import datetime
+    from app.models.llm import LLMBatchJob
+
+    async with async_session_factory() as session:
+        async with session.begin():
+            job = await session.get(LLMBatchJob, job_id)
+            if job and job.status == "submitted":
+                job.status = "failed"
+                job.error_message = error_message
+                job.completed_at = datetime.utcnow()
@@ -1,27 +1,42 @@
-import asyncio
 import logging
 from datetime import datetime
+from typing import Optional
 
 from app.celery_app import celery_app
+from app.config import settings
 from app.database import async_session_factory
 from app.models.analysis import AnalysisTask
+from app.tasks.runtime import run_async
 
 logger = logging.getLogger(__name__)
 
 
 @celery_app.task(bind=True, max_retries=3, default_retry_delay=60)
-def preprocess_video(self, media_id: str):
+def preprocess_video(self, media_id: str, urgent: bool = False, deferred: bool = False):
     """
     Celery 任务：视频预处理（关键帧提取 + 语音转写 + 人脸识别）。
     完成后自动触发 AI 深度分析任务。
+
+    非紧急分析（上传后的自动分析）先检查家庭月度 LLM 预算：接近预算时延后
+    LLM_BUDGET_THROTTLE_DELAY_SEC 再执行（延后的任务带 deferred=True，执行时仍检查预算，
+    只是不再重复延后），预算用尽时推迟到预算恢复。
+    用户手动触发的重新分析传入 urgent=True，不受预算限制。
     """
     logger.info("开始预处理视频: %s", media_id)
 
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-
     try:
-        result = loop.run_until_complete(_run_preprocess(media_id))
+        if not urgent:
+            budget_state = run_async(_check_budget(media_id))
+            if budget_state == "exceeded":
+                return
+            if budget_state == "throttled" and not deferred:
+                logger.info("家庭 LLM 预算接近上限，延后预处理: %s", media_id)
+                preprocess_video.apply_async(
+                    args=[media_id], kwargs={"deferred": True}, countdown=settings.LLM_BUDGET_THROTTLE_DELAY_SEC
+                )
+                return
+
+        result = run_async(_run_preprocess(media_id))
         from app.tasks.analyze import analyze_media
         analyze_media.delay(media_id, result)
         logger.info("预处理完成，已触发深度分析: %s", media_id)
@@ -30,9 +45,58 @@ def preprocess_video(self, media_id: str):
         try:
             self.retry(exc=error)
         except self.MaxRetriesExceededError:
-            loop.run_until_complete(_mark_task_failed(media_id, str(error)))
-    finally:
-        loop.close()
+            run_async(_mark_task_failed(media_id, str(error)))
+
+
+@celery_app.task(bind=True)
+def dispatch_photo_events(self, uploader_id: str):
+    """
+    Celery 任务：把上传者排队中的照片按拍摄时间归为事件，每个事件分派一个 analyze_photo_event。
+    每次上传照片后在等待期结束后安排一次；仍有事件在等待后续上传时，按剩余等待时间重新安排自己。
+    """
+    from app.tasks.analyze import analyze_photo_event
+
+    events, retry_in = run_async(_claim_photo_events(uploader_id))
+    for event in events:
+        if event["countdown"]:
+            logger.info("家庭 LLM 预算接近上限，延后照片事件分析: 照片数=%d", len(event["media_ids"]))
+        analyze_photo_event.apply_async(args=[event["media_ids"]], countdown=event["countdown"])
+    if retry_in is not None:
+        dispatch_photo_events.apply_async(args=[uploader_id], countdown=retry_in)
+
+
+@celery_app.task(bind=True)
+def resume_budget_deferred_analysis(self):
+    """Celery 定时任务：家庭预算恢复后（新的月份或调高预算），重新排队因预算推迟的分析"""
+    media_ids = run_async(_release_deferred())
+    for media_id in media_ids:
+        preprocess_video.delay(media_id, urgent=True)
+    if media_ids:
+        logger.info("预算恢复，已重新排队分析: 媒体数=%d", len(media_ids))
+
+
+async def _check_budget(media_id: str) -> str:
+    from app.services.llm_usage_service import check_media_budget
+
+    async with async_session_factory() as session:
+        async with session.begin():
+            return await check_media_budget(session, media_id)
+
+
+async def _claim_photo_events(uploader_id: str) -> tuple[list[dict], Optional[int]]:
+    from app.services.photo_event_service import claim_photo_events
+
+    async with async_session_factory() as session:
+        async with session.begin():
+            return await claim_photo_events(session, uploader_id)
+
+
+async def _release_deferred() -> list[str]:
+    from app.services.llm_usage_service import release_deferred_analysis
+
+    async with async_session_factory() as session:
+        async with session.begin():
+            return await release_deferred_analysis(session)
 
 
 async def _run_preprocess(media_id: str) -> dict:
@@ -1,9 +1,10 @@
-import asyncio
 import logging
 from datetime import date, datetime
 
+from app.ai.remote.usage_ledger import llm_usage_ledger
 from app.celery_app import celery_app
 from app.database import async_session_factory
+from app.tasks.runtime import run_async
 
 logger = logging.getLogger(__name__)
 
@@ -16,11 +17,8 @@ def generate_child_monthly_report(self, child_id: str):
     """
     logger.info("开始生成月度报告: child_id=%s", child_id)
 
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-
     try:
-        loop.run_until_complete(_generate_report(child_id))
+        run_async(_generate_report(child_id))
         logger.info("月度报告生成完成: child_id=%s", child_id)
     except Exception as error:
         logger.error("月度报告生成失败: child_id=%s, 错误: %s", child_id, error)
@@ -29,7 +27,7 @@ def generate_child_monthly_report(self, child_id: str):
         except self.MaxRetriesExceededError:
             logger.error("月度报告生成重试次数已用尽: child_id=%s", child_id)
     finally:
-        loop.close()
+        run_async(llm_usage_ledger.flush())
 
 
 @celery_app.task(bind=True, max_retries=1, default_retry_delay=60)
@@ -40,16 +38,11 @@ def generate_all_monthly_reports(self):
     """
     logger.info("开始批量生成月度报告")
 
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-
     try:
-        loop.run_until_complete(_generate_all_reports())
+        run_async(_generate_all_reports())
         logger.info("批量月度报告生成完成")
     except Exception as error:
         logger.error("批量月度报告生成失败: %s", error)
-    finally:
-        loop.close()
 
 
 @celery_app.task(bind=True, max_retries=2, default_retry_delay=120)
@@ -60,11 +53,8 @@ def generate_export_package(self, child_id: str, export_id: str):
     """
     logger.info("开始生成导出包: child_id=%s, export_id=%s", child_id, export_id)
 
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-
     try:
-        loop.run_until_complete(_generate_export(child_id, export_id))
+        run_async(_generate_export(child_id, export_id))
         logger.info("导出包生成完成: export_id=%s", export_id)
     except Exception as error:
         logger.error("导出包生成失败: export_id=%s, 错误: %s", export_id, error)
@@ -72,8 +62,6 @@ def generate_export_package(self, child_id: str, export_id: str):
             self.retry(exc=error)
         except self.MaxRetriesExceededError:
             logger.error("导出包生成重试次数已用尽: export_id=%s", export_id)
-    finally:
-        loop.close()
 
 
 async def _generate_report(child_id: str):
@@ -87,6 +75,7 @@ async def _generate_report(child_id: str):
         generate_monthly_summary,
     )
     from app.ai.remote.report_generator import generate_growth_narrative
+    from app.ai.remote.usage_ledger import llm_usage_context
 
     report_month = date.today().replace(day=1)
 
@@ -118,16 +107,17 @@ async def _generate_report(child_id: str):
                 + report_month.month - child.birth_date.month
             )
 
-            narrative = await generate_growth_narrative(
-                child_name=child.name,
-                age_months=age_months,
-                radar_data=radar_data,
-                spark_cards=spark_cards,
-                behavior_summary=[],
-                emotion_summary={},
-            )
+            with llm_usage_context(family_id=child.family_id):
+                narrative = await generate_growth_narrative(
+                    child_name=child.name,
+                    age_months=age_months,
+                    radar_data=radar_data,
+                    spark_cards=spark_cards,
+                    behavior_summary=[],
+                    emotion_summary={},
+                )
 
-            summary = await generate_monthly_summary(radar_data, spark_cards)
+                summary = await generate_monthly_summary(radar_data, spark_cards)
 
             report = MonthlyReport(
                 child_id=child_id,
@@ -141,10 +131,20 @@ async def _generate_report(child_id: str):
 
 
 async def _generate_all_reports():
-    """为所有孩子生成月度报告"""
+    """为所有孩子生成月度报告；开启 LLM_BATCH_REPORTS 时作为离线批处理提交"""
     from sqlalchemy import select
+    from app.config import settings
     from app.models.child import Child
 
+    if settings.LLM_BATCH_REPORTS:
+        from app.services.report_service import submit_monthly_report_batch
+
+        # 每个批次提交后由 submit_batch_jobs 立即落库并安排轮询
+        async with async_session_factory() as session:
+            async with session.begin():
+                await submit_monthly_report_batch(session)
+        return
+
     async with async_session_factory() as session:
         result = await session.execute(select(Child))
         children = list(result.scalars().all())
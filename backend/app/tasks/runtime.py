@@ -0,0 +1,160 @@
+"""
+Celery worker 进程的异步运行时。
+
+每个 worker 子进程持有一个长期存在的事件循环，以及在该循环上创建的数据库引擎（asyncpg 连接绑定
+建立时的事件循环）。所有任务通过 run_async() 在这个循环上执行协程，数据库连接、Redis 客户端与
+大模型 SDK 的 HTTP 连接池（均按事件循环缓存）因此可以跨任务复用，而不是每个任务重新建立。
+
+prefork 子进程在 worker_process_init 时创建运行时；solo 等不触发该信号的执行池在第一次
+run_async() 时创建。子进程退出时写入剩余的用量记录并关闭连接。
+"""
+import asyncio
+import logging
+import os
+import threading
+from typing import Coroutine, Optional, TypeVar
+
+from celery.signals import worker_process_init, worker_process_shutdown
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 每执行该数量的任务记录一次连接池统计
+REPORT_EVERY_TASKS = 100
+
+
+class WorkerRuntime:
+    """单个 worker 进程的持久事件循环、数据库引擎与连接池统计"""
+
+    def __init__(self):
+        from sqlalchemy import event
+        from app.database import create_engine, rebind_engine
+
+        self.pid = os.getpid()
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.engine = create_engine(
+            pool_size=settings.CELERY_DB_POOL_SIZE,
+            max_overflow=settings.CELERY_DB_MAX_OVERFLOW,
+            pool_recycle=settings.CELERY_DB_POOL_RECYCLE_SEC,
+        )
+        rebind_engine(self.engine)
+
+        self._lock = threading.Lock()
+        self.tasks = 0
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidated = 0
+        event.listen(self.engine.sync_engine, "connect", self._on_connect)
+        event.listen(self.engine.sync_engine, "checkout", self._on_checkout)
+        event.listen(self.engine.sync_engine, "invalidate", self._on_invalidate)
+
+    def run(self, coroutine: Coroutine[object, object, T]) -> T:
+        with self._lock:
+            self.tasks += 1
+            due = self.tasks % REPORT_EVERY_TASKS == 0
+        task = self.loop.create_task(coroutine)
+        try:
+            return self.loop.run_until_complete(task)
+        except BaseException:
+            # 软超时等信号在循环内抛出时协程可能仍未结束，取消它以免在下一个任务中继续运行
+            if not task.done():
+                task.cancel()
+                self.loop.run_until_complete(asyncio.gather(task, return_exceptions=True))
+            raise
+        finally:
+            if due:
+                logger.info("🔁 [Worker 运行时] 连接池统计: %s", self.report())
+
+    def report(self) -> dict:
+        """
+        连接池统计：connects 为新建的数据库连接数，checkouts 为取用连接的次数，
+        reuse_ratio 为取用时复用已有连接的比例（接近 1 说明连接在任务间被复用）
+        """
+        pool = self.engine.pool
+        with self._lock:
+            return {
+                "pid": self.pid,
+                "tasks": self.tasks,
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "invalidated": self.invalidated,
+                "reuse_ratio": round(1 - self.connects / self.checkouts, 4) if self.checkouts else 0.0,
+                "pool_size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+            }
+
+    def close(self) -> None:
+        from app.ai.remote.client_pool import llm_client_pool
+        from app.ai.remote.rate_limiter import llm_rate_limiter
+        from app.ai.remote.usage_ledger import llm_usage_ledger
+
+        try:
+            self.loop.run_until_complete(llm_usage_ledger.flush())
+            self.loop.run_until_complete(llm_rate_limiter.publish_metrics())
+            self.loop.run_until_complete(llm_client_pool.aclose())
+            self.loop.run_until_complete(self.engine.dispose())
+        finally:
+            self.loop.close()
+
+    def _on_connect(self, *_) -> None:
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, *_) -> None:
+        with self._lock:
+            self.checkouts += 1
+
+    def _on_invalidate(self, *_) -> None:
+        with self._lock:
+            self.invalidated += 1
+
+
+_runtime: Optional[WorkerRuntime] = None
+
+
+def get_runtime() -> WorkerRuntime:
+    """当前进程的运行时；fork 之后的子进程不沿用父进程的事件循环与连接"""
+    global _runtime
+    if _runtime is None or _runtime.pid != os.getpid() or _runtime.loop.is_closed():
+        _runtime = WorkerRuntime()
+    return _runtime
+
+
+def run_async(coroutine: Coroutine[object, object, T]) -> T:
+    """在当前 worker 进程的持久事件循环上执行协程并返回结果（供 Celery 任务使用）"""
+    return get_runtime().run(coroutine)
+
+
+def runtime_report() -> Optional[dict]:
+    """当前进程的运行时统计，尚未创建运行时时返回 None"""
+    if _runtime is None or _runtime.pid != os.getpid():
+        return None
+    return _runtime.report()
+
+
+@worker_process_init.connect
+def _init_worker_runtime(**_) -> None:
+    runtime = get_runtime()
+    logger.info(
+        "🔁 [Worker 运行时] 进程 %d 已创建持久事件循环与数据库连接池（pool_size=%d, max_overflow=%d）",
+        runtime.pid, settings.CELERY_DB_POOL_SIZE, settings.CELERY_DB_MAX_OVERFLOW,
+    )
+
+
+@worker_process_shutdown.connect
+def _close_worker_runtime(**_) -> None:
+    global _runtime
+    if _runtime is None or _runtime.pid != os.getpid():
+        return
+    logger.info("🔁 [Worker 运行时] 进程 %d 退出，连接池统计: %s", _runtime.pid, _runtime.report())
+    try:
+        _runtime.close()
+    except Exception as error:
+        logger.warning("⚠️ [Worker 运行时] 关闭失败: %s", error)
+    _runtime = None
@@ -0,0 +1,27 @@
+import asyncio
+import threading
+
+from app.config import settings
+
+_clients: dict[int, tuple[asyncio.AbstractEventLoop, object]] = {}
+_lock = threading.Lock()
+
+
+def get_redis():
+    """
+    获取当前事件循环上的 Redis 异步客户端（REDIS_URL）。
+
+    redis.asyncio 的连接绑定创建时的事件循环，Celery 任务可能在不同的事件循环中运行，
+    因此每个事件循环各持有一个客户端，循环关闭后对应客户端随之丢弃。
+    """
+    import redis.asyncio as redis
+
+    loop = asyncio.get_running_loop()
+    with _lock:
+        for loop_id in [key for key, (owner, _) in _clients.items() if owner.is_closed()]:
+            del _clients[loop_id]
+        entry = _clients.get(id(loop))
+        if entry is None or entry[0] is not loop:
+            entry = (loop, redis.Redis.from_url(settings.REDIS_URL, socket_timeout=5.0))
+            _clients[id(loop)] = entry
+        return entry[1]
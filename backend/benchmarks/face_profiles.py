@@ -0,0 +1,167 @@
+"""
+人脸模型档位基准测试：对比各档位的单帧延迟与检出召回率。
+
+延迟分两组报告：
+- 检测+识别：detect_faces_batch（流水线路径，只运行检测与识别两个子模型）
+- 完整 app.get：FaceAnalysis 对该档位已加载的全部子模型逐一推理（full 档位含 genderage 与
+  两个关键点模型），两者之差即为档位裁剪掉的属性 / 关键点模型的开销
+
+用法（在 backend 目录下）：
+    python -m benchmarks.face_profiles --images ./data/bench_frames
+    python -m benchmarks.face_profiles --images ./frames --labels labels.json --profiles fast,balanced
+
+labels.json 可选，格式为 {"文件名": 人脸框列表 [[x1, y1, x2, y2], ...]}。
+未提供标注时，以 --reference 档位（默认 full）的检测结果作为基准计算召回率。
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import time
+
+from app.ai.local.face_engine import FACE_PROFILES, FaceEngine
+from app.ai.local.model_registry import model_registry
+
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png")
+
+
+def _iou(box_a: list[float], box_b: list[float]) -> float:
+    x1, y1 = max(box_a[0], box_b[0]), max(box_a[1], box_b[1])
+    x2, y2 = min(box_a[2], box_b[2]), min(box_a[3], box_b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    area_a = (box_a[2] - box_a[0]) * (box_a[3] - box_a[1])
+    area_b = (box_b[2] - box_b[0]) * (box_b[3] - box_b[1])
+    union = area_a + area_b - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _recall(predicted: list[list[float]], expected: list[list[float]], iou_threshold: float) -> tuple[int, int]:
+    """返回 (命中数, 标注数)，每个标注框最多被一个预测框命中"""
+    remaining = list(predicted)
+    hits = 0
+    for box in expected:
+        best = max(remaining, key=lambda p: _iou(p, box), default=None)
+        if best is not None and _iou(best, box) >= iou_threshold:
+            hits += 1
+            remaining.remove(best)
+    return hits, len(expected)
+
+
+def _percentile(samples: list[float], percentile: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * percentile), len(ordered) - 1)]
+
+
+def run_profile(profile_name: str, image_paths: list[str], repeat: int) -> dict:
+    """运行单个档位，返回延迟统计与每张图的人脸框"""
+    engine = FaceEngine(FACE_PROFILES[profile_name])
+
+    load_start = time.perf_counter()
+    model_registry.get(engine.model_name)
+    load_seconds = time.perf_counter() - load_start
+
+    # 预热一次，避免首帧的 ONNX Runtime 初始化影响统计
+    engine.detect_faces_batch(image_paths[:1])
+
+    per_frame_ms = []
+    batch_ms = []
+    boxes: dict[str, list[list[float]]] = {}
+    for _ in range(repeat):
+        for path in image_paths:
+            start = time.perf_counter()
+            faces = engine.detect_faces_batch([path])[0]
+            per_frame_ms.append((time.perf_counter() - start) * 1000)
+            boxes[os.path.basename(path)] = [face["bbox"] for face in faces]
+
+        start = time.perf_counter()
+        engine.detect_faces_batch(image_paths)
+        batch_ms.append((time.perf_counter() - start) * 1000 / len(image_paths))
+
+    # 完整 app.get：运行档位加载的所有子模型（extract_face_embedding / detect_faces 使用的路径）
+    import cv2
+    images = [image for image in (cv2.imread(path) for path in image_paths) if image is not None]
+    app_get_ms = []
+    with model_registry.use(engine.model_name) as app:
+        loaded_modules = sorted(app.models)
+        if images:
+            app.get(images[0])
+        for _ in range(repeat):
+            for image in images:
+                start = time.perf_counter()
+                app.get(image)
+                app_get_ms.append((time.perf_counter() - start) * 1000)
+
+    memory_mb = next(
+        (m["memory_mb"] for m in model_registry.memory_report() if m["name"] == engine.model_name), 0.0
+    )
+    model_registry.unload(engine.model_name)
+
+    return {
+        "profile": profile_name,
+        "load_seconds": load_seconds,
+        "memory_mb": memory_mb,
+        "modules": loaded_modules,
+        "p50_ms": statistics.median(per_frame_ms),
+        "p95_ms": _percentile(per_frame_ms, 0.95),
+        "batched_ms_per_frame": statistics.median(batch_ms),
+        "app_get_p50_ms": statistics.median(app_get_ms) if app_get_ms else 0.0,
+        "app_get_p95_ms": _percentile(app_get_ms, 0.95) if app_get_ms else 0.0,
+        "faces": sum(len(b) for b in boxes.values()),
+        "boxes": boxes,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="人脸模型档位延迟与召回率基准测试")
+    parser.add_argument("--images", required=True, help="测试图片目录（建议使用真实关键帧）")
+    parser.add_argument("--labels", help="可选的人脸框标注 JSON 文件")
+    parser.add_argument("--profiles", default=",".join(FACE_PROFILES), help="逗号分隔的档位列表")
+    parser.add_argument("--reference", default="full", help="无标注时作为召回基准的档位")
+    parser.add_argument("--repeat", type=int, default=3, help="每个档位重复次数")
+    parser.add_argument("--iou", type=float, default=0.5, help="判定命中的 IoU 阈值")
+    args = parser.parse_args()
+
+    image_paths = sorted(
+        path for pattern in IMAGE_PATTERNS for path in glob.glob(os.path.join(args.images, pattern))
+    )
+    if not image_paths:
+        raise SystemExit(f"目录中没有图片: {args.images}")
+
+    profile_names = [name.strip() for name in args.profiles.split(",") if name.strip()]
+    if args.labels:
+        with open(args.labels, encoding="utf-8") as f:
+            expected_boxes = json.load(f)
+    else:
+        if args.reference not in profile_names:
+            profile_names.insert(0, args.reference)
+        expected_boxes = None
+
+    results = [run_profile(name, image_paths, args.repeat) for name in profile_names]
+    if expected_boxes is None:
+        expected_boxes = next(r["boxes"] for r in results if r["profile"] == args.reference)
+
+    print(f"\n图片数={len(image_paths)}, 重复={args.repeat}, 召回基准={'标注' if args.labels else args.reference}\n")
+    header = (
+        f"{'档位':<10}{'加载(s)':>9}{'内存(MB)':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'批量(ms/帧)':>13}"
+        f"{'get p50':>10}{'get p95':>10}{'人脸数':>8}{'召回率':>9}  子模型"
+    )
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        hits = total = 0
+        for filename, expected in expected_boxes.items():
+            h, t = _recall(result["boxes"].get(filename, []), expected, args.iou)
+            hits += h
+            total += t
+        recall = hits / total if total else 1.0
+        print(
+            f"{result['profile']:<10}{result['load_seconds']:>9.1f}{result['memory_mb']:>10.0f}"
+            f"{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}{result['batched_ms_per_frame']:>13.1f}"
+            f"{result['app_get_p50_ms']:>10.1f}{result['app_get_p95_ms']:>10.1f}"
+            f"{result['faces']:>8d}{recall:>9.1%}  {','.join(result['modules'])}"
+        )
+
+
+if __name__ == "__main__":
+    main()
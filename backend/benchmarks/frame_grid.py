@@ -0,0 +1,241 @@
+"""
+关键帧拼图与逐张发送的对比：对每个视频的关键帧分别以逐张模式（前 --per-image-budget 张）和拼图模式
+（整段均匀抽取 --budget 帧拼成网格）调用联合行为 + 情绪分析，比较覆盖帧数、图片数、输入 token、
+延迟与两种模式结果的一致性。
+
+用法（在 backend 目录下）：
+    # 只估算图片 token（按提供商缩放规则计算），不发请求
+    python -m benchmarks.frame_grid --videos ./data/bench_videos --budget 18 --dry-run
+    # 真实模型
+    python -m benchmarks.frame_grid --videos ./data/bench_videos --budget 18 --concurrency 4
+    # 离线（合成回复按请求哈希生成，一致性无意义，只比较 token 与延迟）
+    python -m benchmarks.llm_standin --port 8900 --seed 1 &
+    LLM_BASE_URL=http://127.0.0.1:8900/v1 LLM_API_KEY=standin \\
+        python -m benchmarks.frame_grid --videos ./data/bench_videos --budget 18
+
+--videos 下每个子目录为一个视频的关键帧（按文件名排序即时间顺序），没有子目录时整个目录视为一个视频。
+关键帧文件名不含时间信息，--interval-sec 非 0 时按固定间隔推算标注时间。
+拼图写在各视频目录的 grids 子目录下，运行结束后删除。
+
+一致性指标：主要情绪相同的比例、行为类型集合的 Jaccard 相似度均值、场景描述相同的比例。
+"""
+import argparse
+import asyncio
+import glob
+import json
+import math
+import os
+import shutil
+import statistics
+import time
+from typing import Optional
+
+from app.ai.remote.combined_analyzer import analyze_behavior_and_emotion
+from app.ai.remote.frame_grid import prepare_frames
+from app.ai.remote.image_payload import image_payload_optimizer
+from app.ai.remote.llm_client import usage_report
+from app.ai.remote.rate_limiter import LLMRequestError
+from app.config import settings
+
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png")
+
+
+def load_videos(root: str) -> dict[str, list[str]]:
+    def images_in(directory: str) -> list[str]:
+        return sorted(path for pattern in IMAGE_PATTERNS for path in glob.glob(os.path.join(directory, pattern)))
+
+    subdirs = sorted(
+        entry.path for entry in os.scandir(root) if entry.is_dir() and entry.name != "grids"
+    )
+    videos = {os.path.basename(path): images_in(path) for path in subdirs}
+    videos = {name: paths for name, paths in videos.items() if paths}
+    if not videos and images_in(root):
+        videos = {os.path.basename(os.path.abspath(root)): images_in(root)}
+    return videos
+
+
+def estimate_image_tokens(image_paths: list[str], provider: str) -> int:
+    """
+    按提供商公开的计费规则估算图片输入 token（尺寸取按提供商限制缩放后的结果）：
+    OpenAI high detail 为 85 + 170 × 512 像素切片数；Anthropic 约为 宽 × 高 / 750。
+    """
+    total = 0
+    for encoded in image_payload_optimizer.encode_many(image_paths, provider):
+        width, height = encoded.width, encoded.height
+        if not width or not height:
+            continue
+        if provider == "anthropic":
+            total += math.ceil(width * height / 750)
+        else:
+            total += 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+    return total
+
+
+def _input_tokens() -> int:
+    return sum(stats["input_tokens"] for stats in usage_report().values())
+
+
+def _percentile(values: list[float], percentile: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * percentile), len(ordered) - 1)] if ordered else 0.0
+
+
+def configure(mode: str, args: argparse.Namespace) -> None:
+    if mode == "grid":
+        settings.LLM_FRAME_GRID_ENABLED = True
+        settings.LLM_COMBINED_FRAME_BUDGET = args.budget
+        settings.LLM_FRAME_GRID_COLUMNS = args.columns
+        settings.LLM_FRAME_GRID_ROWS = args.rows
+    else:
+        settings.LLM_FRAME_GRID_ENABLED = False
+        settings.LLM_COMBINED_FRAME_BUDGET = args.per_image_budget
+
+
+async def run_mode(mode: str, videos: dict[str, list[str]], args: argparse.Namespace) -> dict:
+    configure(mode, args)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    results: dict[str, Optional[tuple[dict, dict]]] = {}
+    latencies: list[float] = []
+    frames: list[int] = []
+    images: list[int] = []
+    image_tokens: list[int] = []
+    failures = 0
+
+    async def one(name: str, paths: list[str]) -> None:
+        nonlocal failures
+        timestamps = [i * args.interval_sec for i in range(len(paths))] if args.interval_sec else None
+        sent, note = prepare_frames("combined", paths, timestamps)
+        covered = min(len(paths), settings.LLM_COMBINED_FRAME_BUDGET)
+        frames.append(covered)
+        images.append(len(sent))
+        image_tokens.append(estimate_image_tokens(sent, settings.LLM_PROVIDER))
+        if args.dry_run:
+            return
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                results[name] = await analyze_behavior_and_emotion(paths, keyframe_timestamps=timestamps)
+            except LLMRequestError:
+                failures += 1
+                results[name] = None
+                return
+            latencies.append(time.perf_counter() - start)
+
+    tokens_before = _input_tokens()
+    start = time.perf_counter()
+    await asyncio.gather(*(one(name, paths) for name, paths in videos.items()))
+    wall = time.perf_counter() - start
+
+    summary = {
+        "mode": mode,
+        "videos": len(videos),
+        "avg_frames": round(statistics.fmean(frames), 1) if frames else 0.0,
+        "avg_images": round(statistics.fmean(images), 1) if images else 0.0,
+        "avg_est_image_tokens": round(statistics.fmean(image_tokens)) if image_tokens else 0,
+    }
+    if not args.dry_run:
+        succeeded = [result for result in results.values() if result is not None]
+        summary.update({
+            "succeeded": len(succeeded),
+            "failed": failures,
+            "fallback": sum(1 for behavior, emotion in succeeded if behavior.get("fallback") or emotion.get("fallback")),
+            "avg_input_tokens": round((_input_tokens() - tokens_before) / len(succeeded)) if succeeded else 0,
+            "wall_seconds": round(wall, 2),
+            "p50_ms": round(_percentile(latencies, 0.5) * 1000, 1),
+            "p95_ms": round(_percentile(latencies, 0.95) * 1000, 1),
+        })
+    return {"summary": summary, "results": results}
+
+
+def agreement(baseline: dict, candidate: dict) -> dict:
+    """两种模式都成功的视频上，主要情绪、行为类型集合与场景的一致程度"""
+    pairs = [
+        (baseline[name], candidate[name])
+        for name in baseline
+        if baseline.get(name) is not None and candidate.get(name) is not None
+    ]
+    if not pairs:
+        return {"compared": 0}
+
+    def activity_types(behavior: dict) -> set:
+        return {activity.get("type") for activity in behavior.get("activities", []) if isinstance(activity, dict)}
+
+    jaccards = []
+    for (behavior_a, _), (behavior_b, _) in pairs:
+        types_a, types_b = activity_types(behavior_a), activity_types(behavior_b)
+        jaccards.append(len(types_a & types_b) / len(types_a | types_b) if types_a | types_b else 1.0)
+    return {
+        "compared": len(pairs),
+        "dominant_emotion": round(sum(a[1].get("dominant") == b[1].get("dominant") for a, b in pairs) / len(pairs), 3),
+        "activity_jaccard": round(statistics.fmean(jaccards), 3),
+        "environment": round(sum(a[0].get("environment") == b[0].get("environment") for a, b in pairs) / len(pairs), 3),
+    }
+
+
+async def run(videos: dict[str, list[str]], args: argparse.Namespace) -> dict:
+    per_image = await run_mode("per_image", videos, args)
+    grid = await run_mode("grid", videos, args)
+    report = {"per_image": per_image["summary"], "grid": grid["summary"]}
+    if not args.dry_run:
+        report["agreement"] = agreement(per_image["results"], grid["results"])
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="关键帧拼图与逐张发送的 token / 延迟 / 一致性对比")
+    parser.add_argument("--videos", required=True, help="关键帧目录（每个子目录为一个视频）")
+    parser.add_argument("--budget", type=int, default=18, help="拼图模式的帧预算")
+    parser.add_argument("--per-image-budget", type=int, default=settings.LLM_COMBINED_FRAME_BUDGET)
+    parser.add_argument("--columns", type=int, default=settings.LLM_FRAME_GRID_COLUMNS)
+    parser.add_argument("--rows", type=int, default=settings.LLM_FRAME_GRID_ROWS)
+    parser.add_argument("--interval-sec", type=float, default=0.0, help="相邻关键帧的时间间隔（用于标注）")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--dry-run", action="store_true", help="只估算图片 token，不调用模型")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+    args = parser.parse_args()
+
+    videos = load_videos(args.videos)
+    if not videos:
+        raise SystemExit(f"目录中没有关键帧: {args.videos}")
+    grid_dirs = {os.path.join(os.path.dirname(paths[0]), "grids") for paths in videos.values()}
+    existing = {path for path in grid_dirs if os.path.exists(path)}
+
+    settings.LLM_CACHE_ENABLED = False
+    settings.LLM_USAGE_LEDGER = False
+    # 只比较同一档模型下两种发送方式的差异
+    settings.LLM_CASCADE_ENABLED = False
+
+    try:
+        report = asyncio.run(run(videos, args))
+    finally:
+        for path in grid_dirs - existing:
+            shutil.rmtree(path, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+    print(f"\n目标: {settings.LLM_PROVIDER} {settings.LLM_VISION_MODEL}，视频数={len(videos)}")
+    for mode in ("per_image", "grid"):
+        summary = report[mode]
+        print(
+            f"{mode}: 覆盖帧数={summary['avg_frames']}, 图片数={summary['avg_images']}, "
+            f"估算图片 token={summary['avg_est_image_tokens']}"
+        )
+        if not args.dry_run:
+            print(
+                f"    成功={summary['succeeded']}, 失败={summary['failed']}, 回退={summary['fallback']}, "
+                f"实际输入 token={summary['avg_input_tokens']}, p50={summary['p50_ms']}ms, p95={summary['p95_ms']}ms"
+            )
+    if "agreement" in report:
+        agreement_report = report["agreement"]
+        if agreement_report["compared"]:
+            print(
+                f"一致性（{agreement_report['compared']} 个视频）: 主要情绪={agreement_report['dominant_emotion']}, "
+                f"行为类型 Jaccard={agreement_report['activity_jaccard']}, 场景={agreement_report['environment']}"
+            )
+        else:
+            print("一致性: 没有两种模式都成功的视频")
+
+
+if __name__ == "__main__":
+    main()
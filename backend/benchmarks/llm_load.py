@@ -0,0 +1,160 @@
+"""
+大模型调用链路压测：通过真实的 LLMClient / 分析器（限流器、端点路由、图片编码、结果解析）
+并发发起请求，统计延迟分位数、吞吐与失败数。配合 benchmarks.llm_standin 可离线复现。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.llm_standin --port 8900 --seed 1 --throttle-rate 0.02 &
+    LLM_BASE_URL=http://127.0.0.1:8900/v1 LLM_API_KEY=standin \\
+        python -m benchmarks.llm_load --kind vision --images ./data/bench_frames --requests 200 --concurrency 16
+
+--kind：
+    vision  联合行为 + 情绪分析（analyze_behavior_and_emotion，每次请求使用 --frames 张关键帧）
+    chat    成长叙事（非流式）
+    stream  成长叙事（流式，额外统计首个分片耗时）
+
+回复缓存在压测期间关闭；用量台账默认关闭（--ledger 开启，需要数据库）。
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import statistics
+import time
+
+from app.ai.remote.combined_analyzer import analyze_behavior_and_emotion
+from app.ai.remote.endpoint_router import endpoint_router
+from app.ai.remote.llm_client import get_llm_client, usage_report
+from app.ai.remote.rate_limiter import LLMRequestError, llm_rate_limiter
+from app.ai.remote.report_generator import NARRATIVE_SYSTEM_PROMPT, _build_narrative_prompt
+from app.config import settings
+
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png")
+
+SAMPLE_RADAR = {
+    "interest": {"sport": 0.6, "music": 0.3, "art": 0.5, "learning": 0.7, "social": 0.4},
+    "talent": {"logic": 0.5, "spatial": 0.6, "language": 0.7, "motor": 0.5},
+    "psychology": {"empathy": 0.6, "resilience": 0.5, "confidence": 0.7},
+}
+
+
+def _percentile(values: list[float], percentile: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * percentile), len(ordered) - 1)] if ordered else 0.0
+
+
+async def _one_request(kind: str, index: int, image_paths: list[str], frames: int) -> dict:
+    start = time.perf_counter()
+    first_chunk = None
+    if kind == "vision":
+        offset = (index * frames) % max(len(image_paths), 1)
+        batch = (image_paths[offset:] + image_paths[:offset])[:frames]
+        await analyze_behavior_and_emotion(batch)
+    else:
+        # 每个请求使用不同的名字，避免提示词完全相同
+        prompt = _build_narrative_prompt(f"孩子{index}", 36, SAMPLE_RADAR, [], [], {})
+        client = get_llm_client()
+        if kind == "chat":
+            await client.chat(prompt, NARRATIVE_SYSTEM_PROMPT, cache=False)
+        else:
+            async for _ in client.chat_stream(prompt, NARRATIVE_SYSTEM_PROMPT, cache=False):
+                if first_chunk is None:
+                    first_chunk = time.perf_counter() - start
+    return {"latency": time.perf_counter() - start, "first_chunk": first_chunk}
+
+
+async def run(kind: str, requests: int, concurrency: int, image_paths: list[str], frames: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    first_chunks: list[float] = []
+    failures: dict[str, int] = {}
+
+    async def worker(index: int) -> None:
+        async with semaphore:
+            try:
+                result = await _one_request(kind, index, image_paths, frames)
+            except LLMRequestError as error:
+                key = str(error.status_code or type(error.__cause__).__name__)
+                failures[key] = failures.get(key, 0) + 1
+                return
+            latencies.append(result["latency"])
+            if result["first_chunk"] is not None:
+                first_chunks.append(result["first_chunk"])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(requests)))
+    wall = time.perf_counter() - start
+
+    summary = {
+        "kind": kind,
+        "requests": requests,
+        "concurrency": concurrency,
+        "succeeded": len(latencies),
+        "failed": failures,
+        "wall_seconds": round(wall, 2),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "p50_ms": round(_percentile(latencies, 0.5) * 1000, 1),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 1) if latencies else 0.0,
+    }
+    if first_chunks:
+        summary["ttft_p50_ms"] = round(_percentile(first_chunks, 0.5) * 1000, 1)
+        summary["ttft_p95_ms"] = round(_percentile(first_chunks, 0.95) * 1000, 1)
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="大模型调用链路压测（建议配合 benchmarks.llm_standin 离线运行）")
+    parser.add_argument("--kind", choices=["vision", "chat", "stream"], default="vision")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--images", help="vision 压测使用的关键帧目录")
+    parser.add_argument("--frames", type=int, default=8, help="vision 每次请求的关键帧数")
+    parser.add_argument("--ledger", action="store_true", help="写入用量台账（需要数据库）")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出（便于比较多次运行）")
+    args = parser.parse_args()
+
+    image_paths: list[str] = []
+    if args.kind == "vision":
+        if not args.images:
+            raise SystemExit("vision 压测需要 --images")
+        image_paths = sorted(
+            path for pattern in IMAGE_PATTERNS for path in glob.glob(os.path.join(args.images, pattern))
+        )
+        if not image_paths:
+            raise SystemExit(f"目录中没有图片: {args.images}")
+
+    settings.LLM_CACHE_ENABLED = False
+    settings.LLM_USAGE_LEDGER = args.ledger
+
+    summary = asyncio.run(run(args.kind, args.requests, args.concurrency, image_paths, args.frames))
+    summary["rate_limiter"] = llm_rate_limiter.report()
+    summary["endpoints"] = endpoint_router.report()
+    summary["usage"] = usage_report()
+
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+        return
+    print(f"\n目标: {settings.LLM_PROVIDER} {settings.LLM_BASE_URL}")
+    print(
+        f"{summary['kind']}: 请求={summary['requests']}, 并发={summary['concurrency']}, "
+        f"成功={summary['succeeded']}, 失败={summary['failed'] or 0}"
+    )
+    print(
+        f"耗时={summary['wall_seconds']}s, 吞吐={summary['throughput_rps']} req/s, "
+        f"p50={summary['p50_ms']}ms, p95={summary['p95_ms']}ms, p99={summary['p99_ms']}ms"
+    )
+    if "ttft_p50_ms" in summary:
+        print(f"首个分片: p50={summary['ttft_p50_ms']}ms, p95={summary['ttft_p95_ms']}ms")
+    for key, stats in summary["usage"].items():
+        print(f"用量 {key}: 调用={stats['calls']}, 输入token={stats['input_tokens']}, 输出token={stats['output_tokens']}")
+    for key, metrics in summary["rate_limiter"].items():
+        print(
+            f"限流 {key}: 重试={metrics['retried']}, 429={metrics['throttled']}, "
+            f"失败={metrics['failed']}, 并发上限={metrics['concurrency_limit']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
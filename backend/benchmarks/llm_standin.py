@@ -0,0 +1,440 @@
+"""
+大模型替身服务：兼容 OpenAI（POST .../chat/completions）与 Anthropic（POST .../messages）接口，
+用于离线、可复现地压测分析流水线与报告生成，不产生 API 费用。
+
+三种模式：
+- synthetic：按系统提示词生成结构合法的合成回复（联合分析 / 行为 / 情绪 / 照片事件为 JSON，其余为叙事文本），
+  内容由请求哈希决定，同一请求总是得到同一回复。
+- record：转发到真实 API（总是以非流式请求），按请求哈希保存到 --cassette 目录；已录制的请求直接回放。
+- replay：只使用录制结果；未录制的请求返回 404（--replay-miss synthetic 时改为合成回复）。
+
+所有模式都按配置注入延迟（对数正态分布，每张图片额外增加延迟）、5xx 错误与带 Retry-After 的 429；
+流式请求（stream=true）按对应格式的 SSE 分片返回，并带用量信息。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.llm_standin --port 8900 --latency-ms 800 --latency-sigma 0.5 \\
+        --error-rate 0.01 --throttle-rate 0.02
+    python -m benchmarks.llm_standin --mode record --upstream https://api.openai.com/v1 --cassette ./data/llm_cassettes
+    python -m benchmarks.llm_standin --mode replay --cassette ./data/llm_cassettes --seed 7
+
+后端指向替身：
+    LLM_BASE_URL=http://127.0.0.1:8900/v1 LLM_API_KEY=standin                       # OpenAI 格式
+    LLM_PROVIDER=anthropic LLM_BASE_URL=http://127.0.0.1:8900 LLM_API_KEY=standin   # Anthropic 格式
+
+GET /_standin/stats 返回请求数、注入的错误与 429 次数、回放命中情况。
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.ai.remote.behavior_analyzer import BEHAVIOR_SYSTEM_PROMPT, BEHAVIOR_TYPES
+from app.ai.remote.combined_analyzer import COMBINED_SYSTEM_PROMPT
+from app.ai.remote.emotion_analyzer import EMOTION_SYSTEM_PROMPT, EMOTION_TYPES
+from app.ai.remote.photo_event_analyzer import PHOTO_EVENT_SYSTEM_PROMPT
+
+# 流式回复每个分片的字符数
+STREAM_CHUNK_CHARS = 16
+
+# 哈希时忽略的传输选项：同一请求的流式与非流式调用共用一条录制
+HASH_IGNORED_FIELDS = ("stream", "stream_options", "metadata")
+
+
+@dataclass
+class StandinConfig:
+    mode: str = "synthetic"
+    latency_ms: float = 800.0  # 对数正态分布的中位数
+    latency_sigma: float = 0.5
+    latency_per_image_ms: float = 150.0
+    ttft_ratio: float = 0.3  # 流式回复首个分片到达时间占总延迟的比例
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    retry_after_sec: float = 1.0
+    tokens_per_image: int = 765
+    cassette_dir: str = "./data/llm_cassettes"
+    upstream: str = ""
+    upstream_key: str = ""
+    replay_miss: str = "error"  # error / synthetic
+    replay_timing: str = "distribution"  # distribution / recorded
+    seed: Optional[int] = None
+    stats: dict = field(default_factory=lambda: {
+        "requests": 0, "streamed": 0, "errors_injected": 0, "throttled_injected": 0,
+        "replay_hits": 0, "replay_misses": 0, "recorded": 0,
+    })
+
+
+def request_hash(provider: str, body: dict) -> str:
+    canonical = {k: v for k, v in body.items() if k not in HASH_IGNORED_FIELDS}
+    payload = json.dumps([provider, canonical], ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _system_prompt(provider: str, body: dict) -> str:
+    if provider == "anthropic":
+        system = body.get("system") or ""
+        if isinstance(system, list):
+            return "".join(block.get("text", "") for block in system)
+        return system
+    return "".join(
+        message["content"] for message in body.get("messages", [])
+        if message.get("role") == "system" and isinstance(message.get("content"), str)
+    )
+
+
+def _prompt_chars(provider: str, body: dict) -> tuple[int, int]:
+    """返回 (文本字符数, 图片数)"""
+    chars = len(_system_prompt(provider, body))
+    images = 0
+    for message in body.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            chars += len(content) if message.get("role") != "system" else 0
+            continue
+        for part in content or []:
+            if part.get("type") in ("image", "image_url"):
+                images += 1
+            elif part.get("type") == "text":
+                chars += len(part.get("text", ""))
+    return chars, images
+
+
+def _estimate_tokens(chars: int) -> int:
+    # 中文约每 1.5 字符一个 token，混合文本取 2 作为粗略估计
+    return max(1, math.ceil(chars / 2))
+
+
+def synthetic_content(provider: str, body: dict, digest: str) -> str:
+    """按系统提示词生成结构合法的回复，内容由请求哈希决定"""
+    rng = random.Random(digest)
+    system = _system_prompt(provider, body)
+
+    def behavior() -> dict:
+        types = rng.sample(sorted(BEHAVIOR_TYPES), k=rng.randint(1, 3))
+        return {
+            "activities": [
+                {
+                    "type": t,
+                    "description": f"孩子在进行{t}相关的活动",
+                    "confidence": round(rng.uniform(0.5, 0.95), 2),
+                    "duration_pct": round(1 / len(types), 2),
+                }
+                for t in types
+            ],
+            "environment": rng.choice(["室内", "室外", "学校"]),
+            "interaction_mode": rng.choice(["独处", "与同伴", "与成人"]),
+        }
+
+    def emotion() -> dict:
+        scores = {name: round(rng.random(), 2) for name in sorted(EMOTION_TYPES)}
+        dominant = max(scores, key=scores.get)
+        return {
+            "dominant": dominant,
+            "scores": scores,
+            "expression_description": f"表情以{dominant}为主",
+            "emotional_stability": round(rng.uniform(0.4, 0.9), 2),
+            "confidence": round(rng.uniform(0.5, 0.95), 2),
+        }
+
+    if system == COMBINED_SYSTEM_PROMPT:
+        return json.dumps({"behavior": behavior(), "emotion": emotion()}, ensure_ascii=False)
+    if system == PHOTO_EVENT_SYSTEM_PROMPT:
+        photos = [
+            {"index": index, "behavior": behavior(), "emotion": emotion()}
+            for index in range(1, _prompt_chars(provider, body)[1] + 1)
+        ]
+        return json.dumps({"photos": photos}, ensure_ascii=False)
+    if system == BEHAVIOR_SYSTEM_PROMPT:
+        return json.dumps(behavior(), ensure_ascii=False)
+    if system == EMOTION_SYSTEM_PROMPT:
+        return json.dumps(emotion(), ensure_ascii=False)
+    paragraphs = rng.randint(3, 6)
+    return "\n\n".join(
+        f"## 成长片段 {i + 1}\n这个月孩子在探索中不断进步，展现出好奇心与专注力。" * rng.randint(1, 3)
+        for i in range(paragraphs)
+    )
+
+
+def openai_response(body: dict, content: str, input_tokens: int) -> dict:
+    output_tokens = _estimate_tokens(len(content))
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "standin"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": input_tokens,
+            "completion_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+            "prompt_tokens_details": {"cached_tokens": 0},
+        },
+    }
+
+
+def anthropic_response(body: dict, content: str, input_tokens: int) -> dict:
+    return {
+        "id": f"msg_{uuid.uuid4().hex[:24]}",
+        "type": "message",
+        "role": "assistant",
+        "model": body.get("model", "standin"),
+        "content": [{"type": "text", "text": content}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {
+            "input_tokens": input_tokens,
+            "output_tokens": _estimate_tokens(len(content)),
+            "cache_creation_input_tokens": 0,
+            "cache_read_input_tokens": 0,
+        },
+    }
+
+
+def response_text(provider: str, response: dict) -> str:
+    if provider == "anthropic":
+        return "".join(block.get("text", "") for block in response.get("content", []))
+    return response["choices"][0]["message"].get("content") or ""
+
+
+def _sse(data: dict, event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def stream_openai(response: dict, body: dict, delay: float) -> AsyncIterator[str]:
+    text = response_text("openai", response)
+    chunks = [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)] or [""]
+    base = {"id": response["id"], "object": "chat.completion.chunk", "created": response["created"], "model": response["model"]}
+    for index, chunk in enumerate(chunks):
+        await asyncio.sleep(delay)
+        delta = {"content": chunk}
+        if index == 0:
+            delta["role"] = "assistant"
+        yield "data: " + json.dumps({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}, ensure_ascii=False) + "\n\n"
+    yield "data: " + json.dumps({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}) + "\n\n"
+    if (body.get("stream_options") or {}).get("include_usage"):
+        yield "data: " + json.dumps({**base, "choices": [], "usage": response["usage"]}) + "\n\n"
+    yield "data: [DONE]\n\n"
+
+
+async def stream_anthropic(response: dict, delay: float) -> AsyncIterator[str]:
+    text = response_text("anthropic", response)
+    chunks = [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)] or [""]
+    message = {**response, "content": [], "stop_reason": None, "usage": {**response["usage"], "output_tokens": 1}}
+    yield _sse({"type": "message_start", "message": message}, "message_start")
+    yield _sse({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}, "content_block_start")
+    for chunk in chunks:
+        await asyncio.sleep(delay)
+        yield _sse({"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": chunk}}, "content_block_delta")
+    yield _sse({"type": "content_block_stop", "index": 0}, "content_block_stop")
+    yield _sse({
+        "type": "message_delta",
+        "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+        "usage": {"output_tokens": response["usage"]["output_tokens"]},
+    }, "message_delta")
+    yield _sse({"type": "message_stop"}, "message_stop")
+
+
+def error_response(provider: str, status_code: int, message: str, retry_after: Optional[float] = None) -> JSONResponse:
+    if provider == "anthropic":
+        error_type = {429: "rate_limit_error", 404: "not_found_error"}.get(status_code, "api_error")
+        content = {"type": "error", "error": {"type": error_type, "message": message}}
+    else:
+        error_type = {429: "rate_limit_exceeded", 404: "not_found"}.get(status_code, "server_error")
+        content = {"error": {"message": message, "type": error_type, "code": error_type}}
+    headers = {"retry-after": f"{retry_after:g}"} if retry_after is not None else None
+    return JSONResponse(content, status_code=status_code, headers=headers)
+
+
+class Standin:
+    def __init__(self, config: StandinConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self._http = None
+
+    def sample_latency(self, images: int) -> float:
+        """单次请求的总延迟（秒）：对数正态分布 + 每张图片的固定开销"""
+        base = self.config.latency_ms * math.exp(self.config.latency_sigma * self.rng.gauss(0, 1))
+        return (base + images * self.config.latency_per_image_ms) / 1000
+
+    def _cassette_path(self, digest: str) -> str:
+        return os.path.join(self.config.cassette_dir, digest[:2], f"{digest}.json")
+
+    def load(self, digest: str) -> Optional[dict]:
+        path = self._cassette_path(digest)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, digest: str, provider: str, response: dict, elapsed: float) -> None:
+        path = self._cassette_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"provider": provider, "elapsed_ms": int(elapsed * 1000), "response": response}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    async def forward(self, provider: str, body: dict, headers) -> tuple[int, dict, float]:
+        """以非流式请求转发到真实 API，返回 (状态码, 响应 JSON, 耗时秒数)"""
+        import httpx
+
+        if self._http is None:
+            self._http = httpx.AsyncClient(timeout=180.0)
+        upstream_body = {k: v for k, v in body.items() if k not in ("stream", "stream_options")}
+        upstream = self.config.upstream.rstrip("/")
+        if provider == "anthropic":
+            url = f"{upstream}/v1/messages"
+            forward_headers = {
+                "x-api-key": self.config.upstream_key or headers.get("x-api-key", ""),
+                "anthropic-version": headers.get("anthropic-version", "2023-06-01"),
+            }
+            if headers.get("anthropic-beta"):
+                forward_headers["anthropic-beta"] = headers["anthropic-beta"]
+        else:
+            url = f"{upstream}/chat/completions"
+            authorization = f"Bearer {self.config.upstream_key}" if self.config.upstream_key else headers.get("authorization", "")
+            forward_headers = {"authorization": authorization}
+        start = time.perf_counter()
+        response = await self._http.post(url, json=upstream_body, headers=forward_headers)
+        return response.status_code, response.json(), time.perf_counter() - start
+
+    async def handle(self, provider: str, request: Request):
+        body = await request.json()
+        stats = self.config.stats
+        stats["requests"] += 1
+        digest = request_hash(provider, body)
+        chars, images = _prompt_chars(provider, body)
+
+        if self.rng.random() < self.config.throttle_rate:
+            stats["throttled_injected"] += 1
+            await asyncio.sleep(0.02)
+            return error_response(provider, 429, "standin: rate limited", retry_after=self.config.retry_after_sec)
+
+        latency = self.sample_latency(images)
+        if self.rng.random() < self.config.error_rate:
+            stats["errors_injected"] += 1
+            await asyncio.sleep(latency)
+            return error_response(provider, 500, "standin: injected server error")
+
+        response = None
+        if self.config.mode in ("record", "replay"):
+            recorded = self.load(digest)
+            if recorded is not None:
+                stats["replay_hits"] += 1
+                response = recorded["response"]
+                if self.config.replay_timing == "recorded":
+                    latency = recorded.get("elapsed_ms", 0) / 1000
+            elif self.config.mode == "record":
+                status_code, upstream_response, elapsed = await self.forward(provider, body, request.headers)
+                if status_code != 200:
+                    return JSONResponse(upstream_response, status_code=status_code)
+                self.save(digest, provider, upstream_response, elapsed)
+                stats["recorded"] += 1
+                response, latency = upstream_response, 0.0  # 真实耗时已经发生
+            else:
+                stats["replay_misses"] += 1
+                if self.config.replay_miss != "synthetic":
+                    return error_response(provider, 404, f"standin: no recording for request {digest[:12]}")
+
+        if response is None:
+            content = synthetic_content(provider, body, digest)
+            input_tokens = _estimate_tokens(chars) + images * self.config.tokens_per_image
+            build = anthropic_response if provider == "anthropic" else openai_response
+            response = build(body, content, input_tokens)
+
+        if body.get("stream"):
+            stats["streamed"] += 1
+            text_length = len(response_text(provider, response))
+            chunk_count = max(1, math.ceil(text_length / STREAM_CHUNK_CHARS))
+            await asyncio.sleep(latency * self.config.ttft_ratio)
+            delay = latency * (1 - self.config.ttft_ratio) / chunk_count
+            events = stream_anthropic(response, delay) if provider == "anthropic" else stream_openai(response, body, delay)
+            return StreamingResponse(events, media_type="text/event-stream")
+
+        await asyncio.sleep(latency)
+        return JSONResponse(response)
+
+
+def create_app(config: StandinConfig) -> FastAPI:
+    standin = Standin(config)
+    app = FastAPI(title="LLM Stand-in")
+
+    @app.get("/_standin/stats")
+    async def stats():
+        return config.stats
+
+    @app.post("/{path:path}")
+    async def dispatch(path: str, request: Request):
+        # 按路径后缀识别接口，兼容 base_url 带或不带 /v1 的写法
+        if path.rstrip("/").endswith("chat/completions"):
+            return await standin.handle("openai", request)
+        if path.rstrip("/").endswith("messages"):
+            return await standin.handle("anthropic", request)
+        return JSONResponse({"error": {"message": f"standin: unsupported path /{path}"}}, status_code=404)
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="OpenAI / Anthropic 兼容的大模型替身服务（合成、录制、回放）")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--mode", choices=["synthetic", "record", "replay"], default="synthetic")
+    parser.add_argument("--latency-ms", type=float, default=800.0, help="延迟中位数（对数正态分布）")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="对数正态分布的 sigma，越大长尾越重")
+    parser.add_argument("--latency-per-image-ms", type=float, default=150.0, help="每张图片额外增加的延迟")
+    parser.add_argument("--ttft-ratio", type=float, default=0.3, help="流式回复首个分片的延迟占比")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="注入 500 错误的比例")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="注入 429 的比例")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429 响应的 Retry-After 秒数")
+    parser.add_argument("--tokens-per-image", type=int, default=765, help="合成回复中每张图片计入的输入 token")
+    parser.add_argument("--cassette", default="./data/llm_cassettes", help="录制结果目录")
+    parser.add_argument("--upstream", default="", help="record 模式转发的真实 API 地址")
+    parser.add_argument("--upstream-key", default="", help="record 模式使用的 API Key（默认透传请求中的 Key）")
+    parser.add_argument("--replay-miss", choices=["error", "synthetic"], default="error")
+    parser.add_argument("--replay-timing", choices=["distribution", "recorded"], default="distribution",
+                        help="回放时使用配置的延迟分布，或录制时的真实耗时")
+    parser.add_argument("--seed", type=int, help="随机种子（延迟与错误注入可复现）")
+    args = parser.parse_args()
+
+    if args.mode == "record" and not args.upstream:
+        raise SystemExit("record 模式需要 --upstream")
+
+    config = StandinConfig(
+        mode=args.mode,
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        latency_per_image_ms=args.latency_per_image_ms,
+        ttft_ratio=args.ttft_ratio,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after_sec=args.retry_after,
+        tokens_per_image=args.tokens_per_image,
+        cassette_dir=args.cassette,
+        upstream=args.upstream,
+        upstream_key=args.upstream_key,
+        replay_miss=args.replay_miss,
+        replay_timing=args.replay_timing,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
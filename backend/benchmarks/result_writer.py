@@ -0,0 +1,152 @@
+"""
+分析结果写入方式对比：为同一个媒体重复写入 --media 次结果，每次 --rows 行（行为 + 情感 + 人脸等），
+分别以三种方式运行：
+
+- orm：旧方式，逐行 db.add(AnalysisResult) 后 flush，并加载 MediaFile 更新分析状态
+- bulk：AnalysisResultWriter，每个媒体一条多行 INSERT，直接 UPDATE 分析状态
+- copy：AnalysisResultWriter 强制使用 COPY
+
+比较每秒写入行数与每个媒体的数据库往返次数。每种方式在单独的事务中运行，结束后回滚，不留下数据。
+需要 DATABASE_URL 指向可用的 PostgreSQL，且库中至少有一个媒体文件与孩子（或通过参数指定）。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.result_writer --media 200 --rows 12
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime
+
+from sqlalchemy import event, select, update
+
+
+def _result_data(index: int) -> dict:
+    return {
+        "keyframe": f"keyframe_{index:03d}.jpg",
+        "timestamp_sec": index * 2.5,
+        "matched_children": ["benchmark"],
+        "faces": [{"bbox": [10, 20, 110, 140], "score": 0.9, "track_id": index % 3}],
+    }
+
+
+async def write_orm(db, media_id: str, child_id: str, rows: int) -> None:
+    from app.models.analysis import AnalysisResult
+    from app.models.media import MediaFile
+
+    for index in range(rows):
+        db.add(AnalysisResult(
+            media_id=media_id,
+            child_id=child_id,
+            analysis_type="face",
+            result_data=_result_data(index),
+            confidence_score=0.9,
+            analyzed_at=datetime.utcnow(),
+        ))
+    media_file = (await db.execute(select(MediaFile).where(MediaFile.id == media_id))).scalar_one_or_none()
+    if media_file:
+        media_file.analysis_status = "completed"
+    await db.flush()
+
+
+async def write_bulk(db, media_id: str, child_id: str, rows: int) -> None:
+    from app.models.media import MediaFile
+    from app.services.analysis_service import AnalysisResultWriter
+
+    writer = AnalysisResultWriter(db)
+    for index in range(rows):
+        writer.add(media_id, child_id, "face", _result_data(index), confidence_score=0.9)
+    await db.execute(update(MediaFile).where(MediaFile.id == media_id).values(analysis_status="completed"))
+    await writer.flush()
+
+
+async def run_mode(mode: str, media: int, rows: int, media_id: str, child_id: str) -> dict:
+    from app.config import settings
+    from app.database import async_session_factory, engine
+    from app.services.analysis_service import AnalysisResultWriter
+
+    statements = {"count": 0}
+
+    def _count(*_):
+        statements["count"] += 1
+
+    settings.ANALYSIS_RESULT_COPY_MIN_ROWS = 1 if mode == "copy" else 0
+    copies_before = AnalysisResultWriter.report()["copies"]
+    write = write_orm if mode == "orm" else write_bulk
+
+    event.listen(engine.sync_engine, "before_cursor_execute", _count)
+    try:
+        async with async_session_factory() as session:
+            transaction = await session.begin()
+            try:
+                start = time.perf_counter()
+                for _ in range(media):
+                    await write(session, media_id, child_id, rows)
+                elapsed = time.perf_counter() - start
+            finally:
+                await transaction.rollback()
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", _count)
+
+    # COPY 直接走 asyncpg 连接，不经过 SQLAlchemy 的游标事件，单独计入
+    round_trips = statements["count"] + AnalysisResultWriter.report()["copies"] - copies_before
+    return {
+        "mode": mode,
+        "media": media,
+        "rows": media * rows,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(media * rows / elapsed, 1) if elapsed else 0.0,
+        "round_trips_per_media": round(round_trips / media, 2) if media else 0.0,
+    }
+
+
+async def _pick_ids(media_id: str | None, child_id: str | None) -> tuple[str, str]:
+    from app.database import async_session_factory
+    from app.models.child import Child
+    from app.models.media import MediaFile
+
+    async with async_session_factory() as session:
+        if not media_id:
+            media_id = (await session.execute(select(MediaFile.id).limit(1))).scalar_one_or_none()
+        if not child_id:
+            child_id = (await session.execute(select(Child.id).limit(1))).scalar_one_or_none()
+    if not media_id or not child_id:
+        raise SystemExit("数据库中没有媒体文件或孩子，请通过 --media-id / --child-id 指定")
+    return media_id, child_id
+
+
+async def main_async(args) -> list[dict]:
+    from app.database import engine
+
+    media_id, child_id = await _pick_ids(args.media_id, args.child_id)
+    try:
+        return [
+            await run_mode(mode, args.media, args.rows, media_id, child_id)
+            for mode in ("orm", "bulk", "copy")
+        ]
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="分析结果逐行 ORM 写入 / 多行 INSERT / COPY 对比")
+    parser.add_argument("--media", type=int, default=200, help="模拟的媒体数")
+    parser.add_argument("--rows", type=int, default=12, help="每个媒体的结果行数")
+    parser.add_argument("--media-id", default=None, help="写入时使用的媒体 ID（默认取库中任意一个）")
+    parser.add_argument("--child-id", default=None, help="写入时使用的孩子 ID（默认取库中任意一个）")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    for result in results:
+        print(
+            f"{result['mode']}: 媒体={result['media']}, 行数={result['rows']}, 耗时={result['seconds']}s, "
+            f"写入速率={result['rows_per_sec']} 行/秒, 每媒体往返={result['round_trips_per_media']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
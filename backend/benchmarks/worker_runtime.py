@@ -0,0 +1,111 @@
+"""
+Celery 任务异步运行时的数据库连接复用对比：顺序模拟 --tasks 个任务，每个任务开一个事务执行
+--queries 条查询，分别以两种方式运行：
+
+- legacy：旧方式，每个任务新建并关闭事件循环，共用同一个模块级引擎
+- runtime：app.tasks.runtime.run_async，进程内持久事件循环与在其上创建的引擎
+
+比较新建连接数、连接失效数、失败任务数、取用时的连接复用比例与单任务耗时。
+需要 DATABASE_URL 指向可用的 PostgreSQL。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.worker_runtime --tasks 200 --queries 5
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+
+async def task_body(session_factory, queries: int) -> None:
+    async with session_factory() as session:
+        async with session.begin():
+            for _ in range(queries):
+                await session.execute(text("SELECT 1"))
+
+
+def _summary(mode: str, durations: list[float], failed: int, connects: int, checkouts: int, invalidated: int) -> dict:
+    return {
+        "mode": mode,
+        "tasks": len(durations) + failed,
+        "failed": failed,
+        "connects": connects,
+        "checkouts": checkouts,
+        "invalidated": invalidated,
+        "reuse_ratio": round(1 - connects / checkouts, 4) if checkouts else 0.0,
+        "task_p50_ms": round(statistics.median(durations) * 1000, 2) if durations else 0.0,
+        "task_mean_ms": round(statistics.fmean(durations) * 1000, 2) if durations else 0.0,
+    }
+
+
+def run_legacy(tasks: int, queries: int) -> dict:
+    from app.database import create_engine
+
+    engine = create_engine()
+    counts = {"connect": 0, "checkout": 0, "invalidate": 0}
+    for name in counts:
+        event.listen(engine.sync_engine, name, lambda *_, name=name: counts.__setitem__(name, counts[name] + 1))
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    durations: list[float] = []
+    failed = 0
+    for _ in range(tasks):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        start = time.perf_counter()
+        try:
+            loop.run_until_complete(task_body(session_factory, queries))
+            durations.append(time.perf_counter() - start)
+        except Exception:
+            failed += 1
+        finally:
+            loop.close()
+    return _summary("legacy", durations, failed, counts["connect"], counts["checkout"], counts["invalidate"])
+
+
+def run_runtime(tasks: int, queries: int) -> dict:
+    from app.database import async_session_factory
+    from app.tasks.runtime import get_runtime, run_async
+
+    runtime = get_runtime()
+    durations: list[float] = []
+    failed = 0
+    for _ in range(tasks):
+        start = time.perf_counter()
+        try:
+            run_async(task_body(async_session_factory, queries))
+            durations.append(time.perf_counter() - start)
+        except Exception:
+            failed += 1
+    report = runtime.report()
+    summary = _summary("runtime", durations, failed, report["connects"], report["checkouts"], report["invalidated"])
+    summary["pool"] = {key: report[key] for key in ("pool_size", "checked_in", "checked_out", "overflow")}
+    runtime.close()
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Celery 任务事件循环 / 数据库连接复用对比")
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=5, help="每个任务执行的查询数")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+    args = parser.parse_args()
+
+    results = [run_legacy(args.tasks, args.queries), run_runtime(args.tasks, args.queries)]
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    for result in results:
+        print(
+            f"{result['mode']}: 任务={result['tasks']}, 失败={result['failed']}, 新建连接={result['connects']}, "
+            f"取用={result['checkouts']}, 失效={result['invalidated']}, 复用比例={result['reuse_ratio']}, "
+            f"单任务 p50={result['task_p50_ms']}ms, 均值={result['task_mean_ms']}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import asyncio
+import time
+from collections import deque
+from types import SimpleNamespace
+
+import pytest
+
+from app.ai.remote.endpoint_router import EndpointHealth, EndpointRouter, endpoint_key
+from app.ai.remote.rate_limiter import LLMRequestError
+from app.config import settings
+
+PRIMARY = SimpleNamespace(provider="openai", base_url="https://primary")
+FALLBACK = SimpleNamespace(provider="openai", base_url="https://fallback")
+
+
+@pytest.fixture(autouse=True)
+def router_settings(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_CIRCUIT_FAILURE_THRESHOLD", 2)
+    monkeypatch.setattr(settings, "LLM_CIRCUIT_RESET_SEC", 30)
+    monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", False)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_SAMPLES", 1)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MAX_RATIO", 1.0)
+    monkeypatch.setattr(settings, "LLM_HEDGE_PERCENTILE", 0.95)
+
+
+def make_invoke(behaviour: dict, calls: list):
+    """behaviour: base_url -> 返回值或异常（可为协程函数，模拟慢请求）"""
+
+    async def invoke(client, max_retries):
+        calls.append(client.base_url)
+        action = behaviour[client.base_url]
+        if callable(action):
+            return await action()
+        if isinstance(action, Exception):
+            raise action
+        return action
+
+    return invoke
+
+
+def health(router: EndpointRouter, client) -> EndpointHealth:
+    return router._get_health(endpoint_key(client))
+
+
+def test_health_transitions(monkeypatch):
+    endpoint = EndpointHealth()
+    assert endpoint.available()
+    assert not endpoint.claim_probe()
+
+    endpoint.state = "open"
+    endpoint.opened_at = time.monotonic()
+    assert not endpoint.available()
+    assert not endpoint.claim_probe()
+
+    monkeypatch.setattr(settings, "LLM_CIRCUIT_RESET_SEC", 0)
+    assert endpoint.available()
+    assert endpoint.state == "open"  # available() 只读
+    assert endpoint.claim_probe()
+    assert endpoint.state == "half_open"
+    # 探测名额只有一个
+    assert not endpoint.available()
+    assert not endpoint.claim_probe()
+
+
+def test_failover_to_next_endpoint():
+    router = EndpointRouter()
+    calls = []
+    invoke = make_invoke({PRIMARY.base_url: LLMRequestError("down", 503), FALLBACK.base_url: "ok"}, calls)
+
+    assert asyncio.run(router.call("chat", [PRIMARY, FALLBACK], invoke)) == "ok"
+    assert calls == [PRIMARY.base_url, FALLBACK.base_url]
+    assert health(router, PRIMARY).consecutive_failures == 1
+    assert health(router, PRIMARY).state == "closed"
+
+
+def test_circuit_opens_and_skips_endpoint():
+    router = EndpointRouter()
+    calls = []
+    invoke = make_invoke({PRIMARY.base_url: LLMRequestError("down", 503), FALLBACK.base_url: "ok"}, calls)
+
+    for _ in range(2):
+        asyncio.run(router.call("chat", [PRIMARY, FALLBACK], invoke))
+    assert health(router, PRIMARY).state == "open"
+
+    calls.clear()
+    asyncio.run(router.call("chat", [PRIMARY, FALLBACK], invoke))
+    assert calls == [FALLBACK.base_url]
+
+
+def test_all_endpoints_open_still_tried_in_order():
+    router = EndpointRouter()
+    for client in (PRIMARY, FALLBACK):
+        health(router, client).state = "open"
+        health(router, client).opened_at = time.monotonic()
+    calls = []
+    invoke = make_invoke({PRIMARY.base_url: "ok", FALLBACK.base_url: "ok"}, calls)
+
+    assert asyncio.run(router.call("chat", [PRIMARY, FALLBACK], invoke)) == "ok"
+    assert calls == [PRIMARY.base_url]
+
+
+def test_half_open_probe_success_closes_circuit(monkeypatch):
+    router = EndpointRouter()
+    health(router, PRIMARY).state = "open"
+    monkeypatch.setattr(settings, "LLM_CIRCUIT_RESET_SEC", 0)
+    calls = []
+    invoke = make_invoke({PRIMARY.base_url: "ok", FALLBACK.base_url: "fallback"}, calls)
+
+    assert asyncio.run(router.call("chat", [PRIMARY, FALLBACK], invoke)) == "ok"
+    assert health(router, PRIMARY).state == "closed"
+    assert not health(router, PRIMARY).probing
+
+
+def test_half_open_probe_failure_reopens(monkeypatch):
+    router = EndpointRouter()
+    health(router, PRIMARY).state = "open"
+    monkeypatch.setattr(settings, "LLM_CIRCUIT_RESET_SEC", 0)
+    invoke = make_invoke({PRIMARY.base_url: LLMRequestError("down", 503), FALLBACK.base_url: "ok"}, [])
+
+    assert asyncio.run(router.call("chat", [PRIMARY, FALLBACK], invoke)) == "ok"
+    assert health(router, PRIMARY).state == "open"
+    assert not health(router, PRIMARY).probing
+
+
+def test_unused_endpoint_keeps_no_probe(monkeypatch):
+    # 熔断的备用端点只是被检查、没有被实际请求时，不能占着探测名额卡在 half_open
+    router = EndpointRouter()
+    health(router, FALLBACK).state = "open"
+    monkeypatch.setattr(settings, "LLM_CIRCUIT_RESET_SEC", 0)
+    invoke = make_invoke({PRIMARY.base_url: "ok", FALLBACK.base_url: "fallback"}, [])
+
+    asyncio.run(router.call("chat", [PRIMARY, FALLBACK], invoke))
+    assert health(router, FALLBACK).state == "open"
+    assert not health(router, FALLBACK).probing
+    assert health(router, FALLBACK).available()
+
+
+def test_request_error_is_not_failed_over():
+    router = EndpointRouter()
+    calls = []
+    invoke = make_invoke({PRIMARY.base_url: LLMRequestError("bad request", 400), FALLBACK.base_url: "ok"}, calls)
+
+    with pytest.raises(LLMRequestError):
+        asyncio.run(router.call("chat", [PRIMARY, FALLBACK], invoke))
+    assert calls == [PRIMARY.base_url]
+    assert health(router, PRIMARY).consecutive_failures == 0
+
+
+def test_all_endpoints_fail_raises_last_error():
+    router = EndpointRouter()
+    invoke = make_invoke(
+        {PRIMARY.base_url: LLMRequestError("p", 503), FALLBACK.base_url: LLMRequestError("f", 502)}, []
+    )
+    with pytest.raises(LLMRequestError) as error:
+        asyncio.run(router.call("chat", [PRIMARY, FALLBACK], invoke))
+    assert error.value.status_code == 502
+
+
+def test_hedge_to_fallback_when_primary_is_slow(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", True)
+    router = EndpointRouter()
+    health(router, PRIMARY).latencies["chat"] = deque([0.01])
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return "slow"
+
+    calls = []
+    invoke = make_invoke({PRIMARY.base_url: slow, FALLBACK.base_url: "fast"}, calls)
+
+    assert asyncio.run(router.call("chat", [PRIMARY, FALLBACK], invoke)) == "fast"
+    assert calls == [PRIMARY.base_url, FALLBACK.base_url]
+    assert cancelled == [True]
+    assert health(router, FALLBACK).counts["hedged"] == 1
+    assert health(router, FALLBACK).counts["hedge_won"] == 1
+    assert router.report()["hedges"] == 1
+
+
+def test_no_hedge_without_latency_samples(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_SAMPLES", 20)
+    router = EndpointRouter()
+    health(router, PRIMARY).latencies["chat"] = deque([0.01])
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "slow"
+
+    calls = []
+    invoke = make_invoke({PRIMARY.base_url: slow, FALLBACK.base_url: "fast"}, calls)
+    assert asyncio.run(router.call("chat", [PRIMARY, FALLBACK], invoke)) == "slow"
+    assert calls == [PRIMARY.base_url]
+
+
+def test_cancelled_hedged_probe_is_released(monkeypatch):
+    # 对冲到半开端点后主端点先返回，被取消的探测请求要归还探测名额
+    monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_CIRCUIT_RESET_SEC", 0)
+    router = EndpointRouter()
+    health(router, PRIMARY).latencies["chat"] = deque([0.0])
+    health(router, FALLBACK).state = "open"
+
+    async def primary():
+        await asyncio.sleep(0.05)
+        return "primary"
+
+    async def fallback():
+        await asyncio.sleep(5)
+        return "fallback"
+
+    invoke = make_invoke({PRIMARY.base_url: primary, FALLBACK.base_url: fallback}, [])
+    assert asyncio.run(router.call("chat", [PRIMARY, FALLBACK], invoke)) == "primary"
+    assert health(router, FALLBACK).state == "half_open"
+    assert not health(router, FALLBACK).probing
+    assert health(router, FALLBACK).available()
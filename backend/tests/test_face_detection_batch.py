@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+scrfd = pytest.importorskip("insightface.model_zoo.scrfd")
+
+from app.ai.local.face_engine import FaceEngine  # noqa: E402
+
+INPUT_SIZE = (160, 128)  # (宽, 高)
+STRIDES = [8, 16, 32]
+NUM_ANCHORS = 2
+
+
+class FakeSession:
+    """
+    模拟带动态 batch 维度的 SCRFD 输出：每个锚点的分数、框和关键点由输入张量对应网格的均值决定，
+    同一张图片无论单独推理还是与其他图片拼成批次，得到的输出都相同。
+    """
+
+    def run(self, output_names, feeds):
+        blob = next(iter(feeds.values()))
+        batch, _, height, width = blob.shape
+        scores, bboxes, kpss = [], [], []
+        for stride in STRIDES:
+            grid = blob[:, 0].reshape(batch, height // stride, stride, width // stride, stride).mean(axis=(2, 4))
+            grid = np.repeat(grid.reshape(batch, -1), NUM_ANCHORS, axis=1)
+            scores.append((1 / (1 + np.exp(-4 * grid)))[..., None].astype(np.float32))
+            size = (1.0 + np.abs(grid))[..., None]
+            bboxes.append(np.repeat(size, 4, axis=2).astype(np.float32))
+            kpss.append(np.repeat(size * 0.5, 10, axis=2).astype(np.float32))
+        return scores + bboxes + kpss
+
+
+def make_detector() -> "scrfd.SCRFD":
+    detector = scrfd.SCRFD.__new__(scrfd.SCRFD)
+    detector.session = FakeSession()
+    detector.input_name = "input.1"
+    detector.input_shape = ["None", 3, "?", "?"]
+    detector.output_names = [f"out{i}" for i in range(9)]
+    detector.input_size = INPUT_SIZE
+    detector.input_mean = 127.5
+    detector.input_std = 128.0
+    detector.batched = True
+    detector.use_kps = True
+    detector.fmc = 3
+    detector._feat_stride_fpn = STRIDES
+    detector._num_anchors = NUM_ANCHORS
+    detector.det_thresh = 0.5
+    detector.nms_thresh = 0.4
+    detector.center_cache = {}
+    return detector
+
+
+def make_image(rng: np.random.Generator, height: int, width: int) -> np.ndarray:
+    """暗背景上的几个亮色矩形，对应 FakeSession 中的高分区域"""
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    for _ in range(3):
+        h, w = rng.integers(height // 6, height // 3), rng.integers(width // 6, width // 3)
+        y, x = rng.integers(0, height - h), rng.integers(0, width - w)
+        image[y:y + h, x:x + w] = 255
+    return image
+
+
+def test_batched_decode_matches_single_image_detect():
+    rng = np.random.default_rng(5)
+    # 不同长宽比的图片，覆盖按宽缩放与按高缩放两种情况
+    images = [make_image(rng, h, w) for h, w in [(480, 640), (640, 480), (300, 300), (720, 1280), (100, 400)]]
+    detector = make_detector()
+
+    engine = FaceEngine.__new__(FaceEngine)
+    engine._buffers = {}
+    batched = engine._detect_batch(detector, images)
+    single = [detector.detect(image, max_num=0, metric="default") for image in images]
+
+    assert len(batched) == len(images)
+    total = 0
+    for (det, kpss), (expected_det, expected_kpss) in zip(batched, single):
+        assert det.shape == expected_det.shape
+        np.testing.assert_allclose(det, expected_det, rtol=1e-4, atol=1e-3)
+        np.testing.assert_allclose(kpss, expected_kpss, rtol=1e-4, atol=1e-3)
+        total += det.shape[0]
+    assert total > 0
+
+
+def test_unbatched_detector_falls_back_to_detect():
+    rng = np.random.default_rng(9)
+    images = [make_image(rng, 240, 320) for _ in range(2)]
+    detector = make_detector()
+    detector.input_shape = [1, 3, 128, 160]
+
+    engine = FaceEngine.__new__(FaceEngine)
+    engine._buffers = {}
+    batched = engine._detect_batch(detector, images)
+    for (det, _), image in zip(batched, images):
+        np.testing.assert_array_equal(det, detector.detect(image, max_num=0, metric="default")[0])
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from app.ai.local.face_engine import FaceEngine
+from app.ai.local.face_index import FaceIndex
+
+
+def build_index(rng: np.random.Generator, children: int, per_child: int, dim: int = 512) -> FaceIndex:
+    child_ids = [f"child-{c}" for c in range(children) for _ in range(per_child)]
+    embeddings = rng.standard_normal((len(child_ids), dim)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return FaceIndex(family_id="family", fingerprint="test", child_ids=child_ids, embeddings=embeddings)
+
+
+def make_faces(rng: np.random.Generator, index: FaceIndex, count: int) -> list[dict]:
+    """一部分人脸由已注册特征加噪声得到（应匹配），其余为随机特征（不应匹配）"""
+    faces = []
+    for i in range(count):
+        if i % 2 == 0:
+            base = index.embeddings[rng.integers(len(index.child_ids))]
+            embedding = base * 3.0 + rng.standard_normal(base.shape).astype(np.float32) * 0.05
+        else:
+            embedding = rng.standard_normal(index.embeddings.shape[1]).astype(np.float32)
+        faces.append({"bbox": [i, i, i + 10.0, i + 10.0], "embedding": embedding})
+    return faces
+
+
+def loop_scores(faces: list[dict], index: FaceIndex, threshold: float, top_k: int) -> list:
+    """原逐张、逐条特征循环计算余弦相似度的实现，作为对照"""
+    results = []
+    for face in faces:
+        embedding = np.asarray(face["embedding"], dtype=np.float64)
+        best: dict[str, float] = {}
+        for child_id, registered in zip(index.child_ids, index.embeddings):
+            registered = registered.astype(np.float64)
+            similarity = float(
+                np.dot(embedding, registered) / (np.linalg.norm(embedding) * np.linalg.norm(registered))
+            )
+            best[child_id] = max(best.get(child_id, -1.0), similarity)
+        ranked = sorted(best.items(), key=lambda item: -item[1])[:top_k]
+        results.append([(child_id, score) for child_id, score in ranked if score >= threshold])
+    return results
+
+
+@pytest.mark.parametrize("top_k", [1, 3])
+def test_vectorized_matches_loop(top_k):
+    rng = np.random.default_rng(7)
+    index = build_index(rng, children=5, per_child=3)
+    faces = make_faces(rng, index, 20)
+
+    scored = FaceEngine.score_faces(faces, index, threshold=0.4, top_k=top_k)
+    expected = loop_scores(faces, index, threshold=0.4, top_k=top_k)
+
+    assert len(scored) == len(faces)
+    for match, candidates in zip(scored, expected):
+        if not candidates:
+            assert match is None
+            continue
+        assert [c["child_id"] for c in match["candidates"]] == [child_id for child_id, _ in candidates]
+        for candidate, (_, score) in zip(match["candidates"], candidates):
+            assert candidate["score"] == pytest.approx(score, abs=1e-4)
+        assert match["child_id"] == candidates[0][0]
+
+
+def test_noisy_copies_match_their_child():
+    rng = np.random.default_rng(11)
+    index = build_index(rng, children=4, per_child=2)
+    faces = [
+        {"bbox": [0, 0, 10, 10], "embedding": index.embeddings[row] + rng.standard_normal(512) * 0.01}
+        for row in range(len(index.child_ids))
+    ]
+    scored = FaceEngine.score_faces(faces, index, threshold=0.5)
+    assert [match["child_id"] for match in scored] == index.child_ids
+
+
+def test_match_faces_drops_unmatched():
+    rng = np.random.default_rng(3)
+    index = build_index(rng, children=2, per_child=1)
+    faces = make_faces(rng, index, 6)
+    matched = FaceEngine.match_faces(faces, index, threshold=0.4)
+    scored = FaceEngine.score_faces(faces, index, threshold=0.4)
+    assert matched == [match for match in scored if match is not None]
+
+
+def test_empty_inputs():
+    rng = np.random.default_rng(0)
+    index = build_index(rng, children=1, per_child=1)
+    assert FaceEngine.score_faces([], index) == []
+    empty = FaceIndex(family_id="f", fingerprint="", child_ids=[], embeddings=np.zeros((0, 512), np.float32))
+    assert FaceEngine.score_faces([{"bbox": [0, 0, 1, 1], "embedding": np.ones(512)}], empty) == [None]
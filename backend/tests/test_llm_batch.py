@@ -0,0 +1,26 @@
+import re
+import uuid
+
+from app.ai.remote.llm_batch import make_custom_id, split_custom_id
+
+# Anthropic Message Batches 对 custom_id 的限制
+ANTHROPIC_CUSTOM_ID = re.compile(r"^[a-zA-Z0-9_-]{1,64}$")
+
+
+def test_round_trip():
+    item_key = str(uuid.uuid4())
+    custom_id = make_custom_id(item_key, "narrative")
+    assert split_custom_id(custom_id) == (item_key, "narrative")
+
+
+def test_custom_id_accepted_by_anthropic():
+    assert ANTHROPIC_CUSTOM_ID.match(make_custom_id(str(uuid.uuid4()), "summary"))
+
+
+def test_item_key_containing_separator():
+    # 用途放在最后一个分隔符之后，业务 ID 中出现分隔符也能正确拆分
+    assert split_custom_id(make_custom_id("a__b", "combined")) == ("a__b", "combined")
+
+
+def test_custom_id_without_separator():
+    assert split_custom_id("orphan") == ("", "orphan")
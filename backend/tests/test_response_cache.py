@@ -0,0 +1,36 @@
+from app.ai.remote.response_cache import LLMResponseCache
+
+make_key = LLMResponseCache.make_key
+
+
+def test_key_is_stable():
+    key = make_key("openai", "gpt-4o", "system", "prompt", image_hashes=["a", "b"], variant="jpeg:85:0")
+    assert key == make_key("openai", "gpt-4o", "system", "prompt", image_hashes=["a", "b"], variant="jpeg:85:0")
+    assert key.startswith("llm:cache:")
+
+
+def test_every_component_changes_the_key():
+    base = dict(
+        provider="openai", model="gpt-4o", system_prompt="system", prompt="prompt",
+        image_hashes=["a", "b"], variant="jpeg:85:0",
+    )
+    keys = {make_key(**base)}
+    for name, value in [
+        ("provider", "anthropic"),
+        ("model", "gpt-4o-mini"),
+        ("system_prompt", "system2"),
+        ("prompt", "prompt2"),
+        ("image_hashes", ["b", "a"]),
+        ("variant", "webp:85:0"),
+    ]:
+        keys.add(make_key(**{**base, name: value}))
+    assert len(keys) == 7
+
+
+def test_fields_do_not_run_together():
+    # 字段按 JSON 数组序列化，拼接后相同的不同字段组合不会得到同一个键
+    assert make_key("openai", "gpt-4o", "ab", "c") != make_key("openai", "gpt-4o", "a", "bc")
+
+
+def test_no_images_equals_empty_images():
+    assert make_key("openai", "gpt-4o", "s", "p") == make_key("openai", "gpt-4o", "s", "p", image_hashes=[])
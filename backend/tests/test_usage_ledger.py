@@ -0,0 +1,60 @@
+import pytest
+
+from app.ai.remote import usage_ledger
+from app.ai.remote.usage_ledger import BATCH_DISCOUNT, estimate_cost
+from app.config import settings
+
+
+@pytest.fixture(autouse=True)
+def default_prices(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PRICES", "")
+    monkeypatch.setattr(usage_ledger, "_prices_cache", ("", usage_ledger.DEFAULT_PRICES))
+
+
+def test_uncached_input_and_output():
+    usage = {"input_tokens": 1_000_000, "output_tokens": 1_000_000}
+    assert estimate_cost("gpt-4o-2024-08-06", usage) == pytest.approx(2.5 + 10.0)
+
+
+def test_longest_prefix_wins():
+    usage = {"input_tokens": 1_000_000, "output_tokens": 0}
+    # gpt-4o-mini 同时匹配 gpt-4o 与 gpt-4o-mini 两个前缀
+    assert estimate_cost("gpt-4o-mini", usage) == pytest.approx(0.15)
+
+
+def test_cached_and_cache_write_tokens_priced_separately():
+    usage = {
+        "input_tokens": 1_000_000,
+        "cached_tokens": 600_000,
+        "cache_creation_tokens": 100_000,
+        "output_tokens": 0,
+    }
+    expected = 0.3 * 3.0 + 0.6 * 0.3 + 0.1 * 3.75
+    assert estimate_cost("claude-3-5-sonnet-20241022", usage) == pytest.approx(expected)
+
+
+def test_cached_input_falls_back_to_input_price():
+    usage = {"input_tokens": 1_000_000, "cache_creation_tokens": 1_000_000}
+    # gpt-4o 没有 cache_write 单价，按普通输入计费
+    assert estimate_cost("gpt-4o", usage) == pytest.approx(2.5)
+
+
+def test_batch_discount():
+    usage = {"input_tokens": 1_000_000, "output_tokens": 1_000_000}
+    assert estimate_cost("gpt-4o", usage, batch=True) == pytest.approx((2.5 + 10.0) * BATCH_DISCOUNT)
+
+
+def test_unknown_model_is_free():
+    assert estimate_cost("some-local-model", {"input_tokens": 1000, "output_tokens": 1000}) == 0.0
+
+
+def test_price_overrides(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PRICES", '{"qwen-vl": {"input": 1.0, "output": 2.0}}')
+    usage = {"input_tokens": 1_000_000, "output_tokens": 1_000_000}
+    assert estimate_cost("qwen-vl-max", usage) == pytest.approx(3.0)
+    assert estimate_cost("gpt-4o", usage) == pytest.approx(12.5)
+
+
+def test_invalid_price_overrides_use_defaults(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PRICES", "[1, 2]")
+    assert estimate_cost("gpt-4o", {"input_tokens": 1_000_000}) == pytest.approx(2.5)
@@ -70,7 +70,30 @@ const ReportPage: React.FC = () => {
     if (!resolvedChildId) return
     setGenerating(true)
     try {
-      await reportApi.generate(resolvedChildId)
+      // 流式生成：叙事文本边生成边显示，完成后报告已保存
+      let draft: ReportItem | null = null
+      await reportApi.generateStream(resolvedChildId, (event, data) => {
+        if (event === 'start') {
+          draft = {
+            id: 'draft',
+            report_month: data.report_month,
+            summary_text: '',
+            narrative: '',
+            radar_data: data.radar_data,
+            spark_cards: [],
+            created_at: new Date().toISOString(),
+          }
+        } else if (event === 'narrative' && draft) {
+          draft = { ...draft, narrative: (draft.narrative || '') + data.delta }
+        } else if (event === 'summary' && draft) {
+          draft = { ...draft, summary_text: data.text }
+        } else if (event === 'report') {
+          draft = null
+        } else if (event === 'error') {
+          throw new Error(data.message)
+        }
+        if (draft) setSelectedReport(draft)
+      })
       const response = await reportApi.list(resolvedChildId)
       const data = Array.isArray(response.data) ? response.data as ReportItem[] : []
       setReports(data)
@@ -108,7 +131,7 @@ const ReportPage: React.FC = () => {
       </div>
 
       <Spin spinning={loading}>
-        {reports.length === 0 ? (
+        {reports.length === 0 && !selectedReport ? (
           <Card style={{ borderRadius: 12, textAlign: 'center', padding: 40 }}>
             <Empty description="暂无报告，点击右上角生成第一份报告" />
           </Card>
@@ -35,6 +35,46 @@ apiClient.interceptors.response.use(
   }
 )
 
+/** 以 POST 请求读取 Server-Sent Events 流（EventSource 无法携带 Authorization 头） */
+async function streamEvents(url: string, onEvent: (event: string, data: any) => void): Promise<void> {
+  const headers: Record<string, string> = { Accept: 'text/event-stream' }
+  const authData = localStorage.getItem('auth-storage')
+  const token = authData ? JSON.parse(authData)?.state?.token : null
+  if (token) headers.Authorization = `Bearer ${token}`
+
+  const response = await fetch(url, { method: 'POST', headers })
+  if (response.status === 401) {
+    localStorage.removeItem('auth-storage')
+    window.location.href = '/login'
+    return
+  }
+  if (!response.ok || !response.body) {
+    throw new Error(`请求失败: ${response.status}`)
+  }
+
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  for (;;) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+    let boundary = buffer.indexOf('\n\n')
+    while (boundary >= 0) {
+      const message = buffer.slice(0, boundary)
+      buffer = buffer.slice(boundary + 2)
+      let event = 'message'
+      let data = ''
+      for (const line of message.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim()
+        else if (line.startsWith('data:')) data += line.slice(5).trim()
+      }
+      if (data) onEvent(event, JSON.parse(data))
+      boundary = buffer.indexOf('\n\n')
+    }
+  }
+}
+
 export const authApi = {
   login: (data: { username: string; password: string }) =>
     apiClient.post('/auth/login', data),
@@ -97,6 +137,8 @@ export const reportApi = {
     apiClient.get(`/reports/children/${childId}/reports/${reportId}/pdf`),
   generate: (childId: string) =>
     apiClient.post(`/reports/children/${childId}/reports/generate`),
+  generateStream: (childId: string, onEvent: (event: string, data: any) => void) =>
+    streamEvents(`/api/v1/reports/children/${childId}/reports/generate/stream`, onEvent),
 }
 
 export const autonomyApi = {